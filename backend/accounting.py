@@ -0,0 +1,186 @@
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+METHODS = ("fifo", "lifo", "average")
+
+# Accounting key for the paper portfolio traded by the mock loop and /execute-mock-trade
+PAPER_USER, PAPER_EXCHANGE = "paper", "mock"
+
+
+def _day(t: float) -> str:
+    return datetime.fromtimestamp(t, tz=timezone.utc).date().isoformat()
+
+
+class LotBook:
+    """Open lots for one (user, exchange, symbol) and the PnL realized from them.
+
+    Buys append a lot; sells consume lots from the front (FIFO) or back
+    (LIFO), splitting at most one lot, so each lot is pushed and popped once
+    and a fill costs O(1) amortized. "average" keeps a single pooled lot.
+    Fees are expensed into realized PnL when paid.
+    """
+
+    __slots__ = ("method", "lots", "qty", "cost", "realized", "fees")
+
+    def __init__(self, method: str = "fifo"):
+        if method not in METHODS:
+            raise ValueError(f"Unknown lot matching method: {method}")
+        self.method = method
+        self.lots: deque = deque()  # [qty, price]
+        self.qty = 0.0
+        self.cost = 0.0
+        self.realized = 0.0
+        self.fees = 0.0
+
+    @property
+    def avg_price(self) -> float:
+        return self.cost / self.qty if self.qty > 0 else 0.0
+
+    def buy(self, qty: float, price: float, fee: float = 0.0):
+        if self.method == "average" and self.lots:
+            lot = self.lots[0]
+            lot[1] = (lot[0] * lot[1] + qty * price) / (lot[0] + qty)
+            lot[0] += qty
+        else:
+            self.lots.append([qty, price])
+        self.qty += qty
+        self.cost += qty * price
+        self.fees += fee
+        self.realized -= fee
+
+    def sell(self, qty: float, price: float, fee: float = 0.0) -> Tuple[float, float]:
+        """Close up to `qty` against open lots; returns (closed qty, realized PnL incl. fee)"""
+        remaining = qty
+        realized = -fee
+        take = self.lots.pop if self.method == "lifo" else self.lots.popleft
+        peek = -1 if self.method == "lifo" else 0
+        while remaining > 1e-12 and self.lots:
+            lot = self.lots[peek]
+            matched = min(remaining, lot[0])
+            realized += (price - lot[1]) * matched
+            self.cost -= matched * lot[1]
+            remaining -= matched
+            if matched >= lot[0] - 1e-12:
+                take()
+            else:
+                lot[0] -= matched
+        closed = qty - remaining
+        self.qty -= closed
+        if not self.lots:
+            self.qty = self.cost = 0.0
+        self.fees += fee
+        self.realized += realized
+        return closed, realized
+
+    def reset(self, qty: float, avg_price: float):
+        """Replace the open lots with one lot, e.g. a position restored from elsewhere"""
+        self.lots = deque([[qty, avg_price]]) if qty > 0 else deque()
+        self.qty = qty if qty > 0 else 0.0
+        self.cost = self.qty * avg_price
+
+    def unrealized(self, mark: Optional[float]) -> float:
+        return self.qty * mark - self.cost if mark is not None and self.qty else 0.0
+
+
+class AccountingEngine:
+    """Lot-matched PnL per (user, exchange, symbol) with daily realized rollups per user"""
+
+    def __init__(self, method: str = "fifo"):
+        if method not in METHODS:
+            raise ValueError(f"Unknown lot matching method: {method}")
+        self.method = method
+        self._books: Dict[Tuple[str, str, str], LotBook] = {}
+        self._by_user: Dict[str, List[Tuple[str, str, str]]] = {}
+        self._daily: Dict[str, Dict[str, Dict[str, float]]] = {}  # user -> UTC day -> rollup
+        self._lock = threading.Lock()
+
+    def _book(self, user: str, exchange: str, symbol: str) -> LotBook:
+        key = (user, exchange, symbol)
+        book = self._books.get(key)
+        if book is None:
+            book = self._books[key] = LotBook(self.method)
+            self._by_user.setdefault(user, []).append(key)
+        return book
+
+    def record_fill(self, user: str, exchange: str, symbol: str, side: str, qty: float, price: float,
+                    fee: float = 0.0, at: Optional[float] = None) -> Dict[str, float]:
+        """Book a fill; sells close at most the open quantity (see `closed_qty`)"""
+        with self._lock:
+            book = self._book(user, exchange, symbol)
+            if side == "buy":
+                book.buy(qty, price, fee)
+                closed, realized = 0.0, -fee
+            elif side == "sell":
+                closed, realized = book.sell(qty, price, fee)
+            else:
+                raise ValueError(f"Unknown side: {side}")
+            rollup = self._daily.setdefault(user, {}).setdefault(
+                _day(time.time() if at is None else at),
+                {"realized_pnl": 0.0, "fees": 0.0, "fills": 0, "winning_sells": 0, "losing_sells": 0})
+            rollup["realized_pnl"] += realized
+            rollup["fees"] += fee
+            rollup["fills"] += 1
+            if closed and realized > 0:
+                rollup["winning_sells"] += 1
+            elif closed and realized < 0:
+                rollup["losing_sells"] += 1
+            return {"closed_qty": closed, "realized_pnl": realized, "position_qty": book.qty,
+                    "avg_price": book.avg_price}
+
+    def sync_position(self, user: str, exchange: str, symbol: str, qty: float, avg_price: float):
+        """Re-base a book whose open quantity disagrees with an authoritative position"""
+        with self._lock:
+            book = self._book(user, exchange, symbol)
+            if abs(book.qty - qty) > 1e-12:
+                book.reset(qty, avg_price)
+
+    def position(self, user: str, exchange: str, symbol: str) -> Dict[str, Any]:
+        with self._lock:
+            book = self._books.get((user, exchange, symbol))
+            if book is None:
+                return {"qty": 0.0, "avg_price": 0.0, "lots": []}
+            return {"qty": book.qty, "avg_price": book.avg_price, "lots": [list(lot) for lot in book.lots]}
+
+    def summary(self, user: str, mark_price: Optional[Callable[[str, str], Optional[float]]] = None) -> Dict[str, Any]:
+        """Realized/unrealized split per position and in total; unmarked positions count 0 unrealized"""
+        positions = []
+        realized = unrealized = fees = 0.0
+        with self._lock:
+            for user_key in self._by_user.get(user, []):
+                book = self._books[user_key]
+                _, exchange, symbol = user_key
+                mark = mark_price(exchange, symbol) if mark_price and book.qty else None
+                open_pnl = book.unrealized(mark)
+                realized += book.realized
+                unrealized += open_pnl
+                fees += book.fees
+                positions.append({"exchange": exchange, "symbol": symbol, "qty": book.qty,
+                                  "avg_price": book.avg_price, "mark": mark, "realized_pnl": book.realized,
+                                  "unrealized_pnl": open_pnl, "fees": book.fees})
+        return {"method": self.method, "realized_pnl": realized, "unrealized_pnl": unrealized,
+                "total_pnl": realized + unrealized, "fees": fees, "positions": positions}
+
+    def daily(self, user: str, days: int = 30) -> List[Dict[str, Any]]:
+        """Per-UTC-day realized rollups, most recent first"""
+        with self._lock:
+            rollups = self._daily.get(user, {})
+            return [dict(rollups[day], day=day) for day in sorted(rollups, reverse=True)[:days]]
+
+    def realized_today(self, user: str) -> float:
+        with self._lock:
+            return self._daily.get(user, {}).get(_day(time.time()), {}).get("realized_pnl", 0.0)
+
+    def drop(self, user: str):
+        """Forget every book and daily rollup of `user`"""
+        with self._lock:
+            for key in self._by_user.pop(user, []):
+                self._books.pop(key, None)
+            self._daily.pop(user, None)
+
+
+# Global engine; PNL_METHOD picks fifo (default), lifo or average lot matching
+accounting = AccountingEngine(os.getenv("PNL_METHOD", "fifo").lower())
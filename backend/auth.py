@@ -1,15 +1,18 @@
 from fastapi import HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
-import jwt
-import json
+import functools
 import os
 from pydantic import BaseModel, EmailStr
+from storage import get_storage, StorageConflict
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing; passlib and PyJWT (which pulls in cryptography) are imported on first use
+# so they stay off the startup path
+@functools.lru_cache(maxsize=None)
+def pwd_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # JWT settings
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
@@ -19,9 +22,6 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 # Security
 security = HTTPBearer()
 
-# User data storage (in production, use a database)
-USERS_FILE = "users.json"
-
 class User(BaseModel):
     email: EmailStr
     username: str
@@ -50,44 +50,39 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     email: Optional[str] = None
 
+def _user_from_record(record: Dict[str, Any]) -> UserInDB:
+    record = dict(record)
+    record['created_at'] = datetime.fromisoformat(record['created_at'])
+    return UserInDB(**record)
+
+def _user_to_record(user: UserInDB) -> Dict[str, Any]:
+    record = user.dict()
+    record['created_at'] = user.created_at.isoformat()
+    return record
+
 def load_users() -> Dict[str, UserInDB]:
-    """Load users from file"""
-    if os.path.exists(USERS_FILE):
-        try:
-            with open(USERS_FILE, 'r') as f:
-                data = json.load(f)
-                users = {}
-                for email, user_data in data.items():
-                    user_data['created_at'] = datetime.fromisoformat(user_data['created_at'])
-                    users[email] = UserInDB(**user_data)
-                return users
-        except:
-            return {}
-    return {}
+    """Load all users from storage"""
+    try:
+        return {email: _user_from_record(record) for email, record in get_storage().load_users().items()}
+    except:
+        return {}
 
 def save_users(users: Dict[str, UserInDB]):
-    """Save users to file"""
-    data = {}
-    for email, user in users.items():
-        user_dict = user.dict()
-        user_dict['created_at'] = user.created_at.isoformat()
-        data[email] = user_dict
-    
-    with open(USERS_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+    """Replace all users in storage"""
+    get_storage().save_users({email: _user_to_record(user) for email, user in users.items()})
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     """Hash a password"""
-    return pwd_context.hash(password)
+    return pwd_context().hash(password)
 
 def get_user(email: str) -> Optional[UserInDB]:
     """Get user by email"""
-    users = load_users()
-    return users.get(email)
+    record = get_storage().get_user(email)
+    return _user_from_record(record) if record else None
 
 def authenticate_user(email: str, password: str) -> Optional[UserInDB]:
     """Authenticate a user"""
@@ -106,11 +101,13 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
+    import jwt
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 def verify_token(token: str) -> Optional[TokenData]:
     """Verify JWT token and return user data"""
+    import jwt
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
@@ -146,22 +143,19 @@ async def get_current_active_user(current_user: UserInDB = Depends(get_current_u
 
 def create_user(user_data: UserCreate) -> UserInDB:
     """Create a new user"""
-    users = load_users()
+    storage = get_storage()
     
-    # Check if user already exists
-    if user_data.email in users:
+    # Check before hashing so taken emails/usernames fail fast; create_user re-checks atomically
+    if storage.get_user(user_data.email):
         raise HTTPException(
             status_code=400,
             detail="Email already registered"
         )
-    
-    # Check if username is taken
-    for user in users.values():
-        if user.username == user_data.username:
-            raise HTTPException(
-                status_code=400,
-                detail="Username already taken"
-            )
+    if storage.get_user_by_username(user_data.username):
+        raise HTTPException(
+            status_code=400,
+            detail="Username already taken"
+        )
     
     # Create new user
     hashed_password = get_password_hash(user_data.password)
@@ -172,6 +166,9 @@ def create_user(user_data: UserCreate) -> UserInDB:
         hashed_password=hashed_password
     )
     
-    users[user.email] = user
-    save_users(users)
-    return user 
\ No newline at end of file
+    try:
+        storage.create_user(_user_to_record(user))
+    except StorageConflict as e:
+        detail = "Email already registered" if e.field == "email" else "Username already taken"
+        raise HTTPException(status_code=400, detail=detail)
+    return user
@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the backend hot paths.
+
+Run from the backend directory:
+
+    python benchmark.py                       # run everything
+    python benchmark.py --only strategy auth  # run a subset
+    python benchmark.py --output before.json
+    python benchmark.py --compare before.json # flag regressions vs. a previous run
+
+Every benchmark runs against temporary copies of the data files, so the real
+users.json and user_data/ directory are never touched.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = "benchmark_results.json"
+REGRESSION_THRESHOLD = 0.20  # 20% slower p50 counts as a regression
+
+
+def _measure(name: str, fn: Callable[[], Any], iterations: int, warmup: int = 10) -> Dict[str, Any]:
+    """Time `fn` per call and return summary statistics in microseconds"""
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    perf_counter_ns = time.perf_counter_ns
+    started = perf_counter_ns()
+    for _ in range(iterations):
+        t0 = perf_counter_ns()
+        fn()
+        samples.append(perf_counter_ns() - t0)
+    elapsed_s = (perf_counter_ns() - started) / 1e9
+
+    samples.sort()
+    us = [s / 1000.0 for s in samples]
+
+    def pct(p: float) -> float:
+        return us[min(len(us) - 1, int(p * len(us)))]
+
+    result = {
+        "name": name,
+        "iterations": iterations,
+        "mean_us": round(statistics.fmean(us), 3),
+        "p50_us": round(pct(0.50), 3),
+        "p95_us": round(pct(0.95), 3),
+        "p99_us": round(pct(0.99), 3),
+        "min_us": round(us[0], 3),
+        "max_us": round(us[-1], 3),
+        "ops_per_sec": round(iterations / elapsed_s, 1) if elapsed_s > 0 else None,
+    }
+    print(f"  {name:<45} p50={result['p50_us']:>10.1f}us  p95={result['p95_us']:>10.1f}us  "
+          f"ops/s={result['ops_per_sec']}")
+    return result
+
+
+# Strategy benchmarks
+def bench_strategy(scale: float) -> List[Dict[str, Any]]:
+    """simple_strategy cost per tick for each built-in strategy"""
+    from trading_loop import simple_strategy
+    from trading_state import TradingState
+
+    base_config = TradingState().strategy_config
+    rng = random.Random(42)
+    prices = [30000 + rng.uniform(-500, 500) for _ in range(50)]
+    results = []
+    for strategy in ("rsi", "momentum", "breakout"):
+        config = dict(base_config, active_strategy=strategy)
+        price = prices[-1]
+        results.append(_measure(
+            f"simple_strategy[{strategy}]",
+            lambda: simple_strategy(price, 45.0, config, prices),
+            int(20000 * scale),
+        ))
+
+    from strategy_compiler import compile_strategy
+    compiled = compile_strategy({
+        "id": "bench", "version": 1,
+        "rules": {
+            "buy": {"and": [{"indicator": "rsi", "period": 14, "op": "<", "value": 30},
+                            {"indicator": "price", "op": ">", "value": {"indicator": "sma", "period": 20}}]},
+            "sell": {"or": [{"indicator": "rsi", "period": 14, "op": ">", "value": 70},
+                            {"indicator": "macd", "line": "histogram", "op": "<", "value": 0}]},
+        },
+    })
+    evaluator = compiled.stream()
+    tick = iter(prices * (int(20000 * scale) // len(prices) + 2))
+    results.append(_measure("custom_strategy.stream_update",
+                            lambda: evaluator.update(next(tick)), int(20000 * scale)))
+    import numpy as np
+    series = np.array([30000 + rng.uniform(-500, 500) for _ in range(100000)])
+    results.append(_measure("custom_strategy.evaluate_array[100k]",
+                            lambda: compiled.evaluate_array(series), max(3, int(20 * scale)), warmup=1))
+
+    # Whole-watchlist tick: one matrix append plus one vectorized signal pass
+    from watchlist import PriceMatrix, batch_signals
+    for n in (10, 100, 500):
+        symbols = [f"SYM{i}USDT" for i in range(n)]
+        matrix = PriceMatrix(symbols)
+        quotes = {s: 100 + rng.uniform(-5, 5) for s in symbols}
+        for _ in range(50):
+            matrix.append(quotes)
+        rsi = np.full(n, 45.0)
+        config = dict(base_config, active_strategy="breakout")
+
+        def watchlist_tick(matrix=matrix, quotes=quotes, rsi=rsi, config=config):
+            matrix.append(quotes)
+            return batch_signals(matrix, config, rsi)
+
+        results.append(_measure(f"watchlist_tick[breakout,{n}]", watchlist_tick, max(100, int(2000 * scale))))
+    return results
+
+
+# Mock trade benchmarks
+def bench_mock_trade(scale: float) -> List[Dict[str, Any]]:
+    """execute_mock_trade throughput with alternating buys and sells"""
+    import main
+
+    symbols = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "ADAUSDT"]
+    counter = [0]
+
+    def one_trade():
+        i = counter[0]
+        counter[0] += 1
+        side = "buy" if i % 2 == 0 else "sell"
+        main.execute_mock_trade(main.TradeRequest(
+            symbol=symbols[i % len(symbols)], side=side, qty=0.01, price=30000.0 + (i % 100)
+        ))
+
+    with main.state.lock:
+        positions = {k: dict(v) for k, v in main.state.positions.items()}
+        trades = list(main.state.trades)
+        cash = main.state.cash
+        metrics = dict(main.state.performance_metrics)
+    try:
+        return [_measure("execute_mock_trade", one_trade, int(20000 * scale))]
+    finally:
+        with main.state.lock:
+            main.state.positions = positions
+            main.state.trades = trades
+            main.state.cash = cash
+            main.state.performance_metrics = metrics
+
+
+# User data benchmarks
+def _realistic_user_data(manager, trades: int, strategies: int) -> Dict[str, Any]:
+    """Build a user document roughly the size of a long-running account"""
+    data = manager._get_default_user_data()
+    for i in range(strategies):
+        data["strategies"][f"strategy_{i}"] = {
+            "name": f"strategy_{i}",
+            "description": "benchmark strategy " * 4,
+            "created_at": datetime.utcnow().isoformat() + "Z",
+            "updated_at": datetime.utcnow().isoformat() + "Z",
+            "config": {"active_strategy": "rsi", "rsi_overbought": 70, "rsi_oversold": 30},
+            "bot_controls": {"leverage": 2, "max_positions": 5},
+        }
+    data["trading_data"] = {
+        "trades": [
+            {
+                "timestamp": datetime.utcnow().isoformat(),
+                "user_email": "bench@example.com",
+                "exchange": "binance",
+                "symbol": "BTCUSDT",
+                "action": "buy" if i % 2 else "sell",
+                "quantity": 0.001,
+                "price": 30000.0 + i,
+                "reason": "RSI oversold",
+                "status": "executed",
+            }
+            for i in range(trades)
+        ],
+        "total_pnl": 0.0,
+        "win_rate": 0.0,
+        "total_trades": trades,
+    }
+    return data
+
+
+def bench_user_data(scale: float) -> List[Dict[str, Any]]:
+    """UserDataManager load/save for small, medium and large user documents, on each storage backend"""
+    import storage
+    import user_data
+
+    manager = user_data.user_data_manager
+    tmp_dir = tempfile.mkdtemp(prefix="bench_user_data_")
+    json_storage = storage.JSONStorage(tmp_dir)
+    sqlite_storage = storage.SQLiteStorage(os.path.join(tmp_dir, "bench.db"))
+    original_storage = storage.set_storage(json_storage)
+    results = []
+    try:
+        for backend in (json_storage, sqlite_storage):
+            storage.set_storage(backend)
+            suffix = "" if backend is json_storage else ",sqlite"
+            for label, trades, strategies in (("small", 10, 3), ("medium", 1000, 20), ("large", 10000, 50)):
+                email = f"bench_{label}@example.com"
+                doc = _realistic_user_data(manager, trades, strategies)
+                manager.save_user_data(email, doc)
+                iterations = max(5, int((2000 if label == "small" else 200 if label == "medium" else 20) * scale))
+                load = _measure(f"user_data.load[{label}{suffix}]", lambda: manager.get_user_data(email), iterations)
+                save = _measure(f"user_data.save[{label}{suffix}]", lambda: manager.save_user_data(email, doc), iterations)
+                update = _measure(f"user_data.update_section[{label}{suffix}]",
+                                  lambda: manager.update_user_risk_management(email, {"risk_tolerance": "Low"}),
+                                  iterations)
+                if backend is json_storage:
+                    load["file_kb"] = save["file_kb"] = round(os.path.getsize(backend.user_data_file(email)) / 1024, 1)
+                results.extend([load, save, update])
+    finally:
+        storage.set_storage(original_storage)
+        sqlite_storage.close()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return results
+
+
+# Auth benchmarks
+def bench_auth(scale: float) -> List[Dict[str, Any]]:
+    """auth.get_current_user with 10k users, in a users file and in SQLite"""
+    import auth
+    import storage
+    from fastapi.security import HTTPAuthorizationCredentials
+
+    tmp_dir = tempfile.mkdtemp(prefix="bench_auth_")
+    users_file = os.path.join(tmp_dir, "users.json")
+    # A fixed, pre-computed hash keeps setup fast; get_current_user never verifies passwords
+    dummy_hash = "$2b$12$" + "x" * 53
+    created_at = datetime.utcnow().isoformat()
+    users = {
+        f"user{i}@example.com": {
+            "email": f"user{i}@example.com",
+            "username": f"user{i}",
+            "full_name": f"User {i}",
+            "is_active": True,
+            "created_at": created_at,
+            "hashed_password": dummy_hash,
+        }
+        for i in range(10000)
+    }
+    with open(users_file, "w") as f:
+        json.dump(users, f)
+    sqlite_storage = storage.SQLiteStorage(os.path.join(tmp_dir, "bench.db"))
+    sqlite_storage.save_users(users)
+
+    original_storage = storage.set_storage(storage.JSONStorage(tmp_dir))
+    loop = asyncio.new_event_loop()
+    try:
+        token = auth.create_access_token({"sub": "user9999@example.com"})
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+        results = [_measure(
+            "auth.get_current_user[10k users]",
+            lambda: loop.run_until_complete(auth.get_current_user(credentials)),
+            max(5, int(50 * scale)),
+            warmup=2,
+        )]
+        storage.set_storage(sqlite_storage)
+        results.append(_measure(
+            "auth.get_current_user[10k users,sqlite]",
+            lambda: loop.run_until_complete(auth.get_current_user(credentials)),
+            max(5, int(2000 * scale)),
+        ))
+        return results
+    finally:
+        loop.close()
+        storage.set_storage(original_storage)
+        sqlite_storage.close()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+# Connector benchmarks
+class _StubExchangeHandler(BaseHTTPRequestHandler):
+    """Serves canned Binance-shaped responses"""
+
+    protocol_version = "HTTP/1.1"
+    responses = {
+        "/api/v3/account": {
+            "makerCommission": 10,
+            "balances": [{"asset": "USDT", "free": "1000.0", "locked": "0.0"},
+                         {"asset": "BTC", "free": "0.05", "locked": "0.0"}],
+        },
+        "/api/v3/ticker/24hr": [
+            {"symbol": s, "lastPrice": "30000.0", "volume": "1234.5", "priceChangePercent": "1.2"}
+            for s in ("BTCUSDT", "ETHUSDT", "SOLUSDT")
+        ],
+    }
+
+    def _reply(self):
+        body = json.dumps(self.responses.get(self.path.split("?")[0], {})).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._reply()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        self._reply()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def bench_connector(scale: float) -> List[Dict[str, Any]]:
+    """ExchangeConnector request round trip against a local stub server"""
+    from exchange_connectors import ExchangeConnectorFactory, ExchangeCredentials
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubExchangeHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        credentials = ExchangeCredentials(api_key="bench", api_secret="bench", sandbox=True)
+        connector = ExchangeConnectorFactory.create_connector("binance", credentials)
+        connector.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        iterations = max(10, int(300 * scale))
+        return [
+            _measure("connector.get_balances[stub]", connector.get_balances, iterations),
+            _measure("connector.get_tickers[stub]",
+                     lambda: connector.get_tickers(["BTCUSDT", "ETHUSDT", "SOLUSDT"]), iterations),
+        ]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+# API benchmarks
+def bench_api(scale: float) -> List[Dict[str, Any]]:
+    """End-to-end endpoint latency through an in-process ASGI client"""
+    import auth
+    import main
+    import storage
+    from starlette.testclient import TestClient
+
+    tmp_dir = tempfile.mkdtemp(prefix="bench_api_")
+    original_storage = storage.set_storage(storage.JSONStorage(tmp_dir))
+    try:
+        email = "bench@example.com"
+        auth.save_users({email: auth.UserInDB(
+            email=email, username="bench", full_name="Bench", hashed_password="$2b$12$" + "x" * 53
+        )})
+        headers = {"Authorization": f"Bearer {auth.create_access_token({'sub': email})}"}
+        # Deliberately not used as a context manager so the trading loop is not started
+        client = TestClient(main.app)
+        iterations = max(10, int(500 * scale))
+        return [
+            _measure("GET /health", lambda: client.get("/health"), iterations),
+            _measure("GET /positions", lambda: client.get("/positions"), iterations),
+            _measure("GET /strategy-info", lambda: client.get("/strategy-info"), iterations),
+            _measure("GET /strategy-templates", lambda: client.get("/strategy-templates"), iterations),
+            _measure("GET /saved-strategies[auth]",
+                     lambda: client.get("/saved-strategies", headers=headers), iterations),
+        ]
+    finally:
+        storage.set_storage(original_storage)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+BENCHMARKS = {
+    "strategy": bench_strategy,
+    "mock_trade": bench_mock_trade,
+    "user_data": bench_user_data,
+    "auth": bench_auth,
+    "connector": bench_connector,
+    "api": bench_api,
+}
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def run_benchmarks(names: List[str], scale: float = 1.0) -> Dict[str, Any]:
+    """Run the selected benchmark groups and return a machine-readable report"""
+    report = {
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": scale,
+        "results": [],
+    }
+    for name in names:
+        print(f"[{name}]")
+        try:
+            report["results"].extend(BENCHMARKS[name](scale))
+        except Exception as e:
+            print(f"  {name} failed: {e}")
+            report["results"].append({"name": name, "error": str(e)})
+    return report
+
+
+def compare_reports(current: Dict[str, Any], previous: Dict[str, Any],
+                    threshold: float = REGRESSION_THRESHOLD) -> List[Dict[str, Any]]:
+    """Compare p50 latencies against a previous report; returns the regressions"""
+    previous_by_name = {r["name"]: r for r in previous.get("results", []) if "p50_us" in r}
+    regressions = []
+    print(f"\nComparison against {previous.get('git_revision') or previous.get('timestamp')}:")
+    for result in current["results"]:
+        before = previous_by_name.get(result["name"])
+        if not before or "p50_us" not in result or not before["p50_us"]:
+            continue
+        ratio = result["p50_us"] / before["p50_us"]
+        marker = "REGRESSION" if ratio > 1 + threshold else "ok"
+        print(f"  {result['name']:<45} {before['p50_us']:>10.1f}us -> {result['p50_us']:>10.1f}us "
+              f"({ratio:.2f}x) {marker}")
+        if ratio > 1 + threshold:
+            regressions.append({"name": result["name"], "before_p50_us": before["p50_us"],
+                                "after_p50_us": result["p50_us"], "ratio": round(ratio, 3)})
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the trading backend hot paths")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="benchmark groups to run")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="where to write the JSON report")
+    parser.add_argument("--compare", help="previous JSON report to compare against")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply iteration counts (e.g. 0.1 for a smoke run)")
+    args = parser.parse_args(argv)
+
+    # The app resolves its data files relative to the backend directory
+    os.chdir(BACKEND_DIR)
+    sys.path.insert(0, BACKEND_DIR)
+
+    report = run_benchmarks(args.only or list(BENCHMARKS), args.scale)
+    regressions = []
+    if args.compare:
+        with open(args.compare, "r") as f:
+            regressions = compare_reports(report, json.load(f))
+        report["regressions"] = regressions
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from scheduler import parse_timeframe
+from strategy_compiler import compute_indicator
+
+DEFAULT_TIMEFRAMES = ("1m", "5m", "15m", "1h", "4h", "1d")
+DEFAULT_HISTORY = 200  # closed bars kept per symbol and timeframe
+
+
+class Candle:
+    """One OHLCV bar; `open_time` is the UTC-aligned start of the bar in epoch seconds"""
+
+    __slots__ = ("symbol", "timeframe", "open_time", "open", "high", "low", "close", "volume", "ticks")
+
+    def __init__(self, symbol: str, timeframe: str, open_time: float, price: float, volume: float):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.open_time = open_time
+        self.open = self.high = self.low = self.close = price
+        self.volume = volume
+        self.ticks = 1
+
+    def update(self, price: float, volume: float):
+        if price > self.high:
+            self.high = price
+        elif price < self.low:
+            self.low = price
+        self.close = price
+        self.volume += volume
+        self.ticks += 1
+
+    def to_dict(self) -> Dict:
+        return {
+            "symbol": self.symbol, "timeframe": self.timeframe, "open_time": self.open_time,
+            "open": self.open, "high": self.high, "low": self.low, "close": self.close,
+            "volume": self.volume, "ticks": self.ticks,
+        }
+
+
+class CandleAggregator:
+    """Builds OHLCV bars for several timeframes incrementally from a tick stream.
+
+    Each tick updates the open bar of every timeframe (O(timeframes)); when a
+    tick lands in a new period the finished bar is stored and returned to the
+    caller. Consumers read closed bars and indicators on demand. Bars are
+    aligned to UTC epoch multiples of the timeframe, like exchange klines.
+    """
+
+    def __init__(self, timeframes: Iterable[str] = DEFAULT_TIMEFRAMES, history: int = DEFAULT_HISTORY,
+                 clock: Callable[[], float] = time.time):
+        self.history = history
+        self._clock = clock
+        self._timeframes: List[Tuple[str, int]] = []
+        for label in timeframes:
+            seconds = parse_timeframe(label)
+            if seconds is None:
+                raise ValueError(f"Invalid timeframe: {label}")
+            self._timeframes.append((label, seconds))
+        self._timeframes.sort(key=lambda tf: tf[1])
+        self._by_seconds = {seconds: label for label, seconds in self._timeframes}
+        self._open: Dict[str, List[Optional[Candle]]] = {}
+        self._closed: Dict[Tuple[str, str], deque] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def timeframes(self) -> List[str]:
+        return [label for label, _ in self._timeframes]
+
+    def resolve(self, timeframe) -> str:
+        """Canonical label for a timeframe given as "5min", "1hour", 300, ..."""
+        label = self._by_seconds.get(parse_timeframe(timeframe))
+        if label is None:
+            raise ValueError(f"Timeframe {timeframe!r} is not aggregated; available: {', '.join(self.timeframes)}")
+        return label
+
+    def on_tick(self, symbol: str, price: float, volume: float = 0.0, t: Optional[float] = None) -> List[Candle]:
+        """Fold one trade/price tick into every timeframe; returns the bars it closed"""
+        t = self._clock() if t is None else t
+        closed = []
+        with self._lock:
+            bars = self._open.get(symbol)
+            if bars is None:
+                bars = self._open[symbol] = [None] * len(self._timeframes)
+            for i, (label, seconds) in enumerate(self._timeframes):
+                open_time = t - t % seconds
+                bar = bars[i]
+                if bar is None:
+                    bars[i] = Candle(symbol, label, open_time, price, volume)
+                elif open_time > bar.open_time:
+                    self._store(bar)
+                    closed.append(bar)
+                    bars[i] = Candle(symbol, label, open_time, price, volume)
+                elif open_time == bar.open_time:
+                    bar.update(price, volume)
+                # Ticks older than the open bar arrived late; the bar they belong to is already out
+        return closed
+
+    def on_prices(self, prices: Dict[str, float], t: Optional[float] = None) -> List[Candle]:
+        """Fold one price per symbol (e.g. a batched ticker fetch) into the bars"""
+        t = self._clock() if t is None else t
+        closed = []
+        for symbol, price in prices.items():
+            closed.extend(self.on_tick(symbol, price, 0.0, t))
+        return closed
+
+    def _store(self, bar: Candle):
+        key = (bar.symbol, bar.timeframe)
+        series = self._closed.get(key)
+        if series is None:
+            series = self._closed[key] = deque(maxlen=self.history)
+        series.append(bar)
+
+    def candles(self, symbol: str, timeframe, limit: Optional[int] = None,
+                include_open: bool = False) -> List[Candle]:
+        """Closed bars oldest first, optionally followed by the still-open bar"""
+        label = self.resolve(timeframe)
+        with self._lock:
+            bars = list(self._closed.get((symbol, label), ()))
+            if include_open:
+                current = self._open.get(symbol, [None] * len(self._timeframes))[self.timeframes.index(label)]
+                if current is not None:
+                    bars.append(current)
+        return bars[-limit:] if limit else bars
+
+    def last_price(self, symbol: str) -> Optional[float]:
+        """Price of the most recent tick seen for `symbol`"""
+        with self._lock:
+            bars = self._open.get(symbol)
+            current = bars[0] if bars else None
+        return current.close if current is not None else None
+
+    def closes(self, symbol: str, timeframe, limit: Optional[int] = None) -> List[float]:
+        """Close prices of the closed bars, oldest first"""
+        return [bar.close for bar in self.candles(symbol, timeframe, limit)]
+
+    def indicator(self, name: str, symbol: str, timeframe, **params) -> Optional[float]:
+        """Latest value of a built-in indicator over closed bars; None until enough bars exist"""
+        bars = self.candles(symbol, timeframe)
+        if not bars:
+            return None
+        values = compute_indicator(name, [b.close for b in bars], [b.volume for b in bars], **params)
+        value = float(values[-1])
+        return None if value != value else value
+
+    def clear(self, symbol: Optional[str] = None):
+        with self._lock:
+            if symbol is None:
+                self._open.clear()
+                self._closed.clear()
+                return
+            self._open.pop(symbol, None)
+            for key in [k for k in self._closed if k[0] == symbol]:
+                del self._closed[key]
+
+
+class CandleSources:
+    """One CandleAggregator per price source, so bars never mix venues.
+
+    A source is named after the exchange whose prices feed it; the paper loop's
+    testnet/random prices have a source of their own (PAPER_SOURCE).
+    """
+
+    def __init__(self, **aggregator_kwargs):
+        self._kwargs = aggregator_kwargs
+        self._aggregators: Dict[str, CandleAggregator] = {}
+        self._lock = threading.Lock()
+
+    def get(self, source: str) -> CandleAggregator:
+        with self._lock:
+            aggregator = self._aggregators.get(source)
+            if aggregator is None:
+                aggregator = self._aggregators[source] = CandleAggregator(**self._kwargs)
+            return aggregator
+
+    def sources(self) -> List[str]:
+        with self._lock:
+            return sorted(self._aggregators)
+
+    def last_price(self, source: str, symbol: str) -> Optional[float]:
+        """Latest tick for `symbol` from one source"""
+        return self.get(source).last_price(symbol)
+
+
+# Source of the paper trading loop, named like the exchange its fills are booked under
+PAPER_SOURCE = "mock"
+
+# Per-source aggregators fed by the trading loops
+candle_sources = CandleSources()
+
+# Bars of the paper trading loop
+candle_aggregator = candle_sources.get(PAPER_SOURCE)
@@ -0,0 +1,316 @@
+import itertools
+import json
+import multiprocessing as mp
+import os
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+from metrics import InstrumentedLock, registry as metrics_registry
+from shared_state import SHARED_FIELDS
+
+DEFAULT_SNAPSHOT_BYTES = 8 * 1024 * 1024
+PUBLISH_INTERVAL = 0.2  # seconds between engine snapshots when nothing else triggers one
+SNAPSHOT_TRADES = 1000  # most recent mock trades carried in the snapshot
+COMMAND_TIMEOUT = 10.0
+
+# Fields the API may change locally under state.lock; everything else is written by the engine
+API_WRITABLE_FIELDS = ("strategy_config", "watchlist", "bot_schedule")
+
+ENGINE_COMMAND_DURATION = metrics_registry.histogram(
+    "engine_command_seconds", "Round trip of commands sent from the API to the engine process", ("command",))
+
+# seqlock header: sequence number (odd while a write is in progress) and payload length
+HEADER = struct.Struct("<QI")
+
+
+class SnapshotBuffer:
+    """Versioned JSON snapshot in shared memory with lock-free reads.
+
+    A single writer bumps the sequence to odd, copies the payload, then
+    publishes the length with the next even sequence. Readers copy the
+    payload and retry if the sequence was odd or moved meanwhile, so they
+    never block the writer and never see a torn snapshot.
+    """
+
+    def __init__(self, name: Optional[str] = None, size: int = DEFAULT_SNAPSHOT_BYTES):
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=HEADER.size + size)
+            HEADER.pack_into(self.shm.buf, 0, 0, 0)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.name = self.shm.name
+        self.capacity = self.shm.size - HEADER.size
+        self._write_lock = threading.Lock()
+        self._last_payload = None
+        self._cached_seq = None
+        self._cached = None
+
+    def write(self, payload: bytes) -> bool:
+        """Publish a payload; False if unchanged since the last write"""
+        if len(payload) > self.capacity:
+            raise ValueError(f"Snapshot of {len(payload)} bytes exceeds {self.capacity}")
+        with self._write_lock:
+            if payload == self._last_payload:
+                return False
+            buf = self.shm.buf
+            seq, length = HEADER.unpack_from(buf, 0)
+            HEADER.pack_into(buf, 0, seq + 1, length)
+            buf[HEADER.size:HEADER.size + len(payload)] = payload
+            HEADER.pack_into(buf, 0, seq + 2, len(payload))
+            self._last_payload = payload
+            return True
+
+    def version(self) -> int:
+        return HEADER.unpack_from(self.shm.buf, 0)[0] // 2
+
+    def read(self) -> Optional[Dict[str, Any]]:
+        """Latest complete snapshot (None before the first write); decoded once per version"""
+        buf = self.shm.buf
+        for _ in range(1000):
+            seq, length = HEADER.unpack_from(buf, 0)
+            if seq & 1:
+                time.sleep(0)
+                continue
+            if seq == self._cached_seq:
+                return self._cached
+            if seq == 0:
+                return None
+            payload = bytes(buf[HEADER.size:HEADER.size + length])
+            if HEADER.unpack_from(buf, 0)[0] == seq:
+                self._cached_seq, self._cached = seq, json.loads(payload)
+                return self._cached
+        return self._cached
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def encode_snapshot(state) -> bytes:
+    """Engine state as published to the API, serialized under the state lock"""
+    from scheduler import get_scheduler_stats
+    with state.lock:
+        snapshot = {field: getattr(state, field, None) for field in SHARED_FIELDS}
+        snapshot["trades"] = state.trades[-SNAPSHOT_TRADES:]
+        snapshot["trade_count"] = len(state.trades)
+        snapshot["schedulers"] = get_scheduler_stats()
+        return json.dumps(snapshot, separators=(",", ":"), default=str).encode()
+
+
+def run_engine(shm_name: str, commands, replies, publish_interval: float = PUBLISH_INTERVAL):
+    """Engine process entry point: trading loops, snapshot publisher and command handler"""
+    import main  # registers the endpoints the API forwards here
+    from state_journal import open_state_journal, state_journal
+    from trading_loop import start_trading_loop
+    from trading_state import state
+
+    snapshots = SnapshotBuffer(shm_name)
+    parent = os.getppid()
+
+    def publish():
+        try:
+            snapshots.write(encode_snapshot(state))
+        except ValueError as e:
+            print(f"Engine snapshot skipped: {e}")
+
+    def publisher():
+        while True:
+            if os.getppid() != parent:
+                os._exit(0)  # the API process died; don't keep trading without it
+            publish()
+            time.sleep(publish_interval)
+
+    open_state_journal(state)
+    start_trading_loop()
+    publish()
+    threading.Thread(target=publisher, daemon=True, name="engine-snapshots").start()
+
+    while True:
+        message = commands.get()
+        if message is None:
+            break
+        request_id, command, payload = message
+        try:
+            if command == "set_state":
+                with state.lock:
+                    for field, value in payload.items():
+                        setattr(state, field, value)
+                        state_journal.record_field(field, value)
+                result = None
+            elif command == "endpoint":
+                endpoint = main.ENGINE_ENDPOINTS[payload["name"]]
+                result = endpoint(**payload["kwargs"])
+            else:
+                raise ValueError(f"Unknown engine command: {command}")
+            publish()
+            replies.put((request_id, True, result))
+        except HTTPException as e:
+            replies.put((request_id, False, {"status_code": e.status_code, "detail": e.detail}))
+        except Exception as e:
+            replies.put((request_id, False, {"status_code": 500, "detail": f"Engine error: {e}"}))
+    state_journal.close()
+    snapshots.close()
+
+
+class EngineClient:
+    """API-side handle on the engine process: snapshot reads and request/reply commands"""
+
+    def __init__(self, snapshot_bytes: int = DEFAULT_SNAPSHOT_BYTES, publish_interval: float = PUBLISH_INTERVAL,
+                 target: Callable = run_engine):
+        ctx = mp.get_context("spawn")  # never fork a process that already runs threads
+        self.snapshots = SnapshotBuffer(size=snapshot_bytes)
+        self.commands = ctx.Queue()
+        self.replies = ctx.Queue()
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, list] = {}
+        self._pending_lock = threading.Lock()
+        self.process = ctx.Process(target=target, name="trading-engine", daemon=True,
+                                   args=(self.snapshots.name, self.commands, self.replies, publish_interval))
+        self.process.start()
+        threading.Thread(target=self._dispatch_replies, daemon=True, name="engine-replies").start()
+
+    def _dispatch_replies(self):
+        while True:
+            message = self.replies.get()
+            if message is None:
+                return
+            request_id, ok, result = message
+            with self._pending_lock:
+                waiter = self._pending.pop(request_id, None)
+            if waiter is not None:
+                waiter[1] = (ok, result)
+                waiter[0].set()
+
+    def wait_ready(self, timeout: float = 30.0) -> bool:
+        """Block until the engine has published its first snapshot"""
+        deadline = time.monotonic() + timeout
+        while self.snapshots.read() is None:
+            if time.monotonic() > deadline or not self.process.is_alive():
+                return False
+            time.sleep(0.05)
+        return True
+
+    def snapshot(self) -> Optional[Dict[str, Any]]:
+        return self.snapshots.read()
+
+    def call(self, command: str, payload: Any = None, timeout: float = COMMAND_TIMEOUT) -> Any:
+        """Send a command and wait for the engine's reply; engine errors re-raise as HTTPException"""
+        request_id = next(self._ids)
+        waiter = [threading.Event(), None]
+        with self._pending_lock:
+            self._pending[request_id] = waiter
+        with ENGINE_COMMAND_DURATION.labels(command).time():
+            self.commands.put((request_id, command, payload))
+            if not waiter[0].wait(timeout):
+                with self._pending_lock:
+                    self._pending.pop(request_id, None)
+                raise HTTPException(status_code=503, detail="Trading engine did not respond")
+        ok, result = waiter[1]
+        if not ok:
+            raise HTTPException(status_code=result["status_code"], detail=result["detail"])
+        return result
+
+    def forward(self, endpoint: str, kwargs: Dict[str, Any]) -> Any:
+        """Run an endpoint function inside the engine process"""
+        return self.call("endpoint", {"name": endpoint, "kwargs": kwargs})
+
+    def stop(self, timeout: float = 5.0):
+        self.commands.put(None)
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.replies.put(None)
+        self.snapshots.close()
+
+
+class EngineStateLock:
+    """Drop-in for TradingState.lock in the API process when the engine runs separately.
+
+    Acquiring refreshes the local TradingState from the engine's snapshot if
+    its version moved (no lock or IPC, just a shared-memory read). Releasing
+    sends the API-writable fields whose JSON changed (strategy config,
+    watchlist, schedule) to the engine after the local lock is let go, so
+    read-only users never wait on the engine. Sends go out one at a time in
+    lock order, and no snapshot is loaded while one is in flight, so an older
+    snapshot never overwrites a value that is still on its way.
+    """
+
+    def __init__(self, state, client: EngineClient):
+        self.state = state
+        self.client = client
+        self._local = InstrumentedLock("trading_state")
+        self._send_lock = threading.Lock()
+        self._sending = 0
+        self._version = None
+        self._saved: Dict[str, str] = {}
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        if not self._local.acquire(blocking, timeout):
+            return False
+        version = self.client.snapshots.version()
+        if version != self._version and not self._sending:
+            snapshot = self.client.snapshot()
+            if snapshot is not None:
+                for field in SHARED_FIELDS:
+                    setattr(self.state, field, snapshot[field])
+                self._saved = {field: json.dumps(snapshot[field]) for field in API_WRITABLE_FIELDS}
+            self._version = version
+        return True
+
+    def release(self):
+        changed = {}
+        try:
+            for field in API_WRITABLE_FIELDS:
+                value = json.dumps(getattr(self.state, field, None))
+                if value != self._saved.get(field):
+                    changed[field] = value
+            if changed:
+                # Taken before the local lock is let go, so sends keep the order of the writes
+                self._send_lock.acquire()
+                self._sending += 1
+                self._saved.update(changed)
+        finally:
+            self._local.release()
+        if not changed:
+            return
+        try:
+            self.client.call("set_state", {field: json.loads(value) for field, value in changed.items()})
+        except BaseException:
+            with self._local:
+                for field in changed:
+                    self._saved.pop(field, None)  # resent by the next release
+            raise
+        finally:
+            self._sending -= 1
+            self._send_lock.release()
+
+    def locked(self) -> bool:
+        return self._local.locked()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+def start_engine_process(state) -> Optional[EngineClient]:
+    """Run the trading engine in its own process when ENGINE_PROCESS is set; None otherwise"""
+    if os.getenv("ENGINE_PROCESS", "").lower() not in ("1", "true", "yes"):
+        return None
+    client = EngineClient(snapshot_bytes=int(os.getenv("ENGINE_SNAPSHOT_BYTES", DEFAULT_SNAPSHOT_BYTES)))
+    if not client.wait_ready():
+        client.stop()
+        raise RuntimeError("Trading engine process failed to start")
+    state.lock = EngineStateLock(state, client)
+    return client
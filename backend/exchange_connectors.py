@@ -7,6 +7,8 @@ import time
 import json
 from datetime import datetime
 from pydantic import BaseModel
+from metrics import EXCHANGE_REQUEST_DURATION, EXCHANGE_REQUEST_ERRORS
+from symbol_metadata import symbol_metadata, SymbolInfo, OrderValidationError
 
 class ExchangeCredentials(BaseModel):
     api_key: str
@@ -25,6 +27,14 @@ class Ticker(BaseModel):
     price: float
     volume_24h: float
     change_24h: float
+    # Top of book, when the exchange reports it with the ticker
+    bid: Optional[float] = None
+    ask: Optional[float] = None
+    bid_qty: Optional[float] = None
+    ask_qty: Optional[float] = None
+
+def _optional_float(value) -> Optional[float]:
+    return float(value) if value not in (None, "") else None
 
 class Order(BaseModel):
     symbol: str
@@ -32,11 +42,13 @@ class Order(BaseModel):
     quantity: float
     price: float
     order_type: str  # 'market' or 'limit'
-    status: str
+    status: str = "new"
 
 class ExchangeConnector(ABC):
     """Base class for all exchange connectors"""
     
+    exchange_name = "unknown"
+    
     def __init__(self, credentials: ExchangeCredentials):
         self.credentials = credentials
         self.base_url = self._get_base_url()
@@ -71,27 +83,71 @@ class ExchangeConnector(ABC):
         """Place a new order"""
         pass
     
+    @abstractmethod
+    def get_order(self, symbol: str, order_id: str) -> Dict[str, Any]:
+        """Current status and fill of an order placed earlier"""
+        pass
+    
+    @abstractmethod
+    def cancel_order(self, symbol: str, order_id: str) -> Dict[str, Any]:
+        """Cancel an open order"""
+        pass
+    
+    def symbol_info(self, symbol: str) -> Optional[SymbolInfo]:
+        """Cached lot/tick/notional rules for a canonical or exchange-native symbol"""
+        return symbol_metadata.get(self.exchange_name, symbol, self.credentials.sandbox)
+    
+    def native_symbol(self, symbol: str) -> str:
+        """Exchange-native name for a canonical symbol (BTCUSDT -> BTC-USDT on KuCoin)"""
+        return symbol_metadata.to_exchange(self.exchange_name, symbol, self.credentials.sandbox)
+    
+    def canonical_symbol(self, symbol: str) -> str:
+        """Canonical BASEQUOTE name for an exchange-native symbol"""
+        return symbol_metadata.normalize(self.exchange_name, symbol, self.credentials.sandbox)
+    
+    def prepare_order(self, order: Order) -> Order:
+        """Quantize to the symbol's lot and tick size and reject what the exchange would reject"""
+        info = self.symbol_info(order.symbol)
+        if info is None:
+            return order  # metadata unavailable; let the exchange decide
+        quantity = info.quantize_qty(order.quantity)
+        price = order.price
+        if order.order_type.lower() == "limit":
+            price = info.quantize_price(price, order.side)
+        errors = info.violations(quantity, price)
+        if errors:
+            raise OrderValidationError(f"{info.symbol} order rejected before sending: {'; '.join(errors)}")
+        return order.copy(update={"symbol": info.native, "quantity": quantity, "price": price})
+    
     def _make_request(self, method: str, endpoint: str, params: Dict = None, body: Dict = None) -> Dict[str, Any]:
         """Make an authenticated API request"""
         url = f"{self.base_url}{endpoint}"
         headers = self._get_auth_headers(method, endpoint, params, body)
         
+        start = time.perf_counter()
         try:
             if method.upper() == "GET":
                 response = requests.get(url, params=params, headers=headers, timeout=10)
             elif method.upper() == "POST":
                 response = requests.post(url, json=body, headers=headers, timeout=10)
+            elif method.upper() == "DELETE":
+                response = requests.delete(url, params=params, headers=headers, timeout=10)
             else:
                 raise ValueError(f"Unsupported HTTP method: {method}")
             
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
+            EXCHANGE_REQUEST_ERRORS.labels(self.exchange_name, endpoint).inc()
             raise Exception(f"API request failed: {str(e)}")
+        finally:
+            EXCHANGE_REQUEST_DURATION.labels(self.exchange_name, endpoint).observe(time.perf_counter() - start)
 
 class BTCCConnector(ExchangeConnector):
     """BTCC Exchange Connector"""
     
+    exchange_name = "btcc"
+    
     def _get_base_url(self) -> str:
         return "https://api.btcc.com" if not self.credentials.sandbox else "https://api-testnet.btcc.com"
     
@@ -152,7 +208,7 @@ class BTCCConnector(ExchangeConnector):
         """Get BTCC ticker information"""
         try:
             if symbols:
-                params = {"symbols": ",".join(symbols)}
+                params = {"symbols": ",".join(self.native_symbol(s) for s in symbols)}
                 response = self._make_request("GET", "/api/v1/market/tickers", params=params)
             else:
                 response = self._make_request("GET", "/api/v1/market/tickers")
@@ -160,10 +216,12 @@ class BTCCConnector(ExchangeConnector):
             tickers = []
             for ticker_data in response.get("tickers", []):
                 tickers.append(Ticker(
-                    symbol=ticker_data["symbol"],
+                    symbol=self.canonical_symbol(ticker_data["symbol"]),
                     price=float(ticker_data.get("price", 0)),
                     volume_24h=float(ticker_data.get("volume", 0)),
-                    change_24h=float(ticker_data.get("change", 0))
+                    change_24h=float(ticker_data.get("change", 0)),
+                    bid=_optional_float(ticker_data.get("bid")),
+                    ask=_optional_float(ticker_data.get("ask"))
                 ))
             
             return tickers
@@ -172,6 +230,7 @@ class BTCCConnector(ExchangeConnector):
     
     def place_order(self, order: Order) -> Dict[str, Any]:
         """Place an order on BTCC"""
+        order = self.prepare_order(order)
         try:
             order_data = {
                 "symbol": order.symbol,
@@ -187,10 +246,28 @@ class BTCCConnector(ExchangeConnector):
             return response
         except Exception as e:
             raise Exception(f"Failed to place order: {str(e)}")
+    
+    def get_order(self, symbol: str, order_id: str) -> Dict[str, Any]:
+        """Get a BTCC order's status and fill"""
+        try:
+            params = {"symbol": self.native_symbol(symbol), "orderId": order_id}
+            return self._make_request("GET", "/api/v1/order", params=params)
+        except Exception as e:
+            raise Exception(f"Failed to get order: {str(e)}")
+    
+    def cancel_order(self, symbol: str, order_id: str) -> Dict[str, Any]:
+        """Cancel an open BTCC order"""
+        try:
+            params = {"symbol": self.native_symbol(symbol), "orderId": order_id}
+            return self._make_request("DELETE", "/api/v1/order", params=params)
+        except Exception as e:
+            raise Exception(f"Failed to cancel order: {str(e)}")
 
 class BinanceConnector(ExchangeConnector):
     """Binance Exchange Connector"""
     
+    exchange_name = "binance"
+    
     def _get_base_url(self) -> str:
         return "https://api.binance.com" if not self.credentials.sandbox else "https://testnet.binance.vision"
     
@@ -263,7 +340,7 @@ class BinanceConnector(ExchangeConnector):
         """Get Binance ticker information"""
         try:
             if symbols:
-                params = {"symbols": json.dumps(symbols)}
+                params = {"symbols": json.dumps([self.native_symbol(s) for s in symbols])}
                 response = self._make_request("GET", "/api/v3/ticker/24hr", params=params)
             else:
                 response = self._make_request("GET", "/api/v3/ticker/24hr")
@@ -273,10 +350,14 @@ class BinanceConnector(ExchangeConnector):
             
             for ticker_data in ticker_list:
                 tickers.append(Ticker(
-                    symbol=ticker_data["symbol"],
+                    symbol=self.canonical_symbol(ticker_data["symbol"]),
                     price=float(ticker_data.get("lastPrice", 0)),
                     volume_24h=float(ticker_data.get("volume", 0)),
-                    change_24h=float(ticker_data.get("priceChangePercent", 0))
+                    change_24h=float(ticker_data.get("priceChangePercent", 0)),
+                    bid=_optional_float(ticker_data.get("bidPrice")),
+                    ask=_optional_float(ticker_data.get("askPrice")),
+                    bid_qty=_optional_float(ticker_data.get("bidQty")),
+                    ask_qty=_optional_float(ticker_data.get("askQty"))
                 ))
             
             return tickers
@@ -285,12 +366,14 @@ class BinanceConnector(ExchangeConnector):
     
     def place_order(self, order: Order) -> Dict[str, Any]:
         """Place an order on Binance"""
+        order = self.prepare_order(order)
         try:
             order_data = {
                 "symbol": order.symbol,
                 "side": order.side.upper(),
                 "type": order.order_type.upper(),
-                "quantity": str(order.quantity)
+                "quantity": str(order.quantity),
+                "newOrderRespType": "FULL"  # report status and executed quantity, not just the order id
             }
             
             if order.order_type.lower() == "limit":
@@ -301,10 +384,28 @@ class BinanceConnector(ExchangeConnector):
             return response
         except Exception as e:
             raise Exception(f"Failed to place order: {str(e)}")
+    
+    def get_order(self, symbol: str, order_id: str) -> Dict[str, Any]:
+        """Get a Binance order's status and fill"""
+        try:
+            params = {"symbol": self.native_symbol(symbol), "orderId": order_id}
+            return self._make_request("GET", "/api/v3/order", params=params)
+        except Exception as e:
+            raise Exception(f"Failed to get order: {str(e)}")
+    
+    def cancel_order(self, symbol: str, order_id: str) -> Dict[str, Any]:
+        """Cancel an open Binance order"""
+        try:
+            params = {"symbol": self.native_symbol(symbol), "orderId": order_id}
+            return self._make_request("DELETE", "/api/v3/order", params=params)
+        except Exception as e:
+            raise Exception(f"Failed to cancel order: {str(e)}")
 
 class KuCoinConnector(ExchangeConnector):
     """KuCoin Exchange Connector"""
     
+    exchange_name = "kucoin"
+    
     def _get_base_url(self) -> str:
         return "https://api.kucoin.com" if not self.credentials.sandbox else "https://sandbox-api.kucoin.com"
     
@@ -372,7 +473,7 @@ class KuCoinConnector(ExchangeConnector):
         """Get KuCoin ticker information"""
         try:
             if symbols:
-                params = {"symbol": ",".join(symbols)}
+                params = {"symbol": ",".join(self.native_symbol(s) for s in symbols)}
                 response = self._make_request("GET", "/api/v1/market/orderbook/level1", params=params)
             else:
                 response = self._make_request("GET", "/api/v1/market/allTickers")
@@ -382,10 +483,14 @@ class KuCoinConnector(ExchangeConnector):
             
             for ticker_data in ticker_list:
                 tickers.append(Ticker(
-                    symbol=ticker_data.get("symbol", ""),
+                    symbol=self.canonical_symbol(ticker_data.get("symbol", "")),
                     price=float(ticker_data.get("price", 0)),
                     volume_24h=float(ticker_data.get("vol", 0)),
-                    change_24h=float(ticker_data.get("changeRate", 0))
+                    change_24h=float(ticker_data.get("changeRate", 0)),
+                    bid=_optional_float(ticker_data.get("bestBid", ticker_data.get("buy"))),
+                    ask=_optional_float(ticker_data.get("bestAsk", ticker_data.get("sell"))),
+                    bid_qty=_optional_float(ticker_data.get("bestBidSize")),
+                    ask_qty=_optional_float(ticker_data.get("bestAskSize"))
                 ))
             
             return tickers
@@ -394,6 +499,7 @@ class KuCoinConnector(ExchangeConnector):
     
     def place_order(self, order: Order) -> Dict[str, Any]:
         """Place an order on KuCoin"""
+        order = self.prepare_order(order)
         try:
             order_data = {
                 "clientOid": f"bot_{int(time.time() * 1000)}",
@@ -410,6 +516,20 @@ class KuCoinConnector(ExchangeConnector):
             return response
         except Exception as e:
             raise Exception(f"Failed to place order: {str(e)}")
+    
+    def get_order(self, symbol: str, order_id: str) -> Dict[str, Any]:
+        """Get a KuCoin order's status and fill (dealSize/dealFunds, isActive)"""
+        try:
+            return self._make_request("GET", f"/api/v1/orders/{order_id}")
+        except Exception as e:
+            raise Exception(f"Failed to get order: {str(e)}")
+    
+    def cancel_order(self, symbol: str, order_id: str) -> Dict[str, Any]:
+        """Cancel an open KuCoin order"""
+        try:
+            return self._make_request("DELETE", f"/api/v1/orders/{order_id}")
+        except Exception as e:
+            raise Exception(f"Failed to cancel order: {str(e)}")
 
 class ExchangeConnectorFactory:
     """Factory for creating exchange connectors"""
@@ -0,0 +1,525 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from candles import candle_sources, PAPER_SOURCE
+from exchange_connectors import Order
+from metrics import registry as metrics_registry
+
+ALGOS = ("twap", "vwap", "iceberg")
+MIN_INTERVAL = 1.0  # seconds between child orders of one parent
+MAX_SLICES = 1000
+MAX_ERRORS = 3  # failed or dead-unfilled children before a parent gives up
+DONE_STATUSES = {"filled", "canceled", "cancelled", "expired", "expired_in_match", "rejected", "done"}
+
+EXECUTION_CHILD_ORDERS = metrics_registry.counter(
+    "execution_child_orders_total", "Child orders sent by execution algorithms", ("algo", "outcome"))
+
+
+def parse_order_response(response: Optional[Dict[str, Any]], quantity: float,
+                         price: float) -> Tuple[Optional[str], float, float, bool]:
+    """(order id, filled qty so far, average price, done) from a place_order or get_order response.
+
+    Reads Binance's status/executedQty/cummulativeQuoteQty, KuCoin's
+    isActive/dealSize/dealFunds and BTCC's status/filled_qty. An
+    acknowledgement without fill fields (KuCoin's order placement) is an
+    open order, not an unfilled one. A bare "filled" status counts as the
+    full order at its price.
+    """
+    if not response:
+        return None, 0.0, 0.0, False
+    data = response.get("data") if isinstance(response.get("data"), dict) else response
+    order_id = next((data[key] for key in ("orderId", "order_id", "id") if data.get(key) not in (None, "")), None)
+    status = str(data.get("status", "")).lower()
+    filled, avg_price = 0.0, 0.0
+    for qty_key, quote_key in (("executedQty", "cummulativeQuoteQty"), ("dealSize", "dealFunds"),
+                               ("filled_qty", None)):
+        if qty_key in data:
+            filled = float(data[qty_key] or 0)
+            quote = float(data.get(quote_key) or 0) if quote_key else 0.0
+            avg_price = quote / filled if filled and quote else float(data.get("avg_price") or price)
+            break
+    else:
+        if status == "filled":
+            filled, avg_price = quantity, float(data.get("price") or price)
+    done = (status in DONE_STATUSES or data.get("isActive") is False
+            or filled >= quantity * (1 - 1e-9))
+    return (str(order_id) if order_id is not None else None), filled, (avg_price if filled else 0.0), done
+
+
+class ParentOrder:
+    """A large order worked by an algorithm as a series of child orders"""
+
+    __slots__ = ("id", "owner", "exchange", "connector", "symbol", "side", "qty", "algo", "params",
+                 "arrival_price", "created_at", "slices", "interval", "schedule", "next_at", "slice_index",
+                 "filled_qty", "notional", "children", "status", "in_flight", "open_child", "error", "finished_at")
+
+    def __init__(self, order_id: str, owner: str, connector, symbol: str, side: str, qty: float, algo: str,
+                 params: Dict[str, Any], arrival_price: float, created_at: float):
+        self.id = order_id
+        self.owner = owner
+        self.exchange = connector.exchange_name
+        self.connector = connector
+        self.symbol = symbol
+        self.side = side
+        self.qty = qty
+        self.algo = algo
+        self.params = params
+        self.arrival_price = arrival_price
+        self.created_at = created_at
+        self.slices = 0
+        self.interval = 0.0
+        self.schedule: List[float] = []  # cumulative fraction of qty due after each slice
+        self.next_at = created_at
+        self.slice_index = 0
+        self.filled_qty = 0.0
+        self.notional = 0.0
+        self.children: List[Dict[str, Any]] = []
+        self.status = "working"
+        self.in_flight = False  # a placement or status check is running on the pool
+        self.open_child: Optional[Dict[str, Any]] = None  # acknowledged child whose fill is not final
+        self.error = None
+        self.finished_at = None
+
+    @property
+    def remaining(self) -> float:
+        return max(0.0, self.qty - self.filled_qty)
+
+    @property
+    def avg_price(self) -> Optional[float]:
+        return self.notional / self.filled_qty if self.filled_qty else None
+
+    @property
+    def slippage_bps(self) -> Optional[float]:
+        """Average fill versus arrival price; positive means worse than arrival"""
+        if not self.filled_qty or not self.arrival_price:
+            return None
+        move = (self.avg_price - self.arrival_price) / self.arrival_price * 10000
+        return move if self.side == "buy" else -move
+
+    def to_dict(self, children: bool = True) -> Dict[str, Any]:
+        result = {
+            "id": self.id, "owner": self.owner, "exchange": self.exchange, "symbol": self.symbol,
+            "side": self.side, "qty": self.qty, "algo": self.algo, "params": self.params,
+            "status": self.status, "arrival_price": self.arrival_price, "filled_qty": self.filled_qty,
+            "remaining_qty": self.remaining, "progress": self.filled_qty / self.qty * 100 if self.qty else 0.0,
+            "avg_price": self.avg_price, "slippage_bps": self.slippage_bps, "slices_sent": len(self.children),
+            "slices": self.slices, "created_at": self.created_at, "next_at": self.next_at if self.status == "working" else None,
+            "open_child": self.open_child["id"] if self.open_child else None,
+            "finished_at": self.finished_at, "error": self.error,
+        }
+        if children:
+            result["children"] = list(self.children)
+        return result
+
+
+def plan_schedule(algo: str, qty: float, params: Dict[str, Any],
+                  volumes: Optional[List[float]] = None) -> Tuple[int, float, List[float]]:
+    """(slices, interval seconds, cumulative fraction due after each slice) for an algorithm"""
+    if algo == "iceberg":
+        display = float(params.get("display_qty") or 0)
+        if display <= 0 or display > qty:
+            raise ValueError("iceberg needs 0 < display_qty <= qty")
+        interval = max(MIN_INTERVAL, float(params.get("interval", 5)))
+        return 0, interval, []  # refills until done; no fixed schedule
+    duration = float(params.get("duration", 300))
+    slices = int(params.get("slices") or 0) or max(1, int(duration // max(MIN_INTERVAL, float(params.get("interval", 30)))))
+    slices = min(slices, MAX_SLICES)
+    interval = duration / slices
+    if interval < MIN_INTERVAL:
+        raise ValueError(f"{slices} slices over {duration:g}s is under {MIN_INTERVAL:g}s apart")
+    if algo == "twap":
+        weights = [1.0] * slices
+    elif algo == "vwap":
+        weights = [float(v) for v in (params.get("profile") or volumes or [])]
+        if len(weights) != slices or sum(weights) <= 0:
+            weights = _resample(weights, slices) if weights and sum(weights) > 0 else [1.0] * slices
+    else:
+        raise ValueError(f"Unknown execution algorithm: {algo}")
+    total = sum(weights)
+    cumulative, running = [], 0.0
+    for weight in weights:
+        running += weight
+        cumulative.append(running / total)
+    cumulative[-1] = 1.0
+    return slices, interval, cumulative
+
+
+def _resample(weights: List[float], slices: int) -> List[float]:
+    """Spread a volume profile of any length over `slices` buckets"""
+    n = len(weights)
+    return [sum(weights[i * n // slices:(i + 1) * n // slices] or [weights[min(n - 1, i * n // slices)]])
+            for i in range(slices)]
+
+
+def candle_volume_profile(exchange: str, symbol: str, interval: float, slices: int) -> Optional[List[float]]:
+    """Volume of the last `slices * interval` seconds of `exchange`'s 1-minute bars, bucketed per slice"""
+    source = PAPER_SOURCE if exchange == SimulatedExchange.exchange_name else exchange
+    bars = candle_sources.get(source).candles(symbol, "1m", max(1, int(slices * interval // 60)))
+    volumes = [bar.volume for bar in bars]
+    return _resample(volumes, slices) if sum(volumes) > 0 else None
+
+
+class ExecutionEngine:
+    """Works many parent orders from one scheduler thread.
+
+    Parents wait in a heap keyed by their next child time. The scheduler
+    pops whatever is due, sizes each child from the algorithm's schedule
+    (catching up on earlier shortfalls) and hands the placement to a small
+    thread pool, so a slow exchange delays only its own parent. A child the
+    exchange only acknowledged stays open and is queried by id until its
+    fill is final; no further child goes out meanwhile, so filled plus open
+    quantity never exceeds the parent's. Fills feed progress, average price
+    and slippage versus the arrival price.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time, max_workers: Optional[int] = 8,
+                 on_fill: Optional[Callable[["ParentOrder", float, float], None]] = None,
+                 volume_profile: Optional[Callable[[str, str, float, int], Optional[List[float]]]] = None):
+        self._clock = clock
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="execution") if max_workers else None
+        self.on_fill = on_fill
+        self.volume_profile = volume_profile
+        self._orders: Dict[str, ParentOrder] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._seq = itertools.count()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread = None
+        self._stop = False
+
+    def submit(self, connector, symbol: str, side: str, qty: float, algo: str, arrival_price: float,
+               owner: str = "", **params) -> ParentOrder:
+        """Start working a parent order; the first child goes out on the next scheduler pass"""
+        if side not in ("buy", "sell"):
+            raise ValueError("side must be 'buy' or 'sell'")
+        if qty <= 0 or not arrival_price or arrival_price <= 0:
+            raise ValueError("qty and arrival_price must be positive")
+        algo = algo.lower()
+        if algo not in ALGOS:
+            raise ValueError(f"Unknown execution algorithm: {algo}; available: {', '.join(ALGOS)}")
+        volumes = None
+        if algo == "vwap" and not params.get("profile") and self.volume_profile is not None:
+            slices, interval, _ = plan_schedule("twap", qty, params)
+            volumes = self.volume_profile(connector.exchange_name, symbol, interval, slices)
+        slices, interval, schedule = plan_schedule(algo, qty, params, volumes)
+        now = self._clock()
+        with self._lock:
+            parent = ParentOrder(f"exec-{next(self._ids)}", owner, connector, symbol, side, qty, algo,
+                                 params, arrival_price, now)
+            parent.slices, parent.interval, parent.schedule = slices, interval, schedule
+            self._orders[parent.id] = parent
+            heapq.heappush(self._heap, (now, next(self._seq), parent.id))
+            self._wakeup.notify()
+        return parent
+
+    def cancel(self, order_id: str) -> bool:
+        """Stop sending children and cancel the open one, booking whatever it filled"""
+        with self._lock:
+            parent = self._orders.get(order_id)
+            if parent is None or parent.status != "working":
+                return False
+            self._finish(parent, "cancelled")
+            child = parent.open_child
+        if child is not None:
+            self._cancel_child(parent, child)
+        return True
+
+    def get(self, order_id: str) -> Optional[ParentOrder]:
+        with self._lock:
+            return self._orders.get(order_id)
+
+    def orders(self, owner: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [parent.to_dict(children=False) for parent in self._orders.values()
+                    if owner is None or parent.owner == owner]
+
+    def _finish(self, parent: ParentOrder, status: str):
+        parent.status = status
+        parent.finished_at = self._clock()
+
+    def _child_qty(self, parent: ParentOrder) -> float:
+        # Only called with no open child, so what is unfilled is all that may still be sent
+        if parent.algo == "iceberg":
+            return min(float(parent.params["display_qty"]), parent.remaining)
+        due = parent.qty * parent.schedule[min(parent.slice_index, parent.slices - 1)]
+        return max(0.0, min(parent.remaining, due - parent.filled_qty))
+
+    def _child_order(self, parent: ParentOrder, qty: float) -> Order:
+        if parent.algo == "iceberg":
+            limit = float(parent.params.get("limit_price") or parent.arrival_price)
+            return Order(symbol=parent.symbol, side=parent.side, quantity=qty, price=limit, order_type="limit")
+        return Order(symbol=parent.symbol, side=parent.side, quantity=qty, price=parent.arrival_price,
+                     order_type="market")
+
+    def run_due(self, now: Optional[float] = None) -> int:
+        """Send a child, or check the open one, for every parent due by `now`; returns how many"""
+        now = self._clock() if now is None else now
+        batch = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, _, order_id = heapq.heappop(self._heap)
+                parent = self._orders.get(order_id)
+                if parent is None or parent.status != "working" or parent.in_flight:
+                    continue
+                if parent.open_child is not None:
+                    parent.in_flight = True
+                    batch.append((self._poll, parent, parent.open_child))
+                    continue
+                qty = self._child_qty(parent)
+                parent.slice_index += 1
+                if qty <= 1e-12:
+                    self._reschedule(parent, now)
+                    continue
+                parent.in_flight = True
+                batch.append((self._place, parent, self._child_order(parent, qty)))
+        for task, parent, arg in batch:
+            if self._executor is None:
+                task(parent, arg, now)
+            else:
+                self._executor.submit(task, parent, arg, now)
+        return len(batch)
+
+    def _place(self, parent: ParentOrder, order: Order, sent_at: float):
+        order_id, qty, price, done, error, unconfirmed = None, 0.0, 0.0, True, None, False
+        try:
+            response = parent.connector.place_order(order)
+            order_id, qty, price, done = parse_order_response(response, order.quantity, order.price)
+            if not done and order_id is None:
+                # Acknowledged but not identifiable: resending could double the position, so stop here
+                error = f"{parent.exchange} acknowledged the order without an id; its fill cannot be confirmed"
+                done = unconfirmed = True
+                EXECUTION_CHILD_ORDERS.labels(parent.algo, "unconfirmed").inc()
+            else:
+                EXECUTION_CHILD_ORDERS.labels(parent.algo, "filled" if qty else "open" if not done else "unfilled").inc()
+        except Exception as e:
+            error = str(e)
+            EXECUTION_CHILD_ORDERS.labels(parent.algo, "error").inc()
+        child = {"id": order_id, "sent_at": sent_at, "qty": order.quantity, "order_type": order.order_type,
+                 "filled_qty": 0.0, "price": None, "status": "open", "error": error}
+        with self._lock:
+            parent.in_flight = False
+            parent.children.append(child)
+            fill = self._settle(parent, child, qty, price, done)
+            if unconfirmed and parent.status == "working":
+                parent.error = error
+                self._finish(parent, "failed")
+            # Cancelled while the placement was in flight: cancel() found no open child to pull
+            orphaned = parent.status != "working" and parent.open_child is child
+            self._after_update(parent, child, fill[0] > 0)
+        self._notify_fill(parent, *fill)
+        if orphaned:
+            self._cancel_child(parent, child)
+
+    def _poll(self, parent: ParentOrder, child: Dict[str, Any], now: float):
+        try:
+            response = parent.connector.get_order(parent.symbol, child["id"])
+            _, qty, price, done = parse_order_response(response, child["qty"], child["price"] or parent.arrival_price)
+            error = None
+        except Exception as e:
+            qty, price, done, error = child["filled_qty"], child["price"] or 0.0, False, str(e)
+        with self._lock:
+            parent.in_flight = False
+            child["error"] = error
+            fill = self._settle(parent, child, qty, price, done)
+            self._after_update(parent, child, fill[0] > 0)
+        self._notify_fill(parent, *fill)
+
+    def _cancel_child(self, parent: ParentOrder, child: Dict[str, Any]):
+        """Cancel a resting child, then book its final fill"""
+        try:
+            parent.connector.cancel_order(parent.symbol, child["id"])
+        except Exception as e:
+            child["error"] = f"cancel failed: {e}"
+        try:
+            response = parent.connector.get_order(parent.symbol, child["id"])
+            _, qty, price, done = parse_order_response(response, child["qty"], child["price"] or parent.arrival_price)
+        except Exception as e:
+            child["error"] = f"final status unknown: {e}"
+            return
+        with self._lock:
+            fill = self._settle(parent, child, qty, price, done)
+        self._notify_fill(parent, *fill)
+
+    def _settle(self, parent: ParentOrder, child: Dict[str, Any], qty: float, price: float,
+                done: bool) -> Tuple[float, float]:
+        """Apply a child's cumulative fill; returns the new (qty, price) since the last report"""
+        delta, fill_price = qty - child["filled_qty"], 0.0
+        if delta > 1e-12:
+            notional = qty * price - child["filled_qty"] * (child["price"] or 0.0)
+            fill_price = notional / delta
+            parent.filled_qty += delta
+            parent.notional += notional
+            child["filled_qty"], child["price"] = qty, price
+        else:
+            delta = 0.0
+        if done:
+            child["status"] = "done"
+            if parent.open_child is child:
+                parent.open_child = None
+        else:
+            parent.open_child = child
+        return delta, fill_price
+
+    def _after_update(self, parent: ParentOrder, child: Dict[str, Any], filled: bool):
+        if parent.status != "working":
+            return
+        now = self._clock()
+        if parent.open_child is not None:
+            # Check the open child again; an iceberg slice rests on the book until it fills
+            parent.next_at = now + (parent.interval if parent.algo == "iceberg" else MIN_INTERVAL)
+            heapq.heappush(self._heap, (parent.next_at, next(self._seq), parent.id))
+        else:
+            if not child["filled_qty"] and child["status"] == "done" and not child["error"]:
+                child["error"] = "ended unfilled"
+            if sum(1 for c in parent.children if c["error"]) >= MAX_ERRORS:
+                parent.error = child["error"] or parent.children[-1]["error"]
+                self._finish(parent, "failed")
+            else:
+                self._reschedule(parent, now, filled=filled)
+        self._wakeup.notify()
+
+    def _notify_fill(self, parent: ParentOrder, qty: float, price: float):
+        if qty and self.on_fill is not None:
+            try:
+                self.on_fill(parent, qty, price)
+            except Exception as e:
+                print(f"Error recording execution fill: {e}")
+
+    def _reschedule(self, parent: ParentOrder, now: float, filled: bool = False):
+        if parent.remaining <= 1e-12:
+            self._finish(parent, "completed")
+            return
+        if parent.algo == "iceberg":
+            # Show the next slice as soon as one fills; an unfilled slice waits an interval
+            parent.next_at = now if filled else now + parent.interval
+        elif parent.slice_index < parent.slices:
+            parent.next_at = max(now, parent.created_at + parent.slice_index * parent.interval)
+        else:
+            # Past the end of the schedule: sweep a confirmed shortfall once per interval
+            parent.next_at = now + parent.interval
+        heapq.heappush(self._heap, (parent.next_at, next(self._seq), parent.id))
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name="execution-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            self._stop = True
+            self._wakeup.notify()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if self._stop:
+                    return
+                timeout = self._heap[0][0] - self._clock() if self._heap else None
+                if timeout is None or timeout > 0:
+                    self._wakeup.wait(timeout)
+                    continue
+            self.run_due()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            by_status: Dict[str, int] = {}
+            for parent in self._orders.values():
+                by_status[parent.status] = by_status.get(parent.status, 0) + 1
+            return {"orders": by_status, "running": self._thread is not None and self._thread.is_alive()}
+
+
+class SimulatedExchange:
+    """Order sink for testing and dry runs: fills against a price source with linear market impact.
+
+    Market orders fill in full at the current price moved by `impact_bps`
+    per unit of `depth`. Limit orders fill only while marketable and at
+    most `depth` at a time; the rest rests until a status check finds the
+    price back through the limit, or the order is cancelled. Each fill
+    shifts the price by its impact, which then decays back toward the
+    source price by `recovery` per fill.
+    """
+
+    exchange_name = "simulated"
+
+    def __init__(self, price_source: Callable[[str], Optional[float]], depth: float = 1.0,
+                 impact_bps: float = 10.0, recovery: float = 0.5):
+        self.price_source = price_source
+        self.depth = depth
+        self.impact_bps = impact_bps
+        self.recovery = recovery
+        self.offsets: Dict[str, float] = {}
+        self.orders: List[Order] = []
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def price(self, symbol: str) -> Optional[float]:
+        base = self.price_source(symbol)
+        return base * (1 + self.offsets.get(symbol, 0.0)) if base else None
+
+    def _match(self, record: Dict[str, Any]):
+        order = record["order"]
+        price = self.price(order.symbol)
+        if price is None:
+            return
+        direction = 1 if order.side == "buy" else -1
+        qty = order.quantity - record["filled"]
+        if order.order_type == "limit":
+            if (price - order.price) * direction > 0:
+                return
+            qty = min(qty, self.depth)
+        impact = direction * self.impact_bps / 10000 * qty / self.depth
+        offset = self.offsets.get(order.symbol, 0.0) * (1 - self.recovery)
+        self.offsets[order.symbol] = offset + impact
+        record["filled"] += qty
+        record["notional"] += qty * price * (1 + impact / 2)
+        record["status"] = "FILLED" if record["filled"] >= order.quantity - 1e-12 else "PARTIALLY_FILLED"
+
+    @staticmethod
+    def _report(order_id: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        return {"orderId": order_id, "status": record["status"], "executedQty": record["filled"],
+                "cummulativeQuoteQty": record["notional"]}
+
+    def place_order(self, order: Order) -> Dict[str, Any]:
+        with self._lock:
+            self.orders.append(order)
+            if self.price(order.symbol) is None:
+                raise Exception(f"No price for {order.symbol}")
+            order_id = f"sim-{next(self._ids)}"
+            record = self._records[order_id] = {"order": order, "filled": 0.0, "notional": 0.0, "status": "NEW"}
+            self._match(record)
+            return self._report(order_id, record)
+
+    def get_order(self, symbol: str, order_id: str) -> Dict[str, Any]:
+        with self._lock:
+            record = self._records[order_id]
+            if record["status"] in ("NEW", "PARTIALLY_FILLED"):
+                self._match(record)
+            return self._report(order_id, record)
+
+    def cancel_order(self, symbol: str, order_id: str) -> Dict[str, Any]:
+        with self._lock:
+            record = self._records[order_id]
+            if record["status"] in ("NEW", "PARTIALLY_FILLED"):
+                record["status"] = "CANCELED"
+            return self._report(order_id, record)
+
+    def open_orders(self) -> List[str]:
+        with self._lock:
+            return [order_id for order_id, record in self._records.items()
+                    if record["status"] in ("NEW", "PARTIALLY_FILLED")]
+
+    def get_tickers(self, symbols: List[str] = None):
+        return []
+
+
+# Global engine; started lazily with the first parent order
+execution_engine = ExecutionEngine(volume_profile=candle_volume_profile)
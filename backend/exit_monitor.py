@@ -0,0 +1,227 @@
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# Re-heapify a symbol's triggers once cancelled entries outnumber live ones by this factor
+COMPACT_RATIO = 2
+
+
+class _Position:
+    __slots__ = ("id", "symbol", "generation", "entry_price", "opened_at", "levels")
+
+    def __init__(self, position_id: str, symbol: str, generation: int, entry_price: float, opened_at: float):
+        self.id = position_id
+        self.symbol = symbol
+        self.generation = generation
+        self.entry_price = entry_price
+        self.opened_at = opened_at
+        self.levels: Dict[str, float] = {}
+
+
+class _TrailingEpoch:
+    """Trailing stops that share a high-water mark, tightest trail (largest 1 - pct) on top"""
+
+    __slots__ = ("peak", "heap")
+
+    def __init__(self, peak: float):
+        self.peak = peak
+        self.heap: List[tuple] = []
+
+
+class _SymbolTriggers:
+    """Price-indexed triggers for one symbol.
+
+    `above` is a min-heap of levels that fire when the price rises to them
+    (take profit); `below` a max-heap of levels that fire when it falls to
+    them (stop loss). Trailing stops are grouped into epochs by high-water
+    mark: a stop registered below the current peak starts a new epoch, and a
+    price at or above an epoch's peak raises it and merges it into the ones
+    after it, so every stop in an epoch fires at peak * (1 - pct).
+    """
+
+    __slots__ = ("above", "below", "epochs", "last_price", "live", "stale")
+
+    def __init__(self):
+        self.above: List[tuple] = []
+        self.below: List[tuple] = []
+        self.epochs: List[_TrailingEpoch] = []  # peaks strictly decreasing, oldest first
+        self.last_price: Optional[float] = None
+        self.live = 0
+        self.stale = 0
+
+    def raise_peak(self, price: float):
+        """Fold every trailing epoch whose peak the price reached into one epoch at `price`"""
+        merged = None
+        while self.epochs and self.epochs[-1].peak <= price:
+            epoch = self.epochs.pop()
+            if merged is None:
+                merged = epoch
+            else:
+                if len(merged.heap) < len(epoch.heap):
+                    merged, epoch = epoch, merged
+                for item in epoch.heap:
+                    heapq.heappush(merged.heap, item)
+        if merged is not None:
+            merged.peak = price
+            self.epochs.append(merged)
+
+
+class ExitMonitor:
+    """Stop-loss, take-profit, trailing-stop and time-based exits for open long positions.
+
+    Each position's triggers sit in its symbol's price heaps and a global
+    deadline heap, so a price update only pops the triggers it crosses
+    (O(log n) each plus one peek per heap) instead of scanning positions.
+    The first trigger to fire closes the position; its other entries are
+    skipped lazily when they reach the top of their heap.
+    """
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._positions: Dict[str, _Position] = {}
+        self._symbols: Dict[str, _SymbolTriggers] = {}
+        self._deadlines: List[tuple] = []
+        self._generations = itertools.count(1)
+        self._seq = itertools.count()
+
+    def register(self, position_id: str, symbol: str, entry_price: float, price: Optional[float] = None,
+                 stop_loss_pct: Optional[float] = None, take_profit_pct: Optional[float] = None,
+                 trailing_pct: Optional[float] = None, max_hold_seconds: Optional[float] = None,
+                 opened_at: Optional[float] = None):
+        """Arm (or re-arm) a position's exits; percentages are relative to `entry_price`.
+
+        `price` is the current market price, where a trailing stop starts its
+        high-water mark (defaults to the entry). Re-registering an open
+        position keeps its original open time unless `opened_at` is given.
+        """
+        price = entry_price if price is None else price
+        with self._lock:
+            previous = self._positions.get(position_id)
+            if opened_at is None:
+                opened_at = previous.opened_at if previous else self._clock()
+            self._remove(position_id)
+            position = _Position(position_id, symbol, next(self._generations), entry_price, opened_at)
+            book = self._symbols.get(symbol)
+            if book is None:
+                book = self._symbols[symbol] = _SymbolTriggers()
+            key = (position_id, position.generation)
+            if stop_loss_pct:
+                level = entry_price * (1 - stop_loss_pct / 100)
+                heapq.heappush(book.below, (-level, next(self._seq), key, "stop_loss"))
+                position.levels["stop_loss"] = level
+            if take_profit_pct:
+                level = entry_price * (1 + take_profit_pct / 100)
+                heapq.heappush(book.above, (level, next(self._seq), key, "take_profit"))
+                position.levels["take_profit"] = level
+            if trailing_pct:
+                book.raise_peak(price)
+                if not book.epochs or book.epochs[-1].peak != price:
+                    book.epochs.append(_TrailingEpoch(price))
+                heapq.heappush(book.epochs[-1].heap, (-(1 - trailing_pct / 100), next(self._seq), key, "trailing_stop"))
+                position.levels["trailing_stop"] = trailing_pct
+            if max_hold_seconds:
+                heapq.heappush(self._deadlines, (opened_at + max_hold_seconds, next(self._seq), key, "time_exit"))
+                position.levels["time_exit"] = opened_at + max_hold_seconds
+            if position.levels:
+                self._positions[position_id] = position
+                book.live += len(position.levels)
+
+    def cancel(self, position_id: str) -> bool:
+        """Disarm a position closed by other means"""
+        with self._lock:
+            return self._remove(position_id)
+
+    def _remove(self, position_id: str) -> bool:
+        position = self._positions.pop(position_id, None)
+        if position is None:
+            return False
+        book = self._symbols[position.symbol]
+        count = len(position.levels)
+        book.live -= count
+        book.stale += count
+        if book.stale > COMPACT_RATIO * max(book.live, 16):
+            self._compact(book)
+        return True
+
+    def _is_live(self, key) -> bool:
+        position = self._positions.get(key[0])
+        return position is not None and position.generation == key[1]
+
+    def _compact(self, book: _SymbolTriggers):
+        book.above = [item for item in book.above if self._is_live(item[2])]
+        book.below = [item for item in book.below if self._is_live(item[2])]
+        heapq.heapify(book.above)
+        heapq.heapify(book.below)
+        for epoch in book.epochs:
+            epoch.heap = [item for item in epoch.heap if self._is_live(item[2])]
+            heapq.heapify(epoch.heap)
+        book.epochs = [epoch for epoch in book.epochs if epoch.heap]
+        book.stale = 0
+
+    def _fire(self, key, reason: str, trigger_price: float, price: Optional[float], fired: List[Dict[str, Any]]):
+        if not self._is_live(key):
+            return
+        position = self._positions[key[0]]
+        self._remove(key[0])
+        fired.append({"position_id": position.id, "symbol": position.symbol, "reason": reason,
+                      "trigger_price": trigger_price, "price": price, "entry_price": position.entry_price,
+                      "opened_at": position.opened_at})
+
+    def on_price(self, symbol: str, price: float) -> List[Dict[str, Any]]:
+        """Exits crossed by a new price for `symbol`; each fired position is disarmed"""
+        fired: List[Dict[str, Any]] = []
+        with self._lock:
+            book = self._symbols.get(symbol)
+            if book is None:
+                return fired
+            book.last_price = price
+            while book.above and book.above[0][0] <= price:
+                level, _, key, reason = heapq.heappop(book.above)
+                self._fire(key, reason, level, price, fired)
+            while book.below and -book.below[0][0] >= price:
+                level, _, key, reason = heapq.heappop(book.below)
+                self._fire(key, reason, -level, price, fired)
+            book.raise_peak(price)
+            for epoch in book.epochs:
+                while epoch.heap and -epoch.heap[0][0] * epoch.peak >= price:
+                    factor, _, key, reason = heapq.heappop(epoch.heap)
+                    self._fire(key, reason, -factor * epoch.peak, price, fired)
+            if fired:
+                book.epochs = [epoch for epoch in book.epochs if epoch.heap]
+        return fired
+
+    def poll(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Time-based exits due by `now`, priced at each symbol's last update"""
+        now = self._clock() if now is None else now
+        fired: List[Dict[str, Any]] = []
+        with self._lock:
+            while self._deadlines and self._deadlines[0][0] <= now:
+                deadline, _, key, reason = heapq.heappop(self._deadlines)
+                position = self._positions.get(key[0])
+                price = self._symbols[position.symbol].last_price if position else None
+                self._fire(key, reason, deadline, price, fired)
+            if len(self._deadlines) > COMPACT_RATIO * max(len(self._positions), 16):
+                self._deadlines = [item for item in self._deadlines if self._is_live(item[2])]
+                heapq.heapify(self._deadlines)
+        return fired
+
+    def get(self, position_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            position = self._positions.get(position_id)
+            if position is None:
+                return None
+            return {"symbol": position.symbol, "entry_price": position.entry_price,
+                    "opened_at": position.opened_at, "triggers": dict(position.levels)}
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "positions": len(self._positions),
+                "symbols": {symbol: {"live_triggers": book.live, "stale_entries": book.stale,
+                                     "trailing_epochs": len(book.epochs)}
+                            for symbol, book in self._symbols.items() if book.live},
+                "pending_deadlines": len(self._deadlines),
+            }
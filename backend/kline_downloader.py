@@ -0,0 +1,340 @@
+import argparse
+import itertools
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+
+from metrics import registry as metrics_registry
+from price_store import PriceStore, Kline, get_price_store
+from risk_ledger import split_symbol
+from scheduler import parse_timeframe
+from trade_history import parse_trade_time
+
+# Public kline endpoints; "rate" is requests per second, kept under each exchange's published limit
+KLINE_SOURCES = {
+    "binance": {"base_url": "https://api.binance.com", "page_limit": 1000, "rate": 40.0},
+    "kucoin": {"base_url": "https://api.kucoin.com", "page_limit": 1500, "rate": 8.0},
+}
+BINANCE_INTERVALS = {60: "1m", 180: "3m", 300: "5m", 900: "15m", 1800: "30m", 3600: "1h", 7200: "2h",
+                     14400: "4h", 21600: "6h", 28800: "8h", 43200: "12h", 86400: "1d", 604800: "1w"}
+KUCOIN_INTERVALS = {60: "1min", 180: "3min", 300: "5min", 900: "15min", 1800: "30min", 3600: "1hour",
+                    7200: "2hour", 14400: "4hour", 21600: "6hour", 28800: "8hour", 43200: "12hour",
+                    86400: "1day", 604800: "1week"}
+SEGMENT_BARS = 50000  # bars per checkpointed segment; segments of one series download in parallel
+MAX_RETRIES = 5
+REQUEST_TIMEOUT = 10
+
+KLINE_BARS_DOWNLOADED = metrics_registry.counter(
+    "kline_bars_downloaded_total", "Historical bars written to the price store", ("exchange",))
+KLINE_REQUESTS_THROTTLED = metrics_registry.counter(
+    "kline_requests_throttled_total", "Kline requests answered with 429/418 and retried after backing off", ("exchange",))
+
+
+def timeframe_label(timeframe) -> Tuple[str, int]:
+    """(canonical label such as "1m", seconds) for a timeframe the exchanges serve"""
+    seconds = parse_timeframe(timeframe)
+    if seconds not in BINANCE_INTERVALS:
+        raise ValueError(f"Unsupported kline timeframe: {timeframe!r}; use one of {', '.join(BINANCE_INTERVALS.values())}")
+    return BINANCE_INTERVALS[seconds], seconds
+
+
+class RateLimiter:
+    """Token bucket shared by all workers hitting one exchange; a 429 pauses every worker"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self._tokens = self.burst
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            self._sleep(wait)
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+            self._tokens = 0.0
+
+
+class KlineSource:
+    """Pages through one exchange's kline endpoint"""
+
+    def __init__(self, exchange: str, base_url: Optional[str] = None, page_limit: Optional[int] = None,
+                 rate: Optional[float] = None):
+        if exchange not in KLINE_SOURCES:
+            raise ValueError(f"No kline source for {exchange}; available: {', '.join(KLINE_SOURCES)}")
+        defaults = KLINE_SOURCES[exchange]
+        self.exchange = exchange
+        self.base_url = (base_url or defaults["base_url"]).rstrip("/")
+        self.page_limit = page_limit or defaults["page_limit"]
+        self.limiter = RateLimiter(rate or defaults["rate"])
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _get(self, path: str, params: Dict[str, Any]):
+        for attempt in range(MAX_RETRIES + 1):
+            self.limiter.acquire()
+            try:
+                response = self._session().get(f"{self.base_url}{path}", params=params, timeout=REQUEST_TIMEOUT)
+            except requests.RequestException:
+                if attempt == MAX_RETRIES:
+                    raise
+                time.sleep(min(8.0, 0.25 * 2 ** attempt))
+                continue
+            if response.status_code in (418, 429):
+                KLINE_REQUESTS_THROTTLED.labels(self.exchange).inc()
+                self.limiter.pause(float(response.headers.get("Retry-After", 1 + attempt)))
+                continue
+            if response.status_code >= 500 and attempt < MAX_RETRIES:
+                time.sleep(min(8.0, 0.25 * 2 ** attempt))
+                continue
+            response.raise_for_status()
+            return response.json()
+        raise Exception(f"{self.exchange} kept throttling {path}")
+
+    def page(self, symbol: str, seconds: int, start: int, end: int) -> Tuple[List[Kline], int]:
+        """Bars with start <= open_time < end from one request, and where the next page starts"""
+        if self.exchange == "binance":
+            rows = self._get("/api/v3/klines", {"symbol": symbol, "interval": BINANCE_INTERVALS[seconds],
+                                                "startTime": start * 1000, "endTime": end * 1000 - 1,
+                                                "limit": self.page_limit})
+            bars = [(int(r[0]) // 1000, float(r[1]), float(r[2]), float(r[3]), float(r[4]), float(r[5])) for r in rows]
+            # Binance returns the first `limit` bars at or after startTime; a short page reached the end
+            next_start = bars[-1][0] + seconds if len(bars) == self.page_limit else end
+        else:
+            base, quote = split_symbol(symbol)
+            window_end = min(end, start + self.page_limit * seconds)
+            rows = self._get("/api/v1/market/candles", {"symbol": f"{base}-{quote}", "type": KUCOIN_INTERVALS[seconds],
+                                                        "startAt": start, "endAt": window_end}).get("data") or []
+            # KuCoin rows are [time, open, close, high, low, volume, turnover], newest first
+            bars = sorted((int(r[0]), float(r[1]), float(r[3]), float(r[4]), float(r[2]), float(r[5])) for r in rows)
+            next_start = window_end
+        return [bar for bar in bars if start <= bar[0] < end], max(next_start, start + seconds)
+
+
+class KlineDownloader:
+    """Bulk history download into the price store, resumable and parallel.
+
+    A request is planned per (symbol, timeframe) against the segments the
+    store already knows: finished segments are skipped, unfinished ones
+    resume from their cursor, and only uncovered gaps get new segments, so
+    overlapping requests never fetch a range twice. Segments run on a
+    worker pool; requests to each exchange share one rate limiter.
+    """
+
+    def __init__(self, store: Optional[PriceStore] = None, workers: int = 16, segment_bars: int = SEGMENT_BARS,
+                 clock: Callable[[], float] = time.time):
+        self.store = store or get_price_store()
+        self.workers = workers
+        self.segment_bars = segment_bars
+        self._clock = clock
+        self._sources: Dict[str, KlineSource] = {}
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._job_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def source(self, exchange: str, **overrides) -> KlineSource:
+        with self._lock:
+            source = self._sources.get(exchange)
+            if source is None or overrides:
+                source = self._sources[exchange] = KlineSource(exchange, **overrides)
+            return source
+
+    def plan(self, exchange: str, symbol: str, timeframe: str, start: int, end: int) -> List[Dict[str, Any]]:
+        """Unfinished segments overlapping [start, end), creating segments for uncovered gaps"""
+        label, seconds = timeframe_label(timeframe)
+        start = start - start % seconds
+        end = min(end, int(self._clock()) // seconds * seconds)  # only closed bars
+        if end <= start:
+            return []
+        existing = self.store.segments(exchange, symbol, label)
+        gaps, cursor = [], start
+        for segment in existing:
+            if segment["end"] <= cursor or segment["start"] >= end:
+                continue
+            if segment["start"] > cursor:
+                gaps.append((cursor, segment["start"]))
+            cursor = max(cursor, segment["end"])
+        if cursor < end:
+            gaps.append((cursor, end))
+        chunk = self.segment_bars * seconds
+        ranges = [(s, min(s + chunk, gap_end)) for gap_start, gap_end in gaps for s in range(gap_start, gap_end, chunk)]
+        if ranges:
+            self.store.add_segments(exchange, symbol, label, ranges)
+        return [dict(segment, exchange=exchange, symbol=symbol, timeframe=label, seconds=seconds)
+                for segment in self.store.segments(exchange, symbol, label)
+                if not segment["done"] and segment["end"] > start and segment["start"] < end]
+
+    def _run_segment(self, source: KlineSource, segment: Dict[str, Any], job: Dict[str, Any]):
+        cursor, end = segment["cursor"], segment["end"]
+        while cursor < end and not job["cancel"].is_set():
+            bars, next_cursor = source.page(segment["symbol"], segment["seconds"], cursor, end)
+            written = self.store.write_page(source.exchange, segment["symbol"], segment["timeframe"], bars,
+                                            segment["start"], min(next_cursor, end), done=next_cursor >= end)
+            KLINE_BARS_DOWNLOADED.labels(source.exchange).inc(written)
+            with self._lock:
+                job["bars"] += written
+                job["requests"] += 1
+            cursor = next_cursor
+        if cursor >= end:
+            with self._lock:
+                job["segments_done"] += 1
+
+    def _new_job(self, exchange: str, symbols: List[str], timeframes: List[str], start: int, end: int) -> Dict[str, Any]:
+        job = {"id": f"klines-{next(self._job_ids)}", "exchange": exchange, "symbols": symbols,
+               "timeframes": timeframes, "start": start, "end": end, "status": "planning", "segments": 0,
+               "segments_done": 0, "bars": 0, "requests": 0, "errors": [], "started_at": self._clock(),
+               "finished_at": None, "cancel": threading.Event()}
+        with self._lock:
+            self._jobs[job["id"]] = job
+        return job
+
+    def _execute(self, job: Dict[str, Any], source: KlineSource):
+        status = "failed"
+        try:
+            segments = [segment for symbol in job["symbols"] for timeframe in job["timeframes"]
+                        for segment in self.plan(job["exchange"], symbol, timeframe, job["start"], job["end"])]
+            with self._lock:
+                job["segments"], job["status"] = len(segments), "running"
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="klines") as pool:
+                futures = [pool.submit(self._run_segment, source, segment, job) for segment in segments]
+                try:
+                    for segment, future in zip(segments, futures):
+                        error = future.exception()
+                        if error is not None:
+                            with self._lock:
+                                job["errors"].append(f"{segment['symbol']} {segment['timeframe']} "
+                                                     f"from {segment['cursor']}: {error}")
+                except BaseException:
+                    # Interrupted: workers stop after their current page, which is already checkpointed
+                    job["cancel"].set()
+                    raise
+            status = "failed" if job["errors"] else "completed"
+        except Exception as e:
+            job["errors"].append(str(e))
+        finally:
+            with self._lock:
+                job["status"] = "cancelled" if job["cancel"].is_set() else status
+                job["finished_at"] = self._clock()
+
+    def download(self, exchange: str, symbols: List[str], timeframes: List[str], start: int, end: int,
+                 **source_overrides) -> Dict[str, Any]:
+        """Run a download to completion on the calling thread; returns its job summary"""
+        job = self._new_job(exchange, symbols, timeframes, start, end)
+        self._execute(job, self.source(exchange, **source_overrides))
+        return self.job(job["id"])
+
+    def start(self, exchange: str, symbols: List[str], timeframes: List[str], start: int, end: int) -> Dict[str, Any]:
+        """Run a download in the background; poll it with job()"""
+        for timeframe in timeframes:
+            timeframe_label(timeframe)
+        source = self.source(exchange)
+        job = self._new_job(exchange, symbols, timeframes, start, end)
+        threading.Thread(target=self._execute, args=(job, source), name=job["id"], daemon=True).start()
+        return self.job(job["id"])
+
+    def cancel(self, job_id: str) -> bool:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["finished_at"] is not None:
+                return False
+            job["cancel"].set()
+            return True
+
+    def job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            summary = {key: value for key, value in job.items() if key != "cancel"}
+            summary["errors"] = list(job["errors"])
+        elapsed = (summary["finished_at"] or self._clock()) - summary["started_at"]
+        summary["elapsed_seconds"] = elapsed
+        summary["bars_per_second"] = summary["bars"] / elapsed if elapsed > 0 else 0.0
+        return summary
+
+    def jobs(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            ids = list(self._jobs)
+        return [self.job(job_id) for job_id in ids]
+
+
+_downloader: Optional[KlineDownloader] = None
+_downloader_lock = threading.Lock()
+
+
+def get_kline_downloader() -> KlineDownloader:
+    """The process-wide downloader writing to the shared price store"""
+    global _downloader
+    if _downloader is None:
+        with _downloader_lock:
+            if _downloader is None:
+                _downloader = KlineDownloader()
+    return _downloader
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Download historical klines into the price store")
+    parser.add_argument("--exchange", default="binance", choices=sorted(KLINE_SOURCES))
+    parser.add_argument("--symbols", nargs="+", required=True, help="canonical symbols such as BTCUSDT")
+    parser.add_argument("--timeframes", nargs="+", default=["1m"])
+    parser.add_argument("--start", required=True, help="ISO date/time or epoch seconds (UTC)")
+    parser.add_argument("--end", help="ISO date/time or epoch seconds (UTC); default now")
+    parser.add_argument("--db", help="price store path; default PRICE_STORE_PATH or prices.db")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--rate", type=float, help="requests per second; default the exchange's")
+    parser.add_argument("--base-url", help="kline API base URL, e.g. a local mirror")
+    args = parser.parse_args(argv)
+
+    store = PriceStore(args.db) if args.db else get_price_store()
+    downloader = KlineDownloader(store, workers=args.workers)
+    start = int(parse_trade_time(args.start))
+    end = int(parse_trade_time(args.end)) if args.end else int(time.time())
+    overrides = {key: value for key, value in (("rate", args.rate), ("base_url", args.base_url)) if value}
+    done = threading.Event()
+
+    def report():
+        while not done.wait(5):
+            for progress in downloader.jobs():
+                print(f"{progress['segments_done']}/{progress['segments']} segments, {progress['bars']} bars, "
+                      f"{progress['bars_per_second']:.0f} bars/s")
+
+    threading.Thread(target=report, daemon=True).start()
+    try:
+        summary = downloader.download(args.exchange, [s.upper() for s in args.symbols], args.timeframes,
+                                      start, end, **overrides)
+    except KeyboardInterrupt:
+        print("Interrupted; run the same command again to resume")
+        return 130
+    finally:
+        done.set()
+    print(f"{summary['status']}: {summary['bars']} bars in {summary['requests']} requests, "
+          f"{summary['elapsed_seconds']:.1f}s")
+    for error in summary["errors"]:
+        print(f"  {error}")
+    return 0 if summary["status"] == "completed" else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,22 @@
-from fastapi import FastAPI, Body, Depends, HTTPException, status
+from startup_profile import startup_profile
+startup_profile.start_imports()
+from fastapi import FastAPI, Body, Depends, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from trading_state import TradingState
+from fastapi.responses import Response, StreamingResponse
+from trading_state import state
 from pydantic import BaseModel
 from datetime import datetime, timedelta
-from trading_loop import start_trading_loop
+import trading_loop
+from trading_loop import start_trading_loop, wake_trading_loop, get_watchlist, position_exits, track_position_exits
 from real_trading import real_trading_bot
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import random
 import json
 import os
 import requests
 import time
+import functools
 from auth import (
     UserCreate, UserLogin, Token, UserInDB, 
     authenticate_user, create_user, create_access_token,
@@ -21,10 +26,30 @@ from exchange_connectors import (
     ExchangeConnectorFactory, ExchangeCredentials, 
     Balance, Ticker, Order
 )
+from symbol_metadata import symbol_metadata, OrderValidationError
 from user_data import user_data_manager
-
-# Create singleton instance
-state = TradingState()
+from strategy_compiler import compiled_strategy_cache, compile_strategy, StrategyValidationError
+from scheduler import get_scheduler_stats
+from market_calendar import get_calendar
+from watchlist import normalize_watchlist
+from order_book import order_books
+from candles import candle_aggregator, candle_sources, PAPER_SOURCE
+from signal_pipeline import pipeline_stats
+from market_analysis import analysis_cache, AVAILABLE_STOCKS, AVAILABLE_PAIRS
+from response_cache import response_cache
+from storage import get_storage
+from shared_state import configure_shared_state, is_trading_leader
+from engine_process import start_engine_process
+from state_journal import open_state_journal, state_journal
+from trade_history import trade_store, parse_trade_time, MAX_PAGE_SIZE
+from accounting import accounting, PAPER_USER, PAPER_EXCHANGE
+from valuation import portfolio_valuation
+from order_router import order_router
+from execution_algos import execution_engine, SimulatedExchange
+from risk_ledger import risk_ledgers
+from kline_downloader import get_kline_downloader, timeframe_label
+from metrics import registry as metrics_registry, MetricsMiddleware, CONTENT_TYPE_LATEST
+startup_profile.stop_imports()
 
 app = FastAPI()
 
@@ -37,6 +62,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Record per-route latency for /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Trading engine process started with ENGINE_PROCESS=1; None when the loops run in-process
+engine_client = None
+ENGINE_ENDPOINTS = {}
+
+def runs_in_engine(endpoint):
+    """Endpoints touching engine-owned state run inside the engine process when there is one"""
+    ENGINE_ENDPOINTS[endpoint.__name__] = endpoint
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        if engine_client is not None:
+            return engine_client.forward(endpoint.__name__, kwargs)
+        return endpoint(*args, **kwargs)
+    return wrapper
+
 @app.get("/")
 def root():
     return {"status": "ok"}
@@ -50,6 +93,16 @@ def health_check():
         "service": "trading-bot-api"
     }
 
+@app.get("/startup-profile")
+def get_startup_profile():
+    """Cold-start breakdown: slowest imports of main, init steps and time until ready"""
+    return startup_profile.report()
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text exposition of request, exchange, trading-loop and I/O metrics"""
+    return Response(content=metrics_registry.render(), media_type=CONTENT_TYPE_LATEST)
+
 # Authentication endpoints
 @app.post("/register", response_model=Token)
 async def register(user_data: UserCreate):
@@ -117,38 +170,21 @@ BINANCE_TESTNET_BASE_URL = "https://testnet.binance.vision"
 BINANCE_MAINNET_BASE_URL = "https://api.binance.com"
 
 # Strategy management
-STRATEGIES_FILE = "saved_strategies.json"
-CUSTOM_STRATEGIES_FILE = "custom_strategies.json"
-
 def load_saved_strategies():
-    """Load saved strategies from file"""
-    if os.path.exists(STRATEGIES_FILE):
-        try:
-            with open(STRATEGIES_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
+    """Load saved strategies from storage"""
+    return get_storage().get_document("saved_strategies", {})
 
 def save_strategies_to_file(strategies):
-    """Save strategies to file"""
-    with open(STRATEGIES_FILE, 'w') as f:
-        json.dump(strategies, f, indent=2)
+    """Save strategies to storage"""
+    get_storage().put_document("saved_strategies", strategies)
 
 def load_custom_strategies():
-    """Load custom strategies from file"""
-    if os.path.exists(CUSTOM_STRATEGIES_FILE):
-        try:
-            with open(CUSTOM_STRATEGIES_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            return []
-    return []
+    """Load custom strategies from storage"""
+    return get_storage().get_document("custom_strategies", [])
 
 def save_custom_strategies_to_file(strategies):
-    """Save custom strategies to file"""
-    with open(CUSTOM_STRATEGIES_FILE, 'w') as f:
-        json.dump(strategies, f, indent=2)
+    """Save custom strategies to storage"""
+    get_storage().put_document("custom_strategies", strategies)
 
 def get_binance_price(symbol: str, is_testnet: bool = True):
     """Fetch real-time price from Binance"""
@@ -215,6 +251,7 @@ class CustomExitConfig(BaseModel):
     profit_target: float = 8.0
     stop_loss: float = 4.0
     time_based_exit: int = 60  # minutes
+    trailing_stop: float = 0.0  # percent below the high since entry; 0 disables
 
 class BacktestConfig(BaseModel):
     start_date: str
@@ -289,9 +326,11 @@ class ReallocationLog(BaseModel):
     roi_change: float
 
 @app.get("/positions")
+@runs_in_engine
 def get_positions():
     with state.lock:
-        return {"positions": state.positions}
+        positions = dict(state.positions)
+    return {"positions": positions, "valuation": portfolio_valuation.account(PAPER_USER)}
 
 @app.get("/risk-status")
 def get_risk_status():
@@ -329,25 +368,27 @@ def get_risk_status():
         raise HTTPException(status_code=500, detail=f"Failed to get risk status: {str(e)}")
 
 @app.post("/execute-mock-trade")
+@runs_in_engine
 def execute_mock_trade(trade: TradeRequest):
     with state.lock:
-        # Update positions
         pos = state.positions.get(trade.symbol, {"qty": 0, "avg_price": 0})
+        # Positions restored from the journal or written by another worker re-base the lots
+        accounting.sync_position(PAPER_USER, PAPER_EXCHANGE, trade.symbol, pos["qty"], pos["avg_price"])
         realized_pnl = 0.0
-        if trade.side == "buy":
-            total_cost = pos["qty"] * pos["avg_price"] + trade.qty * trade.price
-            new_qty = pos["qty"] + trade.qty
-            new_avg = total_cost / new_qty if new_qty > 0 else 0
-            pos["qty"] = new_qty
-            pos["avg_price"] = new_avg
-            state.cash -= trade.qty * trade.price
-        elif trade.side == "sell":
-            sell_qty = min(trade.qty, pos["qty"])
-            realized_pnl = (trade.price - pos["avg_price"]) * sell_qty
-            pos["qty"] = max(0, pos["qty"] - trade.qty)
-            state.cash += trade.qty * trade.price
-            state.performance_metrics["total_realized_pnl"] += realized_pnl
+        if trade.side in ("buy", "sell"):
+            fill = accounting.record_fill(PAPER_USER, PAPER_EXCHANGE, trade.symbol, trade.side, trade.qty, trade.price)
+            realized_pnl = fill["realized_pnl"]
+            if trade.side == "buy":
+                state.cash -= trade.qty * trade.price
+            else:
+                # Only the quantity actually held is sold
+                state.cash += fill["closed_qty"] * trade.price
+                state.performance_metrics["total_realized_pnl"] += realized_pnl
+            pos = {"qty": fill["position_qty"], "avg_price": fill["avg_price"]}
         state.positions[trade.symbol] = pos
+        portfolio_valuation.set_position(PAPER_USER, PAPER_EXCHANGE, trade.symbol, pos["qty"], pos["avg_price"])
+        portfolio_valuation.set_cash(PAPER_USER, state.cash)
+        track_position_exits(trade.symbol, pos, trade.price, state.strategy_config)
         # Log trade
         trade_entry = {
             "timestamp": datetime.utcnow().isoformat() + "Z",
@@ -359,32 +400,94 @@ def execute_mock_trade(trade: TradeRequest):
         }
         state.trades.append(trade_entry)
         state.performance_metrics["trade_count"] += 1
+        state_journal.record_trade(trade.symbol, pos, state.cash, trade_entry, state.performance_metrics)
         return {"position": pos, "trade": trade_entry, "cash": state.cash}
 
+RECENT_TRADES_LIMIT = 50
+
 @app.get("/performance-metrics")
+@runs_in_engine
 def get_performance_metrics(current_user: UserInDB = Depends(get_current_active_user)):
     """Get performance metrics including real trading data"""
     with state.lock:
-        base_metrics = {"performance_metrics": state.performance_metrics}
-        
-        # Add real trading history
-        trade_history = real_trading_bot.get_trade_history(current_user.email)
-        base_metrics["real_trades"] = trade_history
-        
-        return base_metrics
+        base_metrics = {"performance_metrics": dict(state.performance_metrics)}
+    
+    # Lot-matched PnL marked at the latest tick of each position's exchange, and realized PnL per UTC day
+    base_metrics["pnl"] = accounting.summary(current_user.email, candle_sources.last_price)
+    base_metrics["daily_pnl"] = accounting.daily(current_user.email)
+    base_metrics["paper_pnl"] = accounting.summary(PAPER_USER, candle_sources.last_price)
+    
+    # Most recent real trades only; the full history is paged via /trade-history
+    recent, next_cursor = trade_store.page(current_user.email, limit=RECENT_TRADES_LIMIT)
+    base_metrics["real_trades"] = recent
+    base_metrics["real_trade_count"] = trade_store.count(current_user.email)
+    base_metrics["real_trades_next_cursor"] = next_cursor
+    return base_metrics
+
+@app.get("/trade-history")
+@runs_in_engine
+def get_trade_history(cursor: int = None, limit: int = 100, symbol: str = None, side: str = None,
+                      start: str = None, end: str = None, order: str = "desc",
+                      current_user: UserInDB = Depends(get_current_active_user)):
+    """Page through the user's real trades, newest first by default; pass next_cursor back as cursor"""
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be 'asc' or 'desc'")
+    try:
+        trades, next_cursor = trade_store.page(current_user.email, cursor, limit, symbol and symbol.upper(),
+                                               side, start, end, descending=order == "desc")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {e}")
+    return {"trades": trades, "next_cursor": next_cursor}
+
+@app.get("/trade-history/export")
+def export_trade_history(symbol: str = None, side: str = None, start: str = None, end: str = None,
+                         current_user: UserInDB = Depends(get_current_active_user)):
+    """Stream every matching trade as NDJSON, oldest first"""
+    try:
+        # Validate the dates before the response starts streaming
+        for value in (start, end):
+            if value:
+                parse_trade_time(value)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {e}")
+    filters = dict(symbol=symbol and symbol.upper(), side=side, start=start, end=end)
+    if engine_client is None:
+        stream = trade_store.export_ndjson(current_user.email, **filters)
+    else:
+        stream = _export_from_engine(current_user.email, filters)
+    return StreamingResponse(stream, media_type="application/x-ndjson",
+                             headers={"Content-Disposition": 'attachment; filename="trades.ndjson"'})
+
+@runs_in_engine
+def export_trade_history_page(user_email: str, filters: Dict[str, Any], cursor: int = None):
+    """One NDJSON page of an export and the cursor of the next; the engine owns the trade log"""
+    trades, next_cursor = trade_store.page(user_email, cursor, MAX_PAGE_SIZE, descending=False, **filters)
+    return "".join(json.dumps(trade, separators=(",", ":")) + "\n" for trade in trades).encode(), next_cursor
+
+def _export_from_engine(user_email: str, filters: Dict[str, Any]):
+    cursor = None
+    while True:
+        chunk, cursor = export_trade_history_page(user_email=user_email, filters=filters, cursor=cursor)
+        if chunk:
+            yield chunk
+        if cursor is None:
+            return
 
 @app.post("/strategy-config")
 def update_strategy_config(config: Dict[str, Any] = Body(...)):
     with state.lock:
         state.strategy_config.update(config)
+        state_journal.record_field("strategy_config", state.strategy_config)
     return {"status": "updated", "strategy_config": state.strategy_config}
 
 # Strategy Management Endpoints
 @app.get("/saved-strategies")
-def get_saved_strategies(current_user: UserInDB = Depends(get_current_active_user)):
+def get_saved_strategies(request: Request, current_user: UserInDB = Depends(get_current_active_user)):
     """Get all saved strategies for the current user"""
-    strategies = user_data_manager.get_user_strategies(current_user.email)
-    return {"strategies": strategies}
+    return response_cache.respond(
+        request, f"saved-strategies:{current_user.email}",
+        lambda: {"strategies": user_data_manager.get_user_strategies(current_user.email)},
+        version=user_data_manager.get_user_data_version(current_user.email), private=True)
 
 @app.post("/save-strategy")
 def save_strategy(request: StrategySaveRequest, current_user: UserInDB = Depends(get_current_active_user)):
@@ -416,6 +519,7 @@ def load_strategy(request: StrategyLoadRequest, current_user: UserInDB = Depends
     with state.lock:
         # Apply the strategy configuration
         state.strategy_config.update(strategy["config"])
+        state_journal.record_field("strategy_config", state.strategy_config)
         # Note: bot_controls would need to be handled in the frontend
         # since they're not stored in the backend state
     
@@ -453,13 +557,54 @@ def save_custom_strategy(strategy: Dict[str, Any] = Body(...), current_user: Use
         strategy['createdAt'] = now
     strategy['updatedAt'] = now
     
-    user_data_manager.save_user_custom_strategy(current_user.email, strategy)
+    # Strategies with executable rules are validated and compiled once, here
+    compiled = None
+    if 'rules' in strategy:
+        try:
+            compiled = compile_strategy(dict(strategy, owner=current_user.email))
+        except StrategyValidationError as e:
+            raise HTTPException(status_code=400, detail={"message": "Invalid strategy rules", "errors": e.errors})
+    
+    # The stored strategy decides the version, so every save is a new one whatever the client sent
+    strategy = user_data_manager.save_user_custom_strategy(current_user.email, strategy)
+    if compiled is not None:
+        compiled.version = strategy['version']
+        compiled_strategy_cache.put(compiled)
     return {"status": "saved", "strategy": strategy}
 
+@app.post("/activate-custom-strategy/{strategy_id}")
+def activate_custom_strategy(strategy_id: str, current_user: UserInDB = Depends(get_current_active_user)):
+    """Make a compiled custom strategy the active strategy of the trading loop"""
+    strategies = user_data_manager.get_user_custom_strategies(current_user.email)
+    # Saves append, so the last entry with this id is the newest version
+    strategy = next((s for s in reversed(strategies) if s.get('id') == strategy_id), None)
+    if strategy is None:
+        raise HTTPException(status_code=404, detail="Custom strategy not found")
+    if 'rules' not in strategy:
+        raise HTTPException(status_code=400, detail="Strategy has no executable rules")
+    
+    try:
+        compiled_strategy_cache.get_or_compile(dict(strategy, owner=current_user.email))
+    except StrategyValidationError as e:
+        raise HTTPException(status_code=400, detail={"message": "Invalid strategy rules", "errors": e.errors})
+    
+    with state.lock:
+        state.strategy_config["active_strategy"] = "custom"
+        state.strategy_config["custom_strategy"] = {
+            "owner": current_user.email,
+            "id": strategy["id"],
+            "version": strategy.get("version"),
+            "parameters": strategy.get("parameters", []),
+            "rules": strategy["rules"]
+        }
+        state_journal.record_field("strategy_config", state.strategy_config)
+    return {"status": "activated", "strategy_id": strategy_id, "version": strategy.get("version")}
+
 @app.delete("/custom-strategy/{strategy_id}")
 def delete_custom_strategy(strategy_id: str, current_user: UserInDB = Depends(get_current_active_user)):
     """Delete a custom strategy for the current user"""
     user_data_manager.delete_user_custom_strategy(current_user.email, strategy_id)
+    compiled_strategy_cache.invalidate(current_user.email, strategy_id)
     return {"status": "deleted", "strategy_id": strategy_id}
 
 # Risk Management Endpoints
@@ -468,6 +613,7 @@ def update_risk_management_config(config: RiskManagementConfig):
     """Update risk management configuration"""
     with state.lock:
         state.strategy_config["risk_management"] = config.dict()
+        state_journal.record_field("strategy_config", state.strategy_config)
     return {"status": "updated", "risk_management": config.dict()}
 
 @app.get("/risk-management-config")
@@ -483,6 +629,7 @@ def update_signal_confirmation_config(config: SignalConfirmationConfig):
     """Update signal confirmation configuration"""
     with state.lock:
         state.strategy_config["signal_confirmation"] = config.dict()
+        state_journal.record_field("strategy_config", state.strategy_config)
     return {"status": "updated", "signal_confirmation": config.dict()}
 
 @app.get("/signal-confirmation-config")
@@ -492,12 +639,19 @@ def get_signal_confirmation_config():
         signal_config = state.strategy_config.get("signal_confirmation", {})
         return {"signal_confirmation": signal_config}
 
+@app.get("/signal-pipeline-stats")
+@runs_in_engine
+def get_signal_pipeline_stats():
+    """Per-stage timing and reject counts for the signal confirmation pipeline"""
+    return {"stages": pipeline_stats.get_stats()}
+
 # Custom Exit Conditions Endpoints
 @app.post("/custom-exit-config")
 def update_custom_exit_config(config: CustomExitConfig):
     """Update custom exit conditions configuration"""
     with state.lock:
         state.strategy_config["custom_exit"] = config.dict()
+        state_journal.record_field("strategy_config", state.strategy_config)
     return {"status": "updated", "custom_exit": config.dict()}
 
 @app.get("/custom-exit-config")
@@ -507,6 +661,15 @@ def get_custom_exit_config():
         exit_config = state.strategy_config.get("custom_exit", {})
         return {"custom_exit": exit_config}
 
+@app.get("/exit-monitor")
+@runs_in_engine
+def get_exit_monitor():
+    """Armed exits for the mock positions and trigger counts per symbol"""
+    with state.lock:
+        symbols = [symbol for symbol, position in state.positions.items() if position["qty"] > 0]
+    return {"positions": {symbol: position_exits.get(symbol) for symbol in symbols},
+            "stats": position_exits.get_stats()}
+
 # Backtest Endpoints
 @app.post("/run-backtest")
 def run_backtest(config: BacktestConfig):
@@ -558,28 +721,20 @@ def run_backtest(config: BacktestConfig):
         return {"error": f"Backtest failed: {str(e)}"}
 
 # Strategy Template Endpoints
-TEMPLATES_FILE = "strategy_templates.json"
-
 def load_strategy_templates():
-    """Load strategy templates from file"""
-    if os.path.exists(TEMPLATES_FILE):
-        try:
-            with open(TEMPLATES_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
+    """Load strategy templates from storage"""
+    return get_storage().get_document("strategy_templates", {})
 
 def save_strategy_templates_to_file(templates):
-    """Save strategy templates to file"""
-    with open(TEMPLATES_FILE, 'w') as f:
-        json.dump(templates, f, indent=2)
+    """Save strategy templates to storage"""
+    get_storage().put_document("strategy_templates", templates)
+    response_cache.invalidate("strategy-templates")
 
 @app.get("/strategy-templates")
-def get_strategy_templates():
+def get_strategy_templates(request: Request):
     """Get all strategy templates"""
-    templates = load_strategy_templates()
-    return {"templates": templates}
+    return response_cache.respond(request, "strategy-templates", lambda: {"templates": load_strategy_templates()},
+                                  version=get_storage().document_version("strategy_templates"))
 
 @app.post("/save-strategy-template")
 def save_strategy_template(template: StrategyTemplate):
@@ -615,6 +770,7 @@ def load_strategy_template(name: str):
             state.strategy_config["signal_confirmation"] = template["signal_confirmation"]
         if "custom_exit" in template:
             state.strategy_config["custom_exit"] = template["custom_exit"]
+        state_journal.record_field("strategy_config", state.strategy_config)
     
     return {"status": "loaded", "template": template}
 
@@ -682,6 +838,7 @@ def update_comprehensive_strategy_config(
         # Store strategy notes
         if strategy_notes:
             state.strategy_config["strategy_notes"] = strategy_notes
+        state_journal.record_field("strategy_config", state.strategy_config)
     
     return {
         "status": "updated",
@@ -700,9 +857,8 @@ def get_comprehensive_strategy_config():
             "strategy_notes": state.strategy_config.get("strategy_notes", "")
         }
 
-@app.get("/strategy-info")
-def get_strategy_info():
-    """Get information about available strategies and their descriptions"""
+def build_strategy_info():
+    """Descriptions of the built-in strategies; static, so served from the response cache"""
     strategy_info = {
         "rsi": {
             "name": "RSI Strategy",
@@ -745,20 +901,73 @@ def get_strategy_info():
     
     return {"strategy_info": strategy_info}
 
+@app.get("/strategy-info")
+def get_strategy_info(request: Request):
+    """Get information about available strategies and their descriptions"""
+    return response_cache.respond(request, "strategy-info", build_strategy_info)
+
+def sync_real_trading_bot(is_leader: bool):
+    """Run the real bot only on the trading leader, for the user recorded in the shared state"""
+    with state.lock:
+        running = state.running
+        user_email = state.real_bot_user if running else None
+    if is_leader and running:
+        start_trading_loop()
+    if is_leader and user_email and not real_trading_bot.running:
+        real_trading_bot.start_trading(user_email)
+    elif real_trading_bot.running and (not is_leader or not user_email):
+        real_trading_bot.stop_trading()
+
 @app.on_event("startup")
 def on_startup():
-    start_trading_loop()
+    global engine_client
+    try:
+        # ENGINE_PROCESS=1 moves the trading loops out of the API process
+        with startup_profile.step("engine_process"):
+            engine_client = start_engine_process(state)
+        if engine_client is not None:
+            return
+        # SHARED_STATE_PATH lets several workers share positions and config; one of them trades
+        with startup_profile.step("shared_state"):
+            shared = configure_shared_state(state, on_renew=sync_real_trading_bot)
+        if shared is None:
+            # STATE_DIR restores the paper portfolio from its snapshot + WAL and keeps journaling
+            with startup_profile.step("state_journal"):
+                open_state_journal(state)
+        # The trading loop starts with the first /start-trading unless restored state is already running
+        with state.lock:
+            running = state.running
+        if running:
+            with startup_profile.step("trading_loop"):
+                start_trading_loop()
+    finally:
+        startup_profile.ready()
+        print(startup_profile.summary())
+
+@app.on_event("shutdown")
+def on_shutdown():
+    if engine_client is not None:
+        engine_client.stop()
+    execution_engine.stop()
+    state_journal.close()
 
 @app.post("/start-trading")
+@runs_in_engine
 def start_trading(current_user: UserInDB = Depends(get_current_active_user)):
     """Start real trading for the authenticated user"""
     try:
-        # Start the real trading bot for this user
-        success = real_trading_bot.start_trading(current_user.email)
+        # Start the real trading bot for this user; another worker may hold the trading lease
+        if is_trading_leader():
+            success = real_trading_bot.start_trading(current_user.email)
+        else:
+            success = bool(user_data_manager.get_user_data(current_user.email).get('connected_exchanges'))
         
         if success:
             with state.lock:
                 state.running = True
+                state.real_bot_user = current_user.email
+                state_journal.record_field("running", True)
+            start_trading_loop()
             return {
                 "status": "started", 
                 "message": "Real trading bot started",
@@ -776,6 +985,7 @@ def start_trading(current_user: UserInDB = Depends(get_current_active_user)):
         }
 
 @app.post("/stop-trading")
+@runs_in_engine
 def stop_trading(current_user: UserInDB = Depends(get_current_active_user)):
     """Stop real trading for the authenticated user"""
     try:
@@ -784,6 +994,8 @@ def stop_trading(current_user: UserInDB = Depends(get_current_active_user)):
         
         with state.lock:
             state.running = False
+            state.real_bot_user = None
+            state_journal.record_field("running", False)
         return {
             "status": "stopped", 
             "message": "Real trading bot stopped",
@@ -796,12 +1008,14 @@ def stop_trading(current_user: UserInDB = Depends(get_current_active_user)):
         }
 
 @app.get("/bot-status")
+@runs_in_engine
 def get_bot_status(current_user: UserInDB = Depends(get_current_active_user)):
     """Get current bot running status and real trading information"""
     with state.lock:
         base_status = {
             "running": state.running,
-            "bot_schedule": state.bot_schedule
+            "bot_schedule": state.bot_schedule,
+            "trading_leader": is_trading_leader()
         }
         
         # Add real trading status
@@ -810,7 +1024,14 @@ def get_bot_status(current_user: UserInDB = Depends(get_current_active_user)):
         
         return base_status
 
+@app.get("/scheduler-stats")
+@runs_in_engine
+def scheduler_stats():
+    """Tick jitter, overrun and missed-tick statistics for the trading loops"""
+    return {"schedulers": get_scheduler_stats()}
+
 @app.post("/update-bot-schedule")
+@runs_in_engine
 def update_bot_schedule(schedule: str = Body(...)):
     """Update bot schedule (24/7 or market)"""
     if schedule not in ["24/7", "market"]:
@@ -818,9 +1039,23 @@ def update_bot_schedule(schedule: str = Body(...)):
     
     with state.lock:
         state.bot_schedule = schedule
+        state_journal.record_field("bot_schedule", schedule)
+    
+    # Loops sleeping through a closed session re-check the new schedule immediately
+    wake_trading_loop()
+    real_trading_bot.wake()
     
     return {"status": "updated", "bot_schedule": state.bot_schedule}
 
+@app.get("/market-calendar")
+def market_calendar(market: str = "us_equities"):
+    """Whether a market is open now and when its next session opens/closes"""
+    try:
+        calendar = get_calendar(market)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return calendar.status(time.time())
+
 # Exchange and trading configuration endpoints
 @app.post("/set-exchange-config")
 def set_exchange_config(config: ExchangeConfig, current_user: UserInDB = Depends(get_current_active_user)):
@@ -851,19 +1086,68 @@ def get_current_price():
     else:
         return {"error": "Failed to fetch price"}
 
+@app.get("/order-book/{symbol}")
+@runs_in_engine
+def get_order_book(symbol: str, levels: int = 10, side: str = None, qty: float = None):
+    """Top of the mirrored order book, plus a fill estimate when side and qty are given"""
+    book = order_books.get(symbol.upper())
+    if book is None:
+        raise HTTPException(status_code=404, detail=f"No synchronized order book for {symbol.upper()}")
+    result = book.summary(levels)
+    result["spread_bps"] = book.spread_bps()
+    if side and qty:
+        if side not in ("buy", "sell"):
+            raise HTTPException(status_code=400, detail="side must be 'buy' or 'sell'")
+        avg_price, filled = book.vwap(side, qty)
+        result["estimate"] = {"side": side, "qty": qty, "vwap": avg_price, "filled": filled,
+                              "slippage_bps": book.slippage_bps(side, qty)}
+    return result
+
+@app.get("/candles/{symbol}")
+@runs_in_engine
+def get_candles(symbol: str, timeframe: str = "1m", limit: int = 100, include_open: bool = False,
+                source: str = PAPER_SOURCE):
+    """OHLCV bars aggregated from one price source's ticks: the paper loop's or a real exchange's"""
+    source = source.lower()
+    if source not in candle_sources.sources():
+        raise HTTPException(status_code=404, detail=f"No candles from {source}; available: "
+                                                    f"{', '.join(candle_sources.sources())}")
+    aggregator = candle_sources.get(source)
+    try:
+        bars = aggregator.candles(symbol.upper(), timeframe, limit, include_open)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"symbol": symbol.upper(), "source": source, "timeframe": aggregator.resolve(timeframe),
+            "candles": [bar.to_dict() for bar in bars]}
+
+@app.get("/watchlist")
+@runs_in_engine
+def get_watchlist_endpoint():
+    """Symbols traded by the mock trading loop, and those its last tick had to price with mock data"""
+    mock_priced = list(trading_loop.mock_priced_symbols)
+    return {"watchlist": get_watchlist(), "mock_priced": mock_priced, "mock_priced_count": len(mock_priced)}
+
+@app.post("/watchlist")
+def set_watchlist(symbols: List[str] = Body(...)):
+    """Replace the mock loop's watchlist (up to 500 pairs, priced with one request per tick)"""
+    try:
+        watchlist = normalize_watchlist(symbols)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Pairs the exchange does not list would only ever get mock prices; skipped if the list is unavailable
+    listed = set(symbol_metadata.symbols("binance", trading_loop.get_exchange_config()["is_testnet"]))
+    unknown = [symbol for symbol in watchlist if listed and symbol not in listed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Not listed on Binance: {', '.join(unknown[:20])}")
+    with state.lock:
+        state.watchlist = watchlist
+        state_journal.record_field("watchlist", watchlist)
+    return {"status": "updated", "watchlist": watchlist}
+
 @app.get("/available-pairs")
-def get_available_pairs():
+def get_available_pairs(request: Request):
     """Get list of available trading pairs on Binance"""
-    try:
-        # Common pairs for demo - in production you'd fetch this from Binance API
-        pairs = [
-            "BTCUSDT", "ETHUSDT", "BNBUSDT", "ADAUSDT", "SOLUSDT", 
-            "XRPUSDT", "DOTUSDT", "DOGEUSDT", "AVAXUSDT", "MATICUSDT",
-            "HBARUSDT", "LINKUSDT", "UNIUSDT", "ATOMUSDT", "LTCUSDT"
-        ]
-        return {"pairs": pairs}
-    except Exception as e:
-        return {"error": f"Failed to fetch pairs: {e}"}
+    return response_cache.respond(request, "available-pairs", lambda: {"pairs": AVAILABLE_PAIRS})
 
 class StockAnalysisRequest(BaseModel):
     symbol: str
@@ -890,219 +1174,54 @@ class StockAnalysis(BaseModel):
     risk_level: str
     confidence: float
     chart_data: List[Dict[str, Any]]
+    timeframe: str = "1d"
+    data_source: str = "exchange"  # "aggregated", "exchange" or "mock"
+    as_of: str = ""
     
     class Config:
         arbitrary_types_allowed = True
 
 @app.post("/ai-analysis")
+@runs_in_engine
 def get_ai_analysis(request: StockAnalysisRequest):
-    """Generate AI-powered analysis for a given stock symbol"""
-    
-    # Mock data for different stocks
-    mock_data = {
-        "BTC": {
-            "name": "Bitcoin",
-            "current_price": 58000,
-            "change_24h": 1200,
-            "change_percent": 2.1,
-            "volume": 25000000000,
-            "market_cap": 1100000000000,
-            "rsi": 65,
-            "macd": 0.8,
-            "bollinger_upper": 59500,
-            "bollinger_lower": 56500,
-            "support": 57000,
-            "resistance": 59000,
-            "trend": "bullish",
-            "volatility": "medium",
-            "recommendation": "Strong momentum with RSI at 65. Consider grid trading strategy with tight stop-loss at $57,000. MACD shows positive divergence.",
-            "strategy": "Grid Trading with 2% intervals",
-            "risk_level": "medium",
-            "confidence": 85,
-        },
-        "ETH": {
-            "name": "Ethereum",
-            "current_price": 3200,
-            "change_24h": -50,
-            "change_percent": -1.5,
-            "volume": 15000000000,
-            "market_cap": 380000000000,
-            "rsi": 45,
-            "macd": -0.2,
-            "bollinger_upper": 3300,
-            "bollinger_lower": 3100,
-            "support": 3150,
-            "resistance": 3250,
-            "trend": "neutral",
-            "volatility": "low",
-            "recommendation": "RSI at 45 indicates oversold conditions. Consider DCA strategy with accumulation at $3,150 support level.",
-            "strategy": "Dollar Cost Averaging",
-            "risk_level": "low",
-            "confidence": 72,
-        },
-        "SOL": {
-            "name": "Solana",
-            "current_price": 140,
-            "change_24h": 8,
-            "change_percent": 6.0,
-            "volume": 8000000000,
-            "market_cap": 65000000000,
-            "rsi": 78,
-            "macd": 1.2,
-            "bollinger_upper": 145,
-            "bollinger_lower": 135,
-            "support": 138,
-            "resistance": 142,
-            "trend": "bullish",
-            "volatility": "high",
-            "recommendation": "RSI at 78 indicates overbought conditions. Consider momentum strategy with trailing stops. High volatility requires careful position sizing.",
-            "strategy": "Momentum Trading with Trailing Stops",
-            "risk_level": "high",
-            "confidence": 68,
-        },
-        "ADA": {
-            "name": "Cardano",
-            "current_price": 0.45,
-            "change_24h": -0.02,
-            "change_percent": -4.3,
-            "volume": 2000000000,
-            "market_cap": 16000000000,
-            "rsi": 35,
-            "macd": -0.5,
-            "bollinger_upper": 0.48,
-            "bollinger_lower": 0.42,
-            "support": 0.43,
-            "resistance": 0.47,
-            "trend": "bearish",
-            "volatility": "medium",
-            "recommendation": "RSI at 35 shows oversold conditions. Consider breakout strategy if price breaks above $0.47 resistance. Risk-reward favorable.",
-            "strategy": "Breakout Trading",
-            "risk_level": "medium",
-            "confidence": 75,
-        },
-        "XRP": {
-            "name": "Ripple",
-            "current_price": 0.52,
-            "change_24h": 0.03,
-            "change_percent": 6.1,
-            "volume": 3000000000,
-            "market_cap": 28000000000,
-            "rsi": 70,
-            "macd": 0.3,
-            "bollinger_upper": 0.54,
-            "bollinger_lower": 0.50,
-            "support": 0.51,
-            "resistance": 0.53,
-            "trend": "bullish",
-            "volatility": "low",
-            "recommendation": "Strong uptrend with RSI at 70. Consider scalping strategy with tight profit targets. Low volatility makes it suitable for frequent trades.",
-            "strategy": "Scalping with 1% targets",
-            "risk_level": "low",
-            "confidence": 82,
-        }
-    }
-    
-    # Generate mock chart data
-    def generate_chart_data(base_price: float, trend: str, volatility: str):
-        data = []
-        price = base_price
-        for i in range(8):
-            # Add some randomness based on volatility
-            volatility_factor = {"low": 0.005, "medium": 0.015, "high": 0.03}[volatility]
-            change = random.uniform(-volatility_factor, volatility_factor) * price
-            
-            # Add trend bias
-            if trend == "bullish":
-                change += random.uniform(0, 0.01) * price
-            elif trend == "bearish":
-                change -= random.uniform(0, 0.01) * price
-                
-            price += change
-            volume = random.uniform(0.8, 1.2) * 1000000
-            
-            data.append({
-                "time": f"{9+i:02d}:00",
-                "price": round(price, 2),
-                "volume": int(volume)
-            })
-        return data
-    
-    if request.symbol in mock_data:
-        stock_data = mock_data[request.symbol]
-        chart_data = generate_chart_data(
-            stock_data["current_price"], 
-            stock_data["trend"], 
-            stock_data["volatility"]
-        )
-        
-        analysis = StockAnalysis(
-            symbol=request.symbol,
-            name=stock_data["name"],
-            current_price=stock_data["current_price"],
-            change_24h=stock_data["change_24h"],
-            change_percent=stock_data["change_percent"],
-            volume=stock_data["volume"],
-            market_cap=stock_data["market_cap"],
-            rsi=stock_data["rsi"],
-            macd=stock_data["macd"],
-            bollinger_upper=stock_data["bollinger_upper"],
-            bollinger_lower=stock_data["bollinger_lower"],
-            support=stock_data["support"],
-            resistance=stock_data["resistance"],
-            trend=stock_data["trend"],
-            volatility=stock_data["volatility"],
-            recommendation=stock_data["recommendation"],
-            strategy=stock_data["strategy"],
-            risk_level=stock_data["risk_level"],
-            confidence=stock_data["confidence"],
-            chart_data=chart_data
-        )
-        
-        return {"analysis": analysis}
-    else:
-        return {"error": f"Analysis not available for {request.symbol}"}
+    """Indicator-based analysis for a stock symbol or trading pair, served from a TTL cache"""
+    try:
+        result = analysis_cache.get(request.symbol, request.timeframe)
+    except ValueError as e:
+        return {"error": str(e)}
+    return {"analysis": StockAnalysis(**dict(result, symbol=request.symbol.upper()))}
 
 @app.get("/available-stocks")
-def get_available_stocks():
+def get_available_stocks(request: Request):
     """Get list of available stocks for analysis"""
-    return {
-        "stocks": [
-            {"symbol": "BTC", "name": "Bitcoin"},
-            {"symbol": "ETH", "name": "Ethereum"},
-            {"symbol": "SOL", "name": "Solana"},
-            {"symbol": "ADA", "name": "Cardano"},
-            {"symbol": "XRP", "name": "Ripple"},
-            {"symbol": "DOT", "name": "Polkadot"},
-            {"symbol": "LINK", "name": "Chainlink"},
-            {"symbol": "UNI", "name": "Uniswap"},
-            {"symbol": "MATIC", "name": "Polygon"},
-            {"symbol": "AVAX", "name": "Avalanche"}
-        ]
-    } 
+    return response_cache.respond(request, "available-stocks", lambda: {"stocks": AVAILABLE_STOCKS})
 
 @app.post("/ultimate-roi-strategy")
 def save_ultimate_roi_strategy(strategy: UltimateROIStrategy):
     """Save Ultimate ROI Strategy configuration"""
     try:
-        # Save to file
-        with open("ultimate_roi_strategy.json", "w") as f:
-            json.dump(strategy.dict(), f, indent=2)
+        get_storage().put_document("ultimate_roi_strategy", strategy.dict())
+        response_cache.invalidate("ultimate-roi-strategy")
         
         return {"message": "Ultimate ROI Strategy saved successfully", "strategy": strategy.dict()}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save strategy: {str(e)}")
 
+def load_ultimate_roi_strategy():
+    """Saved Ultimate ROI Strategy, or the defaults if none was saved"""
+    saved = get_storage().get_document("ultimate_roi_strategy")
+    if saved is not None:
+        return saved
+    # Return default strategy
+    default_strategy = UltimateROIStrategy()
+    return default_strategy.dict()
+
 @app.get("/ultimate-roi-strategy")
-def get_ultimate_roi_strategy():
+def get_ultimate_roi_strategy(request: Request):
     """Get Ultimate ROI Strategy configuration"""
     try:
-        if os.path.exists("ultimate_roi_strategy.json"):
-            with open("ultimate_roi_strategy.json", "r") as f:
-                return json.load(f)
-        else:
-            # Return default strategy
-            default_strategy = UltimateROIStrategy()
-            return default_strategy.dict()
+        return response_cache.respond(request, "ultimate-roi-strategy", load_ultimate_roi_strategy,
+                                      version=get_storage().document_version("ultimate_roi_strategy"))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to load strategy: {str(e)}")
 
@@ -1164,57 +1283,42 @@ def allocate_capital():
         raise HTTPException(status_code=500, detail=f"Failed to allocate capital: {str(e)}")
 
 @app.get("/portfolio-status")
+@runs_in_engine
 def get_portfolio_status():
-    """Get current portfolio status and allocations"""
+    """Get current portfolio status and allocations, marked at the latest prices"""
     try:
-        # Simulate portfolio data
-        portfolio = {
-            "total_value": 15000.0,
-            "daily_pnl": 320.0,
-            "daily_return": 2.13,
-            "max_drawdown": 3.2,
-            "risk_score": 45,
-            "active_positions": 4,
-            "allocations": [
-                {
-                    "asset": "BTCUSDT",
-                    "allocation": 40.0,
-                    "current_value": 6000.0,
-                    "pnl": 150.0,
-                    "leverage": 3.2,
-                    "status": "active"
-                },
-                {
-                    "asset": "ETHUSDT",
-                    "allocation": 30.0,
-                    "current_value": 4500.0,
-                    "pnl": 90.0,
-                    "leverage": 2.8,
-                    "status": "active"
-                },
-                {
-                    "asset": "ADAUSDT",
-                    "allocation": 20.0,
-                    "current_value": 3000.0,
-                    "pnl": 60.0,
-                    "leverage": 3.5,
-                    "status": "active"
-                },
-                {
-                    "asset": "DOTUSDT",
-                    "allocation": 10.0,
-                    "current_value": 1500.0,
-                    "pnl": 20.0,
-                    "leverage": 2.0,
-                    "status": "active"
-                }
-            ],
+        valuation = portfolio_valuation.account(PAPER_USER)
+        total_value = valuation["total_value"]
+        daily_pnl = accounting.realized_today(PAPER_USER) + valuation["unrealized_pnl"]
+        opening_value = total_value - daily_pnl
+        exposure_pct = valuation["notional_exposure"] / total_value * 100 if total_value > 0 else 0.0
+        allocations = [
+            {
+                "asset": position["symbol"],
+                "allocation": round(position["allocation"], 2),
+                "current_value": position["market_value"],
+                "pnl": position["unrealized_pnl"],
+                "leverage": position["leverage"],
+                "status": "active"
+            }
+            for position in sorted(valuation["positions"], key=lambda p: -p["market_value"])
+        ]
+        return {
+            "total_value": total_value,
+            "cash": valuation["cash"],
+            "daily_pnl": daily_pnl,
+            "daily_return": daily_pnl / opening_value * 100 if opening_value > 0 else 0.0,
+            "unrealized_pnl": valuation["unrealized_pnl"],
+            "notional_exposure": valuation["notional_exposure"],
+            "max_drawdown": valuation["max_drawdown"],
+            "risk_score": round(min(100.0, exposure_pct)),
+            "active_positions": len(allocations),
+            "allocations": allocations,
+            "priced_at": valuation["priced_at"],
             "compounding_enabled": True,
             "last_reallocation": "2024-01-15T14:30:00Z",
             "next_reallocation": "2024-01-15T14:45:00Z"
         }
-        
-        return portfolio
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get portfolio status: {str(e)}")
 
@@ -1441,16 +1545,174 @@ def place_exchange_order(exchange_name: str, order: Order, current_user: UserInD
         }
     except HTTPException:
         raise
+    except OrderValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to place order: {str(e)}")
 
 @app.get("/supported-exchanges")
-def get_supported_exchanges():
+def get_supported_exchanges(request: Request):
     """Get list of supported exchanges"""
-    return {
+    return response_cache.respond(request, "supported-exchanges", lambda: {
         "status": "success",
         "supported_exchanges": ExchangeConnectorFactory.get_supported_exchanges()
-    }
+    })
+
+@app.get("/exchange-symbols/{exchange_name}/{symbol}")
+def get_exchange_symbol(exchange_name: str, symbol: str, sandbox: bool = False):
+    """Cached lot size, tick size and minimum notional for one exchange symbol"""
+    if exchange_name.lower() not in ExchangeConnectorFactory.get_supported_exchanges():
+        raise HTTPException(status_code=404, detail=f"Exchange {exchange_name} not supported")
+    info = symbol_metadata.get(exchange_name.lower(), symbol.upper(), sandbox)
+    if info is None:
+        raise HTTPException(status_code=404, detail=f"No metadata for {symbol} on {exchange_name}")
+    return info.to_dict()
+
+@app.get("/order-router")
+@runs_in_engine
+def get_order_router_stats():
+    """Cached venue quotes, fee schedule and quote collection timings of the smart order router"""
+    return {"fees": order_router.fees, "stats": order_router.get_stats()}
+
+# Historical kline endpoints
+class KlineDownloadRequest(BaseModel):
+    exchange: str = "binance"
+    symbols: List[str]
+    timeframes: List[str] = ["1m"]
+    start: str  # ISO date/time or epoch seconds, UTC
+    end: Optional[str] = None  # default now
+
+@app.post("/klines/download")
+def start_kline_download(request: KlineDownloadRequest, current_user: UserInDB = Depends(get_current_active_user)):
+    """Download history into the price store in the background; rerunning resumes or skips what is stored"""
+    try:
+        start = int(parse_trade_time(request.start))
+        end = int(parse_trade_time(request.end)) if request.end else int(time.time())
+        return get_kline_downloader().start(request.exchange.lower(), [s.upper() for s in request.symbols],
+                                            request.timeframes, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/klines/downloads")
+def list_kline_downloads(current_user: UserInDB = Depends(get_current_active_user)):
+    """Download jobs of this process and the series held in the price store"""
+    downloader = get_kline_downloader()
+    return {"jobs": downloader.jobs(), "coverage": downloader.store.coverage()}
+
+@app.get("/klines/downloads/{job_id}")
+def get_kline_download(job_id: str, current_user: UserInDB = Depends(get_current_active_user)):
+    job = get_kline_downloader().job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Download {job_id} not found")
+    return job
+
+@app.delete("/klines/downloads/{job_id}")
+def cancel_kline_download(job_id: str, current_user: UserInDB = Depends(get_current_active_user)):
+    """Stop a download after its in-flight pages; progress so far is kept"""
+    if not get_kline_downloader().cancel(job_id):
+        raise HTTPException(status_code=404, detail=f"No running download {job_id}")
+    return get_kline_downloader().job(job_id)
+
+@app.get("/klines/{exchange}/{symbol}")
+def get_stored_klines(exchange: str, symbol: str, timeframe: str = "1m", start: str = None, end: str = None,
+                      limit: int = 1000):
+    """Stored historical bars, oldest first"""
+    try:
+        label, _ = timeframe_label(timeframe)
+        bars = get_kline_downloader().store.klines(
+            exchange.lower(), symbol.upper(), label, int(parse_trade_time(start)) if start else None,
+            int(parse_trade_time(end)) if end else None, min(max(1, limit), 10000))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"exchange": exchange.lower(), "symbol": symbol.upper(), "timeframe": label,
+            "candles": [{"open_time": t, "open": o, "high": h, "low": l, "close": c, "volume": v}
+                        for t, o, h, l, c, v in bars]}
+
+# Execution algorithm endpoints
+class ExecutionOrderRequest(BaseModel):
+    exchange: str  # a connected exchange, or "simulated" for a dry run against the latest prices
+    symbol: str
+    side: str
+    qty: float
+    algo: str = "twap"
+    arrival_price: Optional[float] = None
+    duration: float = 300  # twap/vwap: seconds to spread the order over
+    slices: int = 0  # twap/vwap: child orders; 0 derives them from interval
+    interval: float = 30  # seconds between children (iceberg: between refill checks)
+    profile: Optional[List[float]] = None  # vwap: expected volume per slice
+    display_qty: Optional[float] = None  # iceberg: size shown at a time
+    limit_price: Optional[float] = None  # iceberg: limit for each slice, default the arrival price
+
+simulated_exchange = SimulatedExchange(candle_aggregator.last_price)
+
+def record_execution_fill(parent, qty: float, price: float):
+    """Book child fills on real exchanges like the trading bot's own fills"""
+    if parent.exchange == SimulatedExchange.exchange_name:
+        return
+    fill = accounting.record_fill(parent.owner, parent.exchange, parent.symbol, parent.side, qty, price)
+    risk_ledgers.get(parent.owner).on_fill(parent.exchange, parent.symbol, parent.side, qty, price,
+                                           realized=fill["realized_pnl"])
+    portfolio_valuation.set_position(parent.owner, parent.exchange, parent.symbol,
+                                     fill["position_qty"], fill["avg_price"])
+
+execution_engine.on_fill = record_execution_fill
+
+@app.post("/execution-orders")
+@runs_in_engine
+def submit_execution_order(request: ExecutionOrderRequest, current_user: UserInDB = Depends(get_current_active_user)):
+    """Work a large order as TWAP, VWAP or iceberg child orders"""
+    exchange_name, symbol = request.exchange.lower(), request.symbol.upper()
+    if exchange_name == SimulatedExchange.exchange_name:
+        connector = simulated_exchange
+        arrival_price = request.arrival_price or connector.price(symbol)
+    else:
+        user_exchanges = user_data_manager.get_user_exchanges(current_user.email)
+        if exchange_name not in user_exchanges:
+            raise HTTPException(status_code=404, detail=f"Exchange {request.exchange} not found")
+        credentials = ExchangeCredentials(**user_exchanges[exchange_name]["credentials"])
+        connector = ExchangeConnectorFactory.create_connector(exchange_name, credentials)
+        arrival_price = request.arrival_price
+        if arrival_price is None:
+            try:
+                arrival_price = next((t.price for t in connector.get_tickers([symbol]) if t.symbol == symbol), None)
+            except Exception as e:
+                raise HTTPException(status_code=502, detail=f"Failed to get arrival price: {str(e)}")
+    if not arrival_price:
+        raise HTTPException(status_code=400, detail=f"No price available for {symbol}; pass arrival_price")
+    params = request.dict(exclude={"exchange", "symbol", "side", "qty", "algo", "arrival_price"}, exclude_none=True)
+    try:
+        parent = execution_engine.submit(connector, symbol, request.side.lower(), request.qty, request.algo,
+                                         arrival_price, owner=current_user.email, **params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    execution_engine.start()
+    return parent.to_dict()
+
+@app.get("/execution-orders")
+@runs_in_engine
+def list_execution_orders(current_user: UserInDB = Depends(get_current_active_user)):
+    """Progress of the current user's parent orders"""
+    return {"orders": execution_engine.orders(current_user.email), "stats": execution_engine.get_stats()}
+
+@app.get("/execution-orders/{order_id}")
+@runs_in_engine
+def get_execution_order(order_id: str, current_user: UserInDB = Depends(get_current_active_user)):
+    """One parent order with its child orders"""
+    parent = execution_engine.get(order_id)
+    if parent is None or parent.owner != current_user.email:
+        raise HTTPException(status_code=404, detail=f"Execution order {order_id} not found")
+    return parent.to_dict()
+
+@app.delete("/execution-orders/{order_id}")
+@runs_in_engine
+def cancel_execution_order(order_id: str, current_user: UserInDB = Depends(get_current_active_user)):
+    """Stop sending child orders for a parent order"""
+    parent = execution_engine.get(order_id)
+    if parent is None or parent.owner != current_user.email:
+        raise HTTPException(status_code=404, detail=f"Execution order {order_id} not found")
+    if not execution_engine.cancel(order_id):
+        raise HTTPException(status_code=409, detail=f"Execution order {order_id} is already {parent.status}")
+    return parent.to_dict(children=False)
 
 @app.delete("/remove-exchange/{exchange_name}")
 def remove_exchange(exchange_name: str, current_user: UserInDB = Depends(get_current_active_user)):
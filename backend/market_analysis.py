@@ -0,0 +1,327 @@
+import datetime
+import math
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import requests
+
+from candles import candle_sources
+from scheduler import parse_timeframe
+from strategy_compiler import compute_indicator
+
+# Public market data comes from mainnet; the testnet only lists a handful of pairs
+BINANCE_KLINES_URL = "https://api.binance.com/api/v3/klines"
+# Aggregated bars are only used when they come from the venue the klines fallback reads
+ANALYSIS_SOURCE = "binance"
+KLINE_LIMIT = 200
+MIN_BARS = 60  # enough for MACD(12, 26, 9) plus a pivot window on each side
+PIVOT_WINDOW = 3
+CHART_POINTS = 24
+QUOTE_ASSET = "USDT"
+
+AVAILABLE_STOCKS = [
+    {"symbol": "BTC", "name": "Bitcoin"},
+    {"symbol": "ETH", "name": "Ethereum"},
+    {"symbol": "SOL", "name": "Solana"},
+    {"symbol": "ADA", "name": "Cardano"},
+    {"symbol": "XRP", "name": "Ripple"},
+    {"symbol": "DOT", "name": "Polkadot"},
+    {"symbol": "LINK", "name": "Chainlink"},
+    {"symbol": "UNI", "name": "Uniswap"},
+    {"symbol": "MATIC", "name": "Polygon"},
+    {"symbol": "AVAX", "name": "Avalanche"}
+]
+
+# Common pairs for demo - in production you'd fetch this from Binance API
+AVAILABLE_PAIRS = [
+    "BTCUSDT", "ETHUSDT", "BNBUSDT", "ADAUSDT", "SOLUSDT",
+    "XRPUSDT", "DOTUSDT", "DOGEUSDT", "AVAXUSDT", "MATICUSDT",
+    "HBARUSDT", "LINKUSDT", "UNIUSDT", "ATOMUSDT", "LTCUSDT"
+]
+
+_ASSET_NAMES = {stock["symbol"]: stock["name"] for stock in AVAILABLE_STOCKS}
+
+# Binance kline intervals by length in seconds
+_KLINE_INTERVALS = {
+    60: "1m", 180: "3m", 300: "5m", 900: "15m", 1800: "30m", 3600: "1h", 7200: "2h",
+    14400: "4h", 21600: "6h", 28800: "8h", 43200: "12h", 86400: "1d", 259200: "3d", 604800: "1w",
+}
+
+
+def resolve_symbol(symbol: str) -> Tuple[str, str]:
+    """(trading pair, display name) for a stock symbol like "BTC" or a pair like "BTCUSDT"""
+    symbol = symbol.upper()
+    base = symbol[:-len(QUOTE_ASSET)] if symbol.endswith(QUOTE_ASSET) else symbol
+    pair = base + QUOTE_ASSET
+    if base not in _ASSET_NAMES and pair not in AVAILABLE_PAIRS:
+        raise ValueError(f"Analysis not available for {symbol}")
+    return pair, _ASSET_NAMES.get(base, base)
+
+
+def resolve_interval(timeframe: str) -> Tuple[str, int]:
+    """Kline interval label and seconds for a timeframe such as "1D", "4h" or "15min"""
+    seconds = parse_timeframe(timeframe)
+    if seconds not in _KLINE_INTERVALS:
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
+    return _KLINE_INTERVALS[seconds], seconds
+
+
+def fetch_binance_klines(pair: str, interval: str, limit: int = KLINE_LIMIT) -> Dict[str, np.ndarray]:
+    """OHLCV arrays from the public klines endpoint"""
+    response = requests.get(BINANCE_KLINES_URL, params={"symbol": pair, "interval": interval, "limit": limit},
+                            timeout=10)
+    response.raise_for_status()
+    rows = response.json()
+    return {
+        "time": np.array([row[0] / 1000 for row in rows]),
+        "open": np.array([float(row[1]) for row in rows]),
+        "high": np.array([float(row[2]) for row in rows]),
+        "low": np.array([float(row[3]) for row in rows]),
+        "close": np.array([float(row[4]) for row in rows]),
+        "volume": np.array([float(row[5]) for row in rows]),
+    }
+
+
+def aggregated_candles(pair: str, interval: str) -> Optional[Dict[str, np.ndarray]]:
+    """Bars the real trading bot already built for `pair` from Binance ticks, if there are enough of them"""
+    try:
+        bars = candle_sources.get(ANALYSIS_SOURCE).candles(pair, interval)
+    except ValueError:
+        return None
+    if len(bars) < MIN_BARS:
+        return None
+    return {
+        "time": np.array([b.open_time for b in bars]),
+        "open": np.array([b.open for b in bars]),
+        "high": np.array([b.high for b in bars]),
+        "low": np.array([b.low for b in bars]),
+        "close": np.array([b.close for b in bars]),
+        "volume": np.array([b.volume for b in bars]),
+    }
+
+
+def mock_candles(pair: str, seconds: int, n: int = KLINE_LIMIT) -> Dict[str, np.ndarray]:
+    """Seeded random walk used when no market data is reachable, so the dashboard still renders"""
+    rng = random.Random(pair)
+    price = rng.uniform(1, 1000)
+    end = time.time() - time.time() % seconds
+    closes, highs, lows, volumes = [], [], [], []
+    for _ in range(n):
+        price *= 1 + rng.gauss(0, 0.01)
+        closes.append(price)
+        highs.append(price * (1 + abs(rng.gauss(0, 0.004))))
+        lows.append(price * (1 - abs(rng.gauss(0, 0.004))))
+        volumes.append(rng.uniform(0.8, 1.2) * 1000000)
+    close = np.array(closes)
+    return {
+        "time": end - seconds * np.arange(n - 1, -1, -1),
+        "open": np.concatenate(([close[0]], close[:-1])),
+        "high": np.array(highs), "low": np.array(lows), "close": close, "volume": np.array(volumes),
+    }
+
+
+def find_pivots(highs: np.ndarray, lows: np.ndarray, window: int = PIVOT_WINDOW) -> Tuple[np.ndarray, np.ndarray]:
+    """Swing highs and lows: bars that are the extreme of `window` bars on each side"""
+    size = 2 * window + 1
+    if len(highs) < size:
+        return np.array([]), np.array([])
+    high_windows = np.lib.stride_tricks.sliding_window_view(highs, size)
+    low_windows = np.lib.stride_tricks.sliding_window_view(lows, size)
+    centre_highs = highs[window:len(highs) - window]
+    centre_lows = lows[window:len(lows) - window]
+    return (centre_highs[centre_highs == high_windows.max(axis=1)],
+            centre_lows[centre_lows == low_windows.min(axis=1)])
+
+
+def support_resistance(candles: Dict[str, np.ndarray], price: float) -> Tuple[float, float]:
+    """Nearest pivot low below and pivot high above the price, falling back to the range extremes"""
+    pivot_highs, pivot_lows = find_pivots(candles["high"], candles["low"])
+    below = pivot_lows[pivot_lows < price]
+    above = pivot_highs[pivot_highs > price]
+    support = float(below.max()) if len(below) else float(candles["low"].min())
+    resistance = float(above.min()) if len(above) else float(candles["high"].max())
+    return support, resistance
+
+
+def _last(values: np.ndarray, default: float = 0.0) -> float:
+    value = float(values[-1]) if len(values) else default
+    return default if math.isnan(value) else value
+
+
+def analyze_candles(pair: str, name: str, candles: Dict[str, np.ndarray], seconds: int) -> Dict[str, Any]:
+    """Indicators, levels, trend, volatility and a rule-based recommendation from OHLCV bars"""
+    close = candles["close"]
+    price = float(close[-1])
+    bars_per_day = max(1, 86400 // seconds)
+    previous = float(close[-1 - bars_per_day]) if len(close) > bars_per_day else float(close[0])
+
+    rsi = _last(compute_indicator("rsi", close, period=14), 50.0)
+    macd = _last(compute_indicator("macd", close, line="macd"))
+    macd_histogram = _last(compute_indicator("macd", close, line="histogram"))
+    bollinger_upper = _last(compute_indicator("bollinger", close, period=20, band="upper"), price)
+    bollinger_lower = _last(compute_indicator("bollinger", close, period=20, band="lower"), price)
+    ema_fast = _last(compute_indicator("ema", close, period=20), price)
+    ema_slow = _last(compute_indicator("ema", close, period=50), price)
+    support, resistance = support_resistance(candles, price)
+
+    if price > ema_fast > ema_slow:
+        trend = "bullish"
+    elif price < ema_fast < ema_slow:
+        trend = "bearish"
+    else:
+        trend = "neutral"
+
+    # Daily-equivalent volatility of log returns over the last 50 bars
+    returns = np.diff(np.log(close[-51:]))
+    daily_vol = float(returns.std() * math.sqrt(bars_per_day)) if len(returns) > 1 else 0.0
+    volatility = "low" if daily_vol < 0.02 else "medium" if daily_vol < 0.05 else "high"
+
+    recommendation, strategy, confidence = _recommend(
+        price, rsi, macd_histogram, trend, volatility, support, resistance)
+    chart_data = [
+        {
+            "time": datetime.datetime.utcfromtimestamp(t).strftime("%m-%d %H:%M" if seconds < 86400 else "%Y-%m-%d"),
+            "price": round(float(p), 2 if p >= 1 else 6),
+            "volume": int(v),
+        }
+        for t, p, v in zip(candles["time"][-CHART_POINTS:], close[-CHART_POINTS:], candles["volume"][-CHART_POINTS:])
+    ]
+    return {
+        "symbol": pair,
+        "name": name,
+        "current_price": price,
+        "change_24h": price - previous,
+        "change_percent": (price - previous) / previous * 100 if previous else 0.0,
+        "volume": float(candles["volume"][-bars_per_day:].sum() * price),
+        "market_cap": 0.0,  # not derivable from exchange data
+        "rsi": round(rsi, 2),
+        "macd": macd,
+        "bollinger_upper": bollinger_upper,
+        "bollinger_lower": bollinger_lower,
+        "support": support,
+        "resistance": resistance,
+        "trend": trend,
+        "volatility": volatility,
+        "recommendation": recommendation,
+        "strategy": strategy,
+        "risk_level": volatility,
+        "confidence": confidence,
+        "chart_data": chart_data,
+    }
+
+
+def _recommend(price, rsi, macd_histogram, trend, volatility, support, resistance) -> Tuple[str, str, float]:
+    """Map the indicator readings to a strategy suggestion and a confidence score"""
+    votes = [
+        1 if trend == "bullish" else -1 if trend == "bearish" else 0,
+        1 if macd_histogram > 0 else -1 if macd_histogram < 0 else 0,
+        1 if rsi < 30 else -1 if rsi > 70 else 0,
+    ]
+    confidence = 50 + 15 * abs(sum(votes)) + (5 if volatility == "low" else 0)
+    if rsi > 70:
+        return (f"RSI at {rsi:.0f} indicates overbought conditions. Consider momentum strategy with "
+                f"trailing stops; resistance near {resistance:,.4g}.",
+                "Momentum Trading with Trailing Stops", confidence)
+    if rsi < 30:
+        return (f"RSI at {rsi:.0f} indicates oversold conditions. Consider DCA with accumulation "
+                f"near the {support:,.4g} support level.",
+                "Dollar Cost Averaging", confidence)
+    if resistance > price and (resistance - price) / price < 0.01:
+        return (f"Price is within 1% of resistance at {resistance:,.4g}. Consider breakout trading if it "
+                f"closes above that level.", "Breakout Trading", confidence)
+    if trend == "bullish":
+        return (f"Uptrend with RSI at {rsi:.0f} and MACD histogram {'positive' if macd_histogram > 0 else 'fading'}. "
+                f"Consider grid trading with a stop-loss below {support:,.4g}.",
+                "Grid Trading with 2% intervals", confidence)
+    if trend == "bearish":
+        return (f"Downtrend with RSI at {rsi:.0f}. Consider waiting for a reclaim of {resistance:,.4g} "
+                f"or scaling in with DCA.", "Dollar Cost Averaging", confidence)
+    return (f"Range-bound between {support:,.4g} and {resistance:,.4g} with RSI at {rsi:.0f}. "
+            f"Consider scalping with tight profit targets.", "Scalping with 1% targets", confidence)
+
+
+class AnalysisCache:
+    """TTL cache of analysis results keyed by (symbol, timeframe).
+
+    Fresh hits are a dictionary lookup. A stale entry is still returned while
+    one background thread recomputes it, so only the very first request for a
+    key pays for the klines fetch and indicator math.
+    """
+
+    def __init__(self, ttl: float = 60.0, fetcher: Optional[Callable[[str, str], Dict[str, np.ndarray]]] = None,
+                 clock: Callable[[], float] = time.time):
+        self.ttl = ttl
+        self.fetcher = fetcher or fetch_binance_klines
+        self._clock = clock
+        self._entries: Dict[Tuple[str, str], Tuple[float, Dict[str, Any]]] = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def get(self, symbol: str, timeframe: str = "1D") -> Dict[str, Any]:
+        """Cached analysis; raises ValueError for unknown symbols or timeframes"""
+        pair, name = resolve_symbol(symbol)
+        interval, seconds = resolve_interval(timeframe)
+        key = (pair, interval)
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None:
+            if now - entry[0] >= self.ttl:
+                self._refresh_in_background(key, name, seconds)
+            return entry[1]
+        return self._compute(key, name, seconds)
+
+    def _compute(self, key: Tuple[str, str], name: str, seconds: int) -> Dict[str, Any]:
+        pair, interval = key
+        candles = aggregated_candles(pair, interval)
+        data_source = "aggregated"
+        if candles is None:
+            try:
+                candles = self.fetcher(pair, interval)
+                data_source = "exchange"
+            except Exception as e:
+                print(f"Error fetching klines for {pair} {interval}: {e}")
+                candles = None
+            if candles is None or len(candles["close"]) < MIN_BARS:
+                candles = mock_candles(pair, seconds)
+                data_source = "mock"
+        result = analyze_candles(pair, name, candles, seconds)
+        result["timeframe"] = interval
+        result["data_source"] = data_source
+        result["as_of"] = datetime.datetime.utcnow().isoformat() + "Z"
+        with self._lock:
+            self._entries[key] = (self._clock(), result)
+        return result
+
+    def _refresh_in_background(self, key: Tuple[str, str], name: str, seconds: int):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self._compute(key, name, seconds)
+            except Exception as e:
+                print(f"Error refreshing analysis for {key}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def invalidate(self, symbol: Optional[str] = None):
+        with self._lock:
+            if symbol is None:
+                self._entries.clear()
+                return
+            pair, _ = resolve_symbol(symbol)
+            for key in [k for k in self._entries if k[0] == pair]:
+                del self._entries[key]
+
+
+# Global analysis cache used by /ai-analysis
+analysis_cache = AnalysisCache()
@@ -0,0 +1,241 @@
+import datetime
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Set, Tuple
+
+import pytz
+
+# Years of sessions built on either side of "now"; tables extend on demand past the edges
+_YEARS_BEHIND = 1
+_YEARS_AHEAD = 2
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> datetime.date:
+    """n-th (1-based) given weekday of a month, or the last one when n == -1"""
+    if n > 0:
+        first = datetime.date(year, month, 1)
+        offset = (weekday - first.weekday()) % 7
+        return first + datetime.timedelta(days=offset + 7 * (n - 1))
+    last = datetime.date(year + (month == 12), month % 12 + 1, 1) - datetime.timedelta(days=1)
+    return last - datetime.timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year: int) -> datetime.date:
+    """Gregorian Easter Sunday (anonymous Gregorian algorithm)"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return datetime.date(year, month, day + 1)
+
+
+def _observed(day: datetime.date) -> Optional[datetime.date]:
+    """NYSE observance: Saturday holidays move to Friday, Sunday holidays to Monday"""
+    if day.weekday() == 5:
+        observed = day - datetime.timedelta(days=1)
+        # NYSE does not close on Dec 31 for a Saturday New Year's Day
+        return None if (day.month, day.day) == (1, 1) else observed
+    if day.weekday() == 6:
+        return day + datetime.timedelta(days=1)
+    return day
+
+
+def us_equity_holidays(year: int) -> Set[datetime.date]:
+    """Full-day NYSE/Nasdaq closures for a year"""
+    days = [
+        _observed(datetime.date(year, 1, 1)),
+        _nth_weekday(year, 1, 0, 3),           # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),           # Washington's Birthday
+        _easter(year) - datetime.timedelta(days=2),  # Good Friday
+        _nth_weekday(year, 5, 0, -1),          # Memorial Day
+        _observed(datetime.date(year, 7, 4)),
+        _nth_weekday(year, 9, 0, 1),           # Labor Day
+        _nth_weekday(year, 11, 3, 4),          # Thanksgiving
+        _observed(datetime.date(year, 12, 25)),
+    ]
+    if year >= 2022:
+        days.append(_observed(datetime.date(year, 6, 19)))  # Juneteenth
+    # A Saturday Jan 1 of next year would have been observed on Dec 31 of this one; NYSE skips it
+    return {d for d in days if d is not None and d.year == year}
+
+
+def us_equity_early_closes(year: int, holidays: Set[datetime.date]) -> Set[datetime.date]:
+    """Days the US equity market closes at 13:00 ET"""
+    candidates = [
+        datetime.date(year, 7, 3),
+        _nth_weekday(year, 11, 3, 4) + datetime.timedelta(days=1),  # Day after Thanksgiving
+        datetime.date(year, 12, 24),
+    ]
+    return {d for d in candidates if d.weekday() < 5 and d not in holidays}
+
+
+class MarketCalendar:
+    """Precomputed trading sessions with O(log n) open/close queries.
+
+    Sessions are stored as two parallel sorted lists of UTC epoch seconds
+    (opens and closes); every query is a bisect over them.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self._opens: List[float] = []
+        self._closes: List[float] = []
+        self._years: Tuple[int, int] = (0, -1)
+        self._lock = threading.Lock()
+
+    def _build_year(self, year: int) -> List[Tuple[float, float]]:
+        raise NotImplementedError
+
+    def _ensure_covers(self, t: float):
+        year = datetime.datetime.utcfromtimestamp(t).year
+        first, last = self._years
+        if first <= year - 1 and year + 1 <= last:
+            return
+        with self._lock:
+            first, last = self._years
+            if first <= year - 1 and year + 1 <= last:
+                return
+            if first > last:
+                current = datetime.datetime.utcnow().year
+                first, last = current - _YEARS_BEHIND, current + _YEARS_AHEAD
+            first, last = min(first, year - 1), max(last, year + 1)
+            sessions = []
+            for y in range(first, last + 1):
+                sessions.extend(self._build_year(y))
+            sessions.sort()
+            # Swap both tables in one assignment so readers never see a half-built pair
+            self._opens, self._closes = [s[0] for s in sessions], [s[1] for s in sessions]
+            self._years = (first, last)
+
+    def is_open(self, t: float) -> bool:
+        """Is the market open at epoch seconds `t`?"""
+        self._ensure_covers(t)
+        opens, closes = self._opens, self._closes
+        i = bisect_right(opens, t) - 1
+        return i >= 0 and t < closes[i]
+
+    def next_open(self, t: float) -> float:
+        """`t` if the market is open, otherwise the start of the next session"""
+        self._ensure_covers(t)
+        opens, closes = self._opens, self._closes
+        i = bisect_right(opens, t) - 1
+        if i >= 0 and t < closes[i]:
+            return t
+        j = bisect_left(opens, t)
+        if j >= len(opens):
+            self._ensure_covers(t + 366 * 86400)
+            return self.next_open(t)
+        return self._opens[j]
+
+    def next_close(self, t: float) -> float:
+        """End of the session containing `t`, or of the next session if closed"""
+        self._ensure_covers(t)
+        opens, closes = self._opens, self._closes
+        i = bisect_right(closes, t)
+        if i >= len(closes):
+            self._ensure_covers(t + 366 * 86400)
+            return self.next_close(t)
+        return closes[i]
+
+    def sessions_between(self, start: float, end: float) -> List[Tuple[float, float]]:
+        """(open, close) pairs overlapping [start, end)"""
+        self._ensure_covers(start)
+        self._ensure_covers(end)
+        opens, closes = self._opens, self._closes
+        i = max(0, bisect_right(opens, start) - 1)
+        j = bisect_left(opens, end)
+        return [(opens[k], closes[k]) for k in range(i, j) if closes[k] > start]
+
+    def status(self, t: float) -> Dict:
+        """Summary used by the /market-calendar endpoint"""
+        is_open = self.is_open(t)
+        return {
+            "market": self.name,
+            "is_open": is_open,
+            "next_open": None if is_open else _iso(self.next_open(t)),
+            "next_close": _iso(self.next_close(t)),
+        }
+
+
+class USEquityCalendar(MarketCalendar):
+    """NYSE/Nasdaq regular sessions: 09:30-16:00 ET, holidays and 13:00 early closes"""
+
+    name = "us_equities"
+    timezone_name = "US/Eastern"
+
+    def _build_year(self, year: int) -> List[Tuple[float, float]]:
+        # Resolved here rather than at import: loading the zone file is a noticeable share of cold start
+        timezone = pytz.timezone(self.timezone_name)
+        holidays = us_equity_holidays(year)
+        early_closes = us_equity_early_closes(year, holidays)
+        sessions = []
+        day = datetime.date(year, 1, 1)
+        one_day = datetime.timedelta(days=1)
+        while day.year == year:
+            if day.weekday() < 5 and day not in holidays:
+                close_hour = 13 if day in early_closes else 16
+                # localize() picks the correct EST/EDT offset for each date
+                open_dt = timezone.localize(datetime.datetime(year, day.month, day.day, 9, 30))
+                close_dt = timezone.localize(datetime.datetime(year, day.month, day.day, close_hour, 0))
+                sessions.append((open_dt.timestamp(), close_dt.timestamp()))
+            day += one_day
+        return sessions
+
+
+class AlwaysOpenCalendar(MarketCalendar):
+    """24/7 markets such as crypto: a single unbounded session"""
+
+    name = "crypto"
+
+    def is_open(self, t: float) -> bool:
+        return True
+
+    def next_open(self, t: float) -> float:
+        return t
+
+    def next_close(self, t: float) -> float:
+        return float("inf")
+
+    def sessions_between(self, start: float, end: float) -> List[Tuple[float, float]]:
+        return [(start, end)]
+
+    def status(self, t: float) -> Dict:
+        return {"market": self.name, "is_open": True, "next_open": None, "next_close": None}
+
+
+def _iso(t: float) -> Optional[str]:
+    if t == float("inf"):
+        return None
+    return datetime.datetime.utcfromtimestamp(t).isoformat() + "Z"
+
+
+# Global calendars, built lazily on first query
+calendars: Dict[str, MarketCalendar] = {
+    USEquityCalendar.name: USEquityCalendar(),
+    AlwaysOpenCalendar.name: AlwaysOpenCalendar(),
+}
+
+# bot_schedule values used by the API and trading loops
+SCHEDULE_MARKETS = {
+    "24/7": AlwaysOpenCalendar.name,
+    "market": USEquityCalendar.name,
+}
+
+
+def get_calendar(market: str) -> MarketCalendar:
+    """Look up a calendar by market name"""
+    if market not in calendars:
+        raise ValueError(f"Unknown market: {market}. Available: {', '.join(calendars)}")
+    return calendars[market]
+
+
+def calendar_for_schedule(schedule: str) -> MarketCalendar:
+    """Calendar matching a bot_schedule setting ("24/7" or "market")"""
+    return calendars[SCHEDULE_MARKETS.get(schedule, AlwaysOpenCalendar.name)]
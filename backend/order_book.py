@@ -0,0 +1,362 @@
+import json
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+
+from metrics import registry as metrics_registry
+
+ORDER_BOOK_RESYNCS = metrics_registry.counter(
+    "order_book_resyncs_total", "Order book snapshots fetched because a book was new or fell out of sequence", ("symbol",))
+
+BINANCE_TESTNET_BASE_URL = "https://testnet.binance.vision"
+BINANCE_MAINNET_BASE_URL = "https://api.binance.com"
+BINANCE_TESTNET_STREAM_URL = "wss://stream.testnet.binance.vision/stream"
+BINANCE_MAINNET_STREAM_URL = "wss://stream.binance.com:9443/stream"
+
+SNAPSHOT_LIMIT = 1000
+# A failed resync waits RESYNC_BACKOFF * 2**(failures - 1) seconds, capped, before the next snapshot request
+RESYNC_BACKOFF = 0.5
+MAX_RESYNC_BACKOFF = 30.0
+# Diffs buffered per unsynced symbol; the oldest are dropped first, a later snapshot covers them
+MAX_PENDING_DIFFS = 5000
+
+
+class OrderBookGapError(Exception):
+    """A depth diff skipped update ids; the book must be rebuilt from a new snapshot"""
+
+
+class _BookSide:
+    """One side of an L2 book: price -> qty plus a sorted key list, best level first.
+
+    Bids are keyed by negated price so both sides iterate best-first in ascending order.
+    """
+
+    def __init__(self, is_bid: bool):
+        self.sign = -1.0 if is_bid else 1.0
+        self.levels: Dict[float, float] = {}
+        self.keys: List[float] = []
+
+    def set(self, price: float, qty: float):
+        key = self.sign * price
+        if qty == 0:
+            if self.levels.pop(key, None) is not None:
+                del self.keys[bisect_left(self.keys, key)]
+        else:
+            if key not in self.levels:
+                insort(self.keys, key)
+            self.levels[key] = qty
+
+    def clear(self):
+        self.levels.clear()
+        self.keys.clear()
+
+    def best(self) -> Optional[Tuple[float, float]]:
+        if not self.keys:
+            return None
+        key = self.keys[0]
+        return self.sign * key, self.levels[key]
+
+    def iter_levels(self, n: Optional[int] = None):
+        keys = self.keys if n is None else self.keys[:n]
+        for key in keys:
+            yield self.sign * key, self.levels[key]
+
+
+class OrderBook:
+    """In-memory L2 book for one symbol, built from a snapshot plus depth diffs"""
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.bids = _BookSide(is_bid=True)
+        self.asks = _BookSide(is_bid=False)
+        self.last_update_id = 0
+        self.updated_at = 0.0
+        self._lock = threading.Lock()
+
+    def apply_snapshot(self, last_update_id: int, bids: List, asks: List):
+        """Replace the book with a REST depth snapshot ([price, qty] pairs)"""
+        with self._lock:
+            self.bids.clear()
+            self.asks.clear()
+            for price, qty in bids:
+                self.bids.set(float(price), float(qty))
+            for price, qty in asks:
+                self.asks.set(float(price), float(qty))
+            self.last_update_id = last_update_id
+            self.updated_at = time.time()
+
+    def apply_diff(self, first_update_id: int, final_update_id: int, bids: List, asks: List) -> bool:
+        """Apply one depth diff; False if it predates the book, OrderBookGapError if ids were skipped"""
+        with self._lock:
+            if final_update_id <= self.last_update_id:
+                return False
+            if first_update_id > self.last_update_id + 1:
+                raise OrderBookGapError(
+                    f"{self.symbol}: expected update {self.last_update_id + 1}, got {first_update_id}")
+            for price, qty in bids:
+                self.bids.set(float(price), float(qty))
+            for price, qty in asks:
+                self.asks.set(float(price), float(qty))
+            self.last_update_id = final_update_id
+            self.updated_at = time.time()
+            return True
+
+    def best_bid(self) -> Optional[Tuple[float, float]]:
+        with self._lock:
+            return self.bids.best()
+
+    def best_ask(self) -> Optional[Tuple[float, float]]:
+        with self._lock:
+            return self.asks.best()
+
+    def mid_price(self) -> Optional[float]:
+        with self._lock:
+            return self._mid()
+
+    def _mid(self) -> Optional[float]:
+        bid, ask = self.bids.best(), self.asks.best()
+        if bid is None or ask is None:
+            return None
+        return (bid[0] + ask[0]) / 2
+
+    def spread_bps(self) -> Optional[float]:
+        with self._lock:
+            bid, ask = self.bids.best(), self.asks.best()
+            mid = self._mid()
+            if mid is None:
+                return None
+            return (ask[0] - bid[0]) / mid * 10000
+
+    def _taker_side(self, side: str) -> _BookSide:
+        """Levels a market order on `side` consumes: buys lift asks, sells hit bids"""
+        if side == "buy":
+            return self.asks
+        if side == "sell":
+            return self.bids
+        raise ValueError(f"side must be 'buy' or 'sell', got {side!r}")
+
+    def depth_within_bps(self, side: str, bps: float) -> float:
+        """Quantity a market order on `side` can fill within `bps` of the mid price"""
+        with self._lock:
+            mid = self._mid()
+            if mid is None:
+                return 0.0
+            book_side = self._taker_side(side)
+            limit = mid * (1 + bps / 10000) if side == "buy" else mid * (1 - bps / 10000)
+            total = 0.0
+            for price, qty in book_side.iter_levels():
+                if (side == "buy" and price > limit) or (side == "sell" and price < limit):
+                    break
+                total += qty
+            return total
+
+    def vwap(self, side: str, quantity: float) -> Tuple[Optional[float], float]:
+        """Average fill price for a market order of `quantity`, and how much the book can fill"""
+        with self._lock:
+            return self._vwap(side, quantity)
+
+    def _vwap(self, side: str, quantity: float) -> Tuple[Optional[float], float]:
+        remaining = quantity
+        cost = 0.0
+        for price, qty in self._taker_side(side).iter_levels():
+            take = min(remaining, qty)
+            cost += take * price
+            remaining -= take
+            if remaining <= 0:
+                break
+        filled = quantity - max(remaining, 0.0)
+        return (cost / filled if filled > 0 else None), filled
+
+    def slippage_bps(self, side: str, quantity: float) -> Optional[float]:
+        """Expected cost versus mid of a market order, in bps; None if the book cannot fill it"""
+        with self._lock:
+            mid = self._mid()
+            avg_price, filled = self._vwap(side, quantity)
+        if mid is None or avg_price is None or filled < quantity:
+            return None
+        move = avg_price - mid if side == "buy" else mid - avg_price
+        return move / mid * 10000
+
+    def summary(self, levels: int = 10) -> Dict:
+        """Top of book for the API"""
+        with self._lock:
+            return {
+                "symbol": self.symbol,
+                "last_update_id": self.last_update_id,
+                "updated_at": self.updated_at,
+                "bids": [list(level) for level in self.bids.iter_levels(levels)],
+                "asks": [list(level) for level in self.asks.iter_levels(levels)],
+            }
+
+
+def fetch_binance_snapshot(symbol: str, is_testnet: bool = True) -> Dict:
+    """REST depth snapshot: {"lastUpdateId", "bids", "asks"}"""
+    base_url = BINANCE_TESTNET_BASE_URL if is_testnet else BINANCE_MAINNET_BASE_URL
+    response = requests.get(f"{base_url}/api/v3/depth",
+                            params={"symbol": symbol, "limit": SNAPSHOT_LIMIT}, timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+
+class OrderBookManager:
+    """Keeps one synchronized OrderBook per subscribed symbol.
+
+    Follows the exchange's diff-depth protocol: diffs are buffered until a
+    snapshot arrives, diffs older than the snapshot are dropped, and a gap in
+    update ids discards the book and triggers a resync. A failed resync backs
+    off exponentially per symbol; diffs keep buffering until one succeeds.
+    """
+
+    def __init__(self, snapshot_fetcher: Optional[Callable[[str], Dict]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.is_testnet = True
+        self.snapshot_fetcher = snapshot_fetcher or (lambda symbol: fetch_binance_snapshot(symbol, self.is_testnet))
+        self._clock = clock
+        self.books: Dict[str, OrderBook] = {}
+        self._synced: Dict[str, bool] = {}
+        self._pending: Dict[str, deque] = {}
+        self._failures: Dict[str, int] = {}
+        self._retry_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def subscribe(self, symbol: str):
+        with self._lock:
+            if symbol not in self.books:
+                self.books[symbol] = OrderBook(symbol)
+                self._synced[symbol] = False
+                self._pending[symbol] = deque(maxlen=MAX_PENDING_DIFFS)
+
+    def unsubscribe(self, symbol: str):
+        with self._lock:
+            self.books.pop(symbol, None)
+            self._synced.pop(symbol, None)
+            self._pending.pop(symbol, None)
+            self._failures.pop(symbol, None)
+            self._retry_at.pop(symbol, None)
+
+    def symbols(self) -> List[str]:
+        with self._lock:
+            return list(self.books)
+
+    def get(self, symbol: str) -> Optional[OrderBook]:
+        """The book for `symbol` if it is subscribed and in sync, else None"""
+        with self._lock:
+            if not self._synced.get(symbol):
+                return None
+            return self.books[symbol]
+
+    def on_depth_event(self, event: Dict):
+        """Handle one depthUpdate event ({"s", "U", "u", "b", "a"})"""
+        symbol = event["s"]
+        with self._lock:
+            book = self.books.get(symbol)
+            synced = self._synced.get(symbol)
+            if book is not None and not synced:
+                self._pending[symbol].append(event)
+            backing_off = self._clock() < self._retry_at.get(symbol, 0.0)
+        if book is None:
+            return
+        if not synced:
+            if not backing_off:
+                self.resync(symbol)
+            return
+        try:
+            book.apply_diff(event["U"], event["u"], event["b"], event["a"])
+        except OrderBookGapError as e:
+            print(f"Order book out of sequence, resyncing: {e}")
+            with self._lock:
+                self._synced[symbol] = False
+                self._pending[symbol] = deque([event], maxlen=MAX_PENDING_DIFFS)
+            self.resync(symbol)
+
+    def resync(self, symbol: str) -> bool:
+        """Fetch a snapshot and replay buffered diffs on top of it"""
+        with self._lock:
+            book = self.books.get(symbol)
+            pending = list(self._pending.get(symbol, ()))
+        if book is None:
+            return False
+        ORDER_BOOK_RESYNCS.labels(symbol).inc()
+        try:
+            snapshot = self.snapshot_fetcher(symbol)
+        except Exception as e:
+            print(f"Error fetching order book snapshot for {symbol}: {e}")
+            return self._resync_failed(symbol)
+        last_update_id = snapshot["lastUpdateId"]
+        if pending and last_update_id < pending[0]["U"] - 1:
+            # Snapshot is older than the buffered diffs; keep buffering and retry after the backoff
+            return self._resync_failed(symbol)
+        book.apply_snapshot(last_update_id, snapshot["bids"], snapshot["asks"])
+        try:
+            for event in pending:
+                book.apply_diff(event["U"], event["u"], event["b"], event["a"])
+        except OrderBookGapError as e:
+            print(f"Order book buffer out of sequence for {symbol}: {e}")
+            with self._lock:
+                self._pending[symbol].clear()
+            return self._resync_failed(symbol)
+        with self._lock:
+            if symbol in self._pending:
+                self._pending[symbol].clear()
+            self._synced[symbol] = True
+            self._failures.pop(symbol, None)
+            self._retry_at.pop(symbol, None)
+        return True
+
+    def _resync_failed(self, symbol: str) -> bool:
+        """Hold off the next snapshot request for `symbol` with exponential backoff"""
+        with self._lock:
+            failures = self._failures.get(symbol, 0) + 1
+            self._failures[symbol] = failures
+            self._retry_at[symbol] = self._clock() + min(MAX_RESYNC_BACKOFF, RESYNC_BACKOFF * 2 ** (failures - 1))
+        return False
+
+    def start_stream(self, is_testnet: bool = True):
+        """Maintain the subscribed books from the exchange's diff-depth websocket stream"""
+        if self._thread and self._thread.is_alive():
+            return
+        self.is_testnet = is_testnet
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._stream_loop, args=(is_testnet,), daemon=True)
+        self._thread.start()
+
+    def stop_stream(self):
+        self._stop.set()
+
+    def _stream_loop(self, is_testnet: bool):
+        from websockets.sync.client import connect
+
+        base_url = BINANCE_TESTNET_STREAM_URL if is_testnet else BINANCE_MAINNET_STREAM_URL
+        while not self._stop.is_set():
+            symbols = self.symbols()
+            if not symbols:
+                self._stop.wait(1)
+                continue
+            streams = "/".join(f"{s.lower()}@depth@100ms" for s in symbols)
+            try:
+                with connect(f"{base_url}?streams={streams}") as ws:
+                    with self._lock:
+                        for symbol in self.books:
+                            self._synced[symbol] = False
+                            self._pending[symbol].clear()
+                    while not self._stop.is_set() and self.symbols() == symbols:
+                        try:
+                            message = ws.recv(timeout=1)
+                        except TimeoutError:
+                            continue
+                        data = json.loads(message).get("data", {})
+                        if data.get("e") == "depthUpdate":
+                            self.on_depth_event(data)
+            except Exception as e:
+                print(f"Order book stream error: {e}")
+                self._stop.wait(5)
+
+
+# Global order book manager used by the trading bot and API
+order_books = OrderBookManager()
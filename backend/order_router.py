@@ -0,0 +1,196 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from metrics import registry as metrics_registry
+
+# Taker fee rates at the base VIP tier; a connected exchange's "taker_fee" overrides them
+TAKER_FEES = {"binance": 0.001, "kucoin": 0.001, "btcc": 0.0006}
+DEFAULT_TAKER_FEE = 0.002
+QUOTE_MAX_AGE = 2.0  # seconds a cached quote is used without refetching
+LATENCY_BUDGET = float(os.getenv("ROUTER_LATENCY_BUDGET", "0.15"))  # seconds to wait for stale quotes
+
+ROUTER_QUOTE_DURATION = metrics_registry.histogram(
+    "order_router_quote_seconds", "Time spent collecting venue quotes for one routing decision")
+ROUTER_LATE_QUOTES = metrics_registry.counter(
+    "order_router_late_quotes_total", "Quote fetches that missed the routing latency budget", ("exchange",))
+
+
+class Quote:
+    """Top of book for one symbol on one exchange"""
+
+    __slots__ = ("exchange", "symbol", "bid", "ask", "bid_qty", "ask_qty", "at")
+
+    def __init__(self, exchange: str, symbol: str, bid: Optional[float], ask: Optional[float],
+                 bid_qty: Optional[float] = None, ask_qty: Optional[float] = None, at: float = 0.0):
+        self.exchange = exchange
+        self.symbol = symbol
+        self.bid = bid
+        self.ask = ask
+        self.bid_qty = bid_qty
+        self.ask_qty = ask_qty
+        self.at = at
+
+    def price(self, side: str) -> Optional[float]:
+        """Price a market order on `side` takes"""
+        return self.ask if side == "buy" else self.bid
+
+    def size(self, side: str) -> Optional[float]:
+        """Displayed quantity at that price; None when the exchange did not report it"""
+        return self.ask_qty if side == "buy" else self.bid_qty
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def quote_from_ticker(exchange: str, ticker, at: float) -> Optional[Quote]:
+    """Quote from a connector Ticker; the last price stands in for a missing bid/ask"""
+    bid = ticker.bid or ticker.price or None
+    ask = ticker.ask or ticker.price or None
+    if bid is None and ask is None:
+        return None
+    return Quote(exchange, ticker.symbol, bid, ask, ticker.bid_qty, ticker.ask_qty, at)
+
+
+class SmartOrderRouter:
+    """Chooses, or splits across, the venues with the best fee-adjusted price.
+
+    Quotes come from a cache fed by each tick's tickers and the live book
+    mirror. Stale venues are refetched concurrently on a small thread pool,
+    and the router waits at most `latency_budget` for them. A fetch that
+    misses the budget still refreshes the cache when it lands, and is not
+    resubmitted while it is in flight.
+    """
+
+    def __init__(self, fees: Optional[Dict[str, float]] = None, latency_budget: float = LATENCY_BUDGET,
+                 max_age: float = QUOTE_MAX_AGE, clock: Callable[[], float] = time.time, max_workers: int = 8):
+        self.fees = dict(TAKER_FEES if fees is None else fees)
+        self.latency_budget = latency_budget
+        self.max_age = max_age
+        self._clock = clock
+        self._quotes: Dict[Tuple[str, str], Quote] = {}
+        self._pending: Dict[Tuple[str, str], Any] = {}
+        self._lock = threading.RLock()  # done callbacks may run inline while quotes() holds it
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="router-quotes")
+        self.fetches = 0
+        self.late_fetches = 0
+        self.last_collect_seconds = 0.0
+
+    def fee(self, exchange: str, override: Optional[float] = None) -> float:
+        if override is not None:
+            return float(override)
+        return self.fees.get(exchange, DEFAULT_TAKER_FEE)
+
+    def on_quote(self, quote: Quote):
+        with self._lock:
+            current = self._quotes.get((quote.exchange, quote.symbol))
+            if current is None or quote.at >= current.at:
+                self._quotes[(quote.exchange, quote.symbol)] = quote
+
+    def on_tickers(self, exchange: str, tickers):
+        now = self._clock()
+        for ticker in tickers:
+            quote = quote_from_ticker(exchange, ticker, now)
+            if quote is not None:
+                self.on_quote(quote)
+
+    def cached(self, exchange: str, symbol: str) -> Optional[Quote]:
+        with self._lock:
+            return self._quotes.get((exchange, symbol))
+
+    def _fetched(self, key: Tuple[str, str], future):
+        with self._lock:
+            self._pending.pop(key, None)
+        if not future.cancelled() and future.exception() is None and future.result() is not None:
+            self.on_quote(future.result())
+
+    def quotes(self, symbol: str, fetchers: Dict[str, Callable[[], Optional[Quote]]]) -> Dict[str, Quote]:
+        """Quotes per exchange: fresh cache entries as-is, stale ones refetched within the latency budget"""
+        start = time.perf_counter()
+        now = self._clock()
+        waiting = {}
+        with self._lock:
+            for exchange, fetch in fetchers.items():
+                key = (exchange, symbol)
+                quote = self._quotes.get(key)
+                if quote is not None and now - quote.at <= self.max_age:
+                    continue
+                future = self._pending.get(key)
+                if future is None:
+                    future = self._pending[key] = self._executor.submit(fetch)
+                    future.add_done_callback(lambda f, key=key: self._fetched(key, f))
+                    self.fetches += 1
+                waiting[exchange] = future
+        if waiting:
+            wait(list(waiting.values()), timeout=self.latency_budget)
+        quotes = {}
+        with self._lock:
+            for exchange in fetchers:
+                future = waiting.get(exchange)
+                if future is not None and not future.done():
+                    self.late_fetches += 1
+                    ROUTER_LATE_QUOTES.labels(exchange).inc()
+                    continue
+                if future is not None and future.exception() is None and future.result() is not None:
+                    quote = future.result()
+                else:
+                    quote = self._quotes.get((exchange, symbol))
+                if quote is not None and now - quote.at <= self.max_age:
+                    quotes[exchange] = quote
+        self.last_collect_seconds = time.perf_counter() - start
+        ROUTER_QUOTE_DURATION.observe(self.last_collect_seconds)
+        return quotes
+
+    def rank(self, side: str, quotes: Dict[str, Quote],
+             fee_overrides: Optional[Dict[str, float]] = None) -> List[Tuple[float, str, float, float]]:
+        """(effective price, exchange, price, fee) best first; buys pay fees on top, sells net of them"""
+        fee_overrides = fee_overrides or {}
+        ranked = []
+        for exchange, quote in quotes.items():
+            price = quote.price(side)
+            if not price:
+                continue
+            fee = self.fee(exchange, fee_overrides.get(exchange))
+            effective = price * (1 + fee) if side == "buy" else price * (1 - fee)
+            ranked.append((effective, exchange, price, fee))
+        ranked.sort(reverse=side != "buy")
+        return ranked
+
+    def route(self, side: str, qty: float, quotes: Dict[str, Quote], capacity: Dict[str, float],
+              fee_overrides: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+        """Split `qty` across venues, best effective price first.
+
+        Each venue first takes what its displayed top of book and `capacity`
+        (the base quantity its balance can fund) allow; any remainder then
+        goes to the best venues with balance left, past their displayed size.
+        """
+        ranked = self.rank(side, quotes, fee_overrides)
+        filled: Dict[str, float] = {}
+        remaining = qty
+        for displayed_only in (True, False):
+            for effective, exchange, price, fee in ranked:
+                if remaining <= 1e-12:
+                    break
+                room = capacity.get(exchange, 0.0) - filled.get(exchange, 0.0)
+                size = quotes[exchange].size(side)
+                if displayed_only and size is not None:
+                    room = min(room, size - filled.get(exchange, 0.0))
+                take = min(remaining, room)
+                if take > 1e-12:
+                    filled[exchange] = filled.get(exchange, 0.0) + take
+                    remaining -= take
+        return [{"exchange": exchange, "qty": filled[exchange], "price": price, "fee": fee,
+                 "effective_price": effective}
+                for effective, exchange, price, fee in ranked if exchange in filled]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"quotes": len(self._quotes), "in_flight": len(self._pending), "fetches": self.fetches,
+                    "late_fetches": self.late_fetches, "latency_budget": self.latency_budget,
+                    "last_collect_ms": self.last_collect_seconds * 1000,
+                    "cached": [quote.to_dict() for quote in self._quotes.values()]}
+
+
+order_router = SmartOrderRouter()
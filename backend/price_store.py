@@ -0,0 +1,147 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_PRICE_STORE_PATH = "prices.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS klines (
+    exchange TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    timeframe TEXT NOT NULL,
+    open_time INTEGER NOT NULL,
+    open REAL NOT NULL,
+    high REAL NOT NULL,
+    low REAL NOT NULL,
+    close REAL NOT NULL,
+    volume REAL NOT NULL,
+    PRIMARY KEY (exchange, symbol, timeframe, open_time)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS kline_segments (
+    exchange TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    timeframe TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    end INTEGER NOT NULL,
+    cursor INTEGER NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (exchange, symbol, timeframe, start)
+);
+"""
+
+# (open_time seconds, open, high, low, close, volume)
+Kline = Tuple[int, float, float, float, float, float]
+
+
+class PriceStore:
+    """Historical OHLCV bars in SQLite, keyed by exchange, symbol, timeframe and open time.
+
+    Bars are upserted, so downloading an overlapping range rewrites the same
+    rows instead of duplicating them. Download progress is kept per segment
+    (a [start, end) range of one series) with a cursor written in the same
+    transaction as the bars it covers, so a resumed run continues exactly
+    where the last committed page ended.
+    """
+
+    def __init__(self, path: str = DEFAULT_PRICE_STORE_PATH, busy_timeout_ms: int = 5000):
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        """This thread's connection; sqlite3 connections must not be shared across threads"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+    def write_page(self, exchange: str, symbol: str, timeframe: str, bars: Iterable[Kline],
+                   segment_start: Optional[int] = None, cursor: Optional[int] = None, done: bool = False) -> int:
+        """Upsert bars and, for a download segment, advance its cursor atomically; returns bars written"""
+        rows = [(exchange, symbol, timeframe) + tuple(bar) for bar in bars]
+        with self.transaction() as conn:
+            conn.executemany("INSERT OR REPLACE INTO klines VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            if segment_start is not None:
+                conn.execute("UPDATE kline_segments SET cursor = ?, done = ?, updated_at = ? "
+                             "WHERE exchange = ? AND symbol = ? AND timeframe = ? AND start = ?",
+                             (cursor, int(done), time.time(), exchange, symbol, timeframe, segment_start))
+        return len(rows)
+
+    def segments(self, exchange: str, symbol: str, timeframe: str) -> List[Dict[str, Any]]:
+        """Download segments of one series ordered by start"""
+        rows = self._conn().execute(
+            "SELECT start, end, cursor, done FROM kline_segments WHERE exchange = ? AND symbol = ? AND timeframe = ? "
+            "ORDER BY start", (exchange, symbol, timeframe)).fetchall()
+        return [{"start": start, "end": end, "cursor": cursor, "done": bool(done)} for start, end, cursor, done in rows]
+
+    def add_segments(self, exchange: str, symbol: str, timeframe: str, ranges: Sequence[Tuple[int, int]]):
+        now = time.time()
+        with self.transaction() as conn:
+            conn.executemany("INSERT OR IGNORE INTO kline_segments VALUES (?, ?, ?, ?, ?, ?, 0, ?)",
+                             [(exchange, symbol, timeframe, start, end, start, now) for start, end in ranges])
+
+    def klines(self, exchange: str, symbol: str, timeframe: str, start: Optional[int] = None,
+               end: Optional[int] = None, limit: Optional[int] = None) -> List[Kline]:
+        """Bars with start <= open_time < end, oldest first"""
+        query = ("SELECT open_time, open, high, low, close, volume FROM klines "
+                 "WHERE exchange = ? AND symbol = ? AND timeframe = ? AND open_time >= ? AND open_time < ? "
+                 "ORDER BY open_time")
+        params = [exchange, symbol, timeframe, start if start is not None else -2 ** 62,
+                  end if end is not None else 2 ** 62]
+        if limit:
+            query += " LIMIT ?"
+            params.append(int(limit))
+        return [tuple(row) for row in self._conn().execute(query, params).fetchall()]
+
+    def coverage(self) -> List[Dict[str, Any]]:
+        """First and last bar and bar count per stored series"""
+        rows = self._conn().execute(
+            "SELECT exchange, symbol, timeframe, MIN(open_time), MAX(open_time), COUNT(*) FROM klines "
+            "GROUP BY exchange, symbol, timeframe").fetchall()
+        return [{"exchange": exchange, "symbol": symbol, "timeframe": timeframe, "first": first, "last": last,
+                 "bars": count} for exchange, symbol, timeframe, first, last, count in rows]
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+
+_price_store: Optional[PriceStore] = None
+_price_store_lock = threading.Lock()
+
+
+def get_price_store() -> PriceStore:
+    """The process-wide price store at PRICE_STORE_PATH, opened on first use"""
+    global _price_store
+    if _price_store is None:
+        with _price_store_lock:
+            if _price_store is None:
+                _price_store = PriceStore(os.getenv("PRICE_STORE_PATH", DEFAULT_PRICE_STORE_PATH))
+    return _price_store
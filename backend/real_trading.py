@@ -2,11 +2,25 @@ import threading
 import time
 import datetime
 import pytz
-from typing import Dict, Any, Optional
-from exchange_connectors import ExchangeConnectorFactory, Order
+from typing import Dict, Any, Optional, Tuple
+from exchange_connectors import ExchangeConnectorFactory, ExchangeCredentials, Order
 from user_data import user_data_manager
 from trading_state import state
 import logging
+from scheduler import TickScheduler
+from strategy_compiler import compiled_strategy_cache, strategy_key, StrategyValidationError
+from market_calendar import calendar_for_schedule
+from order_book import order_books
+from candles import candle_sources
+from signal_pipeline import confirm_signals
+from trade_history import trade_store
+from exit_monitor import ExitMonitor
+from risk_ledger import risk_ledgers, split_symbol
+from accounting import accounting
+from valuation import portfolio_valuation
+from order_router import order_router, Quote, quote_from_ticker
+from shared_state import is_trading_leader
+from metrics import TRADING_TICK_DURATION, TRADING_SIGNALS_PER_TICK, TRADING_ORDERS_PER_TICK
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -16,15 +30,21 @@ class RealTradingBot:
     def __init__(self):
         self.running = False
         self.thread = None
+        self.scheduler = None
+        self.loop_interval = 10  # seconds between ticks
+        self.symbols = ['BTCUSDT', 'ETHUSDT', 'SOLUSDT']
+        self.custom_evaluators = {}  # (symbol, owner, strategy id, version) -> streaming evaluator
         self.user_exchanges = {}  # Store user-specific exchange connections
-        self.trade_history = []
         self.risk_limits = {
             'max_daily_loss': 5.0,  # 5% max daily loss
             'max_position_size': 0.1,  # 10% max position size
             'max_consecutive_losses': 3,
             'stop_loss_percent': 2.0,
-            'take_profit_percent': 5.0
+            'take_profit_percent': 5.0,
+            'max_slippage_bps': 25.0  # cap order size to book depth within this of mid
         }
+        # Stop-loss / take-profit on filled buys, keyed "exchange:symbol"
+        self.position_exits = ExitMonitor()
         
     def start_trading(self, user_email: str):
         """Start real trading for a specific user"""
@@ -41,7 +61,13 @@ class RealTradingBot:
             return False
             
         self.user_exchanges[user_email] = connected_exchanges
+        if 'binance' in connected_exchanges:
+            # Mirror the traded books so sizing can estimate slippage without REST calls
+            for symbol in self.symbols:
+                order_books.subscribe(symbol)
+            order_books.start_stream(is_testnet=connected_exchanges['binance'].get('sandbox', False))
         self.running = True
+        self.scheduler = TickScheduler(self.loop_interval, name="real")
         self.thread = threading.Thread(target=self._trading_loop, args=(user_email,), daemon=True)
         self.thread.start()
         logger.info(f"Started real trading bot for user {user_email}")
@@ -50,14 +76,39 @@ class RealTradingBot:
     def stop_trading(self):
         """Stop the trading bot"""
         self.running = False
+        order_books.stop_stream()
+        if self.scheduler:
+            self.scheduler.stop()
         if self.thread:
             self.thread.join(timeout=5)
         logger.info("Stopped real trading bot")
         
+    def wake(self):
+        """Re-check the trading schedule now instead of at the next session open"""
+        if self.scheduler:
+            self.scheduler.wake()
+        
     def _trading_loop(self, user_email: str):
         """Main trading loop that executes real trades"""
         while self.running:
+            # Ticks fire on aligned boundaries; an overrunning or failed tick skips
+            # the boundaries it missed instead of adding a fixed back-off
+            tick = self.scheduler.wait_next()
+            if tick is None:
+                break
+            # Another worker took the trading lease: stand by until it is ours again
+            if not is_trading_leader():
+                continue
+            with state.lock:
+                schedule = state.bot_schedule
+            calendar = calendar_for_schedule(schedule)
+            if not calendar.is_open(tick.scheduled_at):
+                # Block until the next session opens (or the schedule changes)
+                if not self.scheduler.pause_until(calendar.next_open(tick.scheduled_at)):
+                    break
+                continue
             try:
+                tick_start = time.perf_counter()
                 # Get current strategy configuration
                 with state.lock:
                     strategy_config = state.strategy_config.copy()
@@ -65,22 +116,53 @@ class RealTradingBot:
                 # Get user's exchange connections
                 exchanges = self.user_exchanges.get(user_email, {})
                 
-                for exchange_name, exchange_data in exchanges.items():
-                    if not self.running:
-                        break
-                        
-                    # Execute trading logic for this exchange
-                    self._execute_trading_logic(user_email, exchange_name, exchange_data, strategy_config)
+                tick_signals, tick_orders = self._execute_trading_logic(user_email, exchanges, strategy_config)
                     
-                # Sleep between iterations
-                time.sleep(10)  # Check every 10 seconds
+                TRADING_SIGNALS_PER_TICK.labels("real").observe(tick_signals)
+                TRADING_ORDERS_PER_TICK.labels("real").observe(tick_orders)
+                TRADING_TICK_DURATION.labels("real").observe(time.perf_counter() - tick_start)
                 
             except Exception as e:
                 logger.error(f"Error in trading loop: {e}")
-                time.sleep(30)  # Wait longer on error
                 
-    def _execute_trading_logic(self, user_email: str, exchange_name: str, exchange_data: Dict, strategy_config: Dict):
-        """Execute trading logic for a specific exchange"""
+    def _execute_trading_logic(self, user_email: str, exchanges: Dict, strategy_config: Dict) -> Tuple[int, int]:
+        """Refresh every connected exchange, then trade one set of signals routed across them; returns (signals, orders)"""
+        connectors = {}
+        market = {}
+        orders = 0
+        for exchange_name, exchange_data in exchanges.items():
+            if not self.running:
+                break
+            connector, tickers = self._refresh_exchange(user_email, exchange_name, exchange_data)
+            if connector is None:
+                continue
+            connectors[exchange_name] = connector
+            # Protective exits go out on the exchange holding the position, before new signals
+            orders += self._close_exited_positions(connector, tickers, user_email, exchange_name)
+            for ticker in tickers:
+                # Indicators for a symbol read the bars of the venue its ticker came from
+                market.setdefault(ticker.symbol, dict(ticker.dict(), source=exchange_name))
+        if not connectors:
+            return 0, orders
+        try:
+            # Analyze market and generate signals
+            signals = self._generate_trading_signals(market, strategy_config)
+            
+            # Volume, MACD and multi-timeframe confirmation before risk checks
+            confirmed = confirm_signals(signals, strategy_config)
+            
+            # Execute trades based on signals, each on the venue(s) with the best price after fees
+            for signal in risk_ledgers.get(user_email).check_batch(confirmed, None, self.risk_limits):
+                orders += self._execute_routed_trade(connectors, exchanges, signal, user_email)
+                    
+            return len(signals), orders
+                    
+        except Exception as e:
+            logger.error(f"Error executing trading logic: {e}")
+            return 0, orders
+            
+    def _refresh_exchange(self, user_email: str, exchange_name: str, exchange_data: Dict):
+        """Connector and fresh tickers for one exchange, with balances, quotes and marks updated"""
         try:
             # Create exchange connector
             connector = ExchangeConnectorFactory.create_connector(
@@ -94,27 +176,98 @@ class RealTradingBot:
             )
             
             # Get current market data
-            tickers = connector.get_tickers(['BTCUSDT', 'ETHUSDT', 'SOLUSDT'])
+            tickers = connector.get_tickers(self.symbols)
             if not tickers:
                 logger.warning(f"No ticker data available for {exchange_name}")
-                return
+                return None, []
+            candle_sources.get(exchange_name).on_prices({ticker.symbol: ticker.price for ticker in tickers})
                 
-            # Get account balance
+            # Get account balance; sizing, routing and risk checks read it from the ledger for the rest of the tick
             balances = connector.get_balances()
             if not balances:
                 logger.warning(f"No balance data available for {exchange_name}")
-                return
-                
-            # Analyze market and generate signals
-            signals = self._generate_trading_signals(tickers, strategy_config)
+                return None, []
+            risk_ledgers.get(user_email).on_balances(exchange_name, balances)
+            portfolio_valuation.on_prices(exchange_name, {ticker.symbol: ticker.price for ticker in tickers})
+            order_router.on_tickers(exchange_name, tickers)
+            return connector, tickers
             
-            # Execute trades based on signals
-            for signal in signals:
-                if self._should_execute_trade(signal, balances, user_email):
-                    self._execute_real_trade(connector, signal, user_email, exchange_name)
-                    
         except Exception as e:
-            logger.error(f"Error executing trading logic for {exchange_name}: {e}")
+            logger.error(f"Error refreshing {exchange_name}: {e}")
+            return None, []
+            
+    def _quote_fetcher(self, connector, symbol: str):
+        """Fetch one venue's top of book: the live book mirror for Binance, else a ticker request"""
+        def fetch():
+            now = time.time()
+            book = order_books.get(symbol) if connector.exchange_name == 'binance' else None
+            if book is not None:
+                bid, ask = book.best_bid(), book.best_ask()
+                if bid and ask:
+                    return Quote(connector.exchange_name, symbol, bid[0], ask[0], bid[1], ask[1], now)
+            for ticker in connector.get_tickers([symbol]):
+                if ticker.symbol == symbol:
+                    return quote_from_ticker(connector.exchange_name, ticker, now)
+            return None
+        return fetch
+        
+    def _execute_routed_trade(self, connectors: Dict, exchanges: Dict, signal: Dict, user_email: str) -> int:
+        """Size a signal on its best venue and split it across venues by price, fees and balance; returns fills"""
+        symbol, side = signal['symbol'], signal['action']
+        if len(connectors) == 1:
+            [(exchange_name, connector)] = connectors.items()
+            return int(self._execute_real_trade(connector, signal, user_email, exchange_name))
+        quotes = order_router.quotes(symbol, {name: self._quote_fetcher(connector, symbol)
+                                              for name, connector in connectors.items()})
+        fee_overrides = {name: data['taker_fee'] for name, data in exchanges.items() if 'taker_fee' in data}
+        ranked = order_router.rank(side, quotes, fee_overrides)
+        if not ranked:
+            logger.info(f"No quotes for {symbol} within the routing budget")
+            return 0
+        best_price, best = ranked[0][2], ranked[0][1]
+        quantity = self._calculate_position_size(dict(signal, price=best_price), connectors[best], user_email)
+        if quantity <= 0:
+            return 0
+        ledger = risk_ledgers.get(user_email)
+        base, quote = split_symbol(symbol)
+        capacity = {}
+        for effective, exchange_name, price, fee in ranked:
+            if side == 'buy':
+                capacity[exchange_name] = ledger.balance(exchange_name, quote or 'USDT') / effective
+            else:
+                capacity[exchange_name] = ledger.balance(exchange_name, base)
+        filled = 0
+        for leg in order_router.route(side, quantity, quotes, capacity, fee_overrides):
+            leg_signal = dict(signal, price=leg['price'], quantity=leg['qty'],
+                              reason=f"{signal['reason']} (routed to {leg['exchange']})")
+            if self._execute_real_trade(connectors[leg['exchange']], leg_signal, user_email, leg['exchange']):
+                filled += 1
+        return filled
+            
+    def _close_exited_positions(self, connector, tickers, user_email: str, exchange_name: str) -> int:
+        """Sell positions whose stop-loss or take-profit the latest tickers crossed; returns orders filled"""
+        fired = []
+        for ticker in tickers:
+            fired.extend(self.position_exits.on_price(f"{exchange_name}:{ticker.symbol}", ticker.price))
+        fired.extend(event for event in self.position_exits.poll() if event['symbol'].startswith(f"{exchange_name}:"))
+        orders = 0
+        for event in fired:
+            symbol = event['symbol'].split(':', 1)[1]
+            held = accounting.position(user_email, exchange_name, symbol)['qty']
+            if held <= 0:
+                continue  # already closed by other means
+            # Sell the whole position, not a risk-sized slice of it
+            signal = {'action': 'sell', 'symbol': symbol, 'price': event['price'], 'quantity': held,
+                      'reason': f"Exit: {event['reason'].replace('_', ' ')} at {event['trigger_price']:.8g}"}
+            if signal['price'] and self._execute_real_trade(connector, signal, user_email, exchange_name):
+                orders += 1
+            else:
+                # The trigger disarmed the position; re-arm it so the next tick retries the exit
+                self.position_exits.register(event['position_id'], event['symbol'], event['entry_price'],
+                                             price=event['price'], opened_at=event['opened_at'],
+                                             stop_loss_pct=self.risk_limits['stop_loss_percent'],
+                                             take_profit_pct=self.risk_limits['take_profit_percent'])
+        return orders
             
     def _generate_trading_signals(self, tickers: Dict, strategy_config: Dict) -> list:
         """Generate trading signals based on strategy configuration"""
@@ -123,14 +276,20 @@ class RealTradingBot:
         
         for symbol, ticker in tickers.items():
             current_price = float(ticker['price'])
+            source = ticker['source']
             
             # Calculate technical indicators
-            rsi = self._calculate_rsi(symbol, current_price)  # Simplified RSI
+            rsi = self._calculate_rsi(source, symbol, current_price, strategy_config.get('rsi_timeframe', '5min'))
             momentum = self._calculate_momentum(symbol, current_price)
             
             signal = None
             
-            if strategy_type == 'rsi':
+            if strategy_type == 'custom':
+                action = self._custom_strategy_action(symbol, current_price, strategy_config)
+                if action in ('buy', 'sell'):
+                    signal = {'action': action, 'symbol': symbol, 'price': current_price, 'reason': 'Custom strategy rules'}
+                    
+            elif strategy_type == 'rsi':
                 rsi_oversold = strategy_config.get('rsi_oversold', 30)
                 rsi_overbought = strategy_config.get('rsi_overbought', 70)
                 
@@ -158,51 +317,45 @@ class RealTradingBot:
                     signal = {'action': 'sell', 'symbol': symbol, 'price': current_price, 'reason': 'Breakdown detected'}
                     
             if signal:
+                signal['volume_24h'] = ticker.get('volume_24h')
+                signal['candle_source'] = source
                 signals.append(signal)
                 
         return signals
         
-    def _should_execute_trade(self, signal: Dict, balances: Dict, user_email: str) -> bool:
-        """Check if a trade should be executed based on risk management rules"""
-        try:
-            # Check daily loss limit
-            daily_pnl = self._get_daily_pnl(user_email)
-            if daily_pnl < -self.risk_limits['max_daily_loss']:
-                logger.info(f"Daily loss limit reached: {daily_pnl}%")
-                return False
-                
-            # Check consecutive losses
-            consecutive_losses = self._get_consecutive_losses(user_email)
-            if consecutive_losses >= self.risk_limits['max_consecutive_losses']:
-                logger.info(f"Max consecutive losses reached: {consecutive_losses}")
-                return False
-                
-            # Check position size limits
-            symbol = signal['symbol']
-            if signal['action'] == 'buy':
-                # Check if we have enough balance
-                usdt_balance = balances.get('USDT', 0)
-                if usdt_balance < 100:  # Minimum $100 for trading
-                    return False
-                    
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error checking trade conditions: {e}")
-            return False
-            
-    def _execute_real_trade(self, connector, signal: Dict, user_email: str, exchange_name: str):
-        """Execute a real trade on the exchange"""
+    def _custom_strategy_action(self, symbol: str, price: float, strategy_config: Dict) -> str:
+        """Evaluate the active compiled custom strategy for one symbol"""
+        definition = strategy_config.get('custom_strategy') or {}
+        key = (symbol,) + strategy_key(definition)
+        evaluator = self.custom_evaluators.get(key)
+        if evaluator is None:
+            try:
+                compiled = compiled_strategy_cache.get_or_compile(definition)
+            except StrategyValidationError as e:
+                logger.error(f"Active custom strategy is invalid: {e}")
+                return 'hold'
+            # Drop this symbol's evaluators for older versions of the strategy
+            for stale in [k for k in self.custom_evaluators if k[0] == symbol]:
+                del self.custom_evaluators[stale]
+            evaluator = self.custom_evaluators[key] = compiled.stream()
+        return evaluator.update(price)
+        
+    def _execute_real_trade(self, connector, signal: Dict, user_email: str, exchange_name: str) -> bool:
+        """Execute a real trade on the exchange; returns True when the order filled"""
         try:
             symbol = signal['symbol']
             action = signal['action']
             price = signal['price']
             
-            # Calculate position size based on risk management
-            position_size = self._calculate_position_size(signal, connector)
+            # Calculate position size based on risk management, unless the router already split it
+            if 'quantity' in signal:
+                info = connector.symbol_info(symbol)
+                position_size = info.quantize_qty(signal['quantity']) if info else signal['quantity']
+            else:
+                position_size = self._calculate_position_size(signal, connector, user_email)
             
             if position_size <= 0:
-                return
+                return False
                 
             # Create order
             order = Order(
@@ -217,6 +370,13 @@ class RealTradingBot:
             result = connector.place_order(order)
             
             if result and result.get('status') == 'filled':
+                fill = accounting.record_fill(user_email, exchange_name, symbol, action, position_size, price)
+                realized_pnl = fill['realized_pnl']
+                risk_ledgers.get(user_email).on_fill(exchange_name, symbol, action, position_size, price,
+                                                     realized=realized_pnl)
+                portfolio_valuation.set_position(user_email, exchange_name, symbol,
+                                                 fill['position_qty'], fill['avg_price'])
+                
                 # Log successful trade
                 trade_log = {
                     'timestamp': datetime.datetime.utcnow().isoformat(),
@@ -226,27 +386,41 @@ class RealTradingBot:
                     'action': action,
                     'quantity': position_size,
                     'price': price,
+                    'expected_price': signal.get('expected_price'),
                     'reason': signal['reason'],
+                    'realized_pnl': realized_pnl,
                     'status': 'executed'
                 }
                 
-                self.trade_history.append(trade_log)
+                # Exits follow the average cost of whatever is still held, like the paper loop's
+                key = f"{exchange_name}:{symbol}"
+                if fill['position_qty'] > 0:
+                    self.position_exits.register(key, key, fill['avg_price'], price=price,
+                                                 stop_loss_pct=self.risk_limits['stop_loss_percent'],
+                                                 take_profit_pct=self.risk_limits['take_profit_percent'])
+                else:
+                    self.position_exits.cancel(key)
+                trade_store.append(user_email, trade_log)
                 logger.info(f"Executed {action} order for {symbol}: {position_size} @ {price}")
                 
                 # Update user's trading data
                 self._update_user_trading_data(user_email, trade_log)
+                return True
                 
             else:
                 logger.warning(f"Failed to execute {action} order for {symbol}")
+                return False
                 
         except Exception as e:
             logger.error(f"Error executing real trade: {e}")
+            return False
             
-    def _calculate_position_size(self, signal: Dict, connector) -> float:
+    def _calculate_position_size(self, signal: Dict, connector, user_email: str) -> float:
         """Calculate position size based on risk management rules"""
         try:
-            balances = connector.get_balances()
-            usdt_balance = balances.get('USDT', 0)
+            # Balance as of this tick's refresh, adjusted for fills since
+            quote = split_symbol(signal['symbol'])[1] or 'USDT'
+            usdt_balance = risk_ledgers.get(user_email).balance(connector.exchange_name, quote)
             
             # Use a small percentage of balance for each trade
             risk_per_trade = 0.02  # 2% of balance per trade
@@ -256,13 +430,33 @@ class RealTradingBot:
             price = signal['price']
             quantity = position_value / price
             
-            # Round to appropriate decimal places
-            if 'BTC' in signal['symbol']:
-                quantity = round(quantity, 6)
-            elif 'ETH' in signal['symbol']:
-                quantity = round(quantity, 5)
+            # Round down to the exchange's lot size; fixed decimals only when its metadata is unavailable
+            info = connector.symbol_info(signal['symbol'])
+            if info is None:
+                quantity = round(quantity, 6 if 'BTC' in signal['symbol'] else 5 if 'ETH' in signal['symbol'] else 4)
             else:
-                quantity = round(quantity, 4)
+                quantity = info.quantize_qty(quantity)
+                
+            # With a live book mirror, keep the expected market impact inside the slippage limit
+            book = order_books.get(signal['symbol'])
+            if book is not None:
+                max_quantity = book.depth_within_bps(signal['action'], self.risk_limits['max_slippage_bps'])
+                if quantity > max_quantity:
+                    logger.info(f"Reducing {signal['symbol']} order from {quantity} to {max_quantity} "
+                                f"to stay within {self.risk_limits['max_slippage_bps']} bps")
+                    quantity = info.quantize_qty(max_quantity) if info else max_quantity
+                    
+            # Skip orders the exchange would reject (below min qty / min notional) instead of sending them
+            if info is not None:
+                errors = info.violations(quantity, price)
+                if errors:
+                    logger.info(f"Skipping {signal['symbol']} order: {'; '.join(errors)}")
+                    return 0
+            if book is not None:
+                expected_price, _ = book.vwap(signal['action'], quantity)
+                if expected_price is not None:
+                    signal['expected_price'] = expected_price
+                    signal['expected_slippage_bps'] = book.slippage_bps(signal['action'], quantity)
                 
             return quantity
             
@@ -273,34 +467,38 @@ class RealTradingBot:
     def _update_user_trading_data(self, user_email: str, trade_log: Dict):
         """Update user's trading data with the new trade"""
         try:
-            user_data = user_data_manager.get_user_data(user_email)
-            
-            # Initialize trading data if not exists
-            if 'trading_data' not in user_data:
-                user_data['trading_data'] = {
+            def add_trade(trading_data):
+                # Initialize trading data if not exists
+                trading_data = trading_data or {
                     'trades': [],
                     'total_pnl': 0.0,
                     'win_rate': 0.0,
                     'total_trades': 0
                 }
                 
-            # Add new trade
-            user_data['trading_data']['trades'].append(trade_log)
-            user_data['trading_data']['total_trades'] += 1
-            
-            # Update win rate and PnL (simplified calculation)
-            # In a real implementation, you'd calculate actual PnL from closed positions
-            
-            # Save updated data
-            user_data_manager.save_user_data(user_email, user_data)
+                # Add new trade
+                trading_data['trades'].append(trade_log)
+                trading_data['total_trades'] += 1
+                trading_data.update(risk_ledgers.get(user_email).snapshot())
+                
+                # Update win rate and PnL (simplified calculation)
+                # In a real implementation, you'd calculate actual PnL from closed positions
+                return trading_data
+                
+            # Read-modify-write in one transaction so concurrent writers never drop a trade
+            user_data_manager.update_user_section(user_email, 'trading_data', add_trade)
             
         except Exception as e:
             logger.error(f"Error updating user trading data: {e}")
             
-    def _calculate_rsi(self, symbol: str, current_price: float) -> float:
-        """Calculate RSI (simplified implementation)"""
-        # In a real implementation, you'd calculate RSI from historical price data
-        # For now, return a random value between 20-80
+    def _calculate_rsi(self, source: str, symbol: str, current_price: float, timeframe: str = '5min') -> float:
+        """RSI over closed `timeframe` candles of one price source; simplified mock until enough bars exist"""
+        try:
+            rsi = candle_sources.get(source).indicator('rsi', symbol, timeframe, period=14)
+        except ValueError:
+            rsi = None
+        if rsi is not None:
+            return rsi
         import random
         return random.uniform(20, 80)
         
@@ -323,45 +521,28 @@ class RealTradingBot:
             return 100
             
     def _get_daily_pnl(self, user_email: str) -> float:
-        """Get daily PnL percentage"""
-        try:
-            user_data = user_data_manager.get_user_data(user_email)
-            trading_data = user_data.get('trading_data', {})
-            
-            # Simplified PnL calculation
-            # In a real implementation, you'd calculate actual PnL
-            return trading_data.get('total_pnl', 0.0)
-            
-        except Exception as e:
-            logger.error(f"Error getting daily PnL: {e}")
-            return 0.0
+        """Realized PnL today (UTC) as a percent of the day's starting balance"""
+        return risk_ledgers.get(user_email).daily_pnl_pct
             
     def _get_consecutive_losses(self, user_email: str) -> int:
-        """Get number of consecutive losses"""
-        try:
-            user_data = user_data_manager.get_user_data(user_email)
-            trading_data = user_data.get('trading_data', {})
-            
-            # Simplified consecutive losses calculation
-            # In a real implementation, you'd track actual consecutive losses
-            return trading_data.get('consecutive_losses', 0)
-            
-        except Exception as e:
-            logger.error(f"Error getting consecutive losses: {e}")
-            return 0
+        """Losing sells in a row since the last winning one"""
+        return risk_ledgers.get(user_email).consecutive_losses
             
     def get_trade_history(self, user_email: str) -> list:
         """Get trade history for a user"""
-        return [trade for trade in self.trade_history if trade['user_email'] == user_email]
+        return trade_store.all(user_email)
         
     def get_trading_status(self, user_email: str) -> Dict:
         """Get current trading status for a user"""
         return {
             'running': self.running,
+            'scheduler': self.scheduler.get_stats() if self.scheduler else None,
             'connected_exchanges': list(self.user_exchanges.get(user_email, {}).keys()),
-            'total_trades': len(self.get_trade_history(user_email)),
+            'total_trades': trade_store.count(user_email),
             'daily_pnl': self._get_daily_pnl(user_email),
-            'consecutive_losses': self._get_consecutive_losses(user_email)
+            'consecutive_losses': self._get_consecutive_losses(user_email),
+            'exposure': risk_ledgers.get(user_email).exposure(),
+            'valuation': portfolio_valuation.account(user_email)
         }
 
 # Create global instance
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+from metrics import registry as metrics_registry
+
+RESPONSE_CACHE_RESULTS = metrics_registry.counter(
+    "response_cache_results_total", "Cached endpoint responses by outcome (hit, miss, not_modified)",
+    ("endpoint", "result"))
+
+
+def file_version(path: str) -> Tuple[int, int]:
+    """Content version of a file from its mtime and size; (0, 0) when it does not exist"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return (0, 0)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _etag(key: str, version: Any) -> str:
+    digest = hashlib.blake2b(f"{key}\x00{version!r}".encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def _if_none_match(request: Request) -> Tuple[str, ...]:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return ()
+    return tuple(tag.strip() for tag in header.split(","))
+
+
+class _Entry:
+    __slots__ = ("etag", "body")
+
+    def __init__(self, etag: str, body: bytes):
+        self.etag = etag
+        self.body = body
+
+
+class ResponseCache:
+    """Serialized JSON bodies with strong ETags for read-mostly endpoints.
+
+    Each response is identified by a key and a content version (a file's
+    mtime/size, a user document's version, ...). The ETag is derived from the
+    pair, so a matching If-None-Match gets a 304 without building the body at
+    all, and a changed version rebuilds and re-serializes it exactly once.
+    invalidate() also changes the ETag, for writes the version might miss
+    (e.g. two saves within one mtime tick). Passing version=None hashes the
+    body instead, for data that only changes with the code.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def respond(self, request: Request, key: str, build: Callable[[], Any], version: Any = None,
+                private: bool = False) -> Response:
+        endpoint = request.url.path
+        with self._lock:
+            if version is not None:
+                etag = _etag(key, (self._generations.get(key, 0), version))
+            else:
+                entry = self._entries.get(key)
+                etag = entry.etag if entry is not None else None
+
+        headers = {"Cache-Control": "private, no-cache" if private else "no-cache"}
+        if private:
+            headers["Vary"] = "Authorization"
+        candidates = _if_none_match(request)
+        if etag is not None and (etag in candidates or "*" in candidates):
+            RESPONSE_CACHE_RESULTS.labels(endpoint, "not_modified").inc()
+            return Response(status_code=304, headers=dict(headers, ETag=etag))
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (version is None or entry.etag == etag):
+                self._entries.move_to_end(key)
+            else:
+                entry = None
+        if entry is None:
+            RESPONSE_CACHE_RESULTS.labels(endpoint, "miss").inc()
+            body = json.dumps(jsonable_encoder(build()), separators=(",", ":")).encode()
+            if version is None:
+                etag = f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+            entry = _Entry(etag, body)
+            with self._lock:
+                self._entries[key] = entry
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        else:
+            RESPONSE_CACHE_RESULTS.labels(endpoint, "hit").inc()
+        return Response(content=entry.body, media_type="application/json", headers=dict(headers, ETag=entry.etag))
+
+    def invalidate(self, key: Optional[str] = None):
+        """Drop one cached body (or all of them) and change its ETag"""
+        with self._lock:
+            keys = list(self._entries) if key is None else [key]
+            for k in keys:
+                self._entries.pop(k, None)
+                self._generations[k] = self._generations.get(k, 0) + 1
+
+
+# Global response cache used by the read-mostly endpoints in main.py
+response_cache = ResponseCache()
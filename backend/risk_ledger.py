@@ -0,0 +1,193 @@
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from user_data import user_data_manager
+
+STABLE_ASSETS = ("USDT", "USDC", "BUSD", "FDUSD", "TUSD", "USD")  # counted at face value in the day's start value
+QUOTE_ASSETS = ("USDT", "USDC", "BUSD", "FDUSD", "TUSD", "USD", "EUR", "BTC", "ETH", "BNB")
+MIN_QUOTE_BALANCE = 100.0  # quote currency needed on an exchange before a buy
+
+
+def split_symbol(symbol: str) -> Tuple[str, str]:
+    """(base, quote) for a canonical symbol such as BTCUSDT; quote is '' when unrecognized"""
+    for quote in QUOTE_ASSETS:
+        if symbol.endswith(quote) and len(symbol) > len(quote):
+            return symbol[:-len(quote)], quote
+    return symbol, ""
+
+
+def utc_day(t: Optional[float] = None) -> str:
+    return datetime.fromtimestamp(time.time() if t is None else t, tz=timezone.utc).date().isoformat()
+
+
+class RiskLedger:
+    """One user's running risk figures, kept current by fills and balance refreshes.
+
+    Tracks realized PnL for the current UTC day (reset on the first event of
+    a new day), the consecutive-loss streak, average cost and exposure per
+    asset, and the last balances seen per exchange, so pre-trade checks are
+    plain arithmetic under a lock.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.day = utc_day(clock())
+        self.daily_pnl = 0.0
+        self.day_start_value = 0.0  # quote value of balances when the day's first balances arrived
+        self.consecutive_losses = 0
+        self.positions: Dict[str, Dict[str, float]] = {}  # symbol -> {"qty", "avg_price"}
+        self.balances: Dict[str, Dict[str, float]] = {}  # exchange -> asset -> free
+        self.balances_at: Dict[str, float] = {}
+
+    def seed(self, trading_data: Dict[str, Any]):
+        """Resume the streak and today's PnL recorded in the user's trading data"""
+        with self._lock:
+            self.consecutive_losses = int(trading_data.get("consecutive_losses", 0))
+            if trading_data.get("daily_pnl_date") == self.day:
+                self.daily_pnl = float(trading_data.get("daily_pnl", 0.0))
+
+    def _roll_day(self):
+        today = utc_day(self._clock())
+        if today != self.day:
+            self.day = today
+            self.daily_pnl = 0.0
+            self.day_start_value = 0.0
+
+    def on_balances(self, exchange: str, balances: Iterable):
+        """Replace an exchange's balances (Balance models or {asset, free} dicts)"""
+        free = {}
+        for balance in balances:
+            if isinstance(balance, dict):
+                free[balance["asset"]] = float(balance.get("free", 0))
+            else:
+                free[balance.asset] = float(balance.free)
+        with self._lock:
+            self._roll_day()
+            self.balances[exchange] = free
+            self.balances_at[exchange] = self._clock()
+            if not self.day_start_value:
+                self.day_start_value = self._quote_value()
+
+    def _quote_value(self) -> float:
+        value = 0.0
+        for free in self.balances.values():
+            value += sum(free.get(asset, 0.0) for asset in STABLE_ASSETS)
+        for symbol, position in self.positions.items():
+            value += position["qty"] * position["avg_price"]
+        return value
+
+    def on_fill(self, exchange: str, symbol: str, side: str, qty: float, price: float, fee: float = 0.0,
+                realized: Optional[float] = None) -> float:
+        """Apply a fill; returns the realized PnL, `realized` if the accounting engine matched it"""
+        base, quote = split_symbol(symbol)
+        with self._lock:
+            self._roll_day()
+            position = self.positions.setdefault(symbol, {"qty": 0.0, "avg_price": 0.0})
+            free = self.balances.setdefault(exchange, {})
+            matched = realized
+            realized = -fee
+            if side == "buy":
+                cost = position["qty"] * position["avg_price"] + qty * price
+                position["qty"] += qty
+                position["avg_price"] = cost / position["qty"] if position["qty"] else 0.0
+                free[base] = free.get(base, 0.0) + qty
+                free[quote] = free.get(quote, 0.0) - qty * price - fee
+            else:
+                closed = min(qty, position["qty"])
+                realized += (price - position["avg_price"]) * closed
+                position["qty"] -= closed
+                if position["qty"] <= 0:
+                    del self.positions[symbol]
+                free[base] = max(0.0, free.get(base, 0.0) - qty)
+                free[quote] = free.get(quote, 0.0) + qty * price - fee
+            if matched is not None:
+                realized = matched
+            self.daily_pnl += realized
+            if side != "buy":
+                if realized < 0:
+                    self.consecutive_losses += 1
+                elif realized > 0:
+                    self.consecutive_losses = 0
+            return realized
+
+    @property
+    def daily_pnl_pct(self) -> float:
+        with self._lock:
+            self._roll_day()
+            return self.daily_pnl / self.day_start_value * 100 if self.day_start_value else 0.0
+
+    def balance(self, exchange: str, asset: str) -> float:
+        with self._lock:
+            return self.balances.get(exchange, {}).get(asset, 0.0)
+
+    def exposure(self) -> Dict[str, float]:
+        """Open quantity per base asset across exchanges"""
+        with self._lock:
+            exposure: Dict[str, float] = {}
+            for symbol, position in self.positions.items():
+                base = split_symbol(symbol)[0]
+                exposure[base] = exposure.get(base, 0.0) + position["qty"]
+            return exposure
+
+    def check_batch(self, signals: List[Dict[str, Any]], exchange: Optional[str],
+                    limits: Dict[str, float]) -> List[Dict[str, Any]]:
+        """Signals that pass the daily-loss, loss-streak and balance rules; no I/O.
+
+        With `exchange` None a buy passes if any exchange holds enough quote currency.
+        """
+        with self._lock:
+            self._roll_day()
+            daily_pct = self.daily_pnl / self.day_start_value * 100 if self.day_start_value else 0.0
+            if daily_pct < -limits["max_daily_loss"] or self.consecutive_losses >= limits["max_consecutive_losses"]:
+                return []
+            venues = list(self.balances.values()) if exchange is None else [self.balances.get(exchange, {})]
+            approved = []
+            for signal in signals:
+                base, quote = split_symbol(signal["symbol"])
+                if signal["action"] == "buy" and max(
+                        (free.get(quote or "USDT", 0.0) for free in venues), default=0.0) < MIN_QUOTE_BALANCE:
+                    continue
+                approved.append(signal)
+            return approved
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Figures persisted with the user's trading data"""
+        with self._lock:
+            self._roll_day()
+            return {"daily_pnl": self.daily_pnl, "daily_pnl_date": self.day,
+                    "consecutive_losses": self.consecutive_losses}
+
+
+class RiskLedgerBook:
+    """Per-user ledgers, each seeded once from the user's stored trading data"""
+
+    def __init__(self, loader: Optional[Callable[[str], Dict[str, Any]]] = None):
+        self._loader = loader
+        self._ledgers: Dict[str, RiskLedger] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_email: str) -> RiskLedger:
+        ledger = self._ledgers.get(user_email)
+        if ledger is not None:
+            return ledger
+        with self._lock:
+            if user_email not in self._ledgers:
+                ledger = RiskLedger()
+                if self._loader is not None:
+                    ledger.seed(self._loader(user_email))
+                self._ledgers[user_email] = ledger
+            return self._ledgers[user_email]
+
+    def drop(self, user_email: str):
+        with self._lock:
+            self._ledgers.pop(user_email, None)
+
+
+def _load_trading_data(user_email: str) -> Dict[str, Any]:
+    return user_data_manager.get_user_data(user_email).get("trading_data", {})
+
+
+risk_ledgers = RiskLedgerBook(loader=_load_trading_data)
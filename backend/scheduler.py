@@ -0,0 +1,259 @@
+import math
+import re
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from metrics import registry as metrics_registry
+
+SCHEDULER_JITTER = metrics_registry.histogram(
+    "scheduler_tick_jitter_seconds", "Delay between a tick's scheduled boundary and when it fired", ("loop",))
+SCHEDULER_MISSED_TICKS = metrics_registry.counter(
+    "scheduler_missed_ticks_total", "Ticks skipped or coalesced because the previous tick overran", ("loop",))
+
+# Timeframe units in seconds. Single-letter "m" means minutes, as in exchange kline intervals.
+_TIMEFRAME_UNITS = {
+    "s": 1, "sec": 1, "second": 1,
+    "m": 60, "min": 60, "minute": 60,
+    "h": 3600, "hr": 3600, "hour": 3600,
+    "d": 86400, "day": 86400,
+    "w": 604800, "wk": 604800, "week": 604800,
+}
+_TIMEFRAME_RE = re.compile(r"^\s*(\d+)\s*([a-zA-Z]+?)s?\s*$")
+
+OVERRUN_SKIP = "skip"
+OVERRUN_COALESCE = "coalesce"
+
+
+def parse_timeframe(timeframe) -> Optional[int]:
+    """Convert a timeframe such as "5min", "1h", "1hour", "4H" or "1D" to seconds"""
+    if timeframe is None:
+        return None
+    if isinstance(timeframe, (int, float)):
+        return int(timeframe) if timeframe > 0 else None
+    match = _TIMEFRAME_RE.match(str(timeframe))
+    if not match:
+        return None
+    unit = _TIMEFRAME_UNITS.get(match.group(2).lower())
+    if unit is None:
+        return None
+    return int(match.group(1)) * unit
+
+
+class Tick:
+    """One scheduler firing"""
+
+    __slots__ = ("scheduled_at", "fired_at", "previous_scheduled_at", "missed", "coalesced")
+
+    def __init__(self, scheduled_at: float, fired_at: float, previous_scheduled_at: Optional[float],
+                 missed: int = 0, coalesced: bool = False):
+        self.scheduled_at = scheduled_at
+        self.fired_at = fired_at
+        self.previous_scheduled_at = previous_scheduled_at
+        self.missed = missed
+        self.coalesced = coalesced
+
+    @property
+    def jitter(self) -> float:
+        return self.fired_at - self.scheduled_at
+
+    def crossed(self, period_seconds: Optional[float]) -> bool:
+        """True if a `period_seconds` boundary (e.g. a candle close) fell since the previous tick"""
+        if not period_seconds:
+            return True
+        if self.previous_scheduled_at is None:
+            return _on_boundary(self.scheduled_at, period_seconds)
+        return math.floor(self.scheduled_at / period_seconds + 1e-9) > math.floor(
+            self.previous_scheduled_at / period_seconds + 1e-9)
+
+
+def _on_boundary(t: float, period: float) -> bool:
+    remainder = t % period
+    return remainder < 1e-6 or period - remainder < 1e-6
+
+
+def _percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(p * len(sorted_values)))]
+
+
+class TickScheduler:
+    """Fires ticks on wall-clock boundaries that are multiples of `interval`.
+
+    Work done between ticks does not shift the cadence. If a tick's work runs past
+    the next boundary the missed ticks are either skipped (wait for the next future
+    boundary) or coalesced (fire once immediately for the latest missed boundary).
+    """
+
+    def __init__(self, interval: float, name: str, overrun_policy: str = OVERRUN_SKIP,
+                 offset: float = 0.0, clock: Callable[[], float] = time.time,
+                 sleep: Optional[Callable[[float], bool]] = None, history: int = 1000):
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        if overrun_policy not in (OVERRUN_SKIP, OVERRUN_COALESCE):
+            raise ValueError(f"Unknown overrun policy: {overrun_policy}")
+        self.interval = float(interval)
+        self.name = name
+        self.overrun_policy = overrun_policy
+        self.offset = offset
+        self._clock = clock
+        # Set by stop() and wake(); the default sleep returns early when it fires
+        self._interrupt = threading.Event()
+        self._stopped = False
+        self._sleep = sleep or self._interrupt.wait
+        self._next: Optional[float] = None
+        self._last_scheduled: Optional[float] = None
+        self._last_fired: Optional[float] = None
+        self._jitters = deque(maxlen=history)
+        self._durations = deque(maxlen=history)
+        self._stats_lock = threading.Lock()
+        self.ticks = 0
+        self.overruns = 0
+        self.missed_ticks = 0
+        self._jitter_metric = SCHEDULER_JITTER.labels(name)
+        self._missed_metric = SCHEDULER_MISSED_TICKS.labels(name)
+        _schedulers[name] = self
+
+    def next_boundary(self, now: float) -> float:
+        """First boundary strictly after `now`"""
+        k = math.floor((now - self.offset) / self.interval) + 1
+        return self.offset + k * self.interval
+
+    def set_interval(self, interval: float):
+        """Change the cadence; takes effect from the next boundary of the new interval"""
+        if interval > 0 and interval != self.interval:
+            self.interval = float(interval)
+            self._next = None
+
+    def stop(self):
+        """Wake any pending wait and make wait_next return None"""
+        self._stopped = True
+        self._interrupt.set()
+
+    def wake(self):
+        """End a pause_until() early, e.g. after the trading schedule changed"""
+        self._interrupt.set()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stopped
+
+    def _sleep_until(self, target: float, wakeable: bool = False) -> bool:
+        """Sleep until wall-clock `target`; returns False if stopped meanwhile"""
+        while True:
+            if self._stopped:
+                return False
+            remaining = target - self._clock()
+            if remaining <= 0:
+                return True
+            if self._sleep(remaining) is True:
+                if self._stopped:
+                    return False
+                self._interrupt.clear()
+                if wakeable:
+                    return True
+
+    def pause_until(self, target: float) -> bool:
+        """Block until `target` (or wake()), then realign ticks from there.
+
+        Used to sleep through closed market sessions instead of ticking through them.
+        Returns False if the scheduler was stopped.
+        """
+        if not self._sleep_until(target, wakeable=True):
+            return False
+        self._next = None
+        self._last_fired = None
+        return True
+
+    def wait_next(self) -> Optional[Tick]:
+        """Block until the next tick is due and return it (None once stopped)"""
+        now = self._clock()
+        if self._last_fired is not None:
+            with self._stats_lock:
+                self._durations.append(now - self._last_fired)
+
+        if self._next is None:
+            self._next = self.next_boundary(now)
+
+        missed = 0
+        coalesced = False
+        if now >= self._next:
+            # The previous tick's work ran past one or more boundaries
+            passed = math.floor((now - self._next) / self.interval) + 1
+            self.overruns += 1
+            if self.overrun_policy == OVERRUN_COALESCE:
+                scheduled = self._next + (passed - 1) * self.interval
+                missed = passed - 1
+                coalesced = True
+            else:
+                scheduled = self._next + passed * self.interval
+                missed = passed
+        else:
+            scheduled = self._next
+
+        if missed:
+            self.missed_ticks += missed
+            self._missed_metric.inc(missed)
+
+        if not coalesced and not self._sleep_until(scheduled):
+            return None
+        if self._stopped:
+            return None
+
+        fired = self._clock()
+        tick = Tick(scheduled, fired, self._last_scheduled, missed, coalesced)
+        self._last_scheduled = scheduled
+        self._last_fired = fired
+        # Recompute from the boundary index so float error never accumulates
+        self._next = self.offset + (round((scheduled - self.offset) / self.interval) + 1) * self.interval
+        self.ticks += 1
+        with self._stats_lock:
+            self._jitters.append(tick.jitter)
+        self._jitter_metric.observe(max(0.0, tick.jitter))
+        return tick
+
+    def run(self, fn: Callable[[Tick], None]):
+        """Call `fn(tick)` on every tick until stop() is called"""
+        while True:
+            tick = self.wait_next()
+            if tick is None:
+                return
+            fn(tick)
+
+    def get_stats(self) -> Dict:
+        """Per-tick jitter and duration statistics (milliseconds)"""
+        with self._stats_lock:
+            jitters = sorted(self._jitters)
+            durations = sorted(self._durations)
+        return {
+            "name": self.name,
+            "interval_seconds": self.interval,
+            "overrun_policy": self.overrun_policy,
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "missed_ticks": self.missed_ticks,
+            "jitter_ms": {
+                "mean": round(sum(jitters) / len(jitters) * 1000, 3) if jitters else 0.0,
+                "p50": round(_percentile(jitters, 0.50) * 1000, 3),
+                "p95": round(_percentile(jitters, 0.95) * 1000, 3),
+                "p99": round(_percentile(jitters, 0.99) * 1000, 3),
+                "max": round(jitters[-1] * 1000, 3) if jitters else 0.0,
+            },
+            "tick_duration_ms": {
+                "p50": round(_percentile(durations, 0.50) * 1000, 3),
+                "p95": round(_percentile(durations, 0.95) * 1000, 3),
+                "max": round(durations[-1] * 1000, 3) if durations else 0.0,
+            },
+            "next_tick_at": self._next,
+        }
+
+
+# Registry of live schedulers by name, for /scheduler-stats
+_schedulers: Dict[str, TickScheduler] = {}
+
+
+def get_scheduler_stats() -> Dict[str, Dict]:
+    """Stats for every scheduler created in this process"""
+    return {name: scheduler.get_stats() for name, scheduler in list(_schedulers.items())}
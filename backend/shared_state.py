@@ -0,0 +1,305 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from metrics import InstrumentedLock, registry as metrics_registry
+
+# TradingState attributes every worker must agree on
+SHARED_FIELDS = ("running", "cash", "positions", "trades", "performance_metrics",
+                 "strategy_config", "bot_schedule", "watchlist", "real_bot_user")
+
+# Append-only and unbounded: kept as one row per trade instead of a JSON blob
+TRADES_FIELD = "trades"
+TRADES_EPOCH = "_trades_epoch"  # bumped when the list is rewritten rather than appended to
+
+TRADING_LEASE = "trading_loop"
+DEFAULT_LEASE_TTL = 15.0
+
+LEADER_CHANGES = metrics_registry.counter(
+    "trading_leader_changes_total", "Times this worker gained or lost the trading-loop lease", ("event",))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    field TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS trades (
+    seq INTEGER PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=10)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class SharedStateLock:
+    """Drop-in for TradingState.lock that keeps the shared fields in SQLite.
+
+    Entering starts a BEGIN IMMEDIATE transaction, so one worker at a time
+    holds the lock across processes, and reloads the fields only if another
+    process committed since we last looked (PRAGMA data_version). Leaving
+    writes back the fields whose JSON changed and commits. Trades are rows
+    keyed by position: leaving inserts only the ones appended since, and
+    entering loads only the ones other workers appended. Code that already
+    reads and mutates TradingState under `with state.lock:` is therefore
+    consistent across uvicorn workers without changes.
+    """
+
+    def __init__(self, state, path: str, fields=SHARED_FIELDS):
+        self.state = state
+        self.path = path
+        self.fields = tuple(field for field in fields if field != TRADES_FIELD)
+        self.share_trades = TRADES_FIELD in fields
+        self._local = InstrumentedLock("trading_state")
+        self._conn = _connect(path)
+        self._data_version = None
+        self._saved: Dict[str, str] = {}  # field -> JSON as last loaded or written
+        self._trades = None  # the list object last synced, its length and the epoch it belongs to
+        self._trade_count = 0
+        self._trades_epoch = None
+        self._seed()
+
+    def _seed(self):
+        """First worker publishes its defaults; everyone then loads the shared values"""
+        with self._local:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO state VALUES (?, ?)",
+                    [(field, json.dumps(getattr(self.state, field, None))) for field in self.fields])
+                if self.share_trades:
+                    self._seed_trades()
+                self._load()
+            finally:
+                self._conn.commit()
+
+    def _load(self):
+        for field, value in self._conn.execute("SELECT field, value FROM state"):
+            if field in self.fields and self._saved.get(field) != value:
+                setattr(self.state, field, json.loads(value))
+                self._saved[field] = value
+        if self.share_trades:
+            self._load_trades()
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _seed_trades(self):
+        legacy = self._conn.execute("SELECT value FROM state WHERE field = ?", (TRADES_FIELD,)).fetchone()
+        if legacy is not None:
+            # Files written when trades were one JSON blob
+            self._conn.execute("DELETE FROM state WHERE field = ?", (TRADES_FIELD,))
+            self._write_all_trades(json.loads(legacy[0]))
+        elif self._conn.execute("SELECT 1 FROM trades LIMIT 1").fetchone() is None:
+            self._write_all_trades(self.state.trades)
+
+    def _load_trades(self):
+        row = self._conn.execute("SELECT value FROM state WHERE field = ?", (TRADES_EPOCH,)).fetchone()
+        epoch = row[0] if row else None
+        if epoch != self._trades_epoch or self.state.trades is not self._trades:
+            rows = self._conn.execute("SELECT value FROM trades ORDER BY seq")
+            self.state.trades = [json.loads(value) for value, in rows]
+        else:
+            rows = self._conn.execute("SELECT value FROM trades WHERE seq >= ? ORDER BY seq", (self._trade_count,))
+            self.state.trades.extend(json.loads(value) for value, in rows)
+        self._trades, self._trade_count, self._trades_epoch = self.state.trades, len(self.state.trades), epoch
+
+    def _write_all_trades(self, trades) -> str:
+        """Replace every trade row and bump the epoch so other workers reload the whole list"""
+        self._conn.execute("DELETE FROM trades")
+        self._conn.executemany("INSERT INTO trades VALUES (?, ?)",
+                               [(seq, json.dumps(trade)) for seq, trade in enumerate(trades)])
+        epoch = f"{os.getpid()}:{time.time()}"
+        self._conn.execute("INSERT OR REPLACE INTO state VALUES (?, ?)", (TRADES_EPOCH, epoch))
+        return epoch
+
+    def _save_trades(self) -> Optional[str]:
+        """Write trades appended since the last sync; returns the new epoch if the list was rewritten"""
+        trades = self.state.trades
+        if trades is self._trades and len(trades) >= self._trade_count:
+            if len(trades) > self._trade_count:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO trades VALUES (?, ?)",
+                    [(seq, json.dumps(trades[seq])) for seq in range(self._trade_count, len(trades))])
+            return self._trades_epoch
+        # The list was replaced or shortened: appends alone cannot express that
+        return self._write_all_trades(trades)
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        if not self._local.acquire(blocking, timeout):
+            return False
+        try:
+            self._conn.execute("BEGIN IMMEDIATE")
+            if self._conn.execute("PRAGMA data_version").fetchone()[0] != self._data_version:
+                self._load()
+        except BaseException:
+            if self._conn.in_transaction:
+                self._conn.rollback()
+            self._local.release()
+            raise
+        return True
+
+    def release(self):
+        try:
+            changed = []
+            for field in self.fields:
+                value = json.dumps(getattr(self.state, field, None))
+                if value != self._saved.get(field):
+                    changed.append((field, value))
+            if changed:
+                self._conn.executemany("INSERT OR REPLACE INTO state VALUES (?, ?)", changed)
+            epoch = self._save_trades() if self.share_trades else None
+            self._conn.commit()
+            self._saved.update(changed)
+            if self.share_trades:
+                self._trades, self._trade_count = self.state.trades, len(self.state.trades)
+                self._trades_epoch = epoch
+        finally:
+            self._local.release()
+
+    def locked(self) -> bool:
+        return self._local.locked()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+class LeaderLease:
+    """Lease-based leader election over the shared SQLite file.
+
+    The holder renews every ttl/3 from a background thread; if it dies or
+    stalls, the lease expires and another worker takes over within one
+    renewal period. `is_leader` turns false locally before the lease can
+    expire for others, so two workers never both think they lead.
+    """
+
+    def __init__(self, path: str, name: str = TRADING_LEASE, ttl: float = DEFAULT_LEASE_TTL,
+                 holder: Optional[str] = None, on_renew: Optional[Callable[[bool], None]] = None,
+                 clock: Callable[[], float] = time.time):
+        self.path = path
+        self.name = name
+        self.ttl = ttl
+        self.holder = holder or f"{socket.gethostname()}:{os.getpid()}"
+        self.on_renew = on_renew  # called with is_leader after every renewal attempt
+        self.clock = clock
+        self._conn = _connect(path)
+        self._conn_lock = threading.Lock()
+        self._valid_until = 0.0  # monotonic deadline of our own lease
+        self._leader = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._leader and time.monotonic() < self._valid_until
+
+    def try_acquire(self) -> bool:
+        """Take or renew the lease if it is free, expired or already ours"""
+        started = time.monotonic()
+        with self._conn_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = self.clock()
+                row = self._conn.execute("SELECT holder, expires_at FROM leases WHERE name = ?",
+                                         (self.name,)).fetchone()
+                acquired = row is None or row[0] == self.holder or row[1] < now
+                if acquired:
+                    self._conn.execute("INSERT OR REPLACE INTO leases VALUES (?, ?, ?)",
+                                       (self.name, self.holder, now + self.ttl))
+            finally:
+                self._conn.commit()
+        if acquired:
+            # Measured from before the write, and short of the ttl, so we stop first
+            self._valid_until = started + self.ttl * 0.8
+        self._set_leader(acquired)
+        return acquired
+
+    def release(self):
+        with self._conn_lock:
+            self._conn.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (self.name, self.holder))
+        self._valid_until = 0.0
+        self._set_leader(False)
+
+    def current_holder(self) -> Optional[str]:
+        with self._conn_lock:
+            row = self._conn.execute("SELECT holder, expires_at FROM leases WHERE name = ?", (self.name,)).fetchone()
+        return row[0] if row and row[1] >= self.clock() else None
+
+    def _set_leader(self, leader: bool):
+        changed = leader != self._leader
+        self._leader = leader
+        if changed:
+            LEADER_CHANGES.labels("acquired" if leader else "lost").inc()
+            print(f"Trading lease {self.name}: {self.holder} {'acquired' if leader else 'lost'} leadership")
+        if self.on_renew is not None:
+            try:
+                self.on_renew(leader)
+            except Exception as e:
+                # A failing callback must not stop the renewals that keep the lease
+                print(f"Trading lease callback failed: {e}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.try_acquire()
+            except sqlite3.Error as e:
+                print(f"Trading lease renewal failed: {e}")
+                self._set_leader(self.is_leader)
+            except Exception as e:
+                print(f"Trading lease renewal failed unexpectedly: {e}")
+                self._set_leader(self.is_leader)
+            self._stop.wait(self.ttl / 3)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"lease-{self.name}")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self.release()
+
+
+# Lease of this worker in shared-state mode; None when running as a single process
+trading_lease: Optional[LeaderLease] = None
+
+
+def is_trading_leader() -> bool:
+    """Whether this worker should run the trading loops"""
+    return trading_lease is None or trading_lease.is_leader
+
+
+def configure_shared_state(state, path: Optional[str] = None,
+                           on_renew: Optional[Callable[[bool], None]] = None) -> Optional[LeaderLease]:
+    """Share `state` through SQLite and start competing for the trading lease.
+
+    Enabled by SHARED_STATE_PATH (or `path`); a no-op returning None otherwise.
+    """
+    global trading_lease
+    path = path or os.getenv("SHARED_STATE_PATH")
+    if not path:
+        return None
+    state.lock = SharedStateLock(state, path)
+    ttl = float(os.getenv("TRADING_LEASE_TTL", DEFAULT_LEASE_TTL))
+    trading_lease = LeaderLease(path, ttl=ttl, on_renew=on_renew)
+    trading_lease.start()
+    return trading_lease
@@ -0,0 +1,223 @@
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from candles import candle_aggregator, candle_sources, PAPER_SOURCE
+from metrics import registry as metrics_registry
+
+SIGNAL_STAGE_DURATION = metrics_registry.histogram(
+    "signal_stage_duration_seconds", "Time spent in one signal confirmation stage per batch", ("stage",))
+SIGNAL_STAGE_REJECTS = metrics_registry.counter(
+    "signal_stage_rejects_total", "Signals rejected by a confirmation stage", ("stage",))
+
+# Timeframe used for MACD confirmation when the config does not name one
+DEFAULT_MACD_TIMEFRAME = "15m"
+_TIMEFRAME_TOKEN_RE = re.compile(r"\d+\s*[a-zA-Z]+")
+
+
+class ConfirmationStage:
+    """One filter between signal generation and risk checks.
+
+    `cost` orders the stages (cheapest first) and `needs` names the data
+    providers the stage reads; the pipeline fetches each need once per batch,
+    only for the signals still alive when the stage runs.
+    """
+
+    name = "stage"
+    cost = 1.0
+    needs: Set[str] = set()
+
+    def check(self, signal: Dict, data: Dict[str, Dict]) -> Tuple[bool, str]:
+        raise NotImplementedError
+
+
+class VolumeStage(ConfirmationStage):
+    """Reject signals on symbols whose 24h quote volume is below the threshold"""
+
+    name = "volume"
+    cost = 1.0
+
+    def __init__(self, min_volume: float):
+        self.min_volume = min_volume
+
+    def check(self, signal, data):
+        volume = signal.get('volume_24h')
+        if volume is None:
+            return True, "no volume data"
+        quote_volume = volume * signal['price']
+        if quote_volume < self.min_volume:
+            return False, f"24h volume {quote_volume:.0f} below {self.min_volume}"
+        return True, "volume ok"
+
+
+class MACDStage(ConfirmationStage):
+    """Require the MACD histogram on closed candles to agree with the signal direction"""
+
+    name = "macd"
+    cost = 5.0
+    needs = {"candles"}
+
+    def __init__(self, timeframe: str = DEFAULT_MACD_TIMEFRAME):
+        self.timeframe = timeframe
+
+    def check(self, signal, data):
+        histogram = data["candles"].get((signal_source(signal), signal['symbol'], self.timeframe, "macd"))
+        if histogram is None:
+            return True, "MACD warming up"
+        if signal['action'] == 'buy' and histogram <= 0:
+            return False, f"MACD histogram {histogram:.4f} not bullish"
+        if signal['action'] == 'sell' and histogram >= 0:
+            return False, f"MACD histogram {histogram:.4f} not bearish"
+        return True, "MACD confirms"
+
+
+class TimeframeAlignmentStage(ConfirmationStage):
+    """Require the trend (close vs EMA) on every listed timeframe to match the signal"""
+
+    name = "multi_timeframe"
+    needs = {"candles"}
+
+    def __init__(self, timeframes: List[str], ema_period: int = 20):
+        self.timeframes = timeframes
+        self.ema_period = ema_period
+        self.cost = 5.0 * len(timeframes)
+
+    def check(self, signal, data):
+        for timeframe in self.timeframes:
+            trend = data["candles"].get((signal_source(signal), signal['symbol'], timeframe, "trend"))
+            if trend is None:
+                continue
+            if (signal['action'] == 'buy' and trend < 0) or (signal['action'] == 'sell' and trend > 0):
+                return False, f"{timeframe} trend disagrees"
+        return True, "timeframes aligned"
+
+
+def parse_timeframe_alignment(setting: str) -> List[str]:
+    """Timeframes named in a setting such as "15m + 1h align"; unknown ones are dropped"""
+    timeframes = []
+    for token in _TIMEFRAME_TOKEN_RE.findall(setting or ""):
+        try:
+            timeframes.append(candle_aggregator.resolve(token.replace(" ", "")))
+        except ValueError:
+            continue
+    return timeframes
+
+
+def signal_source(signal: Dict) -> str:
+    """Candle source a signal's indicators are read from; the paper loop's unless the signal names one"""
+    return signal.get('candle_source') or PAPER_SOURCE
+
+
+def candle_provider(signals: List[Dict], stage: ConfirmationStage, values: Dict):
+    """Fill `values` with the indicator readings `stage` needs for the surviving signals' symbols.
+
+    Readings are keyed by (source, symbol, timeframe, kind) and computed once
+    per batch even when several stages share them.
+    """
+    series = {(signal_source(signal), signal['symbol']) for signal in signals}
+    if isinstance(stage, MACDStage):
+        for source, symbol in series:
+            key = (source, symbol, stage.timeframe, "macd")
+            if key not in values:
+                values[key] = candle_sources.get(source).indicator("macd", symbol, stage.timeframe, line="histogram")
+    elif isinstance(stage, TimeframeAlignmentStage):
+        for source, symbol in series:
+            candles = candle_sources.get(source)
+            for timeframe in stage.timeframes:
+                key = (source, symbol, timeframe, "trend")
+                if key in values:
+                    continue
+                ema = candles.indicator("ema", symbol, timeframe, period=stage.ema_period)
+                closes = candles.closes(symbol, timeframe, 1)
+                values[key] = None if ema is None or not closes else closes[-1] - ema
+
+
+DATA_PROVIDERS: Dict[str, Callable[[List[Dict], ConfirmationStage, Dict], None]] = {
+    "candles": candle_provider,
+}
+
+
+class SignalPipeline:
+    """Runs signals through confirmation stages, cheapest first, dropping a signal at its first rejection"""
+
+    def __init__(self, stages: List[ConfirmationStage]):
+        self.stages = sorted(stages, key=lambda stage: stage.cost)
+
+    def run(self, signals: List[Dict]) -> List[Dict]:
+        """Signals that passed every stage; rejected ones are recorded in the stats"""
+        alive = list(signals)
+        data: Dict[str, Dict] = {}
+        for stage in self.stages:
+            if not alive:
+                break
+            start = time.perf_counter()
+            for need in stage.needs:
+                # One batched fetch per stage, only for signals that survived the cheaper stages
+                DATA_PROVIDERS[need](alive, stage, data.setdefault(need, {}))
+            passed = []
+            for signal in alive:
+                ok, reason = stage.check(signal, data)
+                if ok:
+                    passed.append(signal)
+                else:
+                    signal['rejected_by'] = stage.name
+                    signal['reject_reason'] = reason
+            elapsed = time.perf_counter() - start
+            pipeline_stats.record(stage.name, len(alive), len(alive) - len(passed), elapsed)
+            SIGNAL_STAGE_DURATION.labels(stage.name).observe(elapsed)
+            if len(passed) < len(alive):
+                SIGNAL_STAGE_REJECTS.labels(stage.name).inc(len(alive) - len(passed))
+            alive = passed
+        return alive
+
+
+def build_pipeline(confirmation: Optional[Dict[str, Any]]) -> SignalPipeline:
+    """Pipeline for a SignalConfirmationConfig dict; no config means no stages"""
+    stages: List[ConfirmationStage] = []
+    if not confirmation:
+        return SignalPipeline(stages)
+    min_volume = confirmation.get("min_volume_threshold") or 0
+    if min_volume > 0:
+        stages.append(VolumeStage(min_volume))
+    timeframes = parse_timeframe_alignment(confirmation.get("multi_timeframe_confirmation", ""))
+    if confirmation.get("macd_confirmation"):
+        stages.append(MACDStage(timeframes[0] if timeframes else DEFAULT_MACD_TIMEFRAME))
+    if timeframes:
+        stages.append(TimeframeAlignmentStage(timeframes))
+    return SignalPipeline(stages)
+
+
+def confirm_signals(signals: List[Dict], strategy_config: Dict) -> List[Dict]:
+    """Apply the strategy's signal_confirmation settings to a batch of signals"""
+    if not signals:
+        return signals
+    return build_pipeline(strategy_config.get("signal_confirmation")).run(signals)
+
+
+class PipelineStats:
+    """Per-stage counters for /signal-pipeline-stats"""
+
+    def __init__(self):
+        self._stages: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seen: int, rejected: int, seconds: float):
+        with self._lock:
+            stats = self._stages.setdefault(stage, {"runs": 0, "seen": 0, "rejected": 0, "total_seconds": 0.0})
+            stats["runs"] += 1
+            stats["seen"] += seen
+            stats["rejected"] += rejected
+            stats["total_seconds"] += seconds
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                stage: dict(stats,
+                            reject_rate=stats["rejected"] / stats["seen"] if stats["seen"] else 0.0,
+                            avg_ms=stats["total_seconds"] / stats["runs"] * 1000 if stats["runs"] else 0.0)
+                for stage, stats in self._stages.items()
+            }
+
+
+pipeline_stats = PipelineStats()
@@ -0,0 +1,105 @@
+import builtins
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+
+def _process_age_ms() -> Optional[float]:
+    """Milliseconds since the interpreter process started (Linux only)"""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return (uptime - start_ticks / os.sysconf("SC_CLK_TCK")) * 1000
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupProfile:
+    """Where cold-start time goes: main.py's imports and each startup step.
+
+    start_imports() wraps __import__ until stop_imports(), timing each module
+    imported directly by main (inclusive of what it pulls in); nested imports
+    are folded into their parent. step() times init work such as restoring
+    state or starting the trading loop, and ready() marks when the app could
+    first answer /health.
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.interpreter_ms = _process_age_ms()  # time spent before this module was imported
+        self.imports: List[Dict[str, Any]] = []
+        self.steps: List[Dict[str, Any]] = []
+        self.ready_ms: Optional[float] = None
+        self._original_import = None
+        self._depth = threading.local()
+
+    def _elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self.origin) * 1000, 2)
+
+    def start_imports(self):
+        if self._original_import is not None:
+            return
+        original = self._original_import = builtins.__import__
+        profile = self
+
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            depth = getattr(profile._depth, "value", 0)
+            top = name.partition(".")[0]
+            if depth or level or top in sys.modules:
+                profile._depth.value = depth + 1
+                try:
+                    return original(name, globals, locals, fromlist, level)
+                finally:
+                    profile._depth.value = depth
+            start = time.perf_counter()
+            profile._depth.value = 1
+            try:
+                return original(name, globals, locals, fromlist, level)
+            finally:
+                profile._depth.value = 0
+                profile.imports.append({"module": name, "ms": round((time.perf_counter() - start) * 1000, 2)})
+
+        builtins.__import__ = timed_import
+
+    def stop_imports(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    @contextmanager
+    def step(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps.append({"step": name, "ms": round((time.perf_counter() - start) * 1000, 2)})
+
+    def ready(self):
+        if self.ready_ms is None:
+            self.ready_ms = self._elapsed_ms()
+
+    def report(self) -> Dict[str, Any]:
+        imports = sorted(self.imports, key=lambda item: item["ms"], reverse=True)
+        return {
+            "interpreter_ms": None if self.interpreter_ms is None else round(self.interpreter_ms, 2),
+            "imports_ms": round(sum(item["ms"] for item in self.imports), 2),
+            "imports": imports,
+            "steps": list(self.steps),
+            "ready_ms": self.ready_ms,
+        }
+
+    def summary(self, top: int = 5) -> str:
+        report = self.report()
+        slowest = ", ".join(f"{item['module']} {item['ms']:.0f}ms" for item in report["imports"][:top])
+        steps = ", ".join(f"{item['step']} {item['ms']:.1f}ms" for item in report["steps"])
+        return (f"Startup: ready after {report['ready_ms']}ms (imports {report['imports_ms']}ms: {slowest}; "
+                f"steps: {steps or 'none'})")
+
+
+# Created on import, so import this module first to time everything after it
+startup_profile = StartupProfile()
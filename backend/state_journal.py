@@ -0,0 +1,235 @@
+import glob
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from metrics import registry as metrics_registry
+
+# TradingState attributes captured by snapshots and restored on startup
+PERSISTED_FIELDS = ("running", "cash", "positions", "trades", "performance_metrics",
+                    "strategy_config", "bot_schedule", "watchlist")
+
+SNAPSHOT_FILE = "state-snapshot.json"
+WAL_PATTERN = "state-wal-*.log"
+
+JOURNAL_BATCH_SIZE = metrics_registry.histogram(
+    "state_journal_batch_records", "WAL records written per group commit", (),
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 1000))
+JOURNAL_COMMIT_DURATION = metrics_registry.histogram(
+    "state_journal_commit_seconds", "Time to write and fsync one WAL batch", ())
+
+
+def _wal_path(directory: str, first_lsn: int) -> str:
+    return os.path.join(directory, f"state-wal-{first_lsn:012d}.log")
+
+
+def _segments(directory: str) -> List[str]:
+    return sorted(glob.glob(os.path.join(directory, WAL_PATTERN)))
+
+
+def apply_record(state, record: Dict[str, Any]):
+    """Re-apply one WAL record to a TradingState"""
+    op = record["op"]
+    if op == "set":
+        setattr(state, record["field"], record["value"])
+    elif op == "trade":
+        state.positions[record["symbol"]] = record["position"]
+        state.cash = record["cash"]
+        state.trades.append(record["trade"])
+        state.performance_metrics = record["performance_metrics"]
+    else:
+        raise ValueError(f"Unknown WAL op: {op}")
+
+
+class StateJournal:
+    """Crash recovery for TradingState: periodic snapshots plus a write-ahead log.
+
+    record() only serializes the mutation and appends it to an in-memory
+    queue; a background thread writes everything queued since its last pass
+    with a single write and fsync (group commit). Every `snapshot_interval`
+    seconds the writer captures the persisted fields under the state lock,
+    starts a new WAL segment and replaces the snapshot file, then deletes the
+    segments the snapshot covers. restore() loads the snapshot and replays
+    the records after its sequence number.
+    """
+
+    def __init__(self, snapshot_interval: float = 60.0, commit_interval: float = 0.05, fsync: bool = True):
+        self.snapshot_interval = snapshot_interval
+        self.commit_interval = commit_interval
+        self.fsync = fsync
+        self.directory: Optional[str] = None
+        self.state = None
+        self._lsn = 0  # sequence number of the last record handed out
+        self._durable_lsn = 0  # last sequence number written (and fsynced)
+        self._pending: List[Tuple[int, str]] = []
+        self._cond = threading.Condition()
+        self._segment = None
+        self._since_snapshot = 0
+        self._last_snapshot = time.monotonic()
+        self._stop = False
+        self._thread = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    def open(self, directory: str, state) -> Dict[str, Any]:
+        """Restore `state` from `directory` and start journaling into it"""
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.state = state
+        result = self.restore(state)
+        self._segment = open(_wal_path(directory, self._lsn + 1), "a")
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, daemon=True, name="state-journal")
+        self._thread.start()
+        return result
+
+    def restore(self, state) -> Dict[str, Any]:
+        """Load the latest snapshot, then replay the WAL tail; stops at a torn final record"""
+        start = time.perf_counter()
+        snapshot_lsn = 0
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path) as f:
+                snapshot = json.load(f)
+            snapshot_lsn = snapshot["lsn"]
+            for field, value in snapshot["state"].items():
+                setattr(state, field, value)
+        lsn = snapshot_lsn
+        replayed = 0
+        for path in _segments(self.directory):
+            with open(path, "rb+") as f:
+                good = 0
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("unterminated record")
+                        record = json.loads(line)
+                    except ValueError:
+                        # Crash mid-write: drop the torn tail so new records start on a clean line
+                        f.truncate(good)
+                        break
+                    good += len(line)
+                    if record["lsn"] <= snapshot_lsn:
+                        continue
+                    apply_record(state, record)
+                    lsn = record["lsn"]
+                    replayed += 1
+        self._lsn = self._durable_lsn = lsn
+        return {"snapshot_lsn": snapshot_lsn, "replayed": replayed, "lsn": lsn,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 2)}
+
+    def _append(self, record: Dict[str, Any]):
+        with self._cond:
+            self._lsn += 1
+            record["lsn"] = self._lsn
+            self._pending.append((self._lsn, json.dumps(record, separators=(",", ":"))))
+            self._cond.notify()
+
+    def record_field(self, field: str, value: Any):
+        """Log that a TradingState field was set; call with the state lock held"""
+        if self.directory is not None:
+            self._append({"op": "set", "field": field, "value": value})
+
+    def record_trade(self, symbol: str, position: Dict[str, Any], cash: float, trade: Dict[str, Any],
+                     performance_metrics: Dict[str, Any]):
+        """Log a mock trade with the position, cash and totals it produced; call with the state lock held"""
+        if self.directory is not None:
+            self._append({"op": "trade", "symbol": symbol, "position": position, "cash": cash,
+                          "trade": trade, "performance_metrics": performance_metrics})
+
+    def _write(self, batch: List[Tuple[int, str]]):
+        if not batch:
+            return
+        with JOURNAL_COMMIT_DURATION.time():
+            self._segment.write("".join(line + "\n" for _, line in batch))
+            self._segment.flush()
+            if self.fsync:
+                os.fsync(self._segment.fileno())
+        JOURNAL_BATCH_SIZE.observe(len(batch))
+        self._since_snapshot += len(batch)
+        with self._cond:
+            self._durable_lsn = batch[-1][0]
+            self._cond.notify_all()
+
+    def _take(self) -> List[Tuple[int, str]]:
+        with self._cond:
+            lines, self._pending = self._pending, []
+        return lines
+
+    def snapshot(self):
+        """Write a compact snapshot and drop the WAL segments it covers"""
+        with self.state.lock:
+            with self._cond:
+                lsn = self._lsn
+                lines, self._pending = self._pending, []
+            payload = json.dumps({"lsn": lsn, "state": {f: getattr(self.state, f) for f in PERSISTED_FIELDS}},
+                                 separators=(",", ":"))
+        # Records up to lsn go to the old segment, so every older segment is covered by the snapshot
+        self._write(lines)
+        old_segments = _segments(self.directory)
+        self._segment.close()
+        self._segment = open(_wal_path(self.directory, lsn + 1), "a")
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        current = os.path.abspath(self._segment.name)
+        for segment in old_segments:
+            if os.path.abspath(segment) != current:
+                os.remove(segment)
+        self._since_snapshot = 0
+        self._last_snapshot = time.monotonic()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._pending and not self._stop:
+                    self._cond.wait(self.commit_interval)
+                stop = self._stop
+            try:
+                self._write(self._take())
+                if self._since_snapshot and time.monotonic() - self._last_snapshot >= self.snapshot_interval:
+                    self.snapshot()
+            except OSError as e:
+                print(f"State journal write failed: {e}")
+            if stop:
+                return
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until everything recorded so far is on disk"""
+        with self._cond:
+            target = self._lsn
+            return self._cond.wait_for(lambda: self._durable_lsn >= target or self._thread is None, timeout)
+
+    def close(self):
+        if self._thread is None:
+            return
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        self._thread.join(timeout=5)
+        self._segment.close()
+        self._thread = None
+        self.directory = None
+
+
+# Global journal; opened at startup when STATE_DIR is set
+state_journal = StateJournal(snapshot_interval=float(os.getenv("STATE_SNAPSHOT_INTERVAL", 60)))
+
+
+def open_state_journal(state, directory: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Restore and journal `state` under STATE_DIR (or `directory`); a no-op returning None otherwise"""
+    directory = directory or os.getenv("STATE_DIR")
+    if not directory:
+        return None
+    result = state_journal.open(directory, state)
+    print(f"Restored trading state from {directory}: snapshot lsn {result['snapshot_lsn']} "
+          f"+ {result['replayed']} WAL records in {result['duration_ms']} ms")
+    return result
@@ -0,0 +1,496 @@
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from metrics import FILE_IO_DURATION
+
+USERS_FILE = "users.json"
+USER_DATA_DIR = "user_data"
+DEFAULT_SQLITE_PATH = "trading.db"
+
+# Shared JSON documents; the JSON backend keeps each one in <name>.json
+DOCUMENTS = ("strategy_templates", "saved_strategies", "custom_strategies", "ultimate_roi_strategy")
+
+
+class StorageConflict(Exception):
+    """Raised when a unique user field (email or username) is already taken"""
+
+    def __init__(self, field: str):
+        super().__init__(f"{field} already exists")
+        self.field = field
+
+
+class Storage(ABC):
+    """Persistence for users, per-user documents and the shared JSON documents.
+
+    User records are plain dicts with created_at as an ISO string. A user
+    document is a dict of top-level sections ("strategies", "risk_management",
+    ...), and update_user_data() writes only the sections it is given.
+    Changes that depend on a section's current value go through
+    update_section(), which reads and writes it in one transaction.
+    Versions change on every write and feed the response cache's ETags.
+    """
+
+    @abstractmethod
+    def get_user(self, email: str) -> Optional[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    def get_user_by_username(self, username: str) -> Optional[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    def load_users(self) -> Dict[str, Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    def save_users(self, users: Dict[str, Dict[str, Any]]):
+        pass
+
+    @abstractmethod
+    def create_user(self, record: Dict[str, Any]):
+        """Insert a user; raises StorageConflict if the email or username exists"""
+        pass
+
+    @abstractmethod
+    def get_user_data(self, email: str) -> Optional[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    def save_user_data(self, email: str, data: Dict[str, Any]):
+        pass
+
+    @abstractmethod
+    def update_user_data(self, email: str, sections: Dict[str, Any], defaults: Optional[Dict[str, Any]] = None):
+        """Write the given sections; `defaults` seeds a document that does not exist yet"""
+        pass
+
+    @abstractmethod
+    def update_section(self, email: str, section: str, fn: Callable[[Any], Any],
+                       defaults: Optional[Dict[str, Any]] = None, sections: Optional[Dict[str, Any]] = None) -> Any:
+        """Atomically replace one section with `fn(current value)` and return it.
+
+        `fn` gets a private copy of the section (None when missing); `sections`
+        are written in the same transaction, and `defaults` seeds a document
+        that does not exist yet.
+        """
+        pass
+
+    @abstractmethod
+    def delete_user_data(self, email: str):
+        pass
+
+    @abstractmethod
+    def user_data_version(self, email: str) -> Tuple:
+        pass
+
+    @abstractmethod
+    def get_document(self, name: str, default: Any = None) -> Any:
+        pass
+
+    @abstractmethod
+    def put_document(self, name: str, value: Any):
+        pass
+
+    @abstractmethod
+    def document_version(self, name: str) -> Tuple:
+        pass
+
+    def close(self):
+        pass
+
+
+def _stat_version(path: str) -> Tuple[int, int]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return (0, 0)
+    return (st.st_mtime_ns, st.st_size)
+
+
+class JSONStorage(Storage):
+    """The original file layout: users.json, user_data/<email>.json and <document>.json.
+
+    Every write rewrites a whole file, so this is only safe for one process.
+    """
+
+    def __init__(self, base_dir: str = "."):
+        self.base_dir = base_dir
+        self.users_file = os.path.join(base_dir, USERS_FILE)
+        self.data_dir = os.path.join(base_dir, USER_DATA_DIR)
+        self._versions: Dict[str, int] = {}  # user -> writes made by this process
+        self._lock = threading.RLock()
+        os.makedirs(self.data_dir, exist_ok=True)
+
+    def _read(self, path: str, store: str, default: Any = None) -> Any:
+        if not os.path.exists(path):
+            return default
+        try:
+            with FILE_IO_DURATION.labels(store, "read").time():
+                with open(path, 'r') as f:
+                    return json.load(f)
+        except Exception:
+            return default
+
+    def _write(self, path: str, store: str, value: Any):
+        with FILE_IO_DURATION.labels(store, "write").time():
+            with open(path, 'w') as f:
+                json.dump(value, f, indent=2)
+
+    def user_data_file(self, email: str) -> str:
+        """Path of a user's document"""
+        safe_email = email.replace('@', '_at_').replace('.', '_')
+        return os.path.join(self.data_dir, f"{safe_email}.json")
+
+    def get_user(self, email: str) -> Optional[Dict[str, Any]]:
+        return self.load_users().get(email)
+
+    def get_user_by_username(self, username: str) -> Optional[Dict[str, Any]]:
+        for record in self.load_users().values():
+            if record.get("username") == username:
+                return record
+        return None
+
+    def load_users(self) -> Dict[str, Dict[str, Any]]:
+        return self._read(self.users_file, "users", {})
+
+    def save_users(self, users: Dict[str, Dict[str, Any]]):
+        with self._lock:
+            self._write(self.users_file, "users", users)
+
+    def create_user(self, record: Dict[str, Any]):
+        with self._lock:
+            users = self.load_users()
+            if record["email"] in users:
+                raise StorageConflict("email")
+            if any(u.get("username") == record["username"] for u in users.values()):
+                raise StorageConflict("username")
+            users[record["email"]] = record
+            self._write(self.users_file, "users", users)
+
+    def get_user_data(self, email: str) -> Optional[Dict[str, Any]]:
+        return self._read(self.user_data_file(email), "user_data")
+
+    def save_user_data(self, email: str, data: Dict[str, Any]):
+        with self._lock:
+            self._write(self.user_data_file(email), "user_data", data)
+            self._versions[email] = self._versions.get(email, 0) + 1
+
+    def update_user_data(self, email: str, sections: Dict[str, Any], defaults: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            data = self.get_user_data(email)
+            if data is None:
+                data = dict(defaults or {})
+            data.update(sections)
+            self.save_user_data(email, data)
+
+    def update_section(self, email: str, section: str, fn: Callable[[Any], Any],
+                       defaults: Optional[Dict[str, Any]] = None, sections: Optional[Dict[str, Any]] = None) -> Any:
+        with self._lock:
+            data = self.get_user_data(email)
+            if data is None:
+                data = json.loads(json.dumps(defaults or {}))
+            value = fn(data.get(section))
+            data[section] = value
+            data.update(sections or {})
+            self.save_user_data(email, data)
+            return value
+
+    def delete_user_data(self, email: str):
+        with self._lock:
+            file_path = self.user_data_file(email)
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            self._versions[email] = self._versions.get(email, 0) + 1
+
+    def user_data_version(self, email: str) -> Tuple:
+        """Changes whenever the document is written, here or by another process"""
+        return (self._versions.get(email, 0),) + _stat_version(self.user_data_file(email))
+
+    def _document_file(self, name: str) -> str:
+        return os.path.join(self.base_dir, f"{name}.json")
+
+    def get_document(self, name: str, default: Any = None) -> Any:
+        return self._read(self._document_file(name), name, default)
+
+    def put_document(self, name: str, value: Any):
+        with self._lock:
+            self._write(self._document_file(name), name, value)
+
+    def document_version(self, name: str) -> Tuple:
+        return _stat_version(self._document_file(name))
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    email TEXT PRIMARY KEY,
+    username TEXT NOT NULL UNIQUE,
+    full_name TEXT,
+    is_active INTEGER NOT NULL DEFAULT 1,
+    created_at TEXT NOT NULL,
+    hashed_password TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS user_data (
+    email TEXT NOT NULL,
+    section TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (email, section)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS user_data_versions (
+    email TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS documents (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+USER_COLUMNS = ("email", "username", "full_name", "is_active", "created_at", "hashed_password")
+SELECT_USERS = f"SELECT {', '.join(USER_COLUMNS)} FROM users"
+
+
+def _user_row(record: Dict[str, Any]) -> Tuple:
+    return (record["email"], record["username"], record.get("full_name"), int(record.get("is_active", True)),
+            record["created_at"], record["hashed_password"])
+
+
+def _user_record(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+    if row is None:
+        return None
+    record = dict(zip(USER_COLUMNS, row))
+    record["is_active"] = bool(record["is_active"])
+    return record
+
+
+class SQLiteStorage(Storage):
+    """SQLite storage in WAL mode, safe to share between worker processes.
+
+    Users are looked up by primary key (email) or the unique username index.
+    A user document is stored one row per section, so updating the risk
+    settings rewrites one small row instead of the whole document with its
+    trade log. Writes run in BEGIN IMMEDIATE transactions and
+    update_section() reads inside its transaction, so concurrent
+    read-modify-write cycles from different processes are serialized.
+    """
+
+    def __init__(self, path: str = DEFAULT_SQLITE_PATH, busy_timeout_ms: int = 5000):
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        """This thread's connection; sqlite3 connections must not be shared across threads"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Write transaction; nested use joins the outer one"""
+        conn = self._conn()
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+    def journal_mode(self) -> str:
+        return self._conn().execute("PRAGMA journal_mode").fetchone()[0]
+
+    # Users
+    def get_user(self, email: str) -> Optional[Dict[str, Any]]:
+        with FILE_IO_DURATION.labels("users", "read").time():
+            row = self._conn().execute(f"{SELECT_USERS} WHERE email = ?", (email,)).fetchone()
+        return _user_record(row)
+
+    def get_user_by_username(self, username: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(f"{SELECT_USERS} WHERE username = ?", (username,)).fetchone()
+        return _user_record(row)
+
+    def load_users(self) -> Dict[str, Dict[str, Any]]:
+        rows = self._conn().execute(SELECT_USERS).fetchall()
+        return {row[0]: _user_record(row) for row in rows}
+
+    def save_users(self, users: Dict[str, Dict[str, Any]]):
+        with FILE_IO_DURATION.labels("users", "write").time():
+            with self.transaction() as conn:
+                conn.execute("DELETE FROM users")
+                conn.executemany("INSERT INTO users VALUES (?, ?, ?, ?, ?, ?)",
+                                 [_user_row(dict(record, email=email)) for email, record in users.items()])
+
+    def create_user(self, record: Dict[str, Any]):
+        with FILE_IO_DURATION.labels("users", "write").time():
+            with self.transaction() as conn:
+                if conn.execute("SELECT 1 FROM users WHERE email = ?", (record["email"],)).fetchone():
+                    raise StorageConflict("email")
+                if conn.execute("SELECT 1 FROM users WHERE username = ?", (record["username"],)).fetchone():
+                    raise StorageConflict("username")
+                conn.execute("INSERT INTO users VALUES (?, ?, ?, ?, ?, ?)", _user_row(record))
+
+    # User documents
+    def get_user_data(self, email: str) -> Optional[Dict[str, Any]]:
+        with FILE_IO_DURATION.labels("user_data", "read").time():
+            rows = self._conn().execute("SELECT section, value FROM user_data WHERE email = ?", (email,)).fetchall()
+        if not rows:
+            return None
+        return {section: json.loads(value) for section, value in rows}
+
+    def _bump_user_version(self, conn: sqlite3.Connection, email: str):
+        conn.execute("INSERT INTO user_data_versions VALUES (?, 1) "
+                     "ON CONFLICT(email) DO UPDATE SET version = version + 1", (email,))
+
+    def _put_sections(self, conn: sqlite3.Connection, email: str, sections: Dict[str, Any]):
+        conn.executemany("INSERT OR REPLACE INTO user_data VALUES (?, ?, ?)",
+                         [(email, section, json.dumps(value)) for section, value in sections.items()])
+
+    def save_user_data(self, email: str, data: Dict[str, Any]):
+        with FILE_IO_DURATION.labels("user_data", "write").time():
+            with self.transaction() as conn:
+                conn.execute("DELETE FROM user_data WHERE email = ?", (email,))
+                self._put_sections(conn, email, data)
+                self._bump_user_version(conn, email)
+
+    def update_user_data(self, email: str, sections: Dict[str, Any], defaults: Optional[Dict[str, Any]] = None):
+        with FILE_IO_DURATION.labels("user_data", "write").time():
+            with self.transaction() as conn:
+                exists = conn.execute("SELECT 1 FROM user_data WHERE email = ? LIMIT 1", (email,)).fetchone()
+                if not exists and defaults:
+                    sections = dict(defaults, **sections)
+                self._put_sections(conn, email, sections)
+                self._bump_user_version(conn, email)
+
+    def update_section(self, email: str, section: str, fn: Callable[[Any], Any],
+                       defaults: Optional[Dict[str, Any]] = None, sections: Optional[Dict[str, Any]] = None) -> Any:
+        with FILE_IO_DURATION.labels("user_data", "write").time():
+            with self.transaction() as conn:
+                row = conn.execute("SELECT value FROM user_data WHERE email = ? AND section = ?",
+                                   (email, section)).fetchone()
+                if row is not None:
+                    current = json.loads(row[0])
+                else:
+                    exists = conn.execute("SELECT 1 FROM user_data WHERE email = ? LIMIT 1", (email,)).fetchone()
+                    if not exists and defaults:
+                        self._put_sections(conn, email, defaults)
+                    current = json.loads(json.dumps((defaults or {}).get(section))) if not exists else None
+                value = fn(current)
+                self._put_sections(conn, email, dict(sections or {}, **{section: value}))
+                self._bump_user_version(conn, email)
+        return value
+
+    def delete_user_data(self, email: str):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM user_data WHERE email = ?", (email,))
+            self._bump_user_version(conn, email)
+
+    def user_data_version(self, email: str) -> Tuple:
+        row = self._conn().execute("SELECT version FROM user_data_versions WHERE email = ?", (email,)).fetchone()
+        return (row[0] if row else 0,)
+
+    # Shared documents
+    def get_document(self, name: str, default: Any = None) -> Any:
+        with FILE_IO_DURATION.labels(name, "read").time():
+            row = self._conn().execute("SELECT value FROM documents WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def put_document(self, name: str, value: Any):
+        with FILE_IO_DURATION.labels(name, "write").time():
+            with self.transaction() as conn:
+                conn.execute("INSERT INTO documents VALUES (?, ?, 1) ON CONFLICT(name) DO UPDATE SET "
+                             "value = excluded.value, version = version + 1", (name, json.dumps(value)))
+
+    def document_version(self, name: str) -> Tuple:
+        row = self._conn().execute("SELECT version FROM documents WHERE name = ?", (name,)).fetchone()
+        return (row[0] if row else 0,)
+
+    # Migration
+    def migrate_from_json(self, source: JSONStorage) -> Dict[str, int]:
+        """Copy users, their documents and the shared documents from JSON files, once per database"""
+        with self.transaction() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated_at'").fetchone():
+                return {}
+            users = source.load_users()
+            conn.executemany("INSERT OR REPLACE INTO users VALUES (?, ?, ?, ?, ?, ?)",
+                             [_user_row(dict(record, email=email)) for email, record in users.items()])
+            migrated = {"users": len(users), "user_data": 0, "documents": 0}
+            for email in users:
+                data = source.get_user_data(email)
+                if data is not None:
+                    self.save_user_data(email, data)
+                    migrated["user_data"] += 1
+            for name in DOCUMENTS:
+                value = source.get_document(name)
+                if value is not None:
+                    self.put_document(name, value)
+                    migrated["documents"] += 1
+            conn.execute("INSERT INTO meta VALUES ('json_migrated_at', ?)", (datetime.utcnow().isoformat(),))
+        return migrated
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+
+def open_storage(backend: Optional[str] = None, path: Optional[str] = None) -> Storage:
+    """Storage selected by STORAGE_BACKEND (json or sqlite) and STORAGE_PATH"""
+    backend = (backend or os.getenv("STORAGE_BACKEND", "json")).lower()
+    if backend == "json":
+        return JSONStorage()
+    if backend == "sqlite":
+        storage = SQLiteStorage(path or os.getenv("STORAGE_PATH", DEFAULT_SQLITE_PATH))
+        migrated = storage.migrate_from_json(JSONStorage())
+        if migrated:
+            print(f"Migrated JSON data to {storage.path}: {migrated}")
+        return storage
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+_storage: Optional[Storage] = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> Storage:
+    """The process-wide storage backend, opened on first use"""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = open_storage()
+    return _storage
+
+
+def set_storage(storage: Storage) -> Optional[Storage]:
+    """Swap the process-wide backend (tests, benchmarks); returns the previous one"""
+    global _storage
+    with _storage_lock:
+        previous, _storage = _storage, storage
+    return previous
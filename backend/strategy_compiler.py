@@ -0,0 +1,592 @@
+"""
+Rule language and compiler for custom strategies.
+
+A custom strategy may carry a "rules" block next to the builder's parameters:
+
+    {
+      "id": "strategy_123", "version": 3,
+      "parameters": [{"name": "oversold", "value": 30}, ...],
+      "rules": {
+        "buy":  {"and": [{"indicator": "rsi", "period": 14, "op": "<", "value": "$oversold"},
+                         {"indicator": "price", "op": ">", "value": {"indicator": "sma", "period": 50}}]},
+        "sell": {"or":  [{"indicator": "rsi", "period": 14, "op": ">", "value": 70},
+                         {"indicator": "momentum", "period": 10, "op": "<", "value": -0.02}]}
+      }
+    }
+
+Each condition compares an indicator against a threshold (a number, a "$name"
+reference to a builder parameter, or another indicator). Conditions combine
+with "and"/"or" groups. compile_strategy() validates the rules once and
+returns a CompiledStrategy that evaluates either incrementally, one tick at a
+time, or over whole NumPy arrays for backtests. Both paths produce identical
+signals.
+"""
+
+import math
+import operator
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+SIGNAL_BUY = 1
+SIGNAL_SELL = -1
+SIGNAL_HOLD = 0
+SIGNAL_NAMES = {SIGNAL_BUY: "buy", SIGNAL_SELL: "sell", SIGNAL_HOLD: "hold"}
+
+COMPARATORS = {
+    "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+    "==": operator.eq, "!=": operator.ne,
+}
+COMPARATOR_ALIASES = {
+    "lt": "<", "below": "<", "le": "<=", "gt": ">", "above": ">", "ge": ">=",
+    "eq": "==", "=": "==", "ne": "!=",
+}
+MAX_PERIOD = 1000
+MAX_RULE_NODES = 200
+
+
+class StrategyValidationError(ValueError):
+    """Raised when a custom strategy's rules cannot be compiled"""
+
+    def __init__(self, errors: List[str]):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+# Recursive filters (EMA, Wilder smoothing) in vectorized form
+def _recursive_filter(x: np.ndarray, alpha: float, y_prev: float) -> np.ndarray:
+    """y[t] = (1 - alpha) * y[t-1] + alpha * x[t], evaluated block-wise with cumsum.
+
+    Within a block y[j] = d^(j+1) * (y_prev + alpha * sum_k x[k] * d^-(k+1)) with
+    d = 1 - alpha. Blocks are sized so d^-len stays below 1e6, which keeps the
+    result within ~1e-10 of the sequential loop.
+    """
+    n = len(x)
+    out = np.empty(n, dtype=float)
+    d = 1.0 - alpha
+    if d <= 0.0:
+        out[:] = x
+        return out
+    block = max(1, int(math.log(1e6) / -math.log(d)))
+    powers = d ** np.arange(1, block + 1)
+    inverse = 1.0 / powers
+    start = 0
+    while start < n:
+        end = min(n, start + block)
+        length = end - start
+        acc = np.cumsum(x[start:end] * inverse[:length])
+        out[start:end] = powers[:length] * (y_prev + alpha * acc)
+        y_prev = out[end - 1]
+        start = end
+    return out
+
+
+def _ema_array(x: np.ndarray, period: int) -> np.ndarray:
+    out = np.full(len(x), np.nan)
+    if len(x) == 0:
+        return out
+    out[:] = _recursive_filter(x, 2.0 / (period + 1), x[0])
+    out[:period - 1] = np.nan
+    return out
+
+
+def _rsi_value(avg_gain: float, avg_loss: float) -> float:
+    if avg_loss == 0.0:
+        return 50.0 if avg_gain == 0.0 else 100.0
+    return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+
+# Indicators: each has a streaming state and a vectorized equivalent
+class _Indicator:
+    """Base class; `defaults` lists the accepted parameters and their default values"""
+
+    defaults: Dict[str, Any] = {}
+
+    def __init__(self, **params):
+        self.params = params
+
+    def stream(self) -> Callable[[float, float], float]:
+        raise NotImplementedError
+
+    def compute(self, prices: np.ndarray, volumes: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+
+class _Price(_Indicator):
+    def stream(self):
+        return lambda price, volume: price
+
+    def compute(self, prices, volumes):
+        return prices
+
+
+class _Volume(_Indicator):
+    def stream(self):
+        return lambda price, volume: volume
+
+    def compute(self, prices, volumes):
+        return volumes
+
+
+class _SMA(_Indicator):
+    defaults = {"period": 20}
+
+    def stream(self):
+        period = self.params["period"]
+        window = deque(maxlen=period)
+
+        def update(price, volume):
+            window.append(price)
+            return sum(window) / period if len(window) == period else math.nan
+        return update
+
+    def compute(self, prices, volumes):
+        period = self.params["period"]
+        out = np.full(len(prices), np.nan)
+        if len(prices) >= period:
+            out[period - 1:] = np.lib.stride_tricks.sliding_window_view(prices, period).mean(axis=1)
+        return out
+
+
+class _EMA(_Indicator):
+    defaults = {"period": 20}
+
+    def stream(self):
+        period = self.params["period"]
+        alpha = 2.0 / (period + 1)
+        state = {"value": None, "count": 0}
+
+        def update(price, volume):
+            state["value"] = price if state["value"] is None else (1 - alpha) * state["value"] + alpha * price
+            state["count"] += 1
+            return state["value"] if state["count"] >= period else math.nan
+        return update
+
+    def compute(self, prices, volumes):
+        return _ema_array(prices, self.params["period"])
+
+
+class _RSI(_Indicator):
+    """Wilder's RSI: simple average of the first `period` changes, then smoothing"""
+
+    defaults = {"period": 14}
+
+    def stream(self):
+        period = self.params["period"]
+        state = {"prev": None, "n": 0, "gain": 0.0, "loss": 0.0}
+
+        def update(price, volume):
+            prev = state["prev"]
+            state["prev"] = price
+            if prev is None:
+                return math.nan
+            change = price - prev
+            gain, loss = max(change, 0.0), max(-change, 0.0)
+            state["n"] += 1
+            if state["n"] <= period:
+                state["gain"] += gain / period
+                state["loss"] += loss / period
+                return _rsi_value(state["gain"], state["loss"]) if state["n"] == period else math.nan
+            state["gain"] = (state["gain"] * (period - 1) + gain) / period
+            state["loss"] = (state["loss"] * (period - 1) + loss) / period
+            return _rsi_value(state["gain"], state["loss"])
+        return update
+
+    def compute(self, prices, volumes):
+        period = self.params["period"]
+        out = np.full(len(prices), np.nan)
+        if len(prices) <= period:
+            return out
+        changes = np.diff(prices)
+        gains = np.maximum(changes, 0.0)
+        losses = np.maximum(-changes, 0.0)
+        seed_gain = gains[:period].sum() / period
+        seed_loss = losses[:period].sum() / period
+        alpha = 1.0 / period
+        avg_gain = np.concatenate(([seed_gain], _recursive_filter(gains[period:], alpha, seed_gain)))
+        avg_loss = np.concatenate(([seed_loss], _recursive_filter(losses[period:], alpha, seed_loss)))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rsi = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+        rsi = np.where(avg_loss == 0.0, np.where(avg_gain == 0.0, 50.0, 100.0), rsi)
+        out[period:] = rsi
+        return out
+
+
+class _Momentum(_Indicator):
+    """Fractional price change over `period` ticks"""
+
+    defaults = {"period": 14}
+
+    def stream(self):
+        period = self.params["period"]
+        window = deque(maxlen=period + 1)
+
+        def update(price, volume):
+            window.append(price)
+            if len(window) <= period or window[0] == 0:
+                return math.nan
+            return (price - window[0]) / window[0]
+        return update
+
+    def compute(self, prices, volumes):
+        period = self.params["period"]
+        out = np.full(len(prices), np.nan)
+        if len(prices) > period:
+            base = prices[:-period]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                out[period:] = np.where(base != 0, (prices[period:] - base) / base, np.nan)
+        return out
+
+
+class _MACD(_Indicator):
+    """MACD line (fast EMA - slow EMA), signal line, or histogram"""
+
+    defaults = {"fast": 12, "slow": 26, "signal": 9, "line": "macd"}
+
+    def stream(self):
+        fast, slow = _EMA(period=self.params["fast"]).stream(), _EMA(period=self.params["slow"]).stream()
+        signal_period = self.params["signal"]
+        signal_alpha = 2.0 / (signal_period + 1)
+        line = self.params["line"]
+        state = {"signal": None, "count": 0}
+
+        def update(price, volume):
+            f, s = fast(price, volume), slow(price, volume)
+            if math.isnan(f) or math.isnan(s):
+                return math.nan
+            macd = f - s
+            state["signal"] = macd if state["signal"] is None else (
+                (1 - signal_alpha) * state["signal"] + signal_alpha * macd)
+            state["count"] += 1
+            if line == "macd":
+                return macd
+            if state["count"] < signal_period:
+                return math.nan
+            return state["signal"] if line == "signal" else macd - state["signal"]
+        return update
+
+    def compute(self, prices, volumes):
+        macd = _EMA(period=self.params["fast"]).compute(prices, volumes) - \
+            _EMA(period=self.params["slow"]).compute(prices, volumes)
+        if self.params["line"] == "macd":
+            return macd
+        out = np.full(len(prices), np.nan)
+        valid = np.flatnonzero(~np.isnan(macd))
+        if len(valid):
+            out[valid[0]:] = _ema_array(macd[valid[0]:], self.params["signal"])
+        return out if self.params["line"] == "signal" else macd - out
+
+
+class _Bollinger(_Indicator):
+    """Bollinger band: SMA +/- k population standard deviations"""
+
+    defaults = {"period": 20, "k": 2.0, "band": "upper"}
+
+    def _sign(self) -> float:
+        return {"upper": 1.0, "lower": -1.0, "middle": 0.0}[self.params["band"]]
+
+    def stream(self):
+        period, k, sign = self.params["period"], self.params["k"], self._sign()
+        window = deque(maxlen=period)
+
+        def update(price, volume):
+            window.append(price)
+            if len(window) < period:
+                return math.nan
+            mean = sum(window) / period
+            std = math.sqrt(sum((p - mean) ** 2 for p in window) / period)
+            return mean + sign * k * std
+        return update
+
+    def compute(self, prices, volumes):
+        period = self.params["period"]
+        out = np.full(len(prices), np.nan)
+        if len(prices) >= period:
+            windows = np.lib.stride_tricks.sliding_window_view(prices, period)
+            out[period - 1:] = windows.mean(axis=1) + self._sign() * self.params["k"] * windows.std(axis=1)
+        return out
+
+
+INDICATORS = {
+    "price": _Price, "volume": _Volume, "sma": _SMA, "ema": _EMA, "rsi": _RSI,
+    "momentum": _Momentum, "macd": _MACD, "bollinger": _Bollinger,
+}
+_CHOICES = {("macd", "line"): ("macd", "signal", "histogram"),
+            ("bollinger", "band"): ("upper", "middle", "lower")}
+
+
+# Validation and compilation
+class _Compiler:
+    """Walks the rule tree once, validating it and deduplicating indicator instances"""
+
+    def __init__(self, parameters: Dict[str, Any]):
+        self.parameters = parameters
+        self.errors: List[str] = []
+        self.indicator_keys: List[Tuple] = []
+        self.indicators: List[_Indicator] = []
+        self.nodes = 0
+
+    def _indicator_slot(self, spec: Dict[str, Any], path: str) -> Optional[int]:
+        name = str(spec.get("indicator", "")).lower()
+        cls = INDICATORS.get(name)
+        if cls is None:
+            self.errors.append(f"{path}.indicator: unknown indicator {spec.get('indicator')!r}; "
+                               f"expected one of {', '.join(INDICATORS)}")
+            return None
+        params = {}
+        for param, default in cls.defaults.items():
+            errors = len(self.errors)
+            value = self._resolve(spec.get(param, default), f"{path}.{param}")
+            if value is None:
+                if len(self.errors) == errors:
+                    self.errors.append(f"{path}.{param}: parameter resolves to null")
+                return None
+            if isinstance(default, str):
+                choices = _CHOICES.get((name, param), ())
+                if value not in choices:
+                    self.errors.append(f"{path}.{param}: must be one of {', '.join(choices)}")
+                    return None
+            elif isinstance(default, int):
+                if (isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value)
+                        or int(value) != value or not 1 <= value <= MAX_PERIOD):
+                    self.errors.append(f"{path}.{param}: must be an integer between 1 and {MAX_PERIOD}")
+                    return None
+                value = int(value)
+            else:
+                if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+                    self.errors.append(f"{path}.{param}: must be a number")
+                    return None
+                value = float(value)
+            params[param] = value
+        if name == "macd" and params["fast"] >= params["slow"]:
+            self.errors.append(f"{path}: macd fast period must be shorter than slow period")
+            return None
+        key = (name,) + tuple(sorted(params.items()))
+        if key not in self.indicator_keys:
+            self.indicator_keys.append(key)
+            self.indicators.append(cls(**params))
+        return self.indicator_keys.index(key)
+
+    def _resolve(self, value: Any, path: str) -> Any:
+        """Replace "$name" references with builder parameter values"""
+        if isinstance(value, str) and value.startswith("$"):
+            if value[1:] not in self.parameters:
+                self.errors.append(f"{path}: unknown parameter reference {value!r}")
+                return None
+            return self.parameters[value[1:]]
+        return value
+
+    def compile_node(self, node: Any, path: str):
+        """Return (stream_predicate, array_predicate) for a rule node"""
+        self.nodes += 1
+        if self.nodes > MAX_RULE_NODES:
+            if self.nodes == MAX_RULE_NODES + 1:
+                self.errors.append(f"rules: more than {MAX_RULE_NODES} nodes")
+            return None
+        if not isinstance(node, dict):
+            self.errors.append(f"{path}: expected an object")
+            return None
+        keys = {str(k).lower(): k for k in node}
+        group = next((g for g in ("and", "or", "all", "any") if g in keys), None)
+        if group is not None:
+            children = node[keys[group]]
+            if not isinstance(children, list) or not children:
+                self.errors.append(f"{path}.{group}: expected a non-empty list")
+                return None
+            compiled = [self.compile_node(child, f"{path}.{group}[{i}]") for i, child in enumerate(children)]
+            if any(c is None for c in compiled):
+                return None
+            streams = [c[0] for c in compiled]
+            arrays = [c[1] for c in compiled]
+            if group in ("and", "all"):
+                return (lambda v: all(p(v) for p in streams),
+                        lambda a: np.logical_and.reduce([p(a) for p in arrays]))
+            return (lambda v: any(p(v) for p in streams),
+                    lambda a: np.logical_or.reduce([p(a) for p in arrays]))
+        return self._compile_condition(node, path)
+
+    def _compile_condition(self, node: Dict[str, Any], path: str):
+        if "indicator" not in node:
+            self.errors.append(f"{path}: expected an indicator condition or an and/or group")
+            return None
+        left = self._indicator_slot(node, path)
+        op_name = str(node.get("op", node.get("comparator", ""))).lower()
+        op_name = COMPARATOR_ALIASES.get(op_name, op_name)
+        op = COMPARATORS.get(op_name)
+        if op is None:
+            self.errors.append(f"{path}.op: unknown comparator {node.get('op')!r}; "
+                               f"expected one of {', '.join(COMPARATORS)}")
+        threshold = self._resolve(node.get("value", node.get("threshold")), f"{path}.value")
+        if left is None or op is None:
+            return None
+
+        if isinstance(threshold, dict):
+            right = self._indicator_slot(threshold, f"{path}.value")
+            if right is None:
+                return None
+            return (lambda v: op(v[left], v[right]),
+                    lambda a: op(a[left], a[right]))
+        if isinstance(threshold, bool) or not isinstance(threshold, (int, float)):
+            self.errors.append(f"{path}.value: expected a number, a $parameter or an indicator")
+            return None
+        threshold = float(threshold)
+        return (lambda v: op(v[left], threshold),
+                lambda a: op(a[left], threshold))
+
+
+class StreamEvaluator:
+    """Incremental evaluator holding indicator state for one symbol"""
+
+    __slots__ = ("_updates", "_values", "_buy", "_sell")
+
+    def __init__(self, compiled: "CompiledStrategy"):
+        self._updates = [indicator.stream() for indicator in compiled.indicators]
+        self._values = [math.nan] * len(self._updates)
+        self._buy = compiled._buy_stream
+        self._sell = compiled._sell_stream
+
+    def update(self, price: float, volume: float = 0.0) -> str:
+        """Feed one tick and return 'buy', 'sell' or 'hold'"""
+        values = self._values
+        for i, update in enumerate(self._updates):
+            values[i] = update(price, volume)
+        buy = self._buy(values) if self._buy else False
+        sell = self._sell(values) if self._sell else False
+        if buy and not sell:
+            return "buy"
+        if sell and not buy:
+            return "sell"
+        return "hold"
+
+
+class CompiledStrategy:
+    """Validated, compiled form of a custom strategy"""
+
+    def __init__(self, strategy_id: str, version: Any, indicators: List[_Indicator],
+                 indicator_keys: List[Tuple], buy, sell, owner: Optional[str] = None):
+        self.owner = owner
+        self.strategy_id = strategy_id
+        self.version = version
+        self.indicators = indicators
+        self.indicator_keys = indicator_keys
+        self._buy_stream, self._buy_array = buy if buy else (None, None)
+        self._sell_stream, self._sell_array = sell if sell else (None, None)
+
+    def stream(self) -> StreamEvaluator:
+        """New incremental evaluator (keep one per symbol)"""
+        return StreamEvaluator(self)
+
+    def evaluate_array(self, prices, volumes=None) -> np.ndarray:
+        """Signals for a whole price series: int8 array of 1 (buy), -1 (sell), 0 (hold)"""
+        prices = np.asarray(prices, dtype=float)
+        volumes = np.zeros_like(prices) if volumes is None else np.asarray(volumes, dtype=float)
+        values = [indicator.compute(prices, volumes) for indicator in self.indicators]
+        false = np.zeros(len(prices), dtype=bool)
+        buy = self._buy_array(values) if self._buy_array else false
+        sell = self._sell_array(values) if self._sell_array else false
+        signals = np.zeros(len(prices), dtype=np.int8)
+        signals[buy & ~sell] = SIGNAL_BUY
+        signals[sell & ~buy] = SIGNAL_SELL
+        return signals
+
+    def evaluate_latest(self, prices, volumes=None) -> str:
+        """Signal for the last element of a price history (stateless callers)"""
+        if prices is None or len(prices) == 0:
+            return "hold"
+        return SIGNAL_NAMES[int(self.evaluate_array(prices, volumes)[-1])]
+
+    @property
+    def warmup(self) -> int:
+        """Ticks needed before every indicator produces a value"""
+        longest = 1
+        for key in self.indicator_keys:
+            params = dict(key[1:])
+            longest = max(longest, params.get("period", 1) + 1, params.get("slow", 0) + params.get("signal", 0))
+        return longest
+
+
+def compute_indicator(name: str, prices, volumes=None, **params) -> np.ndarray:
+    """One built-in indicator over a price series, e.g. compute_indicator("rsi", closes, period=14)"""
+    cls = INDICATORS[name]
+    prices = np.asarray(prices, dtype=float)
+    volumes = np.zeros(len(prices)) if volumes is None else np.asarray(volumes, dtype=float)
+    return cls(**dict(cls.defaults, **params)).compute(prices, volumes)
+
+
+def _parameter_values(strategy: Dict[str, Any]) -> Dict[str, Any]:
+    """Builder parameters ([{name, value}, ...] or {name: value}) as a name -> value dict"""
+    parameters = strategy.get("parameters") or []
+    if isinstance(parameters, dict):
+        return dict(parameters)
+    values = {}
+    for parameter in parameters:
+        if isinstance(parameter, dict) and "name" in parameter:
+            values[parameter["name"]] = parameter.get("value")
+    return values
+
+
+def compile_strategy(strategy: Dict[str, Any]) -> CompiledStrategy:
+    """Validate and compile a custom strategy; raises StrategyValidationError"""
+    rules = strategy.get("rules")
+    if not isinstance(rules, dict):
+        raise StrategyValidationError(["rules: expected an object with 'buy' and/or 'sell' conditions"])
+    if "buy" not in rules and "sell" not in rules:
+        raise StrategyValidationError(["rules: at least one of 'buy' or 'sell' is required"])
+
+    compiler = _Compiler(_parameter_values(strategy))
+    buy = compiler.compile_node(rules["buy"], "rules.buy") if "buy" in rules else None
+    sell = compiler.compile_node(rules["sell"], "rules.sell") if "sell" in rules else None
+    if compiler.errors:
+        raise StrategyValidationError(compiler.errors)
+    return CompiledStrategy(strategy.get("id"), strategy.get("version"),
+                            compiler.indicators, compiler.indicator_keys, buy, sell, owner=strategy.get("owner"))
+
+
+def strategy_key(strategy: Dict[str, Any]) -> Tuple[Any, Any, Any]:
+    """(owner, strategy id, version): ids are chosen by clients, so only the owner makes them unique"""
+    return strategy.get("owner"), strategy.get("id"), strategy.get("version")
+
+
+class CompiledStrategyCache:
+    """LRU cache of compiled strategies keyed by (owner, strategy id, version)"""
+
+    def __init__(self, max_size: int = 512):
+        self.max_size = max_size
+        self._cache: "OrderedDict[Tuple[Any, Any, Any], CompiledStrategy]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, owner: Any, strategy_id: Any, version: Any) -> Optional[CompiledStrategy]:
+        with self._lock:
+            compiled = self._cache.get((owner, strategy_id, version))
+            if compiled is not None:
+                self._cache.move_to_end((owner, strategy_id, version))
+            return compiled
+
+    def put(self, compiled: CompiledStrategy):
+        with self._lock:
+            # Older versions of the same owner's strategy are never needed again
+            for key in [k for k in self._cache if k[:2] == (compiled.owner, compiled.strategy_id)
+                        and k[2] != compiled.version]:
+                del self._cache[key]
+            self._cache[(compiled.owner, compiled.strategy_id, compiled.version)] = compiled
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+    def get_or_compile(self, strategy: Dict[str, Any]) -> CompiledStrategy:
+        """Cached compiled form, compiling on a miss (e.g. after a restart)"""
+        compiled = self.get(*strategy_key(strategy))
+        if compiled is None:
+            compiled = compile_strategy(strategy)
+            self.put(compiled)
+        return compiled
+
+    def invalidate(self, owner: Any, strategy_id: Any):
+        with self._lock:
+            for key in [k for k in self._cache if k[:2] == (owner, strategy_id)]:
+                del self._cache[key]
+
+
+# Global instance
+compiled_strategy_cache = CompiledStrategyCache()
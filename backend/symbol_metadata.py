@@ -0,0 +1,244 @@
+import threading
+import time
+from decimal import Decimal, ROUND_CEILING, ROUND_FLOOR
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+
+from metrics import EXCHANGE_REQUEST_DURATION, EXCHANGE_REQUEST_ERRORS, registry as metrics_registry
+
+REFRESH_INTERVAL = 3600.0  # seconds between background reloads of a loaded exchange
+RETRY_INTERVAL = 30.0  # minimum seconds between attempts after a failed load
+
+SYMBOL_METADATA_LOADS = metrics_registry.counter(
+    "symbol_metadata_loads_total", "Exchange symbol-list loads by outcome", ("exchange", "outcome"))
+
+SYMBOL_LIST_URLS = {
+    ("binance", False): "https://api.binance.com/api/v3/exchangeInfo",
+    ("binance", True): "https://testnet.binance.vision/api/v3/exchangeInfo",
+    ("kucoin", False): "https://api.kucoin.com/api/v2/symbols",
+    ("kucoin", True): "https://sandbox-api.kucoin.com/api/v2/symbols",
+    ("btcc", False): "https://api.btcc.com/api/v1/market/symbols",
+    ("btcc", True): "https://api-testnet.btcc.com/api/v1/market/symbols",
+}
+
+
+class OrderValidationError(ValueError):
+    """Raised when an order breaks the exchange's lot size, tick size or notional rules"""
+
+
+def _decimal(value) -> Optional[Decimal]:
+    if value in (None, ""):
+        return None
+    number = Decimal(str(value))
+    return number if number > 0 else None
+
+
+def _step(value: float, step: Optional[Decimal], rounding) -> float:
+    if step is None:
+        return value
+    return float((Decimal(repr(value)) / step).to_integral_value(rounding) * step)
+
+
+class SymbolInfo:
+    """Trading rules for one exchange symbol, keyed by its canonical BASEQUOTE name"""
+
+    __slots__ = ("exchange", "symbol", "native", "base", "quote", "tick_size", "step_size",
+                 "min_qty", "max_qty", "min_notional", "trading")
+
+    def __init__(self, exchange: str, native: str, base: str, quote: str, tick_size=None, step_size=None,
+                 min_qty=None, max_qty=None, min_notional=None, trading: bool = True):
+        self.exchange = exchange
+        self.native = native
+        self.base = base.upper()
+        self.quote = quote.upper()
+        self.symbol = self.base + self.quote
+        self.tick_size = _decimal(tick_size)
+        self.step_size = _decimal(step_size)
+        self.min_qty = float(min_qty or 0)
+        self.max_qty = float(max_qty) if _decimal(max_qty) else None
+        self.min_notional = float(min_notional or 0)
+        self.trading = trading
+
+    def quantize_qty(self, quantity: float) -> float:
+        """Round a quantity down to the lot step (never trade more than sized)"""
+        return _step(quantity, self.step_size, ROUND_FLOOR)
+
+    def quantize_price(self, price: float, side: str = "buy") -> float:
+        """Round a limit price to the tick, toward the passive side (buys down, sells up)"""
+        return _step(price, self.tick_size, ROUND_FLOOR if side.lower() == "buy" else ROUND_CEILING)
+
+    def violations(self, quantity: float, price: float) -> List[str]:
+        """Rules an order of `quantity` at `price` would break; empty when it would be accepted"""
+        errors = []
+        if not self.trading:
+            errors.append(f"{self.symbol} is not trading on {self.exchange}")
+        if quantity < self.min_qty:
+            errors.append(f"quantity {quantity} below minimum {self.min_qty}")
+        if self.max_qty is not None and quantity > self.max_qty:
+            errors.append(f"quantity {quantity} above maximum {self.max_qty}")
+        if self.step_size is not None and self.quantize_qty(quantity) != quantity:
+            errors.append(f"quantity {quantity} is not a multiple of {self.step_size}")
+        if price > 0 and quantity * price < self.min_notional:
+            errors.append(f"notional {quantity * price:.8g} below minimum {self.min_notional}")
+        return errors
+
+    def to_dict(self) -> Dict:
+        values = {slot: getattr(self, slot) for slot in self.__slots__}
+        return {key: str(value) if isinstance(value, Decimal) else value for key, value in values.items()}
+
+
+def parse_binance(payload: Dict) -> List[SymbolInfo]:
+    symbols = []
+    for item in payload.get("symbols", []):
+        filters = {f["filterType"]: f for f in item.get("filters", [])}
+        lot = filters.get("LOT_SIZE", {})
+        notional = filters.get("NOTIONAL") or filters.get("MIN_NOTIONAL") or {}
+        symbols.append(SymbolInfo(
+            "binance", item["symbol"], item["baseAsset"], item["quoteAsset"],
+            tick_size=filters.get("PRICE_FILTER", {}).get("tickSize"),
+            step_size=lot.get("stepSize"), min_qty=lot.get("minQty"), max_qty=lot.get("maxQty"),
+            min_notional=notional.get("minNotional"),
+            trading=item.get("status", "TRADING") == "TRADING"))
+    return symbols
+
+
+def parse_kucoin(payload: Dict) -> List[SymbolInfo]:
+    return [SymbolInfo(
+        "kucoin", item["symbol"], item["baseCurrency"], item["quoteCurrency"],
+        tick_size=item.get("priceIncrement"), step_size=item.get("baseIncrement"),
+        min_qty=item.get("baseMinSize"), max_qty=item.get("baseMaxSize"), min_notional=item.get("minFunds"),
+        trading=item.get("enableTrading", True)) for item in payload.get("data", [])]
+
+
+def parse_btcc(payload: Dict) -> List[SymbolInfo]:
+    return [SymbolInfo(
+        "btcc", item["symbol"], item["baseCurrency"], item["quoteCurrency"],
+        tick_size=item.get("tickSize"), step_size=item.get("stepSize"),
+        min_qty=item.get("minQuantity"), max_qty=item.get("maxQuantity"), min_notional=item.get("minNotional"),
+        trading=item.get("status", "trading").lower() == "trading") for item in payload.get("symbols", [])]
+
+
+PARSERS = {"binance": parse_binance, "kucoin": parse_kucoin, "btcc": parse_btcc}
+
+
+def fetch_symbols(exchange: str, sandbox: bool = False) -> List[SymbolInfo]:
+    """Download an exchange's public symbol list"""
+    url = SYMBOL_LIST_URLS[(exchange, sandbox)]
+    endpoint = "/" + url.split("/", 3)[3]
+    start = time.perf_counter()
+    try:
+        response = requests.get(url, timeout=10)
+        response.raise_for_status()
+        return PARSERS[exchange](response.json())
+    except requests.exceptions.RequestException:
+        EXCHANGE_REQUEST_ERRORS.labels(exchange, endpoint).inc()
+        raise
+    finally:
+        EXCHANGE_REQUEST_DURATION.labels(exchange, endpoint).observe(time.perf_counter() - start)
+
+
+class _SymbolTable:
+    """One exchange's symbols indexed by canonical and native name; replaced whole on refresh"""
+
+    __slots__ = ("by_symbol", "by_native", "loaded_at")
+
+    def __init__(self, symbols: List[SymbolInfo]):
+        self.by_symbol = {info.symbol: info for info in symbols}
+        self.by_native = {info.native: info for info in symbols}
+        self.loaded_at = time.time()
+
+
+class SymbolMetadataService:
+    """Per-exchange symbol rules loaded once, refreshed in the background.
+
+    The first lookup for an exchange downloads its symbol list; later lookups
+    are two dict reads against an immutable table that the refresher swaps out
+    every `refresh_interval` seconds. A failed refresh keeps serving the old
+    table, and a failed first load is retried at most every `retry_interval`.
+    """
+
+    def __init__(self, fetcher: Callable[[str, bool], List[SymbolInfo]] = fetch_symbols,
+                 refresh_interval: float = REFRESH_INTERVAL, retry_interval: float = RETRY_INTERVAL):
+        self.fetcher = fetcher
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self._tables: Dict[Tuple[str, bool], _SymbolTable] = {}
+        self._failed_at: Dict[Tuple[str, bool], float] = {}
+        self._load_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def load(self, exchange: str, sandbox: bool = False) -> bool:
+        """(Re)load one exchange's symbol list; False if the download failed"""
+        key = (exchange.lower(), sandbox)
+        try:
+            symbols = self.fetcher(*key)
+        except Exception as e:
+            print(f"Error loading {exchange} symbol metadata: {e}")
+            SYMBOL_METADATA_LOADS.labels(key[0], "error").inc()
+            self._failed_at[key] = time.monotonic()
+            return False
+        self._tables[key] = _SymbolTable(symbols)
+        self._failed_at.pop(key, None)
+        SYMBOL_METADATA_LOADS.labels(key[0], "ok").inc()
+        self._start_refresher()
+        return True
+
+    def _table(self, exchange: str, sandbox: bool) -> Optional[_SymbolTable]:
+        key = (exchange.lower(), sandbox)
+        table = self._tables.get(key)
+        if table is not None:
+            return table
+        with self._load_lock:
+            if key not in self._tables:
+                failed_at = self._failed_at.get(key)
+                if failed_at is None or time.monotonic() - failed_at >= self.retry_interval:
+                    self.load(*key)
+        return self._tables.get(key)
+
+    def get(self, exchange: str, symbol: str, sandbox: bool = False) -> Optional[SymbolInfo]:
+        """Rules for `symbol` given in canonical (BTCUSDT) or exchange-native (BTC-USDT) form"""
+        table = self._table(exchange, sandbox)
+        if table is None:
+            return None
+        return table.by_symbol.get(symbol) or table.by_native.get(symbol)
+
+    def to_exchange(self, exchange: str, symbol: str, sandbox: bool = False) -> str:
+        """Exchange-native name for a canonical symbol; unchanged when unknown"""
+        info = self.get(exchange, symbol, sandbox)
+        return info.native if info else symbol
+
+    def normalize(self, exchange: str, symbol: str, sandbox: bool = False) -> str:
+        """Canonical BASEQUOTE name for an exchange-native symbol; unchanged when unknown"""
+        info = self.get(exchange, symbol, sandbox)
+        return info.symbol if info else symbol
+
+    def symbols(self, exchange: str, sandbox: bool = False) -> List[str]:
+        table = self._table(exchange, sandbox)
+        return sorted(table.by_symbol) if table else []
+
+    def _start_refresher(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, daemon=True, name="symbol-metadata")
+        self._thread.start()
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_interval):
+            for exchange, sandbox in list(self._tables):
+                self.load(exchange, sandbox)
+
+    def stop(self):
+        self._stop.set()
+
+    def get_stats(self) -> Dict:
+        return {
+            f"{exchange}{'-sandbox' if sandbox else ''}": {"symbols": len(table.by_symbol), "loaded_at": table.loaded_at}
+            for (exchange, sandbox), table in self._tables.items()
+        }
+
+
+# Shared by every connector and the real trading bot
+symbol_metadata = SymbolMetadataService()
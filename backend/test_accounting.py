@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test script for lot-matched PnL accounting
+"""
+
+import time
+from accounting import AccountingEngine, LotBook
+from test_helpers import paper_state
+
+DAY = 1700000000.0  # 2023-11-14 UTC
+
+def test_lot_matching_methods():
+    """Test FIFO, LIFO and average cost against the same fills"""
+    print("Testing lot matching methods...")
+    results = {}
+    for method in ("fifo", "lifo", "average"):
+        book = LotBook(method)
+        book.buy(1, 100)
+        book.buy(1, 200)
+        closed, realized = book.sell(1, 180)
+        assert closed == 1
+        results[method] = (realized, book.avg_price)
+    assert results["fifo"] == (80, 200)
+    assert results["lifo"] == (-20, 100)
+    assert results["average"] == (30, 150)
+    print("✅ FIFO, LIFO and average cost realize 80, -20 and 30")
+
+def test_fees_clamping_and_rollups():
+    """Test fee expensing, sells beyond the open quantity and daily rollups"""
+    print("Testing fees, clamped sells and daily rollups...")
+    engine = AccountingEngine("fifo")
+    engine.record_fill("a@example.com", "binance", "BTCUSDT", "buy", 0.5, 30000, fee=3, at=DAY)
+    engine.record_fill("a@example.com", "binance", "BTCUSDT", "buy", 0.5, 32000, at=DAY)
+    fill = engine.record_fill("a@example.com", "binance", "BTCUSDT", "sell", 0.75, 31000, fee=2, at=DAY)
+    assert fill["closed_qty"] == 0.75 and fill["realized_pnl"] == 500 - 250 - 2
+    assert fill["position_qty"] == 0.25 and fill["avg_price"] == 32000
+    fill = engine.record_fill("a@example.com", "binance", "BTCUSDT", "sell", 1, 33000, at=DAY + 86400)
+    assert fill["closed_qty"] == 0.25 and fill["realized_pnl"] == 250 and fill["position_qty"] == 0
+
+    [today, yesterday] = engine.daily("a@example.com")
+    assert today["day"] == "2023-11-15" and today["realized_pnl"] == 250 and today["winning_sells"] == 1
+    assert yesterday["realized_pnl"] == 245 and yesterday["fees"] == 5 and yesterday["fills"] == 3
+    summary = engine.summary("a@example.com")
+    assert summary["realized_pnl"] == 495 and summary["fees"] == 5 and summary["unrealized_pnl"] == 0
+    print("✅ Fees expensed, oversized sell clamped, two days rolled up")
+
+def test_unrealized_and_sync():
+    """Test marking open lots and re-basing a book to an authoritative position"""
+    print("Testing unrealized PnL and position sync...")
+    engine = AccountingEngine("fifo")
+    engine.record_fill("u", "kucoin", "ETHUSDT", "buy", 2, 2000)
+    summary = engine.summary("u", lambda exchange, symbol: {"ETHUSDT": 2100}.get(symbol))
+    assert summary["unrealized_pnl"] == 200 and summary["positions"][0]["mark"] == 2100
+    engine.sync_position("u", "kucoin", "ETHUSDT", 2, 1)  # quantities agree, lots kept
+    assert engine.position("u", "kucoin", "ETHUSDT")["lots"] == [[2, 2000]]
+    engine.sync_position("u", "kucoin", "ETHUSDT", 3, 1800)
+    assert engine.position("u", "kucoin", "ETHUSDT") == {"qty": 3, "avg_price": 1800, "lots": [[3, 1800]]}
+    engine.drop("u")
+    assert engine.summary("u")["positions"] == [] and engine.daily("u") == []
+    print("✅ Open lots marked and re-based")
+
+def test_many_fills():
+    """Test that fills stay O(1) amortized with many open lots"""
+    print("Testing 100,000 fills...")
+    engine = AccountingEngine("fifo")
+    start = time.perf_counter()
+    for i in range(50000):
+        engine.record_fill("u", "binance", "BTCUSDT", "buy", 1, 100 + i % 10, at=DAY)
+    for i in range(50000):
+        engine.record_fill("u", "binance", "BTCUSDT", "sell", 1, 110, at=DAY)
+    elapsed = time.perf_counter() - start
+    assert engine.position("u", "binance", "BTCUSDT")["qty"] == 0 and elapsed < 2.0
+    print(f"✅ 100,000 fills in {elapsed * 1000:.0f} ms")
+
+def test_mock_sell_clamped():
+    """Test that a mock sell larger than the position only credits the held quantity"""
+    print("Testing clamped mock sells...")
+    from accounting import accounting, PAPER_USER, PAPER_EXCHANGE
+    with paper_state() as main:
+        main.execute_mock_trade(main.TradeRequest(symbol="PNLUSDT", side="buy", qty=1, price=10))
+        main.execute_mock_trade(main.TradeRequest(symbol="PNLUSDT", side="buy", qty=1, price=20))
+        cash = main.state.cash
+        result = main.execute_mock_trade(main.TradeRequest(symbol="PNLUSDT", side="sell", qty=5, price=30))
+        assert main.state.cash == cash + 2 * 30
+        assert result["trade"]["realized_pnl"] == 30 and result["position"]["qty"] == 0
+    assert accounting.position(PAPER_USER, PAPER_EXCHANGE, "PNLUSDT")["lots"] == []
+    print("✅ Only the held quantity was credited")
+
+if __name__ == "__main__":
+    test_lot_matching_methods()
+    test_fees_clamping_and_rollups()
+    test_unrealized_and_sync()
+    test_many_fills()
+    test_mock_sell_clamped()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Test script for the incremental multi-timeframe candle aggregator
+"""
+
+from candles import CandleAggregator, CandleSources
+
+def test_bars_roll_on_boundaries():
+    """Test OHLCV building and the bars each tick closes"""
+    print("Testing candle aggregation...")
+    aggregator = CandleAggregator(timeframes=("1m", "5m"))
+    t0 = 1_700_000_100  # 5-minute aligned
+    for i, price in enumerate([100, 103, 99, 101]):
+        assert aggregator.on_tick("BTCUSDT", price, volume=1.0, t=t0 + i * 10) == []
+    closed = aggregator.on_tick("BTCUSDT", 102, volume=2.0, t=t0 + 60)
+    assert [bar.timeframe for bar in closed] == ["1m"]
+    bar = closed[0]
+    assert (bar.open, bar.high, bar.low, bar.close, bar.volume) == (100, 103, 99, 101, 4.0)
+    assert bar.open_time == t0
+    closed = aggregator.on_tick("BTCUSDT", 98, t=t0 + 300)
+    assert [b.timeframe for b in closed] == ["1m", "5m"]
+    five = aggregator.candles("BTCUSDT", "5min")
+    assert len(five) == 1 and five[0].high == 103 and five[0].low == 99 and five[0].close == 102
+    assert aggregator.closes("BTCUSDT", "1m") == [101, 102]
+    # The open 5m bar only shows up when asked for
+    assert aggregator.candles("BTCUSDT", "5m", include_open=True)[-1].close == 98
+    print("✅ Bars roll over on UTC-aligned boundaries")
+
+def test_late_ticks():
+    """Test that ticks from an already closed period are ignored"""
+    print("Testing late ticks...")
+    aggregator = CandleAggregator(timeframes=("1m",))
+    aggregator.on_tick("ETHUSDT", 10, t=120)
+    aggregator.on_tick("ETHUSDT", 11, t=130)
+    closed = aggregator.on_tick("ETHUSDT", 12, t=185)
+    assert len(closed) == 1 and closed[0].close == 11
+    aggregator.on_tick("ETHUSDT", 50, t=170)  # late tick for the closed bar is ignored
+    assert aggregator.closes("ETHUSDT", "1m") == [11]
+    assert aggregator.candles("ETHUSDT", "1m", include_open=True)[-1].high == 12
+    print("✅ Late ticks ignored")
+
+def test_indicator_over_closed_bars():
+    """Test RSI on a higher timeframe from 1-minute ticks"""
+    print("Testing candle indicators...")
+    aggregator = CandleAggregator(timeframes=("1m", "5m"))
+    assert aggregator.indicator("rsi", "BTCUSDT", "5m") is None
+    price = 100.0
+    for minute in range(5 * 20):
+        price += 1.0
+        aggregator.on_tick("BTCUSDT", price, t=minute * 60)
+    assert aggregator.indicator("rsi", "BTCUSDT", "5m", period=14) == 100.0
+    try:
+        aggregator.resolve("30min")
+        assert False, "30min is not aggregated"
+    except ValueError:
+        pass
+    print("✅ Indicators computed on closed 5m bars")
+
+def test_sources_keep_separate_bars():
+    """Test that ticks from different price sources never share a bar"""
+    print("Testing per-source candles...")
+    sources = CandleSources(timeframes=("1m",))
+    sources.get("mock").on_tick("BTCUSDT", 10.0, t=0)
+    sources.get("binance").on_tick("BTCUSDT", 50000.0, t=1)
+    sources.get("kucoin").on_tick("BTCUSDT", 50010.0, t=2)
+    sources.get("binance").on_tick("BTCUSDT", 50020.0, t=61)
+    [bar] = sources.get("binance").candles("BTCUSDT", "1m")
+    assert bar.low == bar.high == 50000.0 and bar.ticks == 1
+    assert sources.get("mock").candles("BTCUSDT", "1m") == []
+    assert sources.last_price("kucoin", "BTCUSDT") == 50010.0
+    assert sources.last_price("mock", "BTCUSDT") == 10.0
+    assert sources.sources() == ["binance", "kucoin", "mock"]
+    print("✅ Each source builds its own bars")
+
+if __name__ == "__main__":
+    test_bars_roll_on_boundaries()
+    test_late_ticks()
+    test_indicator_over_closed_bars()
+    test_sources_keep_separate_bars()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Test script for the separate trading-engine process and its shared-memory snapshot
+"""
+
+import json
+import multiprocessing as mp
+import os
+import threading
+from fastapi.testclient import TestClient
+from engine_process import SnapshotBuffer, EngineStateLock
+from shared_state import SHARED_FIELDS
+from trading_state import TradingState
+
+def write_versions(name, count):
+    """Child process: publish `count` snapshots as fast as possible"""
+    buffer = SnapshotBuffer(name)
+    for i in range(1, count + 1):
+        buffer.write(json.dumps({"n": i, "data": [i] * (i % 50)}).encode())
+    buffer.shm.close()
+
+def test_snapshot_reads_are_never_torn():
+    """Test lock-free reads while another process keeps writing"""
+    print("Testing shared-memory snapshot...")
+    buffer = SnapshotBuffer(size=64 * 1024)
+    assert buffer.read() is None
+    writer = mp.get_context("spawn").Process(target=write_versions, args=(buffer.name, 3000))
+    writer.start()
+    last = 0
+    while writer.is_alive() or last < 3000:
+        snapshot = buffer.read()
+        if snapshot is None:
+            continue
+        assert snapshot["data"] == [snapshot["n"]] * (snapshot["n"] % 50)
+        assert snapshot["n"] >= last
+        last = snapshot["n"]
+    writer.join()
+    assert buffer.version() == 3000
+    assert buffer.write(b'{"n": 3001}') and not buffer.write(b'{"n": 3001}')  # unchanged payload is skipped
+    assert buffer.version() == 3001 and buffer.read() == {"n": 3001}
+    buffer.close()
+    print("✅ Readers only ever see complete snapshots")
+
+def test_api_with_engine_process():
+    """Test that the API reads engine state and forwards commands to it"""
+    print("Testing API with a separate engine process...")
+    import main
+    original_lock = main.state.lock
+    os.environ["ENGINE_PROCESS"] = "1"
+    try:
+        with TestClient(main.app) as client:
+            assert main.engine_client is not None and main.engine_client.process.is_alive()
+            trade = client.post("/execute-mock-trade",
+                                json={"symbol": "ENGINEUSDT", "side": "buy", "qty": 2, "price": 10})
+            assert trade.status_code == 200 and trade.json()["position"]["qty"] == 2
+            positions = client.get("/positions").json()["positions"]
+            assert positions["ENGINEUSDT"] == {"qty": 2, "avg_price": 10}
+
+            # Config written in the API process is applied by the engine
+            assert client.post("/strategy-config", json={"rsi_oversold": 21}).status_code == 200
+            snapshot = main.engine_client.snapshot()
+            assert snapshot["strategy_config"]["rsi_oversold"] == 21
+            assert client.get("/scheduler-stats").json()["schedulers"]
+            assert client.get("/order-book/NOPEUSDT").status_code == 404
+
+            # Execution orders and trade history live in the engine, not the API process
+            user = main.UserInDB(email="engine@example.com", username="engine", hashed_password="x")
+            main.app.dependency_overrides[main.get_current_active_user] = lambda: user
+            order = client.post("/execution-orders", json={"exchange": "simulated", "symbol": "ENGINEUSDT",
+                                                           "side": "buy", "qty": 1, "arrival_price": 10,
+                                                           "duration": 60, "slices": 2}).json()
+            assert main.execution_engine.get(order["id"]) is None
+            assert client.get(f"/execution-orders/{order['id']}").json()["id"] == order["id"]
+            assert client.delete(f"/execution-orders/{order['id']}").json()["status"] == "cancelled"
+            assert client.get("/trade-history").json() == {"trades": [], "next_cursor": None}
+            assert client.get("/trade-history/export").status_code == 200
+        assert not main.engine_client.process.is_alive()
+    finally:
+        del os.environ["ENGINE_PROCESS"]
+        main.app.dependency_overrides.clear()
+        main.engine_client = None
+        main.state.lock = original_lock
+    print("✅ Engine process serves state and commands")
+
+class FakeSnapshots:
+    def __init__(self):
+        self.current = 1
+
+    def version(self):
+        return self.current
+
+class SlowEngineClient:
+    """Engine client whose set_state blocks until the test lets it finish"""
+
+    def __init__(self, state):
+        self.snapshots = FakeSnapshots()
+        self.published = {field: json.loads(json.dumps(getattr(state, field, None))) for field in SHARED_FIELDS}
+        self.calls = []
+        self.started = threading.Event()
+        self.finish = threading.Event()
+
+    def snapshot(self):
+        return json.loads(json.dumps(self.published))
+
+    def call(self, command, payload):
+        self.calls.append((command, payload))
+        self.started.set()
+        assert self.finish.wait(5)
+
+def test_state_lock_sends_changes_outside_the_lock():
+    """Test that only changed fields are sent, after the local lock is released"""
+    print("Testing API-side engine state lock...")
+    state = TradingState()
+    client = SlowEngineClient(state)
+    state.lock = EngineStateLock(state, client)
+    with state.lock:
+        pass
+    assert client.calls == []  # read-only use sends nothing
+
+    def write():
+        with state.lock:
+            state.bot_schedule = "market"
+    writer = threading.Thread(target=write)
+    writer.start()
+    assert client.started.wait(5)
+    # The engine is still applying the write: readers go ahead, and an older snapshot is not loaded over it
+    client.snapshots.current += 1
+    reader = threading.Thread(target=lambda: state.lock.acquire() and state.lock.release())
+    reader.start()
+    reader.join(1)
+    assert not reader.is_alive() and state.bot_schedule == "market"
+    client.finish.set()
+    writer.join(5)
+    assert client.calls == [("set_state", {"bot_schedule": "market"})]
+
+    client.published["bot_schedule"] = "market"
+    client.snapshots.current += 1
+    with state.lock:
+        assert state.bot_schedule == "market"
+    assert len(client.calls) == 1
+    print("✅ Only changed fields sent, without holding the lock")
+
+if __name__ == "__main__":
+    test_snapshot_reads_are_never_torn()
+    test_api_with_engine_process()
+    test_state_lock_sends_changes_outside_the_lock()
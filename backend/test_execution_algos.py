@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Test script for TWAP, VWAP and iceberg execution against a simulated exchange
+"""
+
+import time
+from execution_algos import ExecutionEngine, SimulatedExchange, parse_order_response, plan_schedule
+from exchange_connectors import Order
+
+def make_engine(prices):
+    now = [1000.0]
+    engine = ExecutionEngine(clock=lambda: now[0], max_workers=None)
+    return engine, SimulatedExchange(prices.get, depth=1.0, impact_bps=10), now
+
+def run_until(engine, now, end, step=1.0):
+    while now[0] < end:
+        engine.run_due()
+        now[0] += step
+    engine.run_due()
+
+def test_twap_slices_evenly():
+    """Test that TWAP sends equal children on schedule and reports slippage"""
+    print("Testing TWAP...")
+    engine, exchange, now = make_engine({"BTCUSDT": 30000.0})
+    parent = engine.submit(exchange, "BTCUSDT", "buy", 2.0, "twap", 30000, duration=60, slices=4)
+    assert engine.run_due() == 1 and engine.run_due() == 0  # next child is 15 s out
+    run_until(engine, now, 1060)
+    assert parent.status == "completed" and [c["qty"] for c in parent.children] == [0.5] * 4
+    assert [c["sent_at"] for c in parent.children] == [1000, 1015, 1030, 1045]
+    assert abs(parent.filled_qty - 2.0) < 1e-12 and 0 < parent.slippage_bps < 10
+    print(f"✅ 4 slices, {parent.slippage_bps:.2f} bps slippage")
+
+def test_vwap_follows_profile_and_catches_up():
+    """Test VWAP sizing from a volume profile and catching up after a failed child"""
+    print("Testing VWAP...")
+    engine, exchange, now = make_engine({"ETHUSDT": 2000.0})
+    failures = [1]
+    place = exchange.place_order
+
+    def flaky(order):
+        if failures:
+            failures.pop()
+            raise Exception("timeout")
+        return place(order)
+
+    exchange.place_order = flaky
+    parent = engine.submit(exchange, "ETHUSDT", "sell", 10.0, "vwap", 2000, duration=40, slices=4,
+                           profile=[1, 3, 4, 2])
+    run_until(engine, now, 1040)
+    assert [round(c["qty"], 9) for c in parent.children] == [1.0, 4.0, 4.0, 2.0]
+    assert parent.children[0]["error"] == "timeout" and parent.status == "completed"
+    assert parent.slippage_bps > 0  # selling pushed the price down
+    print("✅ Profile followed and the failed slice made up")
+
+def test_iceberg_shows_display_size():
+    """Test iceberg refills, leaving an unmarketable slice resting instead of stacking more"""
+    print("Testing iceberg...")
+    prices = {"SOLUSDT": 100.0}
+    engine, exchange, now = make_engine(prices)
+    exchange.depth = 10.0
+    parent = engine.submit(exchange, "SOLUSDT", "buy", 5.0, "iceberg", 100, display_qty=2, limit_price=100.5,
+                           interval=5)
+    assert engine.run_due() == 1 and engine.run_due() == 1  # filled slices refill at once
+    prices["SOLUSDT"] = 101.0
+    assert engine.run_due() == 1 and parent.children[-1]["status"] == "open"
+    assert engine.run_due() == 0
+    for _ in range(3):
+        now[0] += 5
+        assert engine.run_due() == 1  # checks the resting slice, sends nothing new
+    assert len(exchange.orders) == 3 and len(exchange.open_orders()) == 1
+    prices["SOLUSDT"] = 100.2
+    now[0] += 5
+    assert engine.run_due() == 1 and parent.status == "completed" and parent.filled_qty == 5
+    assert [c["qty"] for c in parent.children] == [2, 2, 1] and not exchange.open_orders()
+    print("✅ One slice on the book at a time, never more than the display size")
+
+def test_cancel_pulls_resting_child():
+    """Test that cancelling an iceberg cancels its resting slice and books its partial fill"""
+    print("Testing cancel with a resting slice...")
+    prices = {"SOLUSDT": 100.0}
+    engine, exchange, now = make_engine(prices)
+    exchange.depth = 1.0
+    parent = engine.submit(exchange, "SOLUSDT", "buy", 5.0, "iceberg", 100, display_qty=3, interval=5)
+    assert engine.run_due() == 1 and parent.open_child is not None and parent.filled_qty == 1
+    assert engine.cancel(parent.id) and parent.status == "cancelled"
+    assert not exchange.open_orders() and parent.open_child is None and parent.filled_qty == 1
+    now[0] += 5
+    assert engine.run_due() == 0 and len(exchange.orders) == 1
+    print("✅ Resting slice cancelled")
+
+def test_cancel_during_placement():
+    """Test that a slice placed after its parent was cancelled is pulled from the book"""
+    print("Testing cancel during placement...")
+    prices = {"SOLUSDT": 100.0}
+    engine, exchange, now = make_engine(prices)
+    place_order = exchange.place_order
+    parent = None
+
+    def cancel_then_place(order):
+        assert engine.cancel(parent.id)  # lands while the child is in flight
+        return place_order(order)
+
+    exchange.place_order = cancel_then_place
+    parent = engine.submit(exchange, "SOLUSDT", "buy", 5.0, "iceberg", 100, display_qty=2, interval=5,
+                           limit_price=90)
+    assert engine.run_due() == 1
+    assert parent.status == "cancelled" and parent.open_child is None
+    assert not exchange.open_orders() and parent.children[0]["status"] == "done"
+    print("✅ Late slice cancelled")
+
+class AckOnlyExchange:
+    """Acknowledges orders like KuCoin's POST /api/v1/orders; fills show up only in later status checks"""
+
+    exchange_name = "ackonly"
+
+    def __init__(self, checks_until_filled=3):
+        self.checks_until_filled = checks_until_filled
+        self.sent = []
+        self.checks = {}
+
+    def place_order(self, order):
+        order_id = f"ack-{len(self.sent)}"
+        self.sent.append(order)
+        self.checks[order_id] = self.checks_until_filled
+        return {"code": "200000", "data": {"orderId": order_id}}
+
+    def get_order(self, symbol, order_id):
+        self.checks[order_id] -= 1
+        order = self.sent[int(order_id.split("-")[1])]
+        size = order.quantity if self.checks[order_id] <= 0 else 0
+        return {"code": "200000", "data": {"id": order_id, "isActive": size == 0, "dealSize": str(size),
+                                           "dealFunds": str(size * 100)}}
+
+    def cancel_order(self, symbol, order_id):
+        return {"code": "200000", "data": {"cancelledOrderIds": [order_id]}}
+
+def test_acknowledged_children_are_in_flight():
+    """Test that an acknowledged child waits for its fill instead of being resent"""
+    print("Testing acknowledgement-only fills...")
+    now = [1000.0]
+    engine = ExecutionEngine(clock=lambda: now[0], max_workers=None)
+    exchange = AckOnlyExchange()
+    parent = engine.submit(exchange, "BTCUSDT", "buy", 10.0, "twap", 100, duration=100, slices=10)
+    run_until(engine, now, 1200)
+    assert parent.status == "completed" and abs(parent.filled_qty - 10) < 1e-9
+    assert abs(sum(order.quantity for order in exchange.sent) - 10) < 1e-9 and parent.avg_price == 100
+    silent = AckOnlyExchange()
+    silent.place_order = lambda order: silent.sent.append(order) or {"code": "200000"}
+    unconfirmed = engine.submit(silent, "BTCUSDT", "buy", 1.0, "twap", 100, duration=10, slices=2)
+    run_until(engine, now, 1220)
+    assert unconfirmed.status == "failed" and len(silent.sent) == 1  # no id to check, so nothing resent
+    print(f"✅ {len(exchange.sent)} children, {sum(o.quantity for o in exchange.sent):g} units sent for 10")
+
+def test_many_parents_on_one_scheduler():
+    """Test concurrent parents on the scheduler thread and cancellation"""
+    print("Testing 200 concurrent parents...")
+    engine = ExecutionEngine(max_workers=4)
+    exchange = SimulatedExchange({"BTCUSDT": 30000.0}.get, depth=100)
+    parents = [engine.submit(exchange, "BTCUSDT", "buy", 1.0, "twap", 30000, duration=2, slices=2)
+               for _ in range(200)]
+    cancelled = engine.submit(exchange, "BTCUSDT", "buy", 1.0, "twap", 30000, duration=60, slices=2)
+    engine.start()
+    deadline = time.time() + 5
+    while time.time() < deadline and any(p.status == "working" for p in parents):
+        time.sleep(0.05)
+    assert engine.cancel(cancelled.id) and not engine.cancel(cancelled.id)
+    engine.stop()
+    assert all(p.status == "completed" for p in parents) and cancelled.filled_qty == 0.5
+    assert engine.get_stats()["orders"] == {"completed": 200, "cancelled": 1}
+    print("✅ All parents completed on one scheduler")
+
+def test_response_parsing_and_validation():
+    """Test fill parsing for exchange responses and rejected parameters"""
+    print("Testing responses and validation...")
+    assert parse_order_response({"orderId": 7, "status": "FILLED", "executedQty": "0.5",
+                                 "cummulativeQuoteQty": "51"}, 0.5, 100) == ("7", 0.5, 102, True)
+    assert parse_order_response({"data": {"orderId": "k1"}}, 1, 100) == ("k1", 0, 0, False)
+    assert parse_order_response({"data": {"id": "k1", "isActive": False, "dealSize": "1", "dealFunds": "99"}},
+                                1, 100) == ("k1", 1, 99, True)
+    assert parse_order_response({"orderId": 8, "status": "NEW", "executedQty": "0"}, 1, 100) == ("8", 0, 0, False)
+    assert parse_order_response({"status": "filled"}, 1, 100) == (None, 1, 100, True)
+    assert parse_order_response({"order_id": "b1", "status": "open", "filled_qty": "0.25"}, 1, 100) == ("b1", 0.25, 100, False)
+    for algo, params in (("iceberg", {"display_qty": 5}), ("twap", {"duration": 5, "slices": 10}), ("pov", {})):
+        try:
+            plan_schedule(algo, 1.0, params)
+            assert False, algo
+        except ValueError:
+            pass
+    print("✅ Responses parsed and bad parameters rejected")
+
+if __name__ == "__main__":
+    test_twap_slices_evenly()
+    test_vwap_follows_profile_and_catches_up()
+    test_iceberg_shows_display_size()
+    test_cancel_pulls_resting_child()
+    test_cancel_during_placement()
+    test_acknowledged_children_are_in_flight()
+    test_many_parents_on_one_scheduler()
+    test_response_parsing_and_validation()
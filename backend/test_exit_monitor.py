@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Test script for the price-indexed exit monitor (stop loss, take profit, trailing and time exits)
+"""
+
+import random
+import time
+from exit_monitor import ExitMonitor
+from test_helpers import paper_state
+
+def test_triggers_match_a_full_scan():
+    """Test that heap-indexed exits fire exactly when a scan over every position would"""
+    print("Testing exits against a brute-force scan...")
+    rng = random.Random(7)
+    monitor = ExitMonitor(clock=lambda: 0)
+    expected, price = {}, 100.0
+    fired, scanned = set(), set()
+    for step in range(5000):
+        if rng.random() < 0.3:
+            sl, tp, trail = rng.choice([None, 2, 5]), rng.choice([None, 3, 8]), rng.choice([None, 1, 4])
+            monitor.register(f"p{step}", "BTCUSDT", price, stop_loss_pct=sl, take_profit_pct=tp, trailing_pct=trail)
+            if sl or tp or trail:
+                expected[f"p{step}"] = {"stop": price * (1 - sl / 100) if sl else None,
+                                        "target": price * (1 + tp / 100) if tp else None,
+                                        "trail": trail, "peak": price}
+        price *= rng.uniform(0.99, 1.01)
+        fired |= {event["position_id"] for event in monitor.on_price("BTCUSDT", price)}
+        for position_id, p in list(expected.items()):
+            p["peak"] = max(p["peak"], price)
+            if ((p["target"] and price >= p["target"]) or (p["stop"] and price <= p["stop"])
+                    or (p["trail"] and price <= p["peak"] * (1 - p["trail"] / 100))):
+                scanned.add(position_id)
+                del expected[position_id]
+    assert fired == scanned and monitor.get_stats()["positions"] == len(expected)
+    print(f"✅ {len(fired)} exits fired, identical to the scan")
+
+def test_time_exits_and_rearming():
+    """Test deadlines, cancellation and re-registration keeping the open time"""
+    print("Testing time-based exits...")
+    now = [1000.0]
+    monitor = ExitMonitor(clock=lambda: now[0])
+    monitor.register("ETHUSDT", "ETHUSDT", 2000, stop_loss_pct=5, max_hold_seconds=600)
+    monitor.on_price("ETHUSDT", 2010)
+    now[0] = 1300
+    monitor.register("ETHUSDT", "ETHUSDT", 1990, stop_loss_pct=5, max_hold_seconds=600)  # added to position
+    assert monitor.get("ETHUSDT")["opened_at"] == 1000
+    assert monitor.on_price("ETHUSDT", 1895) == []  # old 1900 stop was replaced by 1890.5
+    assert monitor.poll(1599) == []
+    [event] = monitor.poll(1600)
+    assert event["reason"] == "time_exit" and event["price"] == 1895
+    monitor.register("SOLUSDT", "SOLUSDT", 100, take_profit_pct=10)
+    assert monitor.cancel("SOLUSDT") and monitor.on_price("SOLUSDT", 200) == []
+    print("✅ Deadlines fire once and cancelled exits stay quiet")
+
+def test_many_positions():
+    """Test that price updates stay cheap with thousands of open positions"""
+    print("Testing 20,000 open positions...")
+    monitor = ExitMonitor(clock=lambda: 0)
+    for i in range(20000):
+        monitor.register(f"user{i % 500}:p{i}", "BTCUSDT", 30000 + i % 100, stop_loss_pct=20,
+                         take_profit_pct=20, trailing_pct=25)
+    start = time.perf_counter()
+    for i in range(10000):
+        assert monitor.on_price("BTCUSDT", 30000 + (i % 200)) == []
+    elapsed = time.perf_counter() - start
+    assert elapsed < 2.0
+    fired = monitor.on_price("BTCUSDT", 23000)
+    assert len(fired) == 20000 and {event["reason"] for event in fired} <= {"stop_loss", "trailing_stop"}
+    print(f"✅ 10,000 non-crossing updates in {elapsed * 1000:.0f} ms")
+
+def test_mock_positions_exit():
+    """Test that mock fills arm exits from custom_exit and the loop sells on a stop"""
+    print("Testing mock position exits...")
+    import trading_loop
+    with paper_state(custom_exit={"profit_target": 10, "stop_loss": 5, "time_based_exit": 0}) as main:
+        main.execute_mock_trade(main.TradeRequest(symbol="EXITUSDT", side="buy", qty=3, price=100))
+        assert trading_loop.position_exits.get("EXITUSDT")["triggers"]["stop_loss"] == 95
+        assert trading_loop.close_exited_positions({"EXITUSDT": 96}, time.time()) == 0
+        assert trading_loop.close_exited_positions({"EXITUSDT": 94}, time.time()) == 1
+        assert main.state.positions["EXITUSDT"]["qty"] == 0
+        assert trading_loop.position_exits.get("EXITUSDT") is None
+    print("✅ Stop loss closed the mock position")
+
+class ExitConnector:
+    """Connector stub for the real bot that fills or rejects every order"""
+
+    exchange_name = "binance"
+
+    def __init__(self):
+        self.orders = []
+        self.accept = True
+
+    def symbol_info(self, symbol):
+        return None
+
+    def place_order(self, order):
+        self.orders.append(order)
+        return {"status": "filled" if self.accept else "rejected"}
+
+def test_real_bot_exits_whole_position():
+    """Test that a real-bot stop sells the held quantity and stays armed until the sell fills"""
+    print("Testing real bot position exits...")
+    from accounting import accounting
+    from exchange_connectors import Ticker
+    from real_trading import RealTradingBot
+    from risk_ledger import risk_ledgers
+    user = "exit-bot@example.com"
+    bot = RealTradingBot()
+    bot._update_user_trading_data = lambda *args: None
+    connector = ExitConnector()
+    try:
+        buy = {"action": "buy", "symbol": "BTCUSDT", "price": 100, "quantity": 2.5, "reason": "test"}
+        assert bot._execute_real_trade(connector, buy, user, "binance")
+        crossed = [Ticker(symbol="BTCUSDT", price=97, volume_24h=0, change_24h=0)]
+        connector.accept = False
+        assert bot._close_exited_positions(connector, crossed, user, "binance") == 0
+        assert connector.orders[-1].quantity == 2.5 and bot.position_exits.get("binance:BTCUSDT") is not None
+        connector.accept = True
+        assert bot._close_exited_positions(connector, crossed, user, "binance") == 1
+        assert connector.orders[-1].side == "sell" and connector.orders[-1].quantity == 2.5
+        assert accounting.position(user, "binance", "BTCUSDT")["qty"] == 0
+        assert bot.position_exits.get("binance:BTCUSDT") is None
+    finally:
+        risk_ledgers.drop(user)
+        accounting.drop(user)
+    print("✅ Failed exit re-armed, retried exit sold the whole position")
+
+def test_real_bot_partial_sell_keeps_exits():
+    """Test that real-bot exits track the average cost and survive a partial sell"""
+    print("Testing real bot exits after adds and partial sells...")
+    from accounting import accounting
+    from real_trading import RealTradingBot
+    from risk_ledger import risk_ledgers
+    user = "partial-exit-bot@example.com"
+    bot = RealTradingBot()
+    bot._update_user_trading_data = lambda *args: None
+    connector = ExitConnector()
+    key = "binance:ETHUSDT"
+    stop = 1 - bot.risk_limits['stop_loss_percent'] / 100
+    try:
+        for price in (100, 110):
+            buy = {"action": "buy", "symbol": "ETHUSDT", "price": price, "quantity": 2, "reason": "test"}
+            assert bot._execute_real_trade(connector, buy, user, "binance")
+        assert bot.position_exits.get(key)["entry_price"] == 105
+        assert abs(bot.position_exits.get(key)["triggers"]["stop_loss"] - 105 * stop) < 1e-9
+        sell = {"action": "sell", "symbol": "ETHUSDT", "price": 112, "quantity": 1, "reason": "test"}
+        assert bot._execute_real_trade(connector, sell, user, "binance")
+        assert accounting.position(user, "binance", "ETHUSDT")["qty"] == 3
+        assert bot.position_exits.get(key) is not None
+        sell["quantity"] = 3
+        assert bot._execute_real_trade(connector, sell, user, "binance")
+        assert bot.position_exits.get(key) is None
+    finally:
+        risk_ledgers.drop(user)
+        accounting.drop(user)
+    print("✅ Stop kept at average cost for the remaining quantity")
+
+if __name__ == "__main__":
+    test_triggers_match_a_full_scan()
+    test_time_exits_and_rearming()
+    test_many_positions()
+    test_mock_positions_exit()
+    test_real_bot_exits_whole_position()
+    test_real_bot_partial_sell_keeps_exits()
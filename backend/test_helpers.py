@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Shared setup for tests that trade against main's paper portfolio
+"""
+
+from contextlib import contextmanager
+
+@contextmanager
+def paper_state(**strategy_config):
+    """Run a block against main.state and put the paper portfolio back afterwards.
+
+    Positions, cash, trades, performance metrics and the strategy config
+    (updated with `strategy_config` for the block) are restored; the paper
+    account's accounting books, valuation rows and armed exits are rebuilt
+    from the restored positions, so nothing the block traded is left behind.
+    """
+    import main
+    from trading_loop import position_exits
+    from accounting import accounting, PAPER_USER, PAPER_EXCHANGE
+    from valuation import portfolio_valuation
+    state = main.state
+    with state.lock:
+        saved = (dict(state.positions), state.cash, list(state.trades), dict(state.performance_metrics),
+                 dict(state.strategy_config))
+        state.strategy_config.update(strategy_config)
+    try:
+        yield main
+    finally:
+        positions = saved[0]
+        with state.lock:
+            traded = set(state.positions)
+            state.positions, state.cash, state.trades, state.performance_metrics = saved[:4]
+            state.strategy_config.clear()
+            state.strategy_config.update(saved[4])
+        for symbol in traded:
+            if positions.get(symbol, {}).get("qty", 0) <= 0:
+                position_exits.cancel(symbol)
+        accounting.drop(PAPER_USER)
+        portfolio_valuation.drop(PAPER_USER)
+        for symbol, position in positions.items():
+            if position.get("qty"):
+                accounting.sync_position(PAPER_USER, PAPER_EXCHANGE, symbol, position["qty"], position["avg_price"])
+                portfolio_valuation.set_position(PAPER_USER, PAPER_EXCHANGE, symbol, position["qty"],
+                                                 position["avg_price"])
+        portfolio_valuation.set_cash(PAPER_USER, saved[1])
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Test script for the resumable kline downloader against a local fake kline server
+"""
+
+import json
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from kline_downloader import KlineDownloader
+from price_store import PriceStore
+
+T0 = 1700000000 - 1700000000 % 60  # bar-aligned start
+FUTURE = lambda: 2 ** 40
+
+class FakeKlines:
+    """Serves Binance- and KuCoin-shaped klines with a bar every minute; can fail or throttle on demand"""
+
+    def __init__(self):
+        self.requests = []
+        self.fail_symbol = None
+        self.throttle = 0
+        self.lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                with fake.lock:
+                    fake.requests.append((url.path, query))
+                    throttled = fake.throttle > 0
+                    fake.throttle -= 1
+                if throttled:
+                    return self._send(429, {"msg": "slow down"}, {"Retry-After": "0.05"})
+                if query.get("symbol") == fake.fail_symbol:
+                    return self._send(400, {"msg": "broken"})
+                if url.path == "/api/v3/klines":
+                    start, end = int(query["startTime"]) // 1000, int(query["endTime"]) // 1000
+                    first = start + (-start) % 60
+                    times = list(range(first, end + 1, 60))[:int(query["limit"])]
+                    return self._send(200, [[t * 1000, str(t), str(t + 2), str(t - 1), str(t + 1), "5", t * 1000 + 59999]
+                                            for t in times])
+                start, end = int(query["startAt"]), int(query["endAt"])
+                times = range(start + (-start) % 60, end + 1, 60)
+                return self._send(200, {"code": "200000", "data": [[str(t), str(t), str(t + 1), str(t + 2), str(t - 1), "5", "0"]
+                                                                   for t in reversed(times)]})
+
+            def _send(self, code, body, headers=None):
+                payload = json.dumps(body).encode()
+                self.send_response(code)
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def starts(self, symbol):
+        return [int(q["startTime"]) // 1000 for _, q in self.requests if q.get("symbol") == symbol]
+
+def make_downloader(tmp, **kwargs):
+    store = PriceStore(os.path.join(tmp, "prices.db"))
+    return store, KlineDownloader(store, workers=8, segment_bars=kwargs.pop("segment_bars", 1200), clock=FUTURE)
+
+def test_parallel_download_and_overlap():
+    """Test paging several symbols into the store and skipping ranges already downloaded"""
+    print("Testing parallel download...")
+    fake = FakeKlines()
+    with tempfile.TemporaryDirectory() as tmp:
+        store, downloader = make_downloader(tmp)
+        symbols = ["BTCUSDT", "ETHUSDT", "SOLUSDT"]
+        job = downloader.download("binance", symbols, ["1m"], T0, T0 + 5000 * 60, base_url=fake.url, page_limit=500,
+                                  rate=1000)
+        assert job["status"] == "completed" and job["bars"] == 3 * 5000 and job["segments"] == 3 * 5
+        bars = store.klines("binance", "ETHUSDT", "1m")
+        assert len(bars) == 5000 and bars[0] == (T0, T0, T0 + 2, T0 - 1, T0 + 1, 5.0)
+        assert all(b[0] - a[0] == 60 for a, b in zip(bars, bars[1:]))
+
+        fake.requests.clear()
+        job = downloader.download("binance", ["BTCUSDT"], ["1m"], T0 + 4000 * 60, T0 + 6000 * 60,
+                                  base_url=fake.url, page_limit=500, rate=1000)
+        assert job["bars"] == 1000 and min(fake.starts("BTCUSDT")) == T0 + 5000 * 60
+        assert len(store.klines("binance", "BTCUSDT", "1m")) == 6000
+        store.close()
+    fake.server.shutdown()
+    print("✅ 15,000 bars stored; the overlapping request fetched only the new 1,000")
+
+def test_resume_after_failure():
+    """Test that a failed run resumes from its checkpoint without refetching stored pages"""
+    print("Testing resume...")
+    fake = FakeKlines()
+    with tempfile.TemporaryDirectory() as tmp:
+        store, downloader = make_downloader(tmp)
+        fake.fail_symbol = "ETHUSDT"
+        job = downloader.download("binance", ["BTCUSDT", "ETHUSDT"], ["1m"], T0, T0 + 3000 * 60,
+                                  base_url=fake.url, page_limit=500, rate=1000)
+        assert job["status"] == "failed" and job["errors"] and job["bars"] == 3000
+
+        fake.fail_symbol, fake.throttle = None, 2
+        fake.requests.clear()
+        store, downloader = make_downloader(tmp)  # a fresh process reads the checkpoints
+        job = downloader.download("binance", ["BTCUSDT", "ETHUSDT"], ["1m"], T0, T0 + 3000 * 60,
+                                  base_url=fake.url, page_limit=500, rate=1000)
+        assert job["status"] == "completed" and job["bars"] == 3000
+        assert fake.starts("BTCUSDT") == [] and len(store.klines("binance", "ETHUSDT", "1m")) == 3000
+        assert len(fake.starts("ETHUSDT")) == 8 + 2  # three segments in eight pages, plus two throttled attempts
+        store.close()
+    fake.server.shutdown()
+    print("✅ Resumed from checkpoints and backed off on 429")
+
+def test_kucoin_pages():
+    """Test KuCoin's windowed, newest-first candles"""
+    print("Testing KuCoin paging...")
+    fake = FakeKlines()
+    with tempfile.TemporaryDirectory() as tmp:
+        store, downloader = make_downloader(tmp)
+        job = downloader.download("kucoin", ["ETHBTC"], ["1m"], T0, T0 + 2000 * 60, base_url=fake.url,
+                                  page_limit=1500, rate=1000)
+        bars = store.klines("kucoin", "ETHBTC", "1m")
+        assert job["status"] == "completed" and len(bars) == 2000 and bars[0] == (T0, T0, T0 + 2, T0 - 1, T0 + 1, 5.0)
+        assert {q["symbol"] for _, q in fake.requests} == {"ETH-BTC"}
+        store.close()
+    fake.server.shutdown()
+    print("✅ KuCoin candles stored oldest first")
+
+if __name__ == "__main__":
+    test_parallel_download_and_overlap()
+    test_resume_after_failure()
+    test_kucoin_pages()
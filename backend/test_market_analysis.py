@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test script for the candle-based market analysis and its TTL cache
+"""
+
+import time
+import numpy as np
+from market_analysis import AnalysisCache, find_pivots, resolve_symbol, resolve_interval
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def trending_klines(pair, interval, n=200):
+    """Uptrend with a sine wave so there are swing highs and lows"""
+    t = np.arange(n)
+    close = 100 + 0.2 * t + 3 * np.sin(t / 4)
+    return {
+        "time": 1_700_000_000 + 3600 * t,
+        "open": close - 0.1, "high": close + 0.5, "low": close - 0.5,
+        "close": close, "volume": np.full(n, 1000.0),
+    }
+
+def test_symbol_and_timeframe_resolution():
+    """Test stock symbols, pairs and timeframe strings"""
+    print("Testing symbol resolution...")
+    assert resolve_symbol("btc") == ("BTCUSDT", "Bitcoin")
+    assert resolve_symbol("DOGEUSDT") == ("DOGEUSDT", "DOGE")
+    assert resolve_interval("1D") == ("1d", 86400)
+    assert resolve_interval("4h") == ("4h", 14400)
+    for bad in (lambda: resolve_symbol("NOPE"), lambda: resolve_interval("7min")):
+        try:
+            bad()
+            assert False
+        except ValueError:
+            pass
+    print("✅ Symbols and timeframes resolved")
+
+def test_pivots():
+    """Test swing high/low detection"""
+    print("Testing pivot detection...")
+    highs = np.array([1, 2, 3, 9, 3, 2, 1, 2, 3, 4, 5], dtype=float)
+    lows = highs - 1
+    pivot_highs, pivot_lows = find_pivots(highs, lows, window=3)
+    assert list(pivot_highs) == [9.0]
+    assert list(pivot_lows) == [0.0]
+    print("✅ Pivots found")
+
+def test_analysis_from_candles_and_cache():
+    """Test indicator output and that repeat requests hit the cache"""
+    print("Testing analysis cache...")
+    calls = []
+
+    def fetcher(pair, interval):
+        calls.append((pair, interval))
+        return trending_klines(pair, interval)
+
+    clock = FakeClock()
+    cache = AnalysisCache(ttl=60, fetcher=fetcher, clock=clock)
+    analysis = cache.get("ETH", "1h")
+    assert analysis["symbol"] == "ETHUSDT" and analysis["data_source"] == "exchange"
+    assert analysis["trend"] == "bullish"
+    assert analysis["support"] < analysis["current_price"] < analysis["resistance"]
+    assert analysis["bollinger_lower"] < analysis["bollinger_upper"]
+    assert 0 <= analysis["rsi"] <= 100
+    assert len(analysis["chart_data"]) == 24
+    assert cache.get("ETHUSDT", "60min") is analysis
+    assert len(calls) == 1
+
+    # Stale entries are served immediately and refreshed in the background
+    clock.now += 61
+    assert cache.get("ETH", "1h") is analysis
+    for _ in range(100):
+        if len(calls) == 2 and cache.get("ETH", "1h") is not analysis:
+            break
+        time.sleep(0.01)
+    assert len(calls) == 2
+    print("✅ Analysis computed from candles and cached")
+
+def test_mock_fallback():
+    """Test that unreachable market data falls back to a seeded random walk"""
+    print("Testing offline fallback...")
+
+    def failing(pair, interval):
+        raise Exception("offline")
+
+    cache = AnalysisCache(fetcher=failing)
+    analysis = cache.get("SOL", "1D")
+    assert analysis["data_source"] == "mock"
+    assert analysis["trend"] in ("bullish", "bearish", "neutral")
+    print("✅ Offline fallback works")
+
+if __name__ == "__main__":
+    test_symbol_and_timeframe_resolution()
+    test_pivots()
+    test_analysis_from_candles_and_cache()
+    test_mock_fallback()
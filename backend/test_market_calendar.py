@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Test script for the exchange session calendars
+"""
+
+import datetime
+import pytz
+from market_calendar import get_calendar, calendar_for_schedule, us_equity_holidays
+
+eastern = pytz.timezone("US/Eastern")
+
+def et(year, month, day, hour=0, minute=0) -> float:
+    return eastern.localize(datetime.datetime(year, month, day, hour, minute)).timestamp()
+
+def test_us_equity_holidays():
+    """Test the 2025 NYSE holiday list"""
+    print("Testing US equity holidays...")
+    expected = {
+        datetime.date(2025, 1, 1), datetime.date(2025, 1, 20), datetime.date(2025, 2, 17),
+        datetime.date(2025, 4, 18), datetime.date(2025, 5, 26), datetime.date(2025, 6, 19),
+        datetime.date(2025, 7, 4), datetime.date(2025, 9, 1), datetime.date(2025, 11, 27),
+        datetime.date(2025, 12, 25),
+    }
+    assert us_equity_holidays(2025) == expected, us_equity_holidays(2025)
+    print("✅ 2025 holidays match the NYSE calendar")
+
+def test_us_equity_sessions():
+    """Test open/closed checks, early closes and next_open"""
+    print("Testing US equity sessions...")
+    calendar = get_calendar("us_equities")
+    assert calendar.is_open(et(2025, 3, 12, 10, 0))       # regular Wednesday
+    assert not calendar.is_open(et(2025, 3, 12, 9, 29))   # pre-market
+    assert not calendar.is_open(et(2025, 3, 12, 16, 0))   # closing bell
+    assert not calendar.is_open(et(2025, 7, 4, 12, 0))    # Independence Day
+    assert calendar.is_open(et(2025, 11, 28, 12, 59))     # day after Thanksgiving...
+    assert not calendar.is_open(et(2025, 11, 28, 13, 0))  # ...closes early
+    # Friday after close -> Monday open, across the DST change on 2025-03-09
+    assert calendar.next_open(et(2025, 3, 7, 17, 0)) == et(2025, 3, 10, 9, 30)
+    # Thursday before Good Friday -> Monday
+    assert calendar.next_open(et(2025, 4, 17, 16, 30)) == et(2025, 4, 21, 9, 30)
+    assert calendar.next_close(et(2025, 3, 12, 10, 0)) == et(2025, 3, 12, 16, 0)
+    # Already open: next_open is "now"
+    t = et(2025, 3, 12, 11, 0)
+    assert calendar.next_open(t) == t
+    print("✅ Sessions, early closes and next_open correct")
+
+def test_crypto_always_open():
+    """Test the 24/7 calendar and schedule mapping"""
+    print("Testing 24/7 calendar...")
+    calendar = calendar_for_schedule("24/7")
+    t = et(2025, 12, 25, 3, 0)
+    assert calendar.is_open(t) and calendar.next_open(t) == t
+    assert calendar_for_schedule("market").name == "us_equities"
+    print("✅ 24/7 schedule always open")
+
+if __name__ == "__main__":
+    test_us_equity_holidays()
+    test_us_equity_sessions()
+    test_crypto_always_open()
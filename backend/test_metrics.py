@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Test script for the metrics registry and /metrics endpoint
+"""
+
+from metrics import MetricsRegistry, InstrumentedLock, registry
+
+def test_histogram_rendering():
+    """Test that histograms render cumulative Prometheus buckets"""
+    print("Testing histogram rendering...")
+    reg = MetricsRegistry()
+    hist = reg.histogram("test_latency_seconds", "Test latency", ("route",), buckets=(0.1, 1.0))
+    hist.labels("/a").observe(0.05)
+    hist.labels("/a").observe(0.5)
+    hist.labels("/a").observe(5)
+
+    text = reg.render()
+    assert '# TYPE test_latency_seconds histogram' in text
+    assert 'test_latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{route="/a",le="1.0"} 2' in text
+    assert 'test_latency_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'test_latency_seconds_count{route="/a"} 3' in text
+    print("✅ Histogram buckets are cumulative")
+
+    counter = reg.counter("test_errors_total", "Test errors", ("exchange",))
+    counter.labels('bin"ance').inc()
+    assert 'test_errors_total{exchange="bin\\"ance"} 1.0' in reg.render()
+    print("✅ Counter labels are escaped")
+
+def test_instrumented_lock():
+    """Test that the instrumented lock behaves like threading.Lock"""
+    print("Testing instrumented lock...")
+    lock = InstrumentedLock("test_lock")
+    with lock:
+        assert lock.locked()
+        assert not lock.acquire(blocking=False)
+    assert not lock.locked()
+    assert 'lock_wait_seconds_count{lock="test_lock"} 2' in registry.render()
+    print("✅ Lock waits recorded")
+
+def test_metrics_endpoint():
+    """Test that /metrics exposes per-route request latency"""
+    print("Testing /metrics endpoint...")
+    from starlette.testclient import TestClient
+    import main
+
+    client = TestClient(main.app)
+    client.get("/health")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'http_request_duration_seconds_count{method="GET",route="/health",status="200"}' in response.text
+    print("✅ /metrics endpoint working")
+
+if __name__ == "__main__":
+    test_histogram_rendering()
+    test_instrumented_lock()
+    test_metrics_endpoint()
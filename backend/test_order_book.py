@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Test script for the local order book mirror
+"""
+
+from order_book import OrderBook, OrderBookManager, OrderBookGapError
+
+SNAPSHOT = {
+    "lastUpdateId": 100,
+    "bids": [["99.0", "1.0"], ["98.0", "2.0"], ["97.0", "5.0"]],
+    "asks": [["101.0", "1.0"], ["102.0", "2.0"], ["103.0", "5.0"]],
+}
+
+def depth_event(first, final, bids=(), asks=(), symbol="BTCUSDT"):
+    return {"e": "depthUpdate", "s": symbol, "U": first, "u": final, "b": list(bids), "a": list(asks)}
+
+def test_book_queries():
+    """Test best bid/ask, depth within bps and VWAP"""
+    print("Testing order book queries...")
+    book = OrderBook("BTCUSDT")
+    book.apply_snapshot(SNAPSHOT["lastUpdateId"], SNAPSHOT["bids"], SNAPSHOT["asks"])
+    assert book.best_bid() == (99.0, 1.0)
+    assert book.best_ask() == (101.0, 1.0)
+    assert book.mid_price() == 100.0
+    assert abs(book.spread_bps() - 200.0) < 1e-9
+    # Within 2% of mid: asks at 101 and 102
+    assert book.depth_within_bps("buy", 200) == 3.0
+    assert book.depth_within_bps("sell", 100) == 1.0
+    avg_price, filled = book.vwap("buy", 2.0)
+    assert filled == 2.0 and avg_price == 101.5
+    assert abs(book.slippage_bps("buy", 2.0) - 150.0) < 1e-9
+    avg_price, filled = book.vwap("sell", 100.0)
+    assert filled == 8.0
+    assert book.slippage_bps("sell", 100.0) is None
+    print("✅ Book queries correct")
+
+def test_diffs_and_gaps():
+    """Test diff application, stale diffs and gap detection"""
+    print("Testing depth diffs...")
+    book = OrderBook("BTCUSDT")
+    book.apply_snapshot(SNAPSHOT["lastUpdateId"], SNAPSHOT["bids"], SNAPSHOT["asks"])
+    assert not book.apply_diff(90, 100, [["99.0", "0"]], [])  # already in the snapshot
+    assert book.apply_diff(95, 105, [["99.0", "0"], ["99.5", "3"]], [["101.0", "0.5"]])
+    assert book.best_bid() == (99.5, 3.0)
+    assert book.best_ask() == (101.0, 0.5)
+    assert book.apply_diff(106, 110, [], [["100.5", "1"]])
+    assert book.best_ask() == (100.5, 1.0)
+    try:
+        book.apply_diff(112, 115, [], [])
+        assert False, "gap not detected"
+    except OrderBookGapError:
+        pass
+    print("✅ Diffs applied, gaps detected")
+
+def test_manager_buffers_and_resyncs():
+    """Test buffering until snapshot and resync after a gap"""
+    print("Testing order book manager...")
+    snapshots = [dict(SNAPSHOT), dict(SNAPSHOT, lastUpdateId=200)]
+    fetched = []
+
+    def fetch(symbol):
+        fetched.append(symbol)
+        return snapshots[len(fetched) - 1]
+
+    manager = OrderBookManager(snapshot_fetcher=fetch)
+    manager.subscribe("BTCUSDT")
+    assert manager.get("BTCUSDT") is None
+    manager.on_depth_event(depth_event(98, 101, bids=[["99.0", "4"]]))
+    book = manager.get("BTCUSDT")
+    assert book is not None and book.best_bid() == (99.0, 4.0)
+    manager.on_depth_event(depth_event(102, 103, asks=[["101.0", "0"]]))
+    assert book.best_ask() == (102.0, 2.0)
+    # Gap: 104 is missing, so the manager refetches the snapshot
+    manager.on_depth_event(depth_event(150, 201, bids=[["99.0", "7"]]))
+    assert len(fetched) == 2
+    assert manager.get("BTCUSDT").last_update_id == 201
+    assert manager.get("BTCUSDT").best_bid() == (99.0, 7.0)
+    manager.on_depth_event(depth_event(1, 2, symbol="ETHUSDT"))  # not subscribed
+    print("✅ Manager buffers diffs and resyncs after gaps")
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_resync_backoff_keeps_buffering():
+    """Test that failed snapshots back off per symbol while diffs keep buffering"""
+    print("Testing resync backoff...")
+    clock = FakeClock()
+    fetched = []
+
+    def fetch(symbol):
+        fetched.append(symbol)
+        if len(fetched) <= 3:
+            raise ConnectionError("snapshot unavailable")
+        return dict(SNAPSHOT)
+
+    manager = OrderBookManager(snapshot_fetcher=fetch, clock=clock)
+    manager.subscribe("BTCUSDT")
+    manager.subscribe("ETHUSDT")
+    update_id = 98
+    for _ in range(10):  # one failure, then 0.5s of backoff: the rest only buffer
+        manager.on_depth_event(depth_event(update_id, update_id + 1, bids=[["99.0", str(update_id)]]))
+        last_bid = update_id
+        update_id += 2
+    assert len(fetched) == 1
+    clock.now += 0.5
+    manager.on_depth_event(depth_event(update_id, update_id + 1))
+    update_id += 2
+    assert len(fetched) == 2
+    clock.now += 0.5  # second failure doubled the wait to 1s
+    manager.on_depth_event(depth_event(update_id, update_id + 1))
+    update_id += 2
+    assert len(fetched) == 2
+
+    # Another symbol's resync is not held back by this one's failures
+    manager.on_depth_event(depth_event(98, 99, symbol="ETHUSDT"))
+    assert fetched[-1] == "ETHUSDT" and manager.get("ETHUSDT") is None
+
+    clock.now += 0.5
+    manager.on_depth_event(depth_event(update_id, update_id + 1))
+    assert fetched.count("BTCUSDT") == 3
+    book = manager.get("BTCUSDT")
+    assert book is not None and book.last_update_id == update_id + 1
+    # Every buffered diff after the snapshot was replayed
+    assert book.best_bid() == (99.0, float(last_bid))
+    print("✅ Resyncs back off and buffered diffs are replayed")
+
+if __name__ == "__main__":
+    test_book_queries()
+    test_diffs_and_gaps()
+    test_manager_buffers_and_resyncs()
+    test_resync_backoff_keeps_buffering()
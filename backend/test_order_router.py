@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Test script for smart order routing across connected exchanges
+"""
+
+import time
+from order_router import SmartOrderRouter, Quote
+
+FEES = {"binance": 0.001, "kucoin": 0.001, "btcc": 0.0006}
+
+def test_best_effective_price_and_split():
+    """Test venue ranking after fees and splitting by displayed size and balance"""
+    print("Testing routing decisions...")
+    router = SmartOrderRouter(fees=FEES)
+    quotes = {
+        "binance": Quote("binance", "BTCUSDT", 29990, 30000, 1.0, 0.2),
+        "kucoin": Quote("kucoin", "BTCUSDT", 29995, 30010, 1.0, 5.0),
+        "btcc": Quote("btcc", "BTCUSDT", 29980, 30012, None, None),
+    }
+    # btcc's lower fee beats kucoin's better ask: 30012 * 1.0006 < 30010 * 1.001
+    assert [venue[1] for venue in router.rank("buy", quotes)] == ["binance", "btcc", "kucoin"]
+    legs = router.route("buy", 0.5, quotes, {"binance": 10, "kucoin": 10, "btcc": 0.1})
+    assert [(leg["exchange"], round(leg["qty"], 9)) for leg in legs] == [("binance", 0.2), ("btcc", 0.1),
+                                                                          ("kucoin", 0.2)]
+    # Balances cap venues; the rest goes past the best venue's displayed size
+    legs = router.route("buy", 1.0, quotes, {"binance": 2, "kucoin": 0, "btcc": 0})
+    assert [(leg["exchange"], leg["qty"]) for leg in legs] == [("binance", 1.0)]
+    assert router.route("sell", 0.3, quotes, {"kucoin": 0.3, "binance": 1})[0]["exchange"] == "kucoin"
+    assert router.rank("buy", quotes, {"kucoin": 0.0})[0][1] == "kucoin"
+    print("✅ Orders routed to the best venues after fees")
+
+def test_latency_budget():
+    """Test that a slow venue is dropped after the budget and cached when it lands"""
+    print("Testing the quote latency budget...")
+    router = SmartOrderRouter(fees=FEES, latency_budget=0.05)
+    router.on_quote(Quote("binance", "ETHUSDT", 1999, 2000, at=time.time()))
+    calls = []
+
+    def slow():
+        calls.append("kucoin")
+        time.sleep(0.3)
+        return Quote("kucoin", "ETHUSDT", 1998, 1999, at=time.time())
+
+    def fast():
+        return Quote("btcc", "ETHUSDT", 1997, 2001, at=time.time())
+
+    start = time.perf_counter()
+    quotes = router.quotes("ETHUSDT", {"binance": lambda: None, "kucoin": slow, "btcc": fast})
+    elapsed = time.perf_counter() - start
+    assert set(quotes) == {"binance", "btcc"} and elapsed < 0.2
+    router.quotes("ETHUSDT", {"kucoin": slow})  # still in flight: not submitted again
+    time.sleep(0.35)
+    assert calls == ["kucoin"] and router.cached("kucoin", "ETHUSDT").ask == 1999
+    assert set(router.quotes("ETHUSDT", {"binance": fast, "kucoin": slow})) == {"binance", "kucoin"}
+    stats = router.get_stats()
+    assert stats["late_fetches"] == 2 and stats["fetches"] == 2
+    print(f"✅ Quotes collected in {elapsed * 1000:.0f} ms despite a 300 ms venue")
+
+if __name__ == "__main__":
+    test_best_effective_price_and_split()
+    test_latency_budget()
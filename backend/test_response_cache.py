@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Test script for ETag / conditional GET response caching
+"""
+
+import json
+import os
+import tempfile
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from response_cache import ResponseCache, file_version
+
+def test_file_backed_endpoint():
+    """Test 304s, rebuilds on file changes and explicit invalidation"""
+    print("Testing file-backed conditional GET...")
+    cache = ResponseCache()
+    app = FastAPI()
+    path = os.path.join(tempfile.mkdtemp(), "templates.json")
+    with open(path, "w") as f:
+        json.dump({"a": 1}, f)
+    builds = []
+
+    def load():
+        builds.append(1)
+        with open(path) as f:
+            return json.load(f)
+
+    @app.get("/templates")
+    def templates(request: Request):
+        return cache.respond(request, "templates", load, version=file_version(path))
+
+    client = TestClient(app)
+    first = client.get("/templates")
+    assert first.status_code == 200 and first.json() == {"a": 1}
+    etag = first.headers["etag"]
+    assert etag.startswith('"')
+    again = client.get("/templates", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.content == b""
+    assert client.get("/templates").status_code == 200
+    assert len(builds) == 1  # 304 and the cached 200 never touched the file
+
+    with open(path, "w") as f:
+        json.dump({"a": 2, "b": 3}, f)
+    changed = client.get("/templates", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.json() == {"a": 2, "b": 3}
+    assert changed.headers["etag"] != etag
+
+    cache.invalidate("templates")
+    after = client.get("/templates", headers={"If-None-Match": changed.headers["etag"]})
+    assert after.status_code == 200 and len(builds) == 3
+    print("✅ ETags follow the file version")
+
+def test_static_endpoints():
+    """Test content-hashed ETags on the app's static endpoints"""
+    print("Testing static endpoints...")
+    from main import app
+    client = TestClient(app)
+    for path in ("/strategy-info", "/available-pairs", "/available-stocks", "/supported-exchanges"):
+        first = client.get(path)
+        assert first.status_code == 200, path
+        second = client.get(path, headers={"If-None-Match": first.headers["etag"]})
+        assert second.status_code == 304, path
+    print("✅ Static endpoints answer 304 for a matching ETag")
+
+if __name__ == "__main__":
+    test_file_backed_endpoint()
+    test_static_endpoints()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Test script for the in-memory per-user risk ledger
+"""
+
+import time
+from risk_ledger import RiskLedger, RiskLedgerBook, split_symbol
+
+LIMITS = {"max_daily_loss": 5.0, "max_consecutive_losses": 3}
+
+def test_fills_streak_and_day_reset():
+    """Test realized PnL, the loss streak and the UTC-day rollover"""
+    print("Testing fills and daily reset...")
+    now = [1700000000.0]  # 2023-11-14 22:13 UTC
+    ledger = RiskLedger(clock=lambda: now[0])
+    ledger.on_balances("binance", [{"asset": "USDT", "free": 10000}])
+    ledger.on_fill("binance", "BTCUSDT", "buy", 0.1, 30000)
+    ledger.on_fill("binance", "BTCUSDT", "buy", 0.1, 32000)
+    assert ledger.positions["BTCUSDT"]["avg_price"] == 31000
+    assert ledger.balance("binance", "USDT") == 10000 - 6200 and ledger.exposure() == {"BTC": 0.2}
+    assert ledger.on_fill("binance", "BTCUSDT", "sell", 0.1, 30000) == -100
+    assert ledger.on_fill("binance", "BTCUSDT", "sell", 0.05, 30500) == -25
+    assert ledger.consecutive_losses == 2 and ledger.daily_pnl == -125
+    assert ledger.on_fill("binance", "BTCUSDT", "sell", 0.05, 32000) == 50
+    assert ledger.consecutive_losses == 0 and "BTCUSDT" not in ledger.positions
+
+    now[0] += 3 * 3600  # past midnight UTC
+    assert ledger.daily_pnl_pct == 0.0 and ledger.snapshot()["daily_pnl_date"] == "2023-11-15"
+    print("✅ PnL, streak and day reset tracked")
+
+def test_batch_checks_without_io():
+    """Test the pre-trade rules and that a batch check costs microseconds"""
+    print("Testing batch pre-trade checks...")
+    ledger = RiskLedger()
+    ledger.on_balances("binance", [{"asset": "USDT", "free": 1000}])
+    signals = [{"action": "buy", "symbol": "BTCUSDT"}, {"action": "sell", "symbol": "ETHUSDT"},
+               {"action": "buy", "symbol": "ETHBTC"}]
+    assert ledger.check_batch(signals, "binance", LIMITS) == signals[:2]  # no BTC to buy ETHBTC with
+
+    start = time.perf_counter()
+    for _ in range(10000):
+        ledger.check_batch(signals, "binance", LIMITS)
+    per_batch = (time.perf_counter() - start) / 10000
+    assert per_batch < 100e-6
+
+    for price in (990, 980, 970):
+        ledger.on_fill("binance", "SOLUSDT", "buy", 1, 1000)
+        ledger.on_fill("binance", "SOLUSDT", "sell", 1, price)
+    assert ledger.check_batch(signals, "binance", LIMITS) == []  # three losses in a row
+    print(f"✅ Batch check in {per_batch * 1e6:.1f} µs")
+
+def test_ledger_seeded_once():
+    """Test that a user's ledger resumes stored figures and loads them only once"""
+    print("Testing ledger seeding...")
+    loads = []
+    today = RiskLedger().day
+    book = RiskLedgerBook(loader=lambda email: loads.append(email) or {
+        "consecutive_losses": 2, "daily_pnl": -40.0, "daily_pnl_date": today})
+    ledger = book.get("trader@example.com")
+    assert book.get("trader@example.com") is ledger and loads == ["trader@example.com"]
+    assert ledger.consecutive_losses == 2 and ledger.daily_pnl == -40.0
+    assert split_symbol("ETHBTC") == ("ETH", "BTC") and split_symbol("XYZ") == ("XYZ", "")
+    print("✅ Stored streak and PnL resumed")
+
+if __name__ == "__main__":
+    test_fills_streak_and_day_reset()
+    test_batch_checks_without_io()
+    test_ledger_seeded_once()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test script for the drift-free tick scheduler
+"""
+
+from scheduler import TickScheduler, parse_timeframe, OVERRUN_COALESCE
+
+class FakeClock:
+    """Manually advanced wall clock; sleeping just moves time forward"""
+
+    def __init__(self, start: float):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> bool:
+        self.now += seconds
+        return False
+
+def test_parse_timeframe():
+    """Test timeframe strings used by the strategy editor"""
+    print("Testing timeframe parsing...")
+    assert parse_timeframe("1min") == 60
+    assert parse_timeframe("5min") == 300
+    assert parse_timeframe("15m") == 900
+    assert parse_timeframe("1hour") == 3600
+    assert parse_timeframe("4H") == 14400
+    assert parse_timeframe("1day") == 86400
+    assert parse_timeframe("1D") == 86400
+    assert parse_timeframe("bogus") is None
+    print("✅ Timeframes parsed")
+
+def test_aligned_ticks_do_not_drift():
+    """Test that tick work does not shift the cadence"""
+    print("Testing aligned ticks...")
+    clock = FakeClock(1000.3)
+    scheduler = TickScheduler(5, name="test_aligned", clock=clock, sleep=clock.sleep)
+    scheduled = []
+    for _ in range(4):
+        tick = scheduler.wait_next()
+        scheduled.append(tick.scheduled_at)
+        clock.now += 1.7  # simulated work shorter than the interval
+    assert scheduled == [1005.0, 1010.0, 1015.0, 1020.0], scheduled
+    assert scheduler.get_stats()["overruns"] == 0
+    print("✅ Ticks land on 5s boundaries")
+
+def test_overrun_skip_and_coalesce():
+    """Test both overrun policies"""
+    print("Testing overrun handling...")
+    clock = FakeClock(1000.0)
+    skipper = TickScheduler(5, name="test_skip", clock=clock, sleep=clock.sleep)
+    first = skipper.wait_next()
+    clock.now += 12  # overran two boundaries (1010, 1015)
+    second = skipper.wait_next()
+    assert (first.scheduled_at, second.scheduled_at) == (1005.0, 1020.0)
+    assert second.missed == 2 and skipper.missed_ticks == 2
+
+    clock = FakeClock(1000.0)
+    coalescer = TickScheduler(5, name="test_coalesce", overrun_policy=OVERRUN_COALESCE,
+                              clock=clock, sleep=clock.sleep)
+    coalescer.wait_next()
+    clock.now += 12
+    tick = coalescer.wait_next()
+    assert tick.coalesced and tick.scheduled_at == 1015.0 and tick.missed == 1
+    assert abs(tick.jitter - 2.0) < 1e-9
+    print("✅ Overruns skipped or coalesced")
+
+def test_candle_boundaries():
+    """Test that ticks report when a candle boundary was crossed"""
+    print("Testing candle boundary detection...")
+    clock = FakeClock(1199.0)
+    scheduler = TickScheduler(5, name="test_candle", clock=clock, sleep=clock.sleep)
+    closes = []
+    for _ in range(120):
+        tick = scheduler.wait_next()
+        if tick.crossed(300):
+            closes.append(tick.scheduled_at)
+    assert closes == [1200.0, 1500.0], closes
+    print("✅ 5min candle closes detected")
+
+if __name__ == "__main__":
+    test_parse_timeframe()
+    test_aligned_ticks_do_not_drift()
+    test_overrun_skip_and_coalesce()
+    test_candle_boundaries()
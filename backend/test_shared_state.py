@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Test script for multi-worker shared trading state and the trading-loop lease
+"""
+
+import os
+import tempfile
+import threading
+import time
+from trading_state import TradingState
+from shared_state import SharedStateLock, LeaderLease
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_state_shared_between_workers():
+    """Test that mutations under state.lock are visible to another worker"""
+    print("Testing shared state...")
+    path = os.path.join(tempfile.mkdtemp(), "state.db")
+    worker_a, worker_b = TradingState(), TradingState()
+    worker_a.lock = SharedStateLock(worker_a, path)
+    worker_a.cash = 5000  # local change outside the lock is not published
+    worker_b.lock = SharedStateLock(worker_b, path)
+    assert worker_b.cash == 10000
+
+    with worker_a.lock:
+        worker_a.positions["BTCUSDT"] = {"qty": 1, "avg_price": 30000}
+        worker_a.cash = 1234.5
+        worker_a.strategy_config["rsi_oversold"] = 25
+    with worker_b.lock:
+        assert worker_b.positions == {"BTCUSDT": {"qty": 1, "avg_price": 30000}}
+        assert worker_b.cash == 1234.5
+        assert worker_b.strategy_config["rsi_oversold"] == 25
+        worker_b.running = True
+
+    # Concurrent read-modify-write from both workers never loses an update
+    def buy(worker, n):
+        for _ in range(n):
+            with worker.lock:
+                worker.cash -= 1
+    threads = [threading.Thread(target=buy, args=(w, 50)) for w in (worker_a, worker_b)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    with worker_a.lock:
+        assert worker_a.cash == 1134.5 and worker_a.running is True
+    print("✅ Workers see one consistent state")
+
+def test_trades_are_appended_as_rows():
+    """Test that trades sync by appending rows and that a lock cycle does not re-serialize them"""
+    print("Testing shared trades...")
+    path = os.path.join(tempfile.mkdtemp(), "state.db")
+    worker_a, worker_b = TradingState(), TradingState()
+    worker_a.lock = SharedStateLock(worker_a, path)
+    worker_b.lock = SharedStateLock(worker_b, path)
+    with worker_a.lock:
+        worker_a.trades.extend({"id": i, "symbol": "BTCUSDT"} for i in range(20000))
+    with worker_b.lock:
+        assert len(worker_b.trades) == 20000
+        worker_b.trades.append({"id": 20000})
+    with worker_a.lock:
+        assert worker_a.trades[-1] == {"id": 20000} and len(worker_a.trades) == 20001
+
+    start = time.perf_counter()
+    for _ in range(100):
+        with worker_a.lock:
+            pass
+    per_cycle = (time.perf_counter() - start) / 100
+    assert per_cycle < 0.005, per_cycle
+
+    # Replacing the list (a reset or restore) is published in full
+    with worker_b.lock:
+        worker_b.trades = [{"id": "reset"}]
+    with worker_a.lock:
+        assert worker_a.trades == [{"id": "reset"}]
+        worker_a.trades.append({"id": "after"})
+    with worker_b.lock:
+        assert worker_b.trades == [{"id": "reset"}, {"id": "after"}]
+    print(f"✅ 20,000 shared trades, {per_cycle * 1000:.2f} ms per lock cycle")
+
+def test_leader_lease():
+    """Test that one worker leads and another takes over when the lease expires"""
+    print("Testing leader lease...")
+    path = os.path.join(tempfile.mkdtemp(), "state.db")
+    clock = FakeClock()
+    renewals = []
+    a = LeaderLease(path, ttl=15, holder="a", clock=clock, on_renew=renewals.append)
+    b = LeaderLease(path, ttl=15, holder="b", clock=clock)
+    assert a.try_acquire() and a.is_leader
+    assert not b.try_acquire() and not b.is_leader
+    clock.now += 10
+    assert a.try_acquire()  # renewal extends the lease
+    clock.now += 10
+    assert not b.try_acquire()
+    assert b.current_holder() == "a"
+
+    # a stops renewing: b takes over once the lease has expired
+    clock.now += 16
+    assert b.try_acquire() and b.is_leader
+    assert not a.try_acquire() and not a.is_leader
+    assert renewals == [True, True, False]
+
+    b.release()
+    assert not b.is_leader and b.current_holder() is None
+    assert a.try_acquire()
+    print("✅ Exactly one leader at a time")
+
+def test_failing_callback_keeps_renewing():
+    """Test that an exception from on_renew does not stop the renewal thread"""
+    print("Testing lease renewal with a failing callback...")
+    path = os.path.join(tempfile.mkdtemp(), "state.db")
+    calls = []
+    def on_renew(leader):
+        calls.append(leader)
+        raise RuntimeError("callback failed")
+    lease = LeaderLease(path, ttl=0.3, holder="a", on_renew=on_renew)
+    lease.start()
+    try:
+        deadline = time.monotonic() + 5
+        while len(calls) < 3 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert len(calls) >= 3 and lease._thread.is_alive()
+        assert lease.is_leader
+    finally:
+        lease.stop()
+    print("✅ Lease kept renewing after the callback raised")
+
+class FakeTick:
+    scheduled_at = time.time()
+
+class FakeScheduler:
+    def __init__(self, ticks):
+        self.ticks = ticks
+
+    def wait_next(self):
+        if self.ticks:
+            self.ticks -= 1
+            return FakeTick()
+        return None
+
+class FakeLease:
+    def __init__(self, is_leader):
+        self.is_leader = is_leader
+
+def test_real_bot_trades_only_as_leader():
+    """Test that the real bot skips its ticks while another worker holds the lease"""
+    print("Testing real bot leadership check...")
+    import shared_state
+    from real_trading import RealTradingBot
+    bot = RealTradingBot()
+    ticks = []
+    bot._execute_trading_logic = lambda user_email, exchanges, config: ticks.append(user_email) or (0, 0)
+    previous = shared_state.trading_lease
+    try:
+        bot.running = True
+        shared_state.trading_lease = FakeLease(False)
+        bot.scheduler = FakeScheduler(3)
+        bot._trading_loop("leader@example.com")
+        assert ticks == []
+        shared_state.trading_lease = FakeLease(True)
+        bot.scheduler = FakeScheduler(2)
+        bot._trading_loop("leader@example.com")
+        assert len(ticks) == 2
+    finally:
+        bot.running = False
+        shared_state.trading_lease = previous
+    print("✅ Real bot ticks only on the lease holder")
+
+if __name__ == "__main__":
+    test_state_shared_between_workers()
+    test_trades_are_appended_as_rows()
+    test_leader_lease()
+    test_failing_callback_keeps_renewing()
+    test_real_bot_trades_only_as_leader()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Test script for the signal confirmation pipeline
+"""
+
+from candles import candle_aggregator, candle_sources
+from signal_pipeline import (
+    SignalPipeline, ConfirmationStage, VolumeStage, build_pipeline, parse_timeframe_alignment, pipeline_stats,
+)
+
+class CountingStage(ConfirmationStage):
+    """Stage that records which signals reached it"""
+
+    def __init__(self, name, cost, reject_symbols=()):
+        self.name = name
+        self.cost = cost
+        self.reject_symbols = set(reject_symbols)
+        self.seen = []
+
+    def check(self, signal, data):
+        self.seen.append(signal['symbol'])
+        return signal['symbol'] not in self.reject_symbols, "test"
+
+def signal(symbol, action='buy', price=100.0, volume=None):
+    return {'symbol': symbol, 'action': action, 'price': price, 'volume_24h': volume}
+
+def test_cheapest_first_short_circuit():
+    """Test stage ordering and that rejected signals skip later stages"""
+    print("Testing pipeline ordering...")
+    expensive = CountingStage("test_expensive", 10, reject_symbols={"CCCUSDT"})
+    cheap = CountingStage("test_cheap", 1, reject_symbols={"AAAUSDT"})
+    pipeline = SignalPipeline([expensive, cheap])
+    assert [s.name for s in pipeline.stages] == ["test_cheap", "test_expensive"]
+    signals = [signal("AAAUSDT"), signal("BBBUSDT"), signal("CCCUSDT")]
+    passed = pipeline.run(signals)
+    assert [s['symbol'] for s in passed] == ["BBBUSDT"]
+    assert expensive.seen == ["BBBUSDT", "CCCUSDT"]
+    assert signals[0]['rejected_by'] == "test_cheap"
+    stats = pipeline_stats.get_stats()
+    assert stats["test_cheap"]["rejected"] == 1 and stats["test_expensive"]["seen"] == 2
+    print("✅ Cheap stages run first and short-circuit")
+
+def test_volume_stage():
+    """Test the 24h quote volume threshold"""
+    print("Testing volume stage...")
+    stage = VolumeStage(100000)
+    assert not stage.check(signal("AAAUSDT", price=10.0, volume=5000), {})[0]
+    assert stage.check(signal("AAAUSDT", price=10.0, volume=20000), {})[0]
+    assert stage.check(signal("AAAUSDT"), {})[0]  # no data -> pass
+    print("✅ Volume threshold applied")
+
+def test_confirmation_config():
+    """Test building stages from SignalConfirmationConfig and MACD/trend confirmation"""
+    print("Testing confirmation config...")
+    assert parse_timeframe_alignment("15m + 1h align") == ["15m", "1h"]
+    pipeline = build_pipeline({"min_volume_threshold": 100000, "macd_confirmation": True,
+                               "multi_timeframe_confirmation": "15m + 1h align"})
+    assert [s.name for s in pipeline.stages] == ["volume", "macd", "multi_timeframe"]
+
+    # Steady uptrend: 15m and 1h trends up, MACD histogram positive after a late acceleration
+    candle_aggregator.clear("TRENDUSDT")
+    price = 100.0
+    for minute in range(60 * 40):
+        price *= 1.0002 if minute < 60 * 38 else 1.002
+        candle_aggregator.on_tick("TRENDUSDT", price, t=minute * 60)
+    passed = pipeline.run([signal("TRENDUSDT", 'buy', price, 1e6), signal("TRENDUSDT", 'sell', price, 1e6)])
+    assert [s['action'] for s in passed] == ['buy']
+    candle_aggregator.clear("TRENDUSDT")
+    print("✅ MACD and timeframe alignment confirm only the trend direction")
+
+def test_confirmation_reads_the_signal_source():
+    """Test that a real exchange's signal is confirmed on that exchange's bars, not the paper loop's"""
+    print("Testing per-source confirmation...")
+    pipeline = build_pipeline({"macd_confirmation": True, "multi_timeframe_confirmation": "15m + 1h align"})
+    paper, venue = candle_aggregator, candle_sources.get("testvenue")
+    paper.clear("SPLITUSDT")
+    price = 100.0
+    for minute in range(60 * 40):
+        # The paper loop trends up while the venue trends down
+        price *= 1.0002 if minute < 60 * 38 else 1.002
+        paper.on_tick("SPLITUSDT", price, t=minute * 60)
+        venue.on_tick("SPLITUSDT", 10000.0 / price, t=minute * 60)
+    try:
+        buy = dict(signal("SPLITUSDT", 'buy', 10000.0 / price, 1e6), candle_source="testvenue")
+        sell = dict(signal("SPLITUSDT", 'sell', 10000.0 / price, 1e6), candle_source="testvenue")
+        assert [s['action'] for s in pipeline.run([buy, sell])] == ['sell']
+        assert [s['action'] for s in pipeline.run([signal("SPLITUSDT", 'buy', price, 1e6)])] == ['buy']
+    finally:
+        paper.clear("SPLITUSDT")
+        venue.clear("SPLITUSDT")
+    print("✅ Signals are confirmed on their own source's bars")
+
+if __name__ == "__main__":
+    test_cheapest_first_short_circuit()
+    test_volume_stage()
+    test_confirmation_config()
+    test_confirmation_reads_the_signal_source()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Test script for the startup timing report and lazily initialized subsystems
+"""
+
+import json
+import subprocess
+import sys
+import time
+from startup_profile import StartupProfile
+
+COLD_START = """
+import json, sys
+from fastapi.testclient import TestClient
+import main
+import trading_loop
+with TestClient(main.app) as client:
+    assert client.get("/health").status_code == 200
+    report = client.get("/startup-profile").json()
+    loop_started = trading_loop._loop_thread is not None
+print(json.dumps({"report": report, "loop_started": loop_started,
+                  "lazy": [m for m in ("jwt", "passlib", "cryptography") if m not in sys.modules]}))
+"""
+
+def test_profile_records_imports_and_steps():
+    """Test that only imports made while tracing are recorded, with nested ones folded in"""
+    print("Testing import and step timing...")
+    profile = StartupProfile()
+    profile.start_imports()
+    try:
+        import json  # already loaded: not a cold import
+        import mailbox  # noqa: F401  (pulls in email.*, folded into mailbox)
+    finally:
+        profile.stop_imports()
+    modules = [item["module"] for item in profile.imports]
+    assert modules == ["mailbox"], modules
+    with profile.step("sleep"):
+        time.sleep(0.01)
+    profile.ready()
+    report = profile.report()
+    assert report["steps"][0]["step"] == "sleep" and report["steps"][0]["ms"] >= 10
+    assert report["ready_ms"] > 0 and "mailbox" in profile.summary()
+    print("✅ Imports and steps are timed")
+
+def test_cold_start_defers_heavy_subsystems():
+    """Test that a cold API start skips JWT/passlib and the idle trading loop"""
+    print("Testing cold start...")
+    output = subprocess.run([sys.executable, "-c", COLD_START], capture_output=True, text=True,
+                            check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    assert result["lazy"] == ["jwt", "passlib", "cryptography"]
+    assert not result["loop_started"]
+    report = result["report"]
+    assert report["imports"] and report["ready_ms"] >= report["imports_ms"]
+    print(f"✅ Ready after {report['ready_ms']} ms; slowest import {report['imports'][0]}")
+
+if __name__ == "__main__":
+    test_profile_records_imports_and_steps()
+    test_cold_start_defers_heavy_subsystems()
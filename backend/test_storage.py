@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test script for the JSON and SQLite storage backends
+"""
+
+import json
+import os
+import tempfile
+import threading
+from storage import JSONStorage, SQLiteStorage, StorageConflict
+
+def user_record(i):
+    return {
+        "email": f"user{i}@example.com", "username": f"user{i}", "full_name": f"User {i}",
+        "is_active": True, "created_at": "2025-01-01T00:00:00", "hashed_password": "x",
+    }
+
+def check_backend(storage):
+    """Behaviour every backend must share"""
+    storage.create_user(user_record(1))
+    for duplicate, field in ((user_record(1), "email"), (dict(user_record(2), username="user1"), "username")):
+        try:
+            storage.create_user(duplicate)
+            assert False, field
+        except StorageConflict as e:
+            assert e.field == field
+    assert storage.get_user("user1@example.com")["full_name"] == "User 1"
+    assert storage.get_user_by_username("user1")["email"] == "user1@example.com"
+    assert storage.get_user("nobody@example.com") is None
+
+    email = "user1@example.com"
+    assert storage.get_user_data(email) is None
+    v0 = storage.user_data_version(email)
+    storage.update_user_data(email, {"risk_management": {"max": 5}}, defaults={"strategies": {}, "risk_management": {}})
+    assert storage.get_user_data(email) == {"strategies": {}, "risk_management": {"max": 5}}
+    v1 = storage.user_data_version(email)
+    storage.update_user_data(email, {"strategies": {"a": 1}}, defaults={"strategies": {}})
+    assert storage.get_user_data(email) == {"strategies": {"a": 1}, "risk_management": {"max": 5}}
+    assert len({v0, v1, storage.user_data_version(email)}) == 3
+    added = storage.update_section(email, "strategies", lambda strategies: dict(strategies, b=2),
+                                   sections={"updated_at": "now"})
+    assert added == {"a": 1, "b": 2} and storage.get_user_data(email)["updated_at"] == "now"
+    assert storage.update_section("new@example.com", "strategies", lambda s: s, defaults={"strategies": {"d": 0}}) == {"d": 0}
+    assert storage.get_user_data("new@example.com") == {"strategies": {"d": 0}}
+    storage.delete_user_data(email)
+    assert storage.get_user_data(email) is None
+
+    assert storage.get_document("strategy_templates", {}) == {}
+    storage.put_document("strategy_templates", {"t": {"name": "t"}})
+    assert storage.get_document("strategy_templates") == {"t": {"name": "t"}}
+
+def test_json_backend():
+    """Test the original file layout"""
+    print("Testing JSON storage...")
+    base = tempfile.mkdtemp()
+    storage = JSONStorage(base)
+    check_backend(storage)
+    with open(os.path.join(base, "users.json")) as f:
+        assert "user1@example.com" in json.load(f)
+    print("✅ JSON backend works")
+
+def test_sqlite_backend():
+    """Test WAL mode, indexed users and per-section updates"""
+    print("Testing SQLite storage...")
+    storage = SQLiteStorage(os.path.join(tempfile.mkdtemp(), "test.db"))
+    assert storage.journal_mode() == "wal"
+    check_backend(storage)
+
+    # Concurrent section updates from several threads do not lose each other's writes
+    email = "user1@example.com"
+    threads = [threading.Thread(target=storage.update_user_data, args=(email, {f"section{i}": i}))
+               for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    data = storage.get_user_data(email)
+    assert all(data[f"section{i}"] == i for i in range(8))
+
+    # Concurrent read-modify-writes of one section through the user data manager keep every entry
+    from storage import set_storage
+    from user_data import user_data_manager
+    previous = set_storage(storage)
+    try:
+        def save_many(worker):
+            for n in range(10):
+                user_data_manager.save_user_strategy(email, f"w{worker}-{n}", {"n": n})
+                user_data_manager.save_user_custom_strategy(email, {"id": "shared"})
+        threads = [threading.Thread(target=save_many, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(user_data_manager.get_user_strategies(email)) == 80
+        versions = [s["version"] for s in user_data_manager.get_user_custom_strategies(email)]
+        assert sorted(versions) == list(range(1, 81))
+    finally:
+        set_storage(previous)
+    storage.close()
+    print("✅ SQLite backend works")
+
+def test_json_migration():
+    """Test the one-shot copy of the JSON files into SQLite"""
+    print("Testing JSON migration...")
+    base = tempfile.mkdtemp()
+    source = JSONStorage(base)
+    source.save_users({r["email"]: r for r in (user_record(1), user_record(2))})
+    source.save_user_data("user2@example.com", {"strategies": {"s": {"rsi": 30}}, "bot_status": {"running": False}})
+    source.put_document("saved_strategies", {"x": {"name": "x"}})
+    source.put_document("custom_strategies", [{"id": "c1"}])
+
+    target = SQLiteStorage(os.path.join(base, "migrated.db"))
+    assert target.migrate_from_json(source) == {"users": 2, "user_data": 1, "documents": 2}
+    assert target.get_user_by_username("user2")["email"] == "user2@example.com"
+    assert target.get_user_data("user2@example.com")["strategies"] == {"s": {"rsi": 30}}
+    assert target.get_document("custom_strategies") == [{"id": "c1"}]
+    source.put_document("saved_strategies", {})
+    assert target.migrate_from_json(source) == {}  # already migrated
+    assert target.get_document("saved_strategies") == {"x": {"name": "x"}}
+    print("✅ JSON data migrated once")
+
+if __name__ == "__main__":
+    test_json_backend()
+    test_sqlite_backend()
+    test_json_migration()
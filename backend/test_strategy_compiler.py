@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test script for the custom strategy compiler
+"""
+
+import random
+import numpy as np
+from strategy_compiler import compile_strategy, CompiledStrategyCache, StrategyValidationError
+
+STRATEGY = {
+    "id": "strategy_test",
+    "version": 1,
+    "parameters": [{"name": "oversold", "type": "number", "value": 35}],
+    "rules": {
+        "buy": {"and": [
+            {"indicator": "rsi", "period": 14, "op": "<", "value": "$oversold"},
+            {"indicator": "price", "op": ">", "value": {"indicator": "bollinger", "period": 20, "band": "lower"}},
+        ]},
+        "sell": {"OR": [
+            {"indicator": "rsi", "period": 14, "op": ">", "value": 65},
+            {"indicator": "macd", "line": "histogram", "op": "<", "value": -50},
+            {"indicator": "momentum", "period": 10, "op": "below", "value": -0.03},
+        ]},
+    },
+}
+
+def random_walk(n: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    prices = [30000.0]
+    for _ in range(n - 1):
+        prices.append(prices[-1] * (1 + rng.gauss(0, 0.004)))
+    return prices
+
+def test_validation_errors():
+    """Test that invalid rules are rejected with readable paths"""
+    print("Testing rule validation...")
+    bad = {
+        "id": "bad",
+        "rules": {"buy": {"and": [
+            {"indicator": "rsii", "op": "<", "value": 30},
+            {"indicator": "sma", "period": 0, "op": ">", "value": 1},
+            {"indicator": "rsi", "op": "<>", "value": "$missing"},
+        ]}},
+    }
+    try:
+        compile_strategy(bad)
+        assert False, "expected StrategyValidationError"
+    except StrategyValidationError as e:
+        joined = " | ".join(e.errors)
+        assert "rules.buy.and[0].indicator" in joined
+        assert "rules.buy.and[1].period" in joined
+        assert "rules.buy.and[2].op" in joined
+        assert "$missing" in joined
+    print("✅ Invalid rules rejected")
+
+def test_null_parameter_is_reported():
+    """Test that a $parameter whose value is null fails with an error instead of silently"""
+    print("Testing null parameter references...")
+    strategy = {
+        "id": "null_param",
+        "parameters": [{"name": "period", "value": None}],
+        "rules": {"buy": {"indicator": "sma", "period": "$period", "op": ">", "value": 1}},
+    }
+    try:
+        compile_strategy(strategy)
+        assert False, "expected StrategyValidationError"
+    except StrategyValidationError as e:
+        assert e.errors == ["rules.buy.period: parameter resolves to null"]
+    print("✅ Null parameter reported")
+
+def test_stream_matches_vectorized():
+    """Test that tick-by-tick and whole-array evaluation agree"""
+    print("Testing streaming vs vectorized evaluation...")
+    prices = random_walk(3000)
+    compiled = compile_strategy(STRATEGY)
+    vectorized = compiled.evaluate_array(np.array(prices))
+    evaluator = compiled.stream()
+    streamed = [evaluator.update(p) for p in prices]
+    names = {1: "buy", -1: "sell", 0: "hold"}
+    assert [names[int(v)] for v in vectorized] == streamed
+    assert "buy" in streamed and "sell" in streamed
+    assert compiled.evaluate_latest(prices) == streamed[-1]
+    print(f"✅ {len(prices)} ticks agree ({streamed.count('buy')} buys, {streamed.count('sell')} sells)")
+
+def test_cache_by_id_and_version():
+    """Test that the cache keys compiled strategies by owner, id and version"""
+    print("Testing compiled strategy cache...")
+    cache = CompiledStrategyCache()
+    first = cache.get_or_compile(STRATEGY)
+    assert cache.get_or_compile(STRATEGY) is first
+    updated = dict(STRATEGY, version=2)
+    second = cache.get_or_compile(updated)
+    assert second is not first
+    assert cache.get(None, "strategy_test", 1) is None  # older version evicted
+    other = cache.get_or_compile(dict(STRATEGY, owner="other@example.com"))
+    assert other is not second and cache.get(None, "strategy_test", 2) is second
+    print("✅ Cache hit on same version, recompiles on new version or owner")
+
+def test_saves_are_versioned_by_the_server():
+    """Test that re-saving without a version replaces the active rules, per user"""
+    print("Testing server-assigned versions...")
+    import tempfile
+    from types import SimpleNamespace
+    import main
+    from storage import JSONStorage, set_storage
+    from trading_loop import custom_strategy_signal
+    always = {"indicator": "price", "op": ">", "value": 0}
+    alice, bob = SimpleNamespace(email="alice@example.com"), SimpleNamespace(email="bob@example.com")
+    previous = set_storage(JSONStorage(tempfile.mkdtemp()))
+    with main.state.lock:
+        saved_config = dict(main.state.strategy_config)
+    evaluators = {}
+
+    def save_and_activate(user, rules):
+        version = main.save_custom_strategy({"id": "shared_id", "rules": rules}, user)["strategy"]["version"]
+        main.activate_custom_strategy("shared_id", user)
+        return version, custom_strategy_signal(evaluators, 100.0, main.state.strategy_config)
+
+    try:
+        assert save_and_activate(alice, {"buy": always}) == (1, "buy")
+        assert save_and_activate(alice, {"sell": always}) == (2, "sell")
+        assert save_and_activate(bob, {"buy": always}) == (1, "buy")
+        assert save_and_activate(alice, {"sell": always}) == (3, "sell")
+    finally:
+        set_storage(previous)
+        with main.state.lock:
+            main.state.strategy_config.clear()
+            main.state.strategy_config.update(saved_config)
+    print("✅ Every save is a new version and users' ids never collide")
+
+if __name__ == "__main__":
+    test_validation_errors()
+    test_null_parameter_is_reported()
+    test_stream_matches_vectorized()
+    test_cache_by_id_and_version()
+    test_saves_are_versioned_by_the_server()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test script for the exchange symbol-metadata cache and order pre-validation
+"""
+
+import time
+from exchange_connectors import ExchangeConnectorFactory, ExchangeCredentials, Order
+from symbol_metadata import (SymbolMetadataService, OrderValidationError, parse_binance, parse_kucoin,
+                             symbol_metadata)
+
+BINANCE_INFO = {"symbols": [{
+    "symbol": "BTCUSDT", "status": "TRADING", "baseAsset": "BTC", "quoteAsset": "USDT",
+    "filters": [
+        {"filterType": "PRICE_FILTER", "tickSize": "0.01000000"},
+        {"filterType": "LOT_SIZE", "minQty": "0.00001000", "maxQty": "9000.00000000", "stepSize": "0.00001000"},
+        {"filterType": "NOTIONAL", "minNotional": "5.00000000"},
+    ]}]}
+KUCOIN_SYMBOLS = {"data": [{
+    "symbol": "ETH-USDT", "baseCurrency": "ETH", "quoteCurrency": "USDT", "baseIncrement": "0.0001",
+    "priceIncrement": "0.01", "baseMinSize": "0.0001", "baseMaxSize": "10000", "minFunds": "0.1",
+    "enableTrading": True}]}
+
+def fake_fetcher(calls):
+    def fetch(exchange, sandbox):
+        calls.append(exchange)
+        if exchange == "binance":
+            return parse_binance(BINANCE_INFO)
+        if exchange == "kucoin":
+            return parse_kucoin(KUCOIN_SYMBOLS)
+        raise ConnectionError("exchange unreachable")
+    return fetch
+
+def test_lookup_and_quantization():
+    """Test cached lookups, normalization and lot/tick rounding"""
+    print("Testing symbol metadata lookups...")
+    calls = []
+    service = SymbolMetadataService(fetcher=fake_fetcher(calls))
+    btc = service.get("binance", "BTCUSDT")
+    assert service.get("binance", "BTCUSDT") is btc and calls == ["binance"]  # loaded once
+    assert btc.quantize_qty(0.123456789) == 0.12345
+    assert btc.quantize_price(50000.129, "buy") == 50000.12 and btc.quantize_price(50000.121, "sell") == 50000.13
+    assert not btc.violations(0.0001, 50000)
+    assert btc.violations(0.00005, 50000) and btc.violations(0.000015, 1e6)  # min notional, step
+
+    assert service.to_exchange("kucoin", "ETHUSDT") == "ETH-USDT"
+    assert service.normalize("kucoin", "ETH-USDT") == "ETHUSDT"
+    assert service.to_exchange("kucoin", "DOGEUSDT") == "DOGEUSDT"  # unknown passes through
+
+    # A failed first load is not retried on every lookup
+    assert service.get("btcc", "BTCUSDT") is None and service.get("btcc", "BTCUSDT") is None
+    assert calls.count("btcc") == 1
+    service.stop()
+    print("✅ Symbols load once and round to exchange rules")
+
+def test_background_refresh():
+    """Test that the refresher swaps in new rules without blocking lookups"""
+    print("Testing background refresh...")
+    calls = []
+    service = SymbolMetadataService(fetcher=fake_fetcher(calls), refresh_interval=0.05)
+    assert service.get("binance", "BTCUSDT").min_notional == 5.0
+    BINANCE_INFO["symbols"][0]["filters"][2]["minNotional"] = "10.0"
+    try:
+        deadline = time.time() + 2
+        while service.get("binance", "BTCUSDT").min_notional != 10.0 and time.time() < deadline:
+            time.sleep(0.01)
+        assert service.get("binance", "BTCUSDT").min_notional == 10.0
+    finally:
+        BINANCE_INFO["symbols"][0]["filters"][2]["minNotional"] = "5.00000000"
+        service.stop()
+    print(f"✅ Refreshed after {calls.count('binance') - 1} background reloads")
+
+def test_connector_prevalidates_orders():
+    """Test that connectors quantize, translate and reject orders before any request"""
+    print("Testing order pre-validation...")
+    original = symbol_metadata.fetcher
+    symbol_metadata.fetcher = fake_fetcher([])
+    try:
+        credentials = ExchangeCredentials(api_key="k", api_secret="s", passphrase="p", sandbox=True)
+        kucoin = ExchangeConnectorFactory.create_connector("kucoin", credentials)
+        order = kucoin.prepare_order(Order(symbol="ETHUSDT", side="buy", quantity=0.123456, price=3000.009,
+                                           order_type="limit"))
+        assert (order.symbol, order.quantity, order.price) == ("ETH-USDT", 0.1234, 3000.0)
+
+        binance = ExchangeConnectorFactory.create_connector("binance", credentials)
+        try:
+            binance.place_order(Order(symbol="BTCUSDT", side="buy", quantity=0.00001, price=50000,
+                                      order_type="market"))
+            assert False, "order below min notional should not be sent"
+        except OrderValidationError as e:
+            assert "notional" in str(e)
+    finally:
+        symbol_metadata.fetcher = original
+        symbol_metadata._tables.clear()
+        symbol_metadata.stop()
+    print("✅ Invalid orders are rejected locally")
+
+if __name__ == "__main__":
+    test_lookup_and_quantization()
+    test_background_refresh()
+    test_connector_prevalidates_orders()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Test script for cursor-paginated and streamed trade history
+"""
+
+import json
+from trade_history import TradeStore
+
+def make_store(n=250):
+    store = TradeStore()
+    for i in range(n):
+        store.append("a@example.com", {
+            "timestamp": f"2025-01-01T00:{i // 60:02d}:{i % 60:02d}",
+            "symbol": ["BTCUSDT", "ETHUSDT", "SOLUSDT"][i % 3],
+            "action": "buy" if i % 2 == 0 else "sell",
+            "quantity": 1, "price": 100 + i,
+        })
+    store.append("b@example.com", {"timestamp": "2025-01-01T00:00:00", "symbol": "BTCUSDT", "action": "buy"})
+    return store
+
+def test_cursor_pagination():
+    """Test newest-first pages with a cursor until the end"""
+    print("Testing cursor pagination...")
+    store = make_store()
+    seen = []
+    cursor = None
+    while True:
+        page, cursor = store.page("a@example.com", cursor=cursor, limit=100)
+        seen.extend(t["price"] for t in page)
+        if cursor is None:
+            break
+    assert seen == [100 + i for i in range(249, -1, -1)]
+    page, cursor = store.page("a@example.com", limit=250)
+    assert len(page) == 250 and cursor is None
+    ascending, cursor = store.page("a@example.com", limit=10, descending=False)
+    assert [t["price"] for t in ascending] == list(range(100, 110))
+    assert store.page("a@example.com", cursor=cursor, limit=1, descending=False)[0][0]["price"] == 110
+    assert store.count("b@example.com") == 1
+    print("✅ Cursor pages cover every trade exactly once")
+
+def test_filters():
+    """Test symbol, side and date range filters"""
+    print("Testing filters...")
+    store = make_store()
+    page, _ = store.page("a@example.com", symbol="ETHUSDT", side="sell", limit=1000)
+    assert page and all(t["symbol"] == "ETHUSDT" and t["action"] == "sell" for t in page)
+    assert len(page) == len([i for i in range(250) if i % 3 == 1 and i % 2 == 1])
+    page, _ = store.page("a@example.com", start="2025-01-01T00:01:00Z", end="2025-01-01T00:02:00Z", limit=1000)
+    assert [t["price"] for t in page] == [100 + i for i in range(119, 59, -1)]
+    print("✅ Filters applied server-side")
+
+def test_ndjson_export():
+    """Test the streamed export in batches"""
+    print("Testing NDJSON export...")
+    store = make_store(2500)
+    chunks = list(store.export_ndjson("a@example.com", symbol="BTCUSDT"))
+    assert len(chunks) == 1  # 834 trades fit in one batch
+    chunks = list(store.export_ndjson("a@example.com"))
+    assert len(chunks) == 3
+    lines = b"".join(chunks).decode().splitlines()
+    assert len(lines) == 2500
+    assert json.loads(lines[0])["price"] == 100 and json.loads(lines[-1])["price"] == 2599
+    print("✅ Export streams every trade oldest first")
+
+def test_export_pages_from_engine():
+    """Test that an export assembled from engine-side pages matches the local stream"""
+    print("Testing paged export through the engine...")
+    import main
+    store = make_store(2500)
+    original, main.trade_store = main.trade_store, store
+    try:
+        for filters in ({"symbol": None, "side": None, "start": None, "end": None},
+                        {"symbol": "ETHUSDT", "side": "sell", "start": "2025-01-01T00:05:00", "end": None}):
+            paged = b"".join(main._export_from_engine("a@example.com", filters))
+            assert paged == b"".join(store.export_ndjson("a@example.com", **filters))
+    finally:
+        main.trade_store = original
+    print("✅ Engine pages reassemble the full export")
+
+if __name__ == "__main__":
+    test_cursor_pagination()
+    test_filters()
+    test_ndjson_export()
+    test_export_pages_from_engine()
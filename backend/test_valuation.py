@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test script for vectorized mark-to-market valuation
+"""
+
+import random
+import time
+from valuation import PortfolioValuation
+from test_helpers import paper_state
+
+def test_marks_and_totals():
+    """Test per-position marks, leverage, unpriced positions and per-account totals"""
+    print("Testing marked values...")
+    valuation = PortfolioValuation(clock=lambda: 100.0)
+    valuation.set_cash("alice", 1000)
+    valuation.set_position("alice", "binance", "BTCUSDT", 0.1, 30000)
+    valuation.set_position("alice", "binance", "ETHUSDT", 2, 2000, leverage=4)
+    valuation.set_position("bob", "binance", "BTCUSDT", 1, 20000)
+    valuation.set_position("alice", "kucoin", "SOLUSDT", 10, 100)  # never priced: carried at cost
+    valuation.on_prices("binance", {"BTCUSDT": 33000, "ETHUSDT": 2100})
+
+    alice = valuation.account("alice")
+    assert alice["unrealized_pnl"] == 300 + 200 and alice["notional_exposure"] == 3300 + 4200 + 1000
+    assert alice["positions_value"] == 3300 + (1000 + 200) + 1000
+    assert alice["total_value"] == 1000 + 5500 and alice["priced_at"] == 100.0
+    sol = [p for p in alice["positions"] if p["symbol"] == "SOLUSDT"][0]
+    assert sol["mark"] == 100 and sol["unrealized_pnl"] == 0
+    assert valuation.account("bob")["unrealized_pnl"] == 13000
+    assert valuation.account("nobody")["positions"] == []
+    print("✅ Positions marked and totalled per account")
+
+def test_close_and_drawdown():
+    """Test that closing a row keeps the others intact and drawdown follows the peak"""
+    print("Testing closes and drawdown...")
+    valuation = PortfolioValuation()
+    for i in range(5):
+        valuation.set_position("u", "mock", f"S{i}USDT", i + 1, 10)
+    valuation.on_prices("mock", {f"S{i}USDT": 12 for i in range(5)})
+    valuation.set_position("u", "mock", "S1USDT", 0, 0)
+    account = valuation.account("u")
+    assert sorted(p["qty"] for p in account["positions"]) == [1, 3, 4, 5]
+    assert account["unrealized_pnl"] == 2 * 13
+    valuation.on_prices("mock", {f"S{i}USDT": 11 for i in range(5)})
+    account = valuation.account("u")
+    assert abs(account["max_drawdown"] - (180 - 143) / 180 * 100) < 1e-9  # peak was all five at 12
+    valuation.set_position("v", "mock", "S0USDT", 2, 10)
+    valuation.drop("u")
+    assert valuation.account("u")["positions"] == [] and valuation.account("u")["max_drawdown"] == 0
+    assert [p["qty"] for p in valuation.account("v")["positions"]] == [2]
+    print("✅ Rows compacted and drawdown tracked")
+
+def test_matches_per_position_loop():
+    """Test the vectorized pass against a plain loop over many accounts and symbols"""
+    print("Testing 100,000 positions...")
+    rng = random.Random(3)
+    valuation = PortfolioValuation()
+    expected = {}
+    for i in range(100000):
+        account, symbol = f"user{i % 2000}", f"C{rng.randrange(300)}USDT"
+        qty, avg = rng.uniform(0.1, 5), rng.uniform(1, 100)
+        valuation.set_position(account, "binance", symbol, qty, avg)
+        expected[(account, symbol)] = (qty, avg)
+    prices = {f"C{i}USDT": rng.uniform(1, 100) for i in range(300)}
+    start = time.perf_counter()
+    for _ in range(10):
+        valuation.on_prices("binance", prices)
+    per_pass = (time.perf_counter() - start) / 10
+    unrealized = sum(qty * prices[symbol] - qty * avg
+                     for (account, symbol), (qty, avg) in expected.items() if account == "user7")
+    assert abs(valuation.account("user7")["unrealized_pnl"] - unrealized) < 1e-6
+    assert valuation.get_stats()["positions"] == len(expected) and per_pass < 0.1
+    print(f"✅ {len(expected)} positions revalued in {per_pass * 1000:.1f} ms")
+
+def test_portfolio_status_endpoint():
+    """Test that /portfolio-status and /positions report the marked paper portfolio"""
+    print("Testing /portfolio-status...")
+    from accounting import PAPER_USER, PAPER_EXCHANGE
+    from valuation import portfolio_valuation
+    with paper_state() as main:
+        main.execute_mock_trade(main.TradeRequest(symbol="MARKUSDT", side="buy", qty=4, price=25))
+        portfolio_valuation.on_prices(PAPER_EXCHANGE, {"MARKUSDT": 30})
+        status = main.get_portfolio_status()
+        [allocation] = [a for a in status["allocations"] if a["asset"] == "MARKUSDT"]
+        assert allocation["current_value"] == 120 and allocation["pnl"] == 20
+        assert status["cash"] == main.state.cash
+        positions = main.get_positions()
+        assert positions["positions"]["MARKUSDT"] == {"qty": 4, "avg_price": 25}
+        assert any(p["symbol"] == "MARKUSDT" for p in positions["valuation"]["positions"])
+    assert not any(p["symbol"] == "MARKUSDT" for p in portfolio_valuation.account(PAPER_USER)["positions"])
+    print("✅ Paper portfolio served at marked values")
+
+if __name__ == "__main__":
+    test_marks_and_totals()
+    test_close_and_drawdown()
+    test_matches_per_position_loop()
+    test_portfolio_status_endpoint()
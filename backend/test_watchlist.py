@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Test script for the multi-symbol watchlist price matrix and batched signals
+"""
+
+import random
+import numpy as np
+from watchlist import PriceMatrix, batch_signals, normalize_watchlist
+import trading_loop
+from trading_loop import simple_strategy
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None, text=""):
+        self.status_code = status_code
+        self.payload = payload
+        self.text = text
+
+    def json(self):
+        return self.payload
+
+def test_normalize_watchlist():
+    """Test symbol cleanup and validation"""
+    print("Testing watchlist validation...")
+    assert normalize_watchlist(["btcusdt", "ETH/USDT", "BTCUSDT"]) == ["BTCUSDT", "ETHUSDT"]
+    for bad in ([], ["BTC USDT"], ["X"]):
+        try:
+            normalize_watchlist(bad)
+            assert False, bad
+        except ValueError:
+            pass
+    print("✅ Watchlist symbols normalized")
+
+def test_price_matrix_history():
+    """Test ring buffer order, carry-forward and watchlist changes"""
+    print("Testing price matrix...")
+    matrix = PriceMatrix(["AAAUSDT", "BBBUSDT"], history=4)
+    for i in range(6):
+        prices = {"AAAUSDT": 100.0 + i}
+        if i < 3:
+            prices["BBBUSDT"] = 10.0 + i
+        matrix.append(prices)
+    assert matrix.prices_for("AAAUSDT") == [102.0, 103.0, 104.0, 105.0]
+    # BBB stopped quoting after tick 2; its last price is carried forward
+    assert matrix.prices_for("BBBUSDT") == [12.0, 12.0, 12.0, 12.0]
+    matrix.set_symbols(["BBBUSDT", "CCCUSDT"])
+    assert matrix.prices_for("BBBUSDT") == [12.0, 12.0, 12.0, 12.0]
+    assert matrix.prices_for("CCCUSDT") == []
+    print("✅ Price history kept per symbol")
+
+def test_batch_signals_match_simple_strategy():
+    """Test the vectorized pass against the per-symbol strategy"""
+    print("Testing batched signals...")
+    random.seed(7)
+    symbols = [f"SYM{i}USDT" for i in range(40)]
+    matrix = PriceMatrix(symbols)
+    histories = {s: [] for s in symbols}
+    configs = [
+        {"active_strategy": "momentum", "momentum_lookback": 5, "momentum_threshold": 0.02},
+        {"active_strategy": "breakout", "breakout_period": 10, "breakout_multiplier": 1.0},
+        {"active_strategy": "rsi", "rsi_oversold": 35, "rsi_overbought": 65},
+    ]
+    for tick in range(30):
+        prices = {}
+        for s in symbols:
+            last = histories[s][-1] if histories[s] else 100.0
+            prices[s] = last * random.uniform(0.97, 1.03)
+            histories[s] = (histories[s] + [prices[s]])[-50:]
+        matrix.append(prices)
+        rsi = np.array([random.uniform(20, 80) for _ in symbols])
+        for config in configs:
+            signals = batch_signals(matrix, config, rsi)
+            for row, s in enumerate(symbols):
+                expected = simple_strategy(prices[s], rsi[row], config, histories[s])
+                got = {1: 'buy', -1: 'sell', 0: 'hold'}[int(signals[row])]
+                assert got == expected, (tick, config["active_strategy"], s, got, expected)
+    print("✅ Batched signals match simple_strategy for 40 symbols")
+
+def test_unlisted_symbol_keeps_real_prices():
+    """Test that one unlisted symbol falls back to the full ticker list and is reported as mock-priced"""
+    print("Testing watchlist prices with an unlisted symbol...")
+    requests_made = []
+
+    def fake_get(url, params=None, timeout=None):
+        requests_made.append(params)
+        if params:
+            return FakeResponse(400, text='{"code":-1121,"msg":"Invalid symbol."}')
+        return FakeResponse(200, [{"symbol": "BTCUSDT", "price": "30000"}, {"symbol": "ETHUSDT", "price": "2000"},
+                                  {"symbol": "BNBUSDT", "price": "300"}])
+
+    get = trading_loop.requests.get
+    trading_loop.requests.get = fake_get
+    try:
+        prices = trading_loop.get_watchlist_data(["BTCUSDT", "ETHUSDT", "NOPEUSDT"], {"NOPEUSDT": 5.0})
+    finally:
+        trading_loop.requests.get = get
+    assert len(requests_made) == 2 and requests_made[1] is None
+    assert prices["BTCUSDT"] == 30000 and prices["ETHUSDT"] == 2000 and 4.9 < prices["NOPEUSDT"] < 5.1
+    assert "BNBUSDT" not in prices and trading_loop.mock_priced_symbols == ["NOPEUSDT"]
+    print("✅ Listed symbols keep real prices; the unlisted one is reported")
+
+def test_post_watchlist_rejects_unlisted_pairs():
+    """Test that POST /watchlist refuses pairs the exchange does not list"""
+    print("Testing watchlist listing check...")
+    import main
+    from fastapi import HTTPException
+    from symbol_metadata import SymbolMetadataService, SymbolInfo
+    service = SymbolMetadataService(fetcher=lambda exchange, sandbox: [
+        SymbolInfo("binance", symbol, symbol[:-4], "USDT") for symbol in ("BTCUSDT", "ETHUSDT")])
+    metadata, watchlist = main.symbol_metadata, main.state.watchlist
+    main.symbol_metadata = service
+    try:
+        try:
+            main.set_watchlist(["BTCUSDT", "NOPEUSDT"])
+            assert False, "unlisted pair accepted"
+        except HTTPException as e:
+            assert e.status_code == 400 and "NOPEUSDT" in e.detail
+        assert main.set_watchlist(["btcusdt", "ETH/USDT"])["watchlist"] == ["BTCUSDT", "ETHUSDT"]
+    finally:
+        service.stop()
+        main.symbol_metadata = metadata
+        with main.state.lock:
+            main.state.watchlist = watchlist
+    print("✅ Unlisted pairs rejected")
+
+if __name__ == "__main__":
+    test_normalize_watchlist()
+    test_price_matrix_history()
+    test_batch_signals_match_simple_strategy()
+    test_unlisted_symbol_keeps_real_prices()
+    test_post_watchlist_rejects_unlisted_pairs()
@@ -0,0 +1,155 @@
+import json
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from user_data import user_data_manager
+
+MAX_PAGE_SIZE = 1000
+EXPORT_BATCH_SIZE = 1000
+
+
+def parse_trade_time(timestamp) -> float:
+    """Epoch seconds for an ISO-8601 timestamp ("...Z" or naive UTC) or a number"""
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    dt = datetime.fromisoformat(str(timestamp).replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+class _UserTrades:
+    """One user's trades in arrival order with parallel id/time columns and a per-symbol index"""
+
+    __slots__ = ("trades", "ids", "times", "by_symbol")
+
+    def __init__(self):
+        self.trades: List[Dict[str, Any]] = []
+        self.ids: List[int] = []
+        self.times: List[float] = []
+        self.by_symbol: Dict[str, List[int]] = {}
+
+
+class TradeStore:
+    """Append-only per-user trade log with cursor pagination and streaming export.
+
+    Trades get increasing integer ids, so a cursor is just the last id seen.
+    Time bounds and cursors are bisects over the id/time columns; a symbol
+    filter walks that symbol's position list instead of every trade. A user's
+    persisted trades are loaded through `loader` the first time they are used.
+    """
+
+    def __init__(self, loader: Optional[Callable[[str], List[Dict[str, Any]]]] = None):
+        self.loader = loader
+        self._users: Dict[str, _UserTrades] = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def _user(self, user_email: str) -> _UserTrades:
+        user = self._users.get(user_email)
+        if user is not None:
+            return user
+        persisted = self.loader(user_email) if self.loader else []
+        with self._lock:
+            user = self._users.get(user_email)
+            if user is None:
+                user = self._users[user_email] = _UserTrades()
+                for trade in persisted:
+                    self._append(user, trade)
+        return user
+
+    def _append(self, user: _UserTrades, trade: Dict[str, Any]) -> Dict[str, Any]:
+        t = parse_trade_time(trade.get("timestamp") or datetime.utcnow().isoformat())
+        trade = dict(trade, id=self._next_id)
+        self._next_id += 1
+        # Out-of-order timestamps are clamped so the time column stays sorted
+        if user.times and t < user.times[-1]:
+            t = user.times[-1]
+        position = len(user.trades)
+        user.trades.append(trade)
+        user.ids.append(trade["id"])
+        user.times.append(t)
+        user.by_symbol.setdefault(trade.get("symbol"), []).append(position)
+        return trade
+
+    def append(self, user_email: str, trade: Dict[str, Any]) -> Dict[str, Any]:
+        """Record a trade; assigns and returns it with an `id`"""
+        user = self._user(user_email)
+        with self._lock:
+            return self._append(user, trade)
+
+    def count(self, user_email: str) -> int:
+        return len(self._user(user_email).trades)
+
+    def all(self, user_email: str) -> List[Dict[str, Any]]:
+        return list(self._user(user_email).trades)
+
+    def _bounds(self, user: _UserTrades, size: int, start: Optional[str], end: Optional[str]) -> Tuple[int, int]:
+        """[lo, hi) positions of trades with start <= timestamp < end"""
+        times = user.times
+        lo = bisect_left(times, parse_trade_time(start), 0, size) if start else 0
+        hi = bisect_left(times, parse_trade_time(end), 0, size) if end else size
+        return lo, hi
+
+    def _positions(self, user: _UserTrades, lo: int, hi: int, symbol: Optional[str], descending: bool) -> Iterator[int]:
+        if symbol is None:
+            return iter(range(hi - 1, lo - 1, -1) if descending else range(lo, hi))
+        index = user.by_symbol.get(symbol, [])
+        i, j = bisect_left(index, lo), bisect_left(index, hi)
+        return (index[k] for k in (range(j - 1, i - 1, -1) if descending else range(i, j)))
+
+    def page(self, user_email: str, cursor: Optional[int] = None, limit: int = 100,
+             symbol: Optional[str] = None, side: Optional[str] = None,
+             start: Optional[str] = None, end: Optional[str] = None,
+             descending: bool = True) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """One page of matching trades and the cursor for the next page (None at the end)"""
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        user = self._user(user_email)
+        size = len(user.trades)  # append-only: positions below this stay valid without the lock
+        lo, hi = self._bounds(user, size, start, end)
+        if cursor is not None:
+            if descending:
+                hi = min(hi, bisect_left(user.ids, cursor, 0, size))
+            else:
+                lo = max(lo, bisect_right(user.ids, cursor, 0, size))
+        items = []
+        for position in self._positions(user, lo, hi, symbol, descending):
+            trade = user.trades[position]
+            if side is not None and trade.get("action", trade.get("side")) != side:
+                continue
+            if len(items) == limit:
+                return items, items[-1]["id"]
+            items.append(trade)
+        return items, None
+
+    def iter_trades(self, user_email: str, symbol: Optional[str] = None, side: Optional[str] = None,
+                    start: Optional[str] = None, end: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Matching trades oldest first, as of the moment the iteration starts"""
+        user = self._user(user_email)
+        lo, hi = self._bounds(user, len(user.trades), start, end)
+        for position in self._positions(user, lo, hi, symbol, descending=False):
+            trade = user.trades[position]
+            if side is None or trade.get("action", trade.get("side")) == side:
+                yield trade
+
+    def export_ndjson(self, user_email: str, **filters) -> Iterator[bytes]:
+        """Matching trades as NDJSON, in batches so memory stays constant however many there are"""
+        batch = []
+        for trade in self.iter_trades(user_email, **filters):
+            batch.append(json.dumps(trade, separators=(",", ":")))
+            if len(batch) == EXPORT_BATCH_SIZE:
+                yield ("\n".join(batch) + "\n").encode()
+                batch = []
+        if batch:
+            yield ("\n".join(batch) + "\n").encode()
+
+
+def _load_persisted_trades(user_email: str) -> List[Dict[str, Any]]:
+    """Trades the bot saved into the user's document in earlier runs"""
+    return user_data_manager.get_user_data(user_email).get('trading_data', {}).get('trades', [])
+
+
+# Global trade log for the real trading bot
+trade_store = TradeStore(loader=_load_persisted_trades)
@@ -1,10 +1,21 @@
 import threading
 import time
 import random
+import json
 import requests
+import numpy as np
 from trading_state import state
-import datetime
-import pytz
+from scheduler import TickScheduler, parse_timeframe
+from market_calendar import calendar_for_schedule
+from strategy_compiler import compiled_strategy_cache, strategy_key, StrategyValidationError
+from watchlist import PriceMatrix, batch_signals
+from candles import candle_aggregator
+from signal_pipeline import confirm_signals
+from shared_state import is_trading_leader
+from exit_monitor import ExitMonitor
+from accounting import PAPER_USER, PAPER_EXCHANGE
+from valuation import portfolio_valuation
+from metrics import TRADING_TICK_DURATION, TRADING_SIGNALS_PER_TICK, TRADING_ORDERS_PER_TICK, registry as metrics_registry
 
 # Binance API configuration
 BINANCE_TESTNET_BASE_URL = "https://testnet.binance.vision"
@@ -28,17 +39,71 @@ def get_binance_price(symbol: str, is_testnet: bool = True):
         print(f"Exception fetching price for {symbol}: {e}")
         return None
 
+# Above this many symbols one unfiltered ticker/price call is cheaper than a filtered one
+BATCH_ALL_SYMBOLS_THRESHOLD = 100
+
+WATCHLIST_MOCK_PRICED = metrics_registry.gauge(
+    "watchlist_mock_priced_symbols", "Watchlist symbols priced by the random-walk fallback on the last tick")
+
+# Watchlist symbols the last tick priced with mock data, for /watchlist
+mock_priced_symbols = []
+
+def get_binance_prices(symbols, is_testnet: bool = True):
+    """Fetch prices for many symbols with a single ticker/price request"""
+    try:
+        base_url = BINANCE_TESTNET_BASE_URL if is_testnet else BINANCE_MAINNET_BASE_URL
+        url = f"{base_url}/api/v3/ticker/price"
+        # Filtered requests cost weight per symbol; the full ticker list is a flat weight
+        params = {}
+        if len(symbols) <= BATCH_ALL_SYMBOLS_THRESHOLD:
+            params = {"symbols": json.dumps(list(symbols), separators=(",", ":"))}
+        
+        response = requests.get(url, params=params, timeout=5)
+        if response.status_code == 400 and params:
+            # One unlisted symbol fails the whole filtered request; the full list still prices the rest
+            print(f"Filtered price request rejected ({response.text[:200]}), fetching the full ticker list")
+            response = requests.get(url, timeout=5)
+        if response.status_code == 200:
+            wanted = set(symbols)
+            return {t["symbol"]: float(t["price"]) for t in response.json() if t["symbol"] in wanted}
+        else:
+            print(f"Error fetching prices for {len(symbols)} symbols: {response.status_code}")
+            return {}
+    except Exception as e:
+        print(f"Exception fetching prices for {len(symbols)} symbols: {e}")
+        return {}
+
+def get_exchange_config():
+    """Exchange config from state, defaulting to BTCUSDT on the Binance testnet"""
+    with state.lock:
+        return getattr(state, 'exchange_config', {
+            "exchange": "binance",
+            "is_testnet": True,
+            "trading_pair": "BTCUSDT",
+            "test_balance": 10000.0
+        })
+
+def get_watchlist_data(symbols, last_prices=None):
+    """Prices for the whole watchlist from one batched request, mock data for any gaps"""
+    global mock_priced_symbols
+    config = get_exchange_config()
+    prices = get_binance_prices(symbols, config["is_testnet"])
+    missing = [symbol for symbol in symbols if symbol not in prices]
+    if missing:
+        # Fallback: random walk from the last known price, like the single-pair mock
+        print(f"Using mock prices for {len(missing)} of {len(symbols)} watchlist symbols: {', '.join(missing[:10])}")
+        last_prices = last_prices or {}
+        for symbol in missing:
+            last = last_prices.get(symbol)
+            prices[symbol] = last * random.uniform(0.99, 1.01) if last else random.uniform(29000, 31000)
+    mock_priced_symbols = missing
+    WATCHLIST_MOCK_PRICED.set(len(missing))
+    return prices
+
 def get_market_data():
     """Get real market data from Binance or fallback to mock data"""
     try:
-        # Get exchange config from state
-        with state.lock:
-            config = getattr(state, 'exchange_config', {
-                "exchange": "binance",
-                "is_testnet": True,
-                "trading_pair": "BTCUSDT",
-                "test_balance": 10000.0
-            })
+        config = get_exchange_config()
         
         # Try to get real price from Binance
         price = get_binance_price(config["trading_pair"], config["is_testnet"])
@@ -57,6 +122,23 @@ def compute_mock_rsi(prices):
     # Very basic RSI mock: random between 20 and 80
     return random.uniform(20, 80)
 
+def compute_mock_rsi_batch(n):
+    # Same mock as compute_mock_rsi, one value per watchlist symbol
+    return np.random.uniform(20, 80, n)
+
+def compute_watchlist_rsi(symbols, config):
+    """RSI over closed `rsi_timeframe` candles per symbol; mock values until enough bars exist"""
+    rsi = compute_mock_rsi_batch(len(symbols))
+    try:
+        timeframe = candle_aggregator.resolve(config.get('rsi_timeframe', '5min'))
+    except ValueError:
+        return rsi
+    for row, symbol in enumerate(symbols):
+        value = candle_aggregator.indicator('rsi', symbol, timeframe, period=14)
+        if value is not None:
+            rsi[row] = value
+    return rsi
+
 def simple_strategy(price, rsi, config, prices=None):
     # Use strategy config from state
     strategy = config.get('active_strategy', 'rsi')
@@ -88,6 +170,20 @@ def simple_strategy(price, rsi, config, prices=None):
         
         return 'hold'
     
+    elif strategy == 'custom':
+        # Compiled rule-based strategy; stateless callers evaluate over the price history
+        definition = config.get('custom_strategy')
+        if not definition:
+            return 'hold'
+        try:
+            compiled = compiled_strategy_cache.get_or_compile(definition)
+        except StrategyValidationError:
+            return 'hold'
+        history = list(prices) if prices else [price]
+        if not prices or prices[-1] != price:
+            history.append(price)
+        return compiled.evaluate_latest(history)
+    
     elif strategy == 'breakout':
         # Breakout strategy: buy on breakouts
         period = config.get('breakout_period', 20)
@@ -123,51 +219,186 @@ def risk_check(signal):
     # Always allow for this mock, but you can expand
     return signal in ['buy', 'sell']
 
-def execute_trade(signal, price):
+def execute_trade(signal, price, symbol='BTCUSDT', qty=1):
     if signal == 'buy':
-        # Buy 1 unit
         from main import TradeRequest, execute_mock_trade
-        req = TradeRequest(symbol='BTCUSDT', side='buy', qty=1, price=price)
+        req = TradeRequest(symbol=symbol, side='buy', qty=qty, price=price)
         execute_mock_trade(req)
     elif signal == 'sell':
         from main import TradeRequest, execute_mock_trade
-        req = TradeRequest(symbol='BTCUSDT', side='sell', qty=1, price=price)
+        req = TradeRequest(symbol=symbol, side='sell', qty=qty, price=price)
         execute_mock_trade(req)
 
+def order_qty(price, config):
+    """Units per order: a fixed `order_notional` in quote currency if set, else `order_qty` (1)"""
+    notional = config.get('order_notional')
+    if notional:
+        return notional / price
+    return config.get('order_qty', 1)
+
+def strategy_due(tick, config) -> bool:
+    """RSI strategies evaluate on `rsi_timeframe` candle closes; the others every tick"""
+    if config.get('active_strategy', 'rsi') != 'rsi':
+        return True
+    return tick.crossed(parse_timeframe(config.get('rsi_timeframe')))
+
+# Scheduler driving trading_loop; created when the loop starts
+mock_scheduler = None
+
+# Stop-loss / take-profit / trailing / time exits for the mock positions, keyed by symbol
+position_exits = ExitMonitor()
+
+def exit_settings(config):
+    """ExitMonitor arguments from the strategy's custom_exit config; None when exits are off"""
+    custom_exit = config.get('custom_exit')
+    if not custom_exit:
+        return None
+    return {
+        'stop_loss_pct': custom_exit.get('stop_loss'),
+        'take_profit_pct': custom_exit.get('profit_target'),
+        'trailing_pct': custom_exit.get('trailing_stop'),
+        'max_hold_seconds': (custom_exit.get('time_based_exit') or 0) * 60 or None,
+    }
+
+def track_position_exits(symbol, position, price, config):
+    """Re-arm a mock position's exits after a fill; call with the state lock held"""
+    settings = exit_settings(config)
+    if position['qty'] <= 0 or settings is None:
+        position_exits.cancel(symbol)
+    else:
+        position_exits.register(symbol, symbol, position['avg_price'], price=price, **settings)
+
+def close_exited_positions(prices, now):
+    """Sell every mock position whose exit the latest prices (or the clock) triggered"""
+    fired = [event for symbol, price in prices.items() for event in position_exits.on_price(symbol, price)]
+    fired.extend(position_exits.poll(now))
+    for event in fired:
+        with state.lock:
+            qty = state.positions.get(event['symbol'], {}).get('qty', 0)
+        price = event['price'] or prices.get(event['symbol'])
+        if qty > 0 and price:
+            print(f"Exit {event['reason']} for {event['symbol']}: selling {qty} @ {price}")
+            execute_trade('sell', price, event['symbol'], qty)
+    return len(fired)
+
+def wake_trading_loop():
+    """Re-check the schedule now, e.g. after bot_schedule changed while sleeping"""
+    if mock_scheduler is not None:
+        mock_scheduler.wake()
+
+def custom_strategy_signal(evaluators, price, config):
+    """Feed one tick to the streaming evaluator of the active custom strategy"""
+    definition = config.get('custom_strategy') or {}
+    key = strategy_key(definition)
+    evaluator = evaluators.get(key)
+    if evaluator is None:
+        try:
+            compiled = compiled_strategy_cache.get_or_compile(definition)
+        except StrategyValidationError:
+            return 'hold'
+        # A new strategy or version starts from fresh indicator state
+        evaluators.clear()
+        evaluator = evaluators[key] = compiled.stream()
+    return evaluator.update(price)
+
+def get_watchlist():
+    """Symbols the mock loop trades; the configured trading pair when no watchlist is set"""
+    with state.lock:
+        watchlist = list(getattr(state, 'watchlist', None) or [])
+    return watchlist or [get_exchange_config()["trading_pair"]]
+
+SIGNAL_NAMES = {1: 'buy', -1: 'sell', 0: 'hold'}
+
+def watchlist_signals(matrix, tick, config, custom_evaluators, current):
+    """Signals for every watchlist symbol: vectorized for built-in strategies, streamed for custom"""
+    if config.get('active_strategy') == 'custom':
+        signals = np.zeros(len(matrix.symbols), dtype=np.int8)
+        codes = {'buy': 1, 'sell': -1}
+        for row, symbol in enumerate(matrix.symbols):
+            evaluators = custom_evaluators.setdefault(symbol, {})
+            signals[row] = codes.get(custom_strategy_signal(evaluators, float(current[row]), config), 0)
+        return signals
+    if not strategy_due(tick, config):
+        return np.zeros(len(matrix.symbols), dtype=np.int8)
+    rsi = None
+    if config.get('active_strategy', 'rsi') not in ('momentum', 'breakout'):
+        rsi = compute_watchlist_rsi(matrix.symbols, config)
+    return batch_signals(matrix, config, rsi)
+
 def trading_loop():
-    prices = []
-    eastern = pytz.timezone('US/Eastern')
+    global mock_scheduler
+    matrix = PriceMatrix(get_watchlist())
+    last_prices = {}
+    custom_evaluators = {}  # symbol -> {(owner, strategy id, version): StreamEvaluator}
+    with state.lock:
+        interval = state.config.get("interval", 5)
+        # Value positions restored before the loop started
+        for symbol, position in state.positions.items():
+            portfolio_valuation.set_position(PAPER_USER, PAPER_EXCHANGE, symbol, position['qty'], position['avg_price'])
+        portfolio_valuation.set_cash(PAPER_USER, state.cash)
+    mock_scheduler = scheduler = TickScheduler(interval, name="mock")
+    armed_exits = None  # custom_exit config the open positions were last armed with
     while True:
-        if state.running:
+        tick = scheduler.wait_next()
+        if tick is None:
+            return
+        with state.lock:
+            running = state.running
+        # With several workers only the lease holder trades
+        if running and is_trading_leader():
             # Check schedule
             with state.lock:
                 schedule = getattr(state, 'bot_schedule', '24/7')
-            now_utc = datetime.datetime.utcnow().replace(tzinfo=pytz.utc)
-            now_est = now_utc.astimezone(eastern)
-            is_market_hours = (
-                now_est.weekday() < 5 and
-                (now_est.hour > 9 or (now_est.hour == 9 and now_est.minute >= 30)) and
-                (now_est.hour < 16 or (now_est.hour == 16 and now_est.minute == 0))
-            )
-            if schedule == 'market' and not is_market_hours:
-                # Skip trading outside market hours
-                time.sleep(5)
+            calendar = calendar_for_schedule(schedule)
+            if not calendar.is_open(tick.scheduled_at):
+                # Sleep through the closed session instead of waking every tick
+                if not scheduler.pause_until(calendar.next_open(tick.scheduled_at)):
+                    return
                 continue
-            price = get_market_data()
-            prices.append(price)
-            if len(prices) > 50:  # Keep more prices for momentum/breakout strategies
-                prices = prices[-50:]
-            rsi = compute_mock_rsi(prices)
+            tick_start = time.perf_counter()
+            symbols = get_watchlist()
+            matrix.set_symbols(symbols)
+            for symbol in list(custom_evaluators):
+                if symbol not in matrix.index:
+                    del custom_evaluators[symbol]
+            last_prices = get_watchlist_data(symbols, last_prices)
+            current = matrix.append(last_prices)
+            candle_aggregator.on_prices(last_prices, tick.scheduled_at)
+            portfolio_valuation.on_prices(PAPER_EXCHANGE, last_prices)
             
             # Get current strategy config
             with state.lock:
                 config = state.strategy_config.copy()
+                if config.get('custom_exit') != armed_exits:
+                    # Exit settings changed (or positions were restored): re-arm every open position
+                    armed_exits = config.get('custom_exit')
+                    for symbol, position in state.positions.items():
+                        track_position_exits(symbol, position, last_prices.get(symbol, position['avg_price']), config)
+            exits = close_exited_positions(last_prices, tick.scheduled_at)
             
-            signal = simple_strategy(price, rsi, config, prices)
-            if risk_check(signal):
-                execute_trade(signal, price)
-        time.sleep(5)
+            signals = watchlist_signals(matrix, tick, config, custom_evaluators, current)
+            candidates = [
+                {'action': SIGNAL_NAMES[int(signals[row])], 'symbol': matrix.symbols[row], 'price': float(current[row])}
+                for row in np.flatnonzero(signals)
+            ]
+            orders = exits
+            for signal in confirm_signals(candidates, config):
+                if risk_check(signal['action']):
+                    execute_trade(signal['action'], signal['price'], signal['symbol'],
+                                  order_qty(signal['price'], config))
+                    orders += 1
+            TRADING_SIGNALS_PER_TICK.labels("mock").observe(int(np.count_nonzero(signals)))
+            TRADING_ORDERS_PER_TICK.labels("mock").observe(orders)
+            TRADING_TICK_DURATION.labels("mock").observe(time.perf_counter() - tick_start)
+
+_loop_thread = None
+_loop_start_lock = threading.Lock()
 
 def start_trading_loop():
-    t = threading.Thread(target=trading_loop, daemon=True)
-    t.start() 
\ No newline at end of file
+    """Start the mock trading loop once; later calls are no-ops"""
+    global _loop_thread
+    with _loop_start_lock:
+        if _loop_thread is None or not _loop_thread.is_alive():
+            _loop_thread = threading.Thread(target=trading_loop, daemon=True, name="trading-loop")
+            _loop_thread.start()
+        return _loop_thread 
\ No newline at end of file
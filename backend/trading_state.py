@@ -1,8 +1,8 @@
-import threading
+from metrics import InstrumentedLock
 
 class TradingState:
     def __init__(self):
-        self.lock = threading.Lock()
+        self.lock = InstrumentedLock("trading_state")
         self.running = False
         self.positions = {}  # symbol -> position info
         self.trades = []
@@ -36,6 +36,8 @@ class TradingState:
             "breakout_multiplier": 2.0
         }
         self.bot_schedule = "24/7"  # "24/7" or "market"
+        self.watchlist = []  # symbols the mock loop trades; empty -> exchange trading_pair
+        self.real_bot_user = None  # email the real bot trades for; the trading leader runs it
         # ...other state 
 
 # Singleton instance for import
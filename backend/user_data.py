@@ -1,43 +1,29 @@
-import json
-import os
-from typing import Dict, Any, List, Optional
+from typing import Callable, Dict, Any, List, Optional
 from datetime import datetime
 from pydantic import BaseModel
+from storage import get_storage
 
 class UserDataManager:
     """Manages user-specific data storage"""
     
-    def __init__(self):
-        self.users_data_dir = "user_data"
-        self._ensure_data_dir()
-    
-    def _ensure_data_dir(self):
-        """Ensure the user data directory exists"""
-        if not os.path.exists(self.users_data_dir):
-            os.makedirs(self.users_data_dir)
-    
-    def _get_user_file(self, user_email: str) -> str:
-        """Get the file path for a user's data"""
-        # Sanitize email for filename
-        safe_email = user_email.replace('@', '_at_').replace('.', '_')
-        return os.path.join(self.users_data_dir, f"{safe_email}.json")
-    
     def _load_user_data(self, user_email: str) -> Dict[str, Any]:
-        """Load user data from file"""
-        file_path = self._get_user_file(user_email)
-        if os.path.exists(file_path):
-            try:
-                with open(file_path, 'r') as f:
-                    return json.load(f)
-            except:
-                return self._get_default_user_data()
-        return self._get_default_user_data()
+        """Load user data from storage"""
+        data = get_storage().get_user_data(user_email)
+        return data if data is not None else self._get_default_user_data()
     
     def _save_user_data(self, user_email: str, data: Dict[str, Any]):
-        """Save user data to file"""
-        file_path = self._get_user_file(user_email)
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=2)
+        """Save the whole user document"""
+        get_storage().save_user_data(user_email, data)
+    
+    def _update_user_data(self, user_email: str, sections: Dict[str, Any]):
+        """Write only the given sections of the user document"""
+        sections = dict(sections, updated_at=datetime.now().isoformat())
+        get_storage().update_user_data(user_email, sections, defaults=self._get_default_user_data())
+    
+    def update_user_section(self, user_email: str, section: str, fn: Callable[[Any], Any]) -> Any:
+        """Replace one section with fn(current value) in a single storage transaction; returns the new value"""
+        return get_storage().update_section(user_email, section, fn, defaults=self._get_default_user_data(),
+                                            sections={"updated_at": datetime.now().isoformat()})
     
     def _get_default_user_data(self) -> Dict[str, Any]:
         """Get default user data structure"""
@@ -83,18 +69,20 @@ class UserDataManager:
     
     def add_user_exchange(self, user_email: str, exchange_name: str, exchange_data: Dict[str, Any]):
         """Add or update user's exchange connection"""
-        data = self._load_user_data(user_email)
-        data["exchanges"][exchange_name.lower()] = exchange_data
-        data["updated_at"] = datetime.now().isoformat()
-        self._save_user_data(user_email, data)
+        def add(exchanges):
+            exchanges = exchanges or {}
+            exchanges[exchange_name.lower()] = exchange_data
+            return exchanges
+        self.update_user_section(user_email, "exchanges", add)
     
     def remove_user_exchange(self, user_email: str, exchange_name: str):
         """Remove user's exchange connection"""
-        data = self._load_user_data(user_email)
-        if exchange_name.lower() in data["exchanges"]:
-            del data["exchanges"][exchange_name.lower()]
-            data["updated_at"] = datetime.now().isoformat()
-            self._save_user_data(user_email, data)
+        def remove(exchanges):
+            exchanges = exchanges or {}
+            exchanges.pop(exchange_name.lower(), None)
+            return exchanges
+        if exchange_name.lower() in self.get_user_exchanges(user_email):
+            self.update_user_section(user_email, "exchanges", remove)
     
     def get_user_exchange(self, user_email: str, exchange_name: str) -> Optional[Dict[str, Any]]:
         """Get specific user exchange data"""
@@ -109,18 +97,20 @@ class UserDataManager:
     
     def save_user_strategy(self, user_email: str, strategy_name: str, strategy_data: Dict[str, Any]):
         """Save user's strategy"""
-        data = self._load_user_data(user_email)
-        data["strategies"][strategy_name] = strategy_data
-        data["updated_at"] = datetime.now().isoformat()
-        self._save_user_data(user_email, data)
+        def save(strategies):
+            strategies = strategies or {}
+            strategies[strategy_name] = strategy_data
+            return strategies
+        self.update_user_section(user_email, "strategies", save)
     
     def delete_user_strategy(self, user_email: str, strategy_name: str):
         """Delete user's strategy"""
-        data = self._load_user_data(user_email)
-        if strategy_name in data["strategies"]:
-            del data["strategies"][strategy_name]
-            data["updated_at"] = datetime.now().isoformat()
-            self._save_user_data(user_email, data)
+        def delete(strategies):
+            strategies = strategies or {}
+            strategies.pop(strategy_name, None)
+            return strategies
+        if strategy_name in self.get_user_strategies(user_email):
+            self.update_user_section(user_email, "strategies", delete)
     
     # Custom strategies
     def get_user_custom_strategies(self, user_email: str) -> List[Dict[str, Any]]:
@@ -128,22 +118,22 @@ class UserDataManager:
         data = self._load_user_data(user_email)
         return data.get("custom_strategies", [])
     
-    def save_user_custom_strategy(self, user_email: str, strategy_data: Dict[str, Any]):
-        """Save user's custom strategy"""
-        data = self._load_user_data(user_email)
-        data["custom_strategies"].append(strategy_data)
-        data["updated_at"] = datetime.now().isoformat()
-        self._save_user_data(user_email, data)
+    def save_user_custom_strategy(self, user_email: str, strategy_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Append a new version of a custom strategy, numbered one past the newest stored with its id"""
+        saved = {}
+        def append(strategies):
+            strategies = strategies or []
+            versions = [int(s.get("version") or 0) for s in strategies if s.get("id") == strategy_data.get("id")]
+            saved.update(strategy_data, version=max(versions, default=0) + 1)
+            strategies.append(saved)
+            return strategies
+        self.update_user_section(user_email, "custom_strategies", append)
+        return saved
     
     def delete_user_custom_strategy(self, user_email: str, strategy_id: str):
         """Delete user's custom strategy"""
-        data = self._load_user_data(user_email)
-        data["custom_strategies"] = [
-            s for s in data["custom_strategies"] 
-            if s.get("id") != strategy_id
-        ]
-        data["updated_at"] = datetime.now().isoformat()
-        self._save_user_data(user_email, data)
+        self.update_user_section(user_email, "custom_strategies",
+                                 lambda strategies: [s for s in strategies or [] if s.get("id") != strategy_id])
     
     # Exchange config
     def get_user_exchange_config(self, user_email: str) -> Dict[str, Any]:
@@ -153,10 +143,7 @@ class UserDataManager:
     
     def update_user_exchange_config(self, user_email: str, config: Dict[str, Any]):
         """Update user's exchange configuration"""
-        data = self._load_user_data(user_email)
-        data["exchange_config"] = config
-        data["updated_at"] = datetime.now().isoformat()
-        self._save_user_data(user_email, data)
+        self._update_user_data(user_email, {"exchange_config": config})
     
     # Risk management
     def get_user_risk_management(self, user_email: str) -> Dict[str, Any]:
@@ -166,10 +153,7 @@ class UserDataManager:
     
     def update_user_risk_management(self, user_email: str, settings: Dict[str, Any]):
         """Update user's risk management settings"""
-        data = self._load_user_data(user_email)
-        data["risk_management"] = settings
-        data["updated_at"] = datetime.now().isoformat()
-        self._save_user_data(user_email, data)
+        self._update_user_data(user_email, {"risk_management": settings})
     
     # Signal confirmation
     def get_user_signal_confirmation(self, user_email: str) -> Dict[str, Any]:
@@ -179,10 +163,7 @@ class UserDataManager:
     
     def update_user_signal_confirmation(self, user_email: str, settings: Dict[str, Any]):
         """Update user's signal confirmation settings"""
-        data = self._load_user_data(user_email)
-        data["signal_confirmation"] = settings
-        data["updated_at"] = datetime.now().isoformat()
-        self._save_user_data(user_email, data)
+        self._update_user_data(user_email, {"signal_confirmation": settings})
     
     # Custom exit
     def get_user_custom_exit(self, user_email: str) -> Dict[str, Any]:
@@ -192,10 +173,7 @@ class UserDataManager:
     
     def update_user_custom_exit(self, user_email: str, settings: Dict[str, Any]):
         """Update user's custom exit settings"""
-        data = self._load_user_data(user_email)
-        data["custom_exit"] = settings
-        data["updated_at"] = datetime.now().isoformat()
-        self._save_user_data(user_email, data)
+        self._update_user_data(user_email, {"custom_exit": settings})
     
     # Bot status
     def get_user_bot_status(self, user_email: str) -> Dict[str, Any]:
@@ -205,17 +183,16 @@ class UserDataManager:
     
     def update_user_bot_status(self, user_email: str, status: Dict[str, Any]):
         """Update user's bot status"""
-        data = self._load_user_data(user_email)
-        data["bot_status"] = status
-        data["updated_at"] = datetime.now().isoformat()
-        self._save_user_data(user_email, data)
+        self._update_user_data(user_email, {"bot_status": status})
     
     # User data management
     def delete_user_data(self, user_email: str):
         """Delete all user data"""
-        file_path = self._get_user_file(user_email)
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        get_storage().delete_user_data(user_email)
+    
+    def get_user_data_version(self, user_email: str) -> tuple:
+        """Changes whenever the user's document is written, here or by another process"""
+        return get_storage().user_data_version(user_email)
     
     def get_user_data(self, user_email: str) -> Dict[str, Any]:
         """Get all user data"""
@@ -0,0 +1,182 @@
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+INITIAL_ROWS = 256
+
+
+class PortfolioValuation:
+    """Mark-to-market values of every open position, kept as aligned NumPy arrays.
+
+    Each (account, venue, symbol) position is one row of the qty, cost basis,
+    leverage, account and instrument arrays; prices sit in a vector indexed by
+    instrument, so a price update revalues every row in one vectorized pass and
+    per-account totals are a bincount over the rows. Closing a position moves
+    the last row into its slot to keep the arrays dense.
+    """
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._rows: Dict[Tuple[str, str, str], int] = {}
+        self._keys: List[Tuple[str, str, str]] = []
+        self._qty = np.zeros(INITIAL_ROWS)
+        self._cost = np.zeros(INITIAL_ROWS)
+        self._leverage = np.ones(INITIAL_ROWS)
+        self._account = np.zeros(INITIAL_ROWS, dtype=np.int64)
+        self._instrument = np.zeros(INITIAL_ROWS, dtype=np.int64)
+        self._accounts: Dict[str, int] = {}
+        self._instruments: Dict[Tuple[str, str], int] = {}
+        self._prices = np.full(64, np.nan)
+        self._cash = np.zeros(16)
+        self._peak = np.zeros(16)
+        self._dirty = True
+        self.priced_at = None
+        self.pass_seconds = 0.0
+        # Outputs of the last pass: per row, then per account
+        self._mark = self._market_value = self._unrealized = self._notional = self._equity = np.zeros(0)
+        self._totals: Dict[str, np.ndarray] = {}
+
+    def _account_index(self, account: str) -> int:
+        index = self._accounts.get(account)
+        if index is None:
+            index = self._accounts[account] = len(self._accounts)
+            if index >= len(self._cash):
+                self._cash = np.concatenate([self._cash, np.zeros(len(self._cash))])
+                self._peak = np.concatenate([self._peak, np.zeros(len(self._peak))])
+        return index
+
+    def _instrument_index(self, venue: str, symbol: str) -> int:
+        index = self._instruments.get((venue, symbol))
+        if index is None:
+            index = self._instruments[(venue, symbol)] = len(self._instruments)
+            if index >= len(self._prices):
+                self._prices = np.concatenate([self._prices, np.full(len(self._prices), np.nan)])
+        return index
+
+    def _grow(self):
+        size = len(self._qty)
+        self._qty = np.concatenate([self._qty, np.zeros(size)])
+        self._cost = np.concatenate([self._cost, np.zeros(size)])
+        self._leverage = np.concatenate([self._leverage, np.ones(size)])
+        self._account = np.concatenate([self._account, np.zeros(size, dtype=np.int64)])
+        self._instrument = np.concatenate([self._instrument, np.zeros(size, dtype=np.int64)])
+
+    def set_position(self, account: str, venue: str, symbol: str, qty: float, avg_price: float,
+                     leverage: float = 1.0):
+        """Upsert a position; qty 0 removes it"""
+        key = (account, venue, symbol)
+        with self._lock:
+            row = self._rows.get(key)
+            if not qty:
+                if row is not None:
+                    last = len(self._keys) - 1
+                    if row != last:
+                        for array in (self._qty, self._cost, self._leverage, self._account, self._instrument):
+                            array[row] = array[last]
+                        self._keys[row] = self._keys[last]
+                        self._rows[self._keys[row]] = row
+                    self._keys.pop()
+                    del self._rows[key]
+                    self._dirty = True
+                return
+            if row is None:
+                row = len(self._keys)
+                if row >= len(self._qty):
+                    self._grow()
+                self._rows[key] = row
+                self._keys.append(key)
+                self._account[row] = self._account_index(account)
+                self._instrument[row] = self._instrument_index(venue, symbol)
+            self._qty[row] = qty
+            self._cost[row] = qty * avg_price
+            self._leverage[row] = leverage or 1.0
+            self._dirty = True
+
+    def set_cash(self, account: str, cash: float):
+        with self._lock:
+            self._cash[self._account_index(account)] = cash
+            self._dirty = True
+
+    def drop(self, account: str):
+        """Remove every position of `account` and zero its cash and peak equity"""
+        with self._lock:
+            keys = [key for key in self._keys if key[0] == account]
+        for key in keys:
+            self.set_position(*key, 0, 0)
+        with self._lock:
+            index = self._accounts.get(account)
+            if index is not None:
+                self._cash[index] = self._peak[index] = 0.0
+                self._dirty = True
+
+    def on_prices(self, venue: str, prices: Dict[str, float]):
+        """Record a venue's latest prices and revalue every position"""
+        with self._lock:
+            for symbol, price in prices.items():
+                if price:
+                    self._prices[self._instrument_index(venue, symbol)] = price
+            self.priced_at = self._clock()
+            self._revalue()
+
+    def _revalue(self):
+        start = time.perf_counter()
+        n = len(self._keys)
+        qty, cost, leverage = self._qty[:n], self._cost[:n], self._leverage[:n]
+        accounts = self._account[:n]
+        price = self._prices[self._instrument[:n]]
+        # Positions without a price yet are carried at cost
+        self._mark = np.where(np.isnan(price), cost / qty, price)
+        self._market_value = qty * self._mark
+        self._unrealized = self._market_value - cost
+        self._notional = np.abs(self._market_value)
+        self._equity = cost / leverage + self._unrealized
+        slots = len(self._cash)
+        self._totals = {
+            "cost_basis": np.bincount(accounts, cost, slots),
+            "unrealized_pnl": np.bincount(accounts, self._unrealized, slots),
+            "notional_exposure": np.bincount(accounts, self._notional, slots),
+            "positions_value": np.bincount(accounts, self._equity, slots),
+        }
+        self._totals["total_value"] = self._cash + self._totals["positions_value"]
+        self._peak = np.maximum(self._peak, self._totals["total_value"])
+        self._dirty = False
+        self.pass_seconds = time.perf_counter() - start
+
+    def account(self, account: str) -> Dict[str, Any]:
+        """Marked totals and positions for one account"""
+        with self._lock:
+            if self._dirty:
+                self._revalue()
+            index = self._accounts.get(account)
+            if index is None:
+                return {"account": account, "cash": 0.0, "total_value": 0.0, "positions_value": 0.0,
+                        "cost_basis": 0.0, "unrealized_pnl": 0.0, "notional_exposure": 0.0,
+                        "max_drawdown": 0.0, "priced_at": self.priced_at, "positions": []}
+            totals = {name: float(values[index]) for name, values in self._totals.items()}
+            total_value, peak = totals["total_value"], float(self._peak[index])
+            rows = np.flatnonzero(self._account[:len(self._keys)] == index)
+            positions = []
+            for row in rows.tolist():
+                _, venue, symbol = self._keys[row]
+                positions.append({
+                    "venue": venue, "symbol": symbol, "qty": float(self._qty[row]),
+                    "avg_price": float(self._cost[row] / self._qty[row]), "mark": float(self._mark[row]),
+                    "market_value": float(self._market_value[row]), "unrealized_pnl": float(self._unrealized[row]),
+                    "notional": float(self._notional[row]), "leverage": float(self._leverage[row]),
+                    "allocation": float(self._equity[row] / total_value * 100) if total_value else 0.0,
+                })
+            return dict(totals, account=account, cash=float(self._cash[index]), priced_at=self.priced_at,
+                        max_drawdown=(peak - total_value) / peak * 100 if peak > 0 else 0.0, positions=positions)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"positions": len(self._keys), "accounts": len(self._accounts),
+                    "instruments": len(self._instruments), "last_pass_seconds": self.pass_seconds,
+                    "priced_at": self.priced_at}
+
+
+# Global valuation fed by the trading loops' fills and price ticks
+portfolio_valuation = PortfolioValuation()
@@ -0,0 +1,138 @@
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+
+SYMBOL_RE = re.compile(r"^[A-Z0-9]{2,20}$")
+MAX_WATCHLIST_SIZE = 500
+HISTORY_LENGTH = 50  # ticks kept per symbol, same as the single-pair loop
+
+
+def normalize_watchlist(symbols: List[str]) -> List[str]:
+    """Uppercase, dedupe (keeping order) and validate a list of trading pairs"""
+    seen = []
+    for symbol in symbols:
+        symbol = str(symbol).strip().upper().replace("-", "").replace("/", "")
+        if not SYMBOL_RE.match(symbol):
+            raise ValueError(f"Invalid trading pair: {symbol!r}")
+        if symbol not in seen:
+            seen.append(symbol)
+    if not seen:
+        raise ValueError("Watchlist must contain at least one trading pair")
+    if len(seen) > MAX_WATCHLIST_SIZE:
+        raise ValueError(f"Watchlist is limited to {MAX_WATCHLIST_SIZE} pairs")
+    return seen
+
+
+class PriceMatrix:
+    """Per-symbol price history as one (symbols x history) ring buffer.
+
+    Every tick writes one column for all symbols at once, so strategy
+    indicators can be computed for the whole watchlist with array operations.
+    """
+
+    def __init__(self, symbols: List[str], history: int = HISTORY_LENGTH):
+        self.history = history
+        self.symbols: List[str] = []
+        self.index: Dict[str, int] = {}
+        self._buffer = np.full((0, history), np.nan)
+        self._counts = np.zeros(0, dtype=np.int64)
+        self._head = 0  # column the next tick is written to
+        self.set_symbols(symbols)
+
+    def set_symbols(self, symbols: List[str]):
+        """Change the watchlist, keeping history for symbols that stay"""
+        if symbols == self.symbols:
+            return
+        buffer = np.full((len(symbols), self.history), np.nan)
+        counts = np.zeros(len(symbols), dtype=np.int64)
+        for row, symbol in enumerate(symbols):
+            old = self.index.get(symbol)
+            if old is not None:
+                buffer[row] = self._buffer[old]
+                counts[row] = self._counts[old]
+        self.symbols = list(symbols)
+        self.index = {symbol: row for row, symbol in enumerate(symbols)}
+        self._buffer = buffer
+        self._counts = counts
+
+    def append(self, prices: Dict[str, float]) -> np.ndarray:
+        """Record one tick; symbols missing from `prices` carry their last price forward.
+
+        Returns the current price vector (NaN for symbols never priced).
+        """
+        column = np.array([prices.get(symbol, np.nan) for symbol in self.symbols], dtype=float)
+        previous = self._buffer[:, (self._head - 1) % self.history]
+        missing = np.isnan(column)
+        column[missing] = previous[missing]
+        self._buffer[:, self._head] = column
+        self._counts += ~np.isnan(column)
+        self._head = (self._head + 1) % self.history
+        return column
+
+    def window(self, n: int) -> np.ndarray:
+        """Last `n` prices per symbol in chronological order, shape (symbols, n)"""
+        n = min(n, self.history)
+        columns = (self._head - n + np.arange(n)) % self.history
+        return self._buffer[:, columns]
+
+    def counts(self) -> np.ndarray:
+        """Samples recorded per symbol (capped at the history length)"""
+        return np.minimum(self._counts, self.history)
+
+    def prices_for(self, symbol: str) -> List[float]:
+        """History of one symbol as a list, oldest first"""
+        row = self.index[symbol]
+        count = int(min(self._counts[row], self.history))
+        return [float(p) for p in self.window(count)[row]] if count else []
+
+
+def batch_signals(matrix: PriceMatrix, config: Dict, rsi: Optional[np.ndarray] = None) -> np.ndarray:
+    """simple_strategy for every watchlist symbol in one vectorized pass.
+
+    Returns an int8 vector: 1 buy, -1 sell, 0 hold. The rules mirror
+    trading_loop.simple_strategy for the built-in rsi/momentum/breakout strategies.
+    """
+    n = len(matrix.symbols)
+    signals = np.zeros(n, dtype=np.int8)
+    if n == 0:
+        return signals
+    strategy = config.get('active_strategy', 'rsi')
+    counts = matrix.counts()
+    current = matrix.window(1)[:, 0]
+
+    if strategy == 'momentum':
+        lookback = int(config.get('momentum_lookback', 14))
+        threshold = config.get('momentum_threshold', 0.5)
+        if lookback > matrix.history:
+            return signals
+        base = matrix.window(lookback)[:, 0]
+        ready = (counts >= lookback) & (base != 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            momentum = (current - base) / base
+        signals[ready & (momentum > threshold)] = 1
+        signals[ready & (momentum < -threshold)] = -1
+    elif strategy == 'breakout':
+        period = int(config.get('breakout_period', 20))
+        multiplier = config.get('breakout_multiplier', 2.0)
+        if period > matrix.history:
+            return signals
+        window = matrix.window(period)
+        ready = counts >= period
+        with np.errstate(invalid="ignore"):
+            mean = window.mean(axis=1)
+            std = window.std(axis=1)
+        signals[ready & (current > mean + multiplier * std)] = 1
+        signals[ready & (current < mean - multiplier * std)] = -1
+    else:
+        if rsi is None:
+            return signals
+        if strategy == 'rsi':
+            oversold = config.get('rsi_oversold', 30)
+            overbought = config.get('rsi_overbought', 70)
+        else:
+            oversold, overbought = 30, 70
+        priced = ~np.isnan(current)
+        signals[priced & (rsi < oversold)] = 1
+        signals[priced & (rsi > overbought)] = -1
+    return signals